@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 
@@ -84,7 +86,12 @@ ASGI_APPLICATION = 'backend.asgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('DATABASE_NAME', default=str(BASE_DIR / 'db.sqlite3')),  # File SQLite (condiviso da HTTP e run_worker)
+        'OPTIONS': {
+            # Le transazioni prendono subito il lock di scrittura: una lettura promossa
+            # a scrittura fallirebbe con "database is locked" se un altro processo scrive
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -137,12 +144,70 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# =============================================================================
+# CHANNEL LAYER E CACHE CONDIVISA (più worker uvicorn)
+# =============================================================================
+# Con più worker i messaggi WebSocket e la cache devono passare da Redis: un task
+# eseguito nel worker A deve raggiungere un client collegato al worker B.
+REDIS_URL = config('REDIS_URL', default='')  # Es. redis://localhost:6379/0 (vuoto = solo in memoria, un worker)
+CHANNEL_LAYER_BACKEND = config('CHANNEL_LAYER_BACKEND', default='redis' if REDIS_URL else 'memory')  # 'memory', 'redis' o 'redis-pubsub'
+CHANNEL_LAYER_CAPACITY = config('CHANNEL_LAYER_CAPACITY', cast=int, default=1000)  # Messaggi in coda per canale prima di scartarli
+CHANNEL_LAYER_EXPIRY = config('CHANNEL_LAYER_EXPIRY', cast=int, default=60)  # Secondi di vita di un messaggio non consegnato
+WS_BROADCAST_QUEUE_SIZE = config('WS_BROADCAST_QUEUE_SIZE', cast=int, default=10000)  # Messaggi in attesa di invio dai task prima di scartarli
+
+_CHANNEL_LAYER_BACKENDS = {
+    'memory': 'channels.layers.InMemoryChannelLayer',
+    'redis': 'channels_redis.core.RedisChannelLayer',
+    'redis-pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+}
+if CHANNEL_LAYER_BACKEND not in _CHANNEL_LAYER_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CHANNEL_LAYER_BACKEND non valido: '{CHANNEL_LAYER_BACKEND}' (valori: {', '.join(_CHANNEL_LAYER_BACKENDS)})"
+    )
+if CHANNEL_LAYER_BACKEND != 'memory' and not REDIS_URL:
+    raise ImproperlyConfigured(f"CHANNEL_LAYER_BACKEND='{CHANNEL_LAYER_BACKEND}' richiede REDIS_URL")
+
 # Configurazione WebSocket per comunicazione real-time
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': _CHANNEL_LAYER_BACKENDS[CHANNEL_LAYER_BACKEND],
     }
 }
+if CHANNEL_LAYER_BACKEND == 'memory':
+    CHANNEL_LAYERS['default']['CONFIG'] = {
+        'capacity': CHANNEL_LAYER_CAPACITY,
+        'expiry': CHANNEL_LAYER_EXPIRY,
+    }
+elif CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS['default']['CONFIG'] = {
+        'hosts': [REDIS_URL],
+        'capacity': CHANNEL_LAYER_CAPACITY,
+        'expiry': CHANNEL_LAYER_EXPIRY,
+    }
+else:
+    # Pub/sub: nessuna coda persistente, i messaggi a client non collegati vanno persi
+    CHANNEL_LAYERS['default']['CONFIG'] = {
+        'hosts': [REDIS_URL],
+    }
+
+# Cache di Django (catalogo esercizi, connessioni WebSocket per task): condivisa tra i worker se c'è Redis
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'gpu-code-runner',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Secondi entro cui un client con protocollo delta può riconnettersi prima che il task venga interrotto
+WS_RESUME_GRACE_PERIOD = config('WS_RESUME_GRACE_PERIOD', cast=float, default=5.0)
 
 # =============================================================================
 # SISTEMA DI CREDITI
@@ -152,6 +217,9 @@ DAILY_CREDITS_RESET_AMOUNT = config('DAILY_CREDITS_RESET_AMOUNT', cast=int, defa
 TASK_START_COST = config('TASK_START_COST', cast=int, default=1)
 REDUCE_CREDITS_TIME_AMOUNT= config('REDUCE_CREDITS_TIME_AMOUNT', cast=float, default=1.0)
 DEFAULT_CREDIT_COST_PER_TIME_AMOUNT = config('DEFAULT_CREDIT_COST_PER_TIME_AMOUNT', cast=int, default=1)
+CREDITS_CACHE_TTL = config('CREDITS_CACHE_TTL', cast=float, default=5.0)  # Secondi di validità del saldo in cache
+DAILY_CREDITS_RESET_BATCH_SIZE = config('DAILY_CREDITS_RESET_BATCH_SIZE', cast=int, default=1000)  # Utenti per transazione nel reset giornaliero
+DAILY_CREDITS_RESET_THROTTLE = config('DAILY_CREDITS_RESET_THROTTLE', cast=float, default=0.05)  # Pausa in secondi tra i blocchi del reset
 
 # =============================================================================
 # ESECUZIONE E COMPILAZIONE CODICE
@@ -160,9 +228,93 @@ DEFAULT_FILE_EXTENSION = config('DEFAULT_FILE_EXTENSION', default='.cu')
 MAX_TASK_EXECUTION_TIME = config('MAX_TASK_EXECUTION_TIME', cast=int, default=30)
 MAX_SOURCE_CODE_LENGTH = config('MAX_SOURCE_CODE_LENGTH', cast=int, default=10000)
 MAX_OUTPUT_BUFFER_SIZE = config('MAX_OUTPUT_BUFFER_SIZE', cast=int, default=50000)
+OUTPUT_TAIL_SIZE = config('OUTPUT_TAIL_SIZE', cast=int, default=0)  # Caratteri finali conservati oltre il limite (0 = solo l'inizio)
+OUTPUT_OVERFLOW_ACTION = config('OUTPUT_OVERFLOW_ACTION', default='terminate')  # 'terminate' o 'truncate'
+LIVE_OUTPUT_FLUSH_INTERVAL = config('LIVE_OUTPUT_FLUSH_INTERVAL', cast=float, default=0.5)  # Secondi tra i salvataggi dell'output live
+LIVE_OUTPUT_FLUSH_SIZE = config('LIVE_OUTPUT_FLUSH_SIZE', cast=int, default=8192)  # Caratteri che forzano un salvataggio anticipato
 CODE_COMPILATION_TIMEOUT = config('CODE_COMPILATION_TIMEOUT', cast=int, default=10)
 PROGRAM_EXECUTION_TIMEOUT = config('PROGRAM_EXECUTION_TIMEOUT', cast=int, default=20)
+CUDA_COMPILER = config('CUDA_COMPILER', default='nvcc')  # Compilatore (anche uno script finto per i test)
+CUDA_COMPILER_FLAGS = config('CUDA_COMPILER_FLAGS', default='')  # Flag aggiuntivi del compilatore
 MAX_CONCURRENT_TASKS = config('MAX_CONCURRENT_TASKS', cast=int, default=5)
+MAX_CONCURRENT_COMPILES = config('MAX_CONCURRENT_COMPILES', cast=int, default=os.cpu_count() or 2)  # Compilazioni in parallelo (CPU)
+MAX_CONCURRENT_RUNS = config('MAX_CONCURRENT_RUNS', cast=int, default=MAX_CONCURRENT_TASKS)  # Esecuzioni in parallelo (GPU)
+
+# Limiti di risorse della fase di esecuzione (default degli esercizi che non li impostano, 0 = nessun limite)
+RUN_MEMORY_LIMIT_MB = config('RUN_MEMORY_LIMIT_MB', cast=int, default=0)  # RLIMIT_AS: il runtime CUDA riserva molto spazio di indirizzamento, usare valori ampi
+RUN_CPU_TIME_LIMIT = config('RUN_CPU_TIME_LIMIT', cast=int, default=0)  # RLIMIT_CPU in secondi (per processo)
+RUN_MAX_PROCESSES = config('RUN_MAX_PROCESSES', cast=int, default=0)  # RLIMIT_NPROC: conta tutti i processi e thread dell'utente del backend
+RUN_MAX_FILE_SIZE_MB = config('RUN_MAX_FILE_SIZE_MB', cast=int, default=100)  # RLIMIT_FSIZE: dimensione massima di un file scritto
+TASK_WORKSPACE_DIR = config('TASK_WORKSPACE_DIR', default='')  # Filesystem delle cartelle di lavoro dei task (vuoto = /dev/shm se disponibile, altrimenti cartella temporanea di sistema)
+TASK_WORKSPACE_POOL_SIZE = config('TASK_WORKSPACE_POOL_SIZE', cast=int, default=8)  # Cartelle di lavoro ripulite tenute pronte per esercizio (0 = nessun riuso)
+
+# =============================================================================
+# CACHE DI COMPILAZIONE
+# =============================================================================
+COMPILE_CACHE_ENABLED = config('COMPILE_CACHE_ENABLED', cast=bool, default=True)  # False = compilazione nella cartella di lavoro del task, senza cache
+COMPILE_CACHE_DIR = config('COMPILE_CACHE_DIR', default=str(BASE_DIR / 'compile_cache'))
+COMPILE_CACHE_MAX_SIZE = config('COMPILE_CACHE_MAX_SIZE', cast=int, default=512 * 1024 * 1024)  # Byte su disco prima dell'eliminazione LRU
+
+# =============================================================================
+# RUNNER DAEMON
+# =============================================================================
+RUNNER_SOCKET = config('RUNNER_SOCKET', default='')  # Socket Unix del runner daemon (vuoto = esecuzione locale)
+
+# =============================================================================
+# SCHEDULER DEI TASK
+# =============================================================================
+SCHEDULER_REFILL_INTERVAL = config('SCHEDULER_REFILL_INTERVAL', cast=float, default=5.0)
+SCHEDULER_STATS_WINDOW = config('SCHEDULER_STATS_WINDOW', cast=int, default=10000)
+SCHEDULER_POLICY = config('SCHEDULER_POLICY', default='fair')  # In ogni corsia: 'fair' = turni per utente, 'fifo' = ordine di arrivo, 'sjf' = più brevi prima
+SCHEDULER_MAX_RUNNING_PER_USER = config('SCHEDULER_MAX_RUNNING_PER_USER', cast=int, default=2)  # Task in corso per utente in ogni fase ('fair' e 'sjf', 0 = nessun limite)
+SCHEDULER_INTERACTIVE_SLA = config('SCHEDULER_INTERACTIVE_SLA', cast=float, default=120.0)  # Attesa massima (s) prima di passare davanti ai task dei docenti (0 = mai)
+SCHEDULER_BATCH_SLA = config('SCHEDULER_BATCH_SLA', cast=float, default=900.0)  # Attesa massima (s) di un task batch prima di passare davanti agli altri (0 = mai)
+SCHEDULER_ESTIMATE_TTL = config('SCHEDULER_ESTIMATE_TTL', cast=float, default=60.0)  # Secondi tra due ricalcoli delle durate medie per esercizio ('sjf')
+SCHEDULER_DEFAULT_ESTIMATE = config('SCHEDULER_DEFAULT_ESTIMATE', cast=float, default=10.0)  # Durata stimata (s) senza storico ('sjf')
+MAX_ACTIVE_TASKS_PER_USER = config('MAX_ACTIVE_TASKS_PER_USER', cast=int, default=10)  # Task in attesa + in esecuzione accettati per utente (0 = nessun limite)
+
+# =============================================================================
+# WORKER DI ESECUZIONE (manage.py run_worker)
+# =============================================================================
+# 'local' = la pipeline gira nei processi HTTP (sviluppo, un solo processo);
+# 'worker' = i processi HTTP accodano soltanto, i task vengono eseguiti da run_worker
+EXECUTION_MODE = config('EXECUTION_MODE', default='worker' if REDIS_URL else 'local')
+WORKER_POLL_INTERVAL = config('WORKER_POLL_INTERVAL', cast=float, default=1.0)  # Secondi tra due letture della coda sul database (oltre alle notifiche via channel layer)
+WORKER_SHUTDOWN_TIMEOUT = config('WORKER_SHUTDOWN_TIMEOUT', cast=float, default=60.0)  # Secondi concessi ai task in corso all'arresto del worker
+if EXECUTION_MODE not in ('local', 'worker'):
+    raise ImproperlyConfigured(f"EXECUTION_MODE non valido: '{EXECUTION_MODE}' (valori: local, worker)")
+
+# =============================================================================
+# RECUPERO DEI TASK ORFANI (reaper)
+# =============================================================================
+TASK_HEARTBEAT_INTERVAL = config('TASK_HEARTBEAT_INTERVAL', cast=float, default=10.0)  # Secondi tra due segnali di vita dei task in corso
+TASK_HEARTBEAT_TIMEOUT = config('TASK_HEARTBEAT_TIMEOUT', cast=float, default=60.0)  # Secondi senza segnali dopo cui un task in corso è orfano
+TASK_REAPER_INTERVAL = config('TASK_REAPER_INTERVAL', cast=float, default=30.0)  # Secondi tra due controlli dei task orfani (0 = solo all'avvio)
+TASK_REAPER_MAX_REQUEUES = config('TASK_REAPER_MAX_REQUEUES', cast=int, default=1)  # Volte in cui un task orfano viene rimesso in coda prima di fallire (0 = fallisce subito)
+
+# =============================================================================
+# ARCHIVIAZIONE TASK
+# =============================================================================
+TASK_ARCHIVE_AFTER_DAYS = config('TASK_ARCHIVE_AFTER_DAYS', cast=int, default=30)  # Età dei task conclusi da archiviare
+TASK_ARCHIVE_BATCH_SIZE = config('TASK_ARCHIVE_BATCH_SIZE', cast=int, default=500)  # Task archiviati per transazione
+
+# =============================================================================
+# COMPRESSIONE DEI DATI (codice e output dei task)
+# =============================================================================
+STORAGE_COMPRESSION_LEVEL = config('STORAGE_COMPRESSION_LEVEL', cast=int, default=6)  # Livello zlib (1 = veloce, 9 = compatto)
+STORAGE_COMPRESSION_MIN_SIZE = config('STORAGE_COMPRESSION_MIN_SIZE', cast=int, default=64)  # Byte sotto cui il testo resta non compresso
+STORAGE_DEDUP_MIN_SIZE = config('STORAGE_DEDUP_MIN_SIZE', cast=int, default=64)  # Byte sotto cui il codice non viene deduplicato
+
+# =============================================================================
+# CRONOLOGIA TASK (API paginata)
+# =============================================================================
+TASK_HISTORY_PAGE_SIZE = config('TASK_HISTORY_PAGE_SIZE', cast=int, default=20)  # Task per pagina se il client non indica page_size
+TASK_HISTORY_MAX_PAGE_SIZE = config('TASK_HISTORY_MAX_PAGE_SIZE', cast=int, default=100)  # Limite massimo di page_size
+
+# =============================================================================
+# CATALOGO ESERCIZI
+# =============================================================================
+EXERCISE_CATALOGUE_CACHE_TTL = config('EXERCISE_CATALOGUE_CACHE_TTL', cast=int, default=300)  # Secondi in cache del catalogo per corso (0 = disattivata)
 
 # =============================================================================
 # AUTENTICAZIONE E SICUREZZA
@@ -197,3 +349,22 @@ SIMPLE_JWT = {
 
 # Configurazione CSRF
 CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', cast=Csv(), default='http://localhost:3000,http://localhost:5173')
+
+# =============================================================================
+# LOGGING
+# =============================================================================
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': config('CORE_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Course, User, Exercise, Task
+from django.db import transaction
+from .models import Course, User, Exercise, Task, CreditLedgerEntry
 
 
 # Configurazione admin per gestire i corsi universitari
@@ -26,6 +27,24 @@ class UserAdmin(admin.ModelAdmin):
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
 
+    # Le modifiche manuali del saldo passano da add_credits (UPDATE atomico e movimento
+    # 'adjustment' nel registro): gli addebiti dei task nel frattempo non vengono sovrascritti
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if not change:
+                super().save_model(request, obj, form, change)
+                CreditLedgerEntry.objects.create(user=obj, delta=obj.credits, reason='initial')
+                return
+            delta = 0
+            if 'credits' in form.changed_data:
+                initial = form.initial.get('credits') or 0
+                delta = obj.credits - initial
+                obj.credits = initial   # Il nuovo saldo viene applicato da add_credits
+            obj.save(update_fields=[
+                field.name for field in obj._meta.concrete_fields if not field.primary_key and field.name != 'credits'
+            ])
+            obj.add_credits(delta, reason='adjustment')
+
 
 # Configurazione admin per gestire esercizi di programmazione con parametri JSON
 @admin.register(Exercise)
@@ -44,18 +63,36 @@ class ExerciseAdmin(admin.ModelAdmin):
 # Configurazione admin per gestire i task
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
-    list_display = ['id', 'get_user_matr', 'get_exercise_name', 'status', 'credits_cost', 'get_execution_time', 'created_at']
-    list_filter = ['status', 'created_at', 'user__course', 'exercise']
+    list_display = ['id', 'get_user_matr', 'get_exercise_name', 'status', 'priority', 'credits_cost', 'get_execution_time', 'created_at']
+    list_filter = ['status', 'priority', 'failure_reason', 'created_at', 'user__course', 'exercise']
     search_fields = ['user__email', 'user__matr', 'user__first_name', 'user__last_name', 'exercise__name']
     ordering = ['-created_at']
-    readonly_fields = ['id', 'created_at', 'started_at', 'finished_at', 'total_execution_time', 'stdout', 'stderr', 'process_id', 'credits_cost']
+    readonly_fields = ['id', 'created_at', 'started_at', 'finished_at', 'total_execution_time', 'stdout', 'stderr', 'process_id', 'credits_cost', 'archived_at', 'worker_id', 'heartbeat_at', 'recovery_count', 'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason']
+    list_select_related = ['user', 'exercise']
     
     fieldsets = (
-        ('Info', {'fields': ('id', 'user', 'exercise', 'status', 'credits_cost')}),
+        ('Info', {'fields': ('id', 'user', 'exercise', 'status', 'priority', 'credits_cost')}),
         ('Output', {'fields': ('stdout', 'stderr', 'message')}),
-        ('Timestamps', {'fields': ('created_at', 'started_at', 'finished_at', 'total_execution_time')}),
+        ('Timestamps', {'fields': ('created_at', 'started_at', 'finished_at', 'total_execution_time', 'archived_at')}),
+        ('Worker', {'fields': ('worker_id', 'process_id', 'heartbeat_at', 'recovery_count')}),
+        ('Risorse', {'fields': ('run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason')}),
     )
     
+    # La lista non mostra codice e output: non vengono letti dal database
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('code', 'stdout', 'stderr')
+        return queryset
+    
+    # Il dettaglio di un task archiviato mostra codice e output dall'archivio
+    # (solo in lettura: un salvataggio li riporterebbe nella tabella Task)
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None and request.method == 'GET':
+            obj.load_payload()
+        return obj
+    
     def get_user_matr(self, obj):
         return obj.user.matr
     get_user_matr.short_description = 'Matricola'
@@ -72,3 +109,20 @@ class TaskAdmin(admin.ModelAdmin):
         return '-'
     get_execution_time.short_description = 'Execution Time'
     get_execution_time.admin_order_field = 'total_execution_time'
+
+
+# Registro crediti in sola lettura (i movimenti non si modificano)
+@admin.register(CreditLedgerEntry)
+class CreditLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'delta', 'reason', 'task', 'created_at']
+    list_filter = ['reason', 'created_at']
+    search_fields = ['user__email', 'user__matr']
+    ordering = ['-created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user', 'task']
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    # Registra i segnali di invalidazione del catalogo esercizi e il controllo dei manifest
+    def ready(self) -> None:
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from .models import Task, TaskArchive
+
+
+# =============================================================================
+# ARCHIVIAZIONE DEI TASK CONCLUSI
+# =============================================================================
+
+# I task conclusi da più di TASK_ARCHIVE_AFTER_DAYS giorni spostano codice e output
+# nella tabella TaskArchive: la riga Task conserva solo i metadati e archived_at,
+# e il contenuto viene ricaricato solo quando serve (Task.load_payload).
+
+# Task archiviabili: conclusi, non ancora archiviati e creati prima di 'cutoff'
+def archivable_tasks(cutoff: datetime):
+    return Task.objects.filter(status__in=Task.FINISHED_STATUSES, created_at__lt=cutoff, archived_at__isnull=True)
+
+
+# Archivia il blocco successivo di task (id > after_pk) in un'unica transazione.
+# Restituisce (ultimo id del blocco o None se non ci sono altri task, task archiviati, byte spostati).
+def archive_batch(cutoff: datetime, after_pk: int = 0, batch_size: int = 500) -> Tuple[Optional[int], int, int]:
+    with transaction.atomic():
+        rows = list(
+            archivable_tasks(cutoff)
+            .filter(pk__gt=after_pk)
+            .order_by('pk')
+            .values_list('pk', 'code', 'stdout', 'stderr')[:batch_size]
+        )
+        if not rows:
+            return None, 0, 0
+
+        moved = 0
+        archives = []
+        for pk, code, stdout, stderr in rows:
+            moved += len(code.encode()) + len(stdout.encode()) + len(stderr.encode())
+            archives.append(TaskArchive(task_id=pk, code=code, stdout=stdout, stderr=stderr))
+        TaskArchive.objects.bulk_create(archives)
+        Task.objects.filter(pk__in=[row[0] for row in rows]).update(
+            code='', stdout='', stderr='', archived_at=timezone.now(),
+        )
+    return rows[-1][0], len(rows), moved
+
+
+# Byte occupati su disco da ogni tabella (solo SQLite con la tabella virtuale dbstat)
+def table_sizes() -> Dict[str, int]:
+    if connection.vendor != 'sqlite':
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')
+            return dict(cursor.fetchall())
+    except OperationalError:
+        return {}
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence
+from django.db import connection
+from .models import Course, Exercise, User
+
+
+# =============================================================================
+# UTILITÀ PER I BENCHMARK (comando bench, pacchetto core.benchmarks)
+# =============================================================================
+
+# Compilatore finto: l'"eseguibile" è uno script che contiene il sorgente ricevuto.
+# Con -c produce un oggetto (il testo del sorgente, un commento per l'harness) e senza
+# sorgente in TEMP_FILE_PATH collega gli oggetti ricevuti in un unico script.
+STUB_COMPILER = r'''#!/bin/bash
+out=a.out; src=""; compile=0; inputs=()
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -o) out="$2"; shift 2;;
+    -c) compile=1; shift;;
+    -include) shift 2;;
+    -DTEMP_FILE_PATH=*) src="${1#-DTEMP_FILE_PATH=}"; src="${src%\"}"; src="${src#\"}"; shift;;
+    --version) echo "stub-nvcc 1.0"; exit 0;;
+    -*) shift;;
+    *) inputs+=("$1"); shift;;
+  esac
+done
+if [ $compile = 1 ] && [ -n "$src" ]; then echo '# harness' > "$out"
+elif [ $compile = 1 ]; then cat "${inputs[@]}" > "$out"
+elif [ -n "$src" ]; then { echo '#!/bin/bash'; cat "$src"; } > "$out"; chmod +x "$out"
+else { echo '#!/bin/bash'; cat "${inputs[@]}"; } > "$out"; chmod +x "$out"
+fi
+'''
+
+
+# Scrive il compilatore finto nella cartella indicata e ne restituisce il percorso
+def write_stub_compiler(directory: str, name: str = 'nvcc') -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(STUB_COMPILER)
+    os.chmod(path, 0o755)
+    return path
+
+# Crea un database SQLite temporaneo su file (mai il database di sviluppo)
+@contextmanager
+def bench_database() -> Iterator[str]:
+    tmp_dir = tempfile.mkdtemp(prefix='gpu_bench_')
+    db_path = os.path.join(tmp_dir, 'bench.sqlite3')
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = db_path
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        yield db_path
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        try:
+            os.rmdir(tmp_dir)
+        except OSError:
+            pass
+
+
+# Crea i dati minimi per simulare le esecuzioni (corso, esercizio, utenti)
+def create_bench_fixtures(users: int = 1, credits: int = 1_000_000) -> tuple:
+    course = Course.objects.create(name='Benchmark')
+    exercise = Exercise.objects.create(name='sum', return_type='void')
+    exercise.courses.add(course)
+    bench_users = [
+        User.objects.create_user(
+            email=f'bench{i}@example.com',
+            matr=f'B{i:06d}',
+            first_name='Bench',
+            last_name=str(i),
+            password=None,
+            course=course,
+        )
+        for i in range(users)
+    ]
+    for user in bench_users:
+        user.add_credits(credits - user.credits)
+    return course, exercise, bench_users
+
+
+# Percentile (interpolazione lineare) di una lista di valori
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered: List[float] = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
@@ -0,0 +1,35 @@
+import pkgutil
+from importlib import import_module
+from typing import List, Type
+from django.core.management.base import BaseCommand
+from core.bench import bench_database
+
+
+# =============================================================================
+# BENCHMARK (eseguiti con: python manage.py bench <nome> [opzioni])
+# =============================================================================
+
+# Ogni modulo del pacchetto è un benchmark e definisce una classe Benchmark:
+# argomenti e output sono quelli di un comando di gestione, ma vengono tutti
+# esposti dall'unico comando 'bench' (il nome del benchmark è il nome del modulo).
+class BaseBenchmark(BaseCommand):
+    uses_database = False   # True: run_benchmark(options) gira su un database temporaneo (bench_database)
+
+    def handle(self, *args, **options):
+        if not self.uses_database:
+            return self.run_benchmark(options)
+        with bench_database():
+            return self.run_benchmark(options)
+
+    def run_benchmark(self, options):
+        raise NotImplementedError
+
+
+# Nomi dei benchmark disponibili, in ordine alfabetico
+def benchmark_names() -> List[str]:
+    return sorted(module.name for module in pkgutil.iter_modules(__path__) if not module.name.startswith('_'))
+
+
+# Classe del benchmark indicato
+def load_benchmark(name: str) -> Type[BaseBenchmark]:
+    return import_module(f'{__name__}.{name}').Benchmark
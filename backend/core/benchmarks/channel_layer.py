@@ -0,0 +1,190 @@
+import asyncio
+import multiprocessing
+import time
+from django.conf import settings
+from django.core.management.base import CommandError
+from core.benchmarks import BaseBenchmark
+
+
+# =============================================================================
+# PROCESSI DEL BENCHMARK (eseguiti con 'spawn': ognuno configura Django da sé)
+# =============================================================================
+
+# Processo che simula un worker uvicorn con client WebSocket collegati ai suoi gruppi
+def _receiver(groups, expected, ready, start, results, timeout):
+    import django
+    django.setup()
+    from channels.layers import get_channel_layer
+
+    async def main():
+        layer = get_channel_layer()
+        channels = []
+        for group in groups:
+            channel = await layer.new_channel()
+            await layer.group_add(group, channel)
+            channels.append(channel)
+        ready.release()
+        await asyncio.get_running_loop().run_in_executor(None, start.wait)
+
+        received, last = 0, None
+        deadline = time.monotonic() + timeout
+
+        async def consume(channel):
+            nonlocal received, last
+            while received < expected:
+                await layer.receive(channel)
+                received += 1
+                last = time.time()
+
+        tasks = [asyncio.ensure_future(consume(channel)) for channel in channels]
+        while received < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for group, channel in zip(groups, channels):
+            await layer.group_discard(group, channel)
+        return received, last
+
+    received, last = asyncio.run(main())
+    results.put(('receiver', received, last))
+
+
+# Processo che simula un worker in cui girano i task: invia i delta tramite il broadcaster
+def _publisher(groups, messages, payload_size, ready, start, results):
+    import django
+    django.setup()
+    from core.broadcast import ChannelBroadcaster
+
+    broadcaster = ChannelBroadcaster(queue_size=messages)
+    broadcaster.start()
+    payload = 'x' * payload_size
+    ready.release()
+    start.wait()
+    for i in range(messages):
+        broadcaster.send(groups[i % len(groups)], {
+            'type': 'task_delta',
+            'data': {'type': 'output', 'stream': 'stdout', 'offset': i * payload_size, 'data': payload},
+        })
+    broadcaster.flush()
+    results.put(('publisher', broadcaster.stats()['sent'], None))
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Benchmark multi-processo del channel layer: N processi inviano delta ai gruppi di N processi '
+            'riceventi (come N worker uvicorn). Richiede un channel layer condiviso (Redis).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            default='1,2,4',
+            help='Numeri di worker da provare, separati da virgola (default: 1,2,4)',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=5000,
+            help='Messaggi inviati da ogni processo mittente (default: 5000)',
+        )
+        parser.add_argument(
+            '--groups',
+            type=int,
+            default=8,
+            help='Task (gruppi) seguiti da ogni processo ricevente (default: 8)',
+        )
+        parser.add_argument(
+            '--payload-size',
+            type=int,
+            default=200,
+            help='Caratteri di output per messaggio (default: 200)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60.0,
+            help='Secondi massimi per ogni prova (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        if settings.CHANNEL_LAYER_BACKEND == 'memory':
+            raise CommandError(
+                'Il channel layer in memoria non attraversa i processi: impostare REDIS_URL '
+                '(es. REDIS_URL=redis://localhost:6379/0 python manage.py bench channel_layer)'
+            )
+        try:
+            workers = [int(value) for value in options['workers'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError(f"--workers non valido: '{options['workers']}'")
+
+        self.stdout.write(
+            f'[bench_channel_layer] backend {settings.CHANNEL_LAYER_BACKEND} — {options["messages"]} messaggi '
+            f'da {options["payload_size"]} caratteri per mittente, {options["groups"]} gruppi per ricevente'
+        )
+        self.stdout.write(f'  {"worker":>6} | {"inviati":>9} | {"ricevuti":>9} | {"persi":>6} | {"durata":>8} | {"msg/s":>9}')
+
+        rates = []
+        for count in workers:
+            sent, received, lost, elapsed = self.run_round(count, options)
+            rate = received / elapsed if elapsed > 0 else 0.0
+            rates.append(rate)
+            self.stdout.write(
+                f'  {count:>6} | {sent:>9} | {received:>9} | {lost:>6} | {elapsed:>6.2f} s | {rate:>9.0f}'
+            )
+            if received == 0:
+                raise CommandError(f'Nessun messaggio consegnato con {count} worker: channel layer non condiviso?')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[bench_channel_layer] Throughput da {workers[0]} a {workers[-1]} worker: '
+            f'{rates[-1] / max(rates[0], 1e-9):.2f}x'
+        ))
+
+    # Una prova: count mittenti e count riceventi, ogni mittente invia a tutti i gruppi
+    def run_round(self, count, options):
+        context = multiprocessing.get_context('spawn')
+        ready = context.Semaphore(0)
+        start = context.Event()
+        results = context.Queue()
+        run_id = f'{time.time_ns():x}'
+        groups = [
+            [f'bench_{run_id}_{receiver}_{i}' for i in range(options['groups'])]
+            for receiver in range(count)
+        ]
+        all_groups = [group for receiver_groups in groups for group in receiver_groups]
+        messages = options['messages']
+
+        # Messaggi attesi da ogni ricevente: i mittenti scorrono i gruppi a turno
+        expected = [0] * count
+        for i in range(messages):
+            expected[(i % len(all_groups)) // options['groups']] += count
+
+        processes = [
+            context.Process(target=_receiver, args=(groups[receiver], expected[receiver], ready, start, results, options['timeout']))
+            for receiver in range(count)
+        ] + [
+            context.Process(target=_publisher, args=(all_groups, messages, options['payload_size'], ready, start, results))
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for _ in processes:
+                if not ready.acquire(timeout=options['timeout']):
+                    raise CommandError('Processi del benchmark non pronti (channel layer raggiungibile?)')
+            started = time.time()
+            start.set()
+
+            sent, received, last = 0, 0, started
+            for _ in processes:
+                role, value, finished = results.get(timeout=options['timeout'] + 10)
+                if role == 'publisher':
+                    sent += value
+                else:
+                    received += value
+                    last = max(last, finished or started)
+            # Persi: scartati dal broadcaster, falliti o oltre la capacità del channel layer
+            return sent, received, count * messages - received, last - started
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
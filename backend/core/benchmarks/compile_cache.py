@@ -0,0 +1,131 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from core.bench import percentile
+from core.benchmarks import BaseBenchmark
+from core.compiler import CompileCache
+from core.manifest import ExerciseManifest
+
+# Compilatore finto: simula il tempo di compilazione e produce un "eseguibile"
+# che contiene il sorgente ricevuto tramite -DTEMP_FILE_PATH
+FAKE_COMPILER = r'''#!/bin/bash
+out=a.out; src=""
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -o) out="$2"; shift 2;;
+    -DTEMP_FILE_PATH=*) src="${1#-DTEMP_FILE_PATH=}"; src="${src%\"}"; src="${src#\"}"; shift;;
+    --version) echo "fake-nvcc 1.0"; exit 0;;
+    *) shift;;
+  esac
+done
+sleep __SECONDS__
+{ echo '#!/bin/bash'; cat "$src"; head -c __PADDING__ /dev/zero | tr '\0' '#'; echo; } > "$out"
+'''
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark della cache di compilazione con un compilatore finto (hit, miss ed eliminazione LRU).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--submissions',
+            type=int,
+            default=200,
+            help='Numero di sottomissioni simulate (default: 200)',
+        )
+        parser.add_argument(
+            '--unique',
+            type=int,
+            default=40,
+            help='Sorgenti distinti tra cui scegliere (default: 40)',
+        )
+        parser.add_argument(
+            '--compile-ms',
+            type=float,
+            default=200.0,
+            help='Durata simulata di una compilazione in millisecondi (default: 200)',
+        )
+        parser.add_argument(
+            '--binary-size',
+            type=int,
+            default=64 * 1024,
+            help='Dimensione degli eseguibili finti in byte (default: 65536)',
+        )
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            default=1024 * 1024,
+            help='Dimensione massima della cache in byte (default: 1048576)',
+        )
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix='gpu_bench_cc_')
+        try:
+            self.run_benchmark(work_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_benchmark(self, work_dir, options):
+        compiler = os.path.join(work_dir, 'fake_nvcc')
+        with open(compiler, 'w') as f:
+            f.write(
+                FAKE_COMPILER
+                .replace('__SECONDS__', str(options['compile_ms'] / 1000.0))
+                .replace('__PADDING__', str(options['binary_size']))
+            )
+        os.chmod(compiler, 0o755)
+
+        exercise_dir = os.path.join(work_dir, 'exercise')
+        os.makedirs(exercise_dir)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\nint main() { return 0; }\n')
+        manifest = ExerciseManifest(os.path.basename(exercise_dir), exercise_dir, 'main.cu')
+
+        sources = []
+        for i in range(options['unique']):
+            path = os.path.join(exercise_dir, f'tmp_{i}.cu')
+            with open(path, 'w') as f:
+                f.write(f'echo "soluzione {i}"\n')
+            sources.append(path)
+
+        cache = CompileCache(
+            directory=os.path.join(work_dir, 'cache'),
+            max_size=options['max_size'],
+            compiler=compiler,
+            flags=[],
+        )
+
+        # Distribuzione sbilanciata: pochi sorgenti vengono ripetuti spesso (utenti che rilanciano)
+        rng = random.Random(42)
+        weights = [1.0 / (rank + 1) for rank in range(len(sources))]
+        hit_times, miss_times = [], []
+        started = time.perf_counter()
+        for _ in range(options['submissions']):
+            source = rng.choices(sources, weights)[0]
+            t0 = time.perf_counter()
+            result = cache.compile(source, manifest)
+            elapsed = time.perf_counter() - t0
+            if not result.ok:
+                self.stderr.write(f'Compilazione fallita: {result.stderr}')
+                return
+            (hit_times if result.hit else miss_times).append(elapsed)
+        elapsed = time.perf_counter() - started
+
+        stats = cache.stats()
+        cached = [name for name in os.listdir(cache.directory) if name.endswith('.out')]
+        cache_size = sum(os.path.getsize(os.path.join(cache.directory, name)) for name in cached)
+        uncached = options['submissions'] * options['compile_ms'] / 1000.0
+
+        self.stdout.write(
+            f'[bench_compile_cache] {options["submissions"]} sottomissioni, {options["unique"]} sorgenti distinti, '
+            f'compilazione {options["compile_ms"]} ms'
+        )
+        self.stdout.write(f'  hit:            {stats["hits"]} (p50 {percentile(hit_times, 50) * 1000:.1f} ms, '
+                          f'p95 {percentile(hit_times, 95) * 1000:.1f} ms)')
+        self.stdout.write(f'  miss:           {stats["misses"]} (p50 {percentile(miss_times, 50) * 1000:.1f} ms, '
+                          f'p95 {percentile(miss_times, 95) * 1000:.1f} ms)')
+        self.stdout.write(f'  eliminazioni:   {stats["evictions"]}')
+        self.stdout.write(f'  cache su disco: {len(cached)} eseguibili, {cache_size} byte (limite {options["max_size"]})')
+        self.stdout.write(f'  tempo totale:   {elapsed:.2f} s (senza cache ~{uncached:.2f} s)')
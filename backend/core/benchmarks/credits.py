@@ -0,0 +1,139 @@
+import threading
+import time
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from core.bench import create_bench_fixtures
+from core.benchmarks import BaseBenchmark
+from core.credits import get_balance_cache
+from core.models import CreditLedgerEntry, User
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark di contesa sui crediti: molti task paralleli per utente, lettura-modifica-scrittura contro addebito atomico.'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=4,
+            help='Numero di utenti (default: 4)',
+        )
+        parser.add_argument(
+            '--tasks-per-user',
+            type=int,
+            default=8,
+            help='Task paralleli (thread) per ogni utente (default: 8)',
+        )
+        parser.add_argument(
+            '--charges',
+            type=int,
+            default=50,
+            help='Addebiti da 1 credito eseguiti da ogni task (default: 50)',
+        )
+        parser.add_argument(
+            '--credits',
+            type=int,
+            default=None,
+            help='Crediti iniziali per utente (default: esattamente quelli richiesti dai task)',
+        )
+
+    def run_benchmark(self, options):
+        demand = options['tasks_per_user'] * options['charges']
+        initial = options['credits'] if options['credits'] is not None else demand
+        _, _, users = create_bench_fixtures(users=options['users'], credits=initial)
+        user_ids = [user.id for user in users]
+
+        self.stdout.write(
+            f'[bench_credits] {len(user_ids)} utenti x {options["tasks_per_user"]} task x {options["charges"]} addebiti, '
+            f'{initial} crediti iniziali per utente'
+        )
+
+        # 1. Comportamento precedente: rilettura dell'utente, decremento in Python e save() dell'intera riga
+        def legacy_charge(user_id):
+            user = User.objects.get(pk=user_id)
+            if user.credits < 1:
+                return False
+            user.credits -= 1
+            user.save()
+            return True
+
+        # 2. Addebito atomico: controllo sul saldo in cache e UPDATE ... WHERE credits >= 1 con movimento nel registro
+        def atomic_charge(user_id):
+            user = User(pk=user_id, credits=0)
+            return user.has_credits(1) and user.reduce_credits(1, reason='task_usage')
+
+        for label, charge in (('lettura-modifica-scrittura', legacy_charge), ('atomico + registro', atomic_charge)):
+            self.reset_balances(users, initial)
+            result = self.run_contention(charge, user_ids, options)
+            self.report(label, result, user_ids, initial)
+
+    # Riporta saldi e registro al valore iniziale (rettifica sul registro) e svuota la cache
+    def reset_balances(self, users, initial):
+        for user in users:
+            total = CreditLedgerEntry.objects.filter(user=user).aggregate(total=Sum('delta'))['total'] or 0
+            User.objects.filter(pk=user.pk).update(credits=initial)
+            if total != initial:
+                CreditLedgerEntry.objects.create(user=user, delta=initial - total, reason='adjustment')
+        cache = get_balance_cache()
+        cache.invalidate()
+        cache.hits = cache.reloads = 0
+
+    # Avvia tasks_per_user thread per ogni utente e conta addebiti riusciti, rifiutati ed errori di lock
+    def run_contention(self, charge, user_ids, options):
+        counters = {'charged': 0, 'rejected': 0, 'locked': 0}
+        counters_lock = threading.Lock()
+        barrier = threading.Barrier(len(user_ids) * options['tasks_per_user'])
+
+        def task(user_id):
+            local = {'charged': 0, 'rejected': 0, 'locked': 0}
+            barrier.wait()
+            try:
+                for _ in range(options['charges']):
+                    try:
+                        local['charged' if charge(user_id) else 'rejected'] += 1
+                    except OperationalError:
+                        local['locked'] += 1
+            finally:
+                connection.close()
+            with counters_lock:
+                for key, value in local.items():
+                    counters[key] += value
+
+        threads = [
+            threading.Thread(target=task, args=(user_id,))
+            for user_id in user_ids
+            for _ in range(options['tasks_per_user'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters['elapsed'] = time.perf_counter() - started
+        return counters
+
+    def report(self, label, result, user_ids, initial):
+        balances = dict(User.objects.filter(id__in=user_ids).values_list('id', 'credits'))
+        ledger = dict(
+            CreditLedgerEntry.objects.filter(user_id__in=user_ids).values('user_id')
+            .annotate(total=Sum('delta')).values_list('user_id', 'total')
+        )
+        spent = sum(initial - balances[user_id] for user_id in user_ids)
+        lost = result['charged'] - spent
+        drift = sum(1 for user_id in user_ids if ledger.get(user_id, 0) != balances[user_id])
+        negative = sum(1 for user_id in user_ids if balances[user_id] < 0)
+        cache = get_balance_cache()
+        total = result['charged'] + result['rejected'] + result['locked']
+
+        self.stdout.write(f'  {label}')
+        self.stdout.write(f'    addebiti riusciti:   {result["charged"]} (rifiutati {result["rejected"]}, errori di lock {result["locked"]})')
+        self.stdout.write(f'    crediti scalati:     {spent}')
+        style = self.style.ERROR if lost else self.style.SUCCESS
+        self.stdout.write(style(f'    aggiornamenti persi: {lost}'))
+        self.stdout.write(f'    saldi negativi:      {negative}')
+        self.stdout.write(f'    registro != saldo:   {drift} utenti')
+        self.stdout.write(f'    saldo in cache:      {cache.hits} hit, {cache.reloads} riletture')
+        self.stdout.write(
+            f'    tempo:               {result["elapsed"]:.2f} s ({total / result["elapsed"]:.0f} addebiti/s)'
+        )
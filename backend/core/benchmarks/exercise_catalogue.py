@@ -0,0 +1,91 @@
+import time
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from core.bench import create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.catalogue import invalidate_catalogue
+from core.models import Course, Exercise
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark del catalogo esercizi: richieste al secondo senza cache, con cache e con If-None-Match (304).'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--exercises',
+            type=int,
+            default=40,
+            help='Esercizi nel corso dello studente (default: 40)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Richieste per ogni scenario (default: 2000)',
+        )
+
+    def run_benchmark(self, options):
+        course, _, (user,) = create_bench_fixtures()
+        other = Course.objects.create(name='Altro corso')
+        for i in range(options['exercises']):
+            exercise = Exercise.objects.create(
+                name=f'kernel_{i}',
+                return_type='void',
+                params=[{'type': 'float*', 'name': f'buf{j}'} for j in range(4)] + [{'type': 'int', 'name': 'n'}],
+                comment=f'Esercizio {i}: descrizione del kernel\n' * 5,
+                include_files=['cuda_runtime.h', 'stdio.h'],
+            )
+            exercise.courses.set([course, other] if i % 2 else [course])
+        invalidate_catalogue([course.id, other.id])
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        n = options['requests']
+
+        with override_settings(EXERCISE_CATALOGUE_CACHE_TTL=0):
+            uncached = self.run_requests(client, n, expected=200)
+        cached = self.run_requests(client, n, expected=200)
+        etag = client.get('/api/exercises/')['ETag']
+        conditional = self.run_requests(client, n, expected=304, HTTP_IF_NONE_MATCH=etag)
+
+        self.stdout.write(
+            f'[bench_exercise_catalogue] {Exercise.objects.filter(courses=course).count()} esercizi nel corso, '
+            f'{n} richieste per scenario'
+        )
+        self.stdout.write(f'  {"scenario":<26} | {"richieste/s":>11} | {"p50":>9} | {"p95":>9} | {"byte":>7}')
+        for label, (rps, timings, size) in (
+            ('senza cache', uncached), ('con cache', cached), ('con cache, If-None-Match', conditional),
+        ):
+            self.stdout.write(
+                f'  {label:<26} | {rps:>11.0f} | {percentile(timings, 50) * 1000:>6.2f} ms | '
+                f'{percentile(timings, 95) * 1000:>6.2f} ms | {size:>7}'
+            )
+
+        # Verifica dell'invalidazione: modificare un esercizio del corso cambia l'ETag
+        exercise = Exercise.objects.filter(courses=course).first()
+        exercise.comment = 'Commento aggiornato'
+        exercise.save()
+        response = client.get('/api/exercises/', HTTP_IF_NONE_MATCH=etag)
+        if response.status_code != 200 or response['ETag'] == etag:
+            raise CommandError('Il catalogo non è stato invalidato dopo la modifica di un esercizio')
+        before = len(response.data)
+        exercise.courses.remove(course)
+        if len(client.get('/api/exercises/').data) != before - 1:
+            raise CommandError('Il catalogo non è stato invalidato dopo la modifica dei corsi')
+        invalidate_catalogue([course.id, other.id])
+        self.stdout.write(self.style.SUCCESS('[bench_exercise_catalogue] Invalidazione verificata (modifica esercizio e corsi)'))
+
+    def run_requests(self, client, n, expected, **headers):
+        timings = []
+        size = 0
+        started = time.perf_counter()
+        for _ in range(n):
+            t0 = time.perf_counter()
+            response = client.get('/api/exercises/', **headers)
+            timings.append(time.perf_counter() - t0)
+            if response.status_code != expected:
+                raise CommandError(f'Risposta {response.status_code} invece di {expected}')
+            size = len(response.content)
+        return n / (time.perf_counter() - started), timings, size
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from django.core.management.base import CommandError
+from core.bench import percentile
+from core.benchmarks import BaseBenchmark
+from core.compiler import CompileCache
+from core.manifest import MANIFEST_NAME, ExerciseManifest
+
+# Compilatore finto con costo per file: attende il tempo indicato per ogni unità di
+# traduzione (harness, sorgente dello studente) e per il collegamento, e registra
+# "<tipo> <file> <secondi>" nel file di log
+COST_COMPILER = r'''#!/bin/bash
+out=a.out; src=""; compile=0; inputs=()
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -o) out="$2"; shift 2;;
+    -c) compile=1; shift;;
+    -include) shift 2;;
+    -DTEMP_FILE_PATH=*) src="${1#-DTEMP_FILE_PATH=}"; src="${src%\"}"; src="${src#\"}"; shift;;
+    --version) echo "cost-nvcc 1.0"; exit 0;;
+    -*) shift;;
+    *) inputs+=("$1"); shift;;
+  esac
+done
+cost() { echo "$1 $(basename "$2") $3" >> __LOG__; sleep "$3"; }
+if [ $compile = 1 ] && [ -n "$src" ]; then
+  cost harness "${inputs[0]}" __HARNESS__; echo '# harness' > "$out"
+elif [ $compile = 1 ]; then
+  cost sorgente "${inputs[0]}" __STUDENT__; cat "${inputs[@]}" > "$out"
+elif [ -n "$src" ]; then
+  cost harness "${inputs[0]}" __HARNESS__; cost sorgente "$src" __STUDENT__
+  { echo '#!/bin/bash'; cat "$src"; } > "$out"; chmod +x "$out"
+else
+  cost collegamento "$out" __LINK__; { echo '#!/bin/bash'; cat "${inputs[@]}"; } > "$out"; chmod +x "$out"
+fi
+'''
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Benchmark dell\'harness precompilato: harness e sorgente compilati insieme a ogni '
+            'sottomissione contro harness compilato una volta per versione dell\'esercizio, sorgente '
+            'compilato da solo e collegamento. Il compilatore finto registra il costo di ogni file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--submissions',
+            type=int,
+            default=20,
+            help='Sottomissioni distinte per ogni modalità (default: 20)',
+        )
+        parser.add_argument(
+            '--harness-ms',
+            type=int,
+            default=400,
+            help='Costo di compilazione dell\'harness in millisecondi (default: 400)',
+        )
+        parser.add_argument(
+            '--student-ms',
+            type=int,
+            default=50,
+            help='Costo di compilazione del sorgente dello studente in millisecondi (default: 50)',
+        )
+        parser.add_argument(
+            '--link-ms',
+            type=int,
+            default=20,
+            help='Costo del collegamento in millisecondi (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix='gpu_bench_harness_')
+        try:
+            self.run_benchmark(work_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_benchmark(self, work_dir, options):
+        log_path = os.path.join(work_dir, 'compiler.log')
+        compiler = os.path.join(work_dir, 'nvcc')
+        with open(compiler, 'w') as f:
+            f.write(
+                COST_COMPILER
+                .replace('__LOG__', log_path)
+                .replace('__HARNESS__', str(options['harness_ms'] / 1000.0))
+                .replace('__STUDENT__', str(options['student_ms'] / 1000.0))
+                .replace('__LINK__', str(options['link_ms'] / 1000.0))
+            )
+        os.chmod(compiler, 0o755)
+
+        self.stdout.write(
+            f'[bench_harness] {options["submissions"]} sottomissioni distinte per modalità, costo harness '
+            f'{options["harness_ms"]} ms, sorgente {options["student_ms"]} ms, collegamento {options["link_ms"]} ms'
+        )
+        errors = []
+        for label, separate in (('insieme', False), ('precompilato', True)):
+            exercise_dir = os.path.join(work_dir, label, 'bench')
+            manifest = self.write_exercise(exercise_dir, separate)
+            cache = CompileCache(directory=os.path.join(work_dir, label, 'cache'), compiler=compiler, flags=[])
+            open(log_path, 'w').close()
+
+            latencies = []
+            for n in range(options['submissions']):
+                source = os.path.join(work_dir, label, f'submission_{n}.cu')
+                with open(source, 'w') as f:
+                    f.write(f'echo "soluzione {n}"\n')
+                started = time.perf_counter()
+                result = cache.compile(source, manifest)
+                latencies.append(time.perf_counter() - started)
+                if not result.ok:
+                    raise CommandError(f'{label}: compilazione fallita: {result.stderr}')
+                output = subprocess.run([result.binary], capture_output=True, text=True).stdout
+                if output.strip() != f'soluzione {n}':
+                    errors.append(f'{label}: output {output!r} della sottomissione {n}')
+
+            self.stdout.write(
+                f'  {label:<13} p50 {percentile(latencies, 50) * 1000:>7.1f} ms   '
+                f'p95 {percentile(latencies, 95) * 1000:>7.1f} ms   totale {sum(latencies):>6.2f} s'
+            )
+            costs = self.read_costs(log_path)
+            for kind, (count, seconds) in sorted(costs.items()):
+                self.stdout.write(f'    {kind:<13} {count:>4} file   {seconds:>6.2f} s')
+            if separate and costs.get('harness', (0, 0))[0] != 1:
+                errors.append(f'precompilato: harness compilato {costs.get("harness", (0, 0))[0]} volte invece di 1')
+
+            if separate:
+                # Nuova versione dell'harness: un solo nuovo oggetto, quello precedente viene eliminato
+                with open(manifest.harness_path, 'a') as f:
+                    f.write('// versione 2\n')
+                source = os.path.join(work_dir, label, 'submission_v2.cu')
+                with open(source, 'w') as f:
+                    f.write('echo "versione 2"\n')
+                cache.compile(source, manifest)
+                stats = cache.stats()
+                objects = os.listdir(os.path.join(cache.directory, 'harness'))
+                self.stdout.write(
+                    f'  harness modificato: {stats["harness_builds"]} compilazioni dell\'harness, '
+                    f'{stats["harness_hits"]} riusi, oggetti in cache {objects}'
+                )
+                if stats['harness_builds'] != 2 or len(objects) != 1:
+                    errors.append(f'harness modificato: {stats["harness_builds"]} compilazioni, oggetti {objects}')
+
+        if errors:
+            raise CommandError('; '.join(errors))
+        self.stdout.write(self.style.SUCCESS('[bench_harness] Eseguibili corretti in entrambe le modalità'))
+
+    # Esercizio con harness e, per la compilazione separata, header dei prototipi
+    @staticmethod
+    def write_exercise(exercise_dir, separate):
+        os.makedirs(exercise_dir)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\n')
+        manifest = {'harness': 'main.cu'}
+        if separate:
+            with open(os.path.join(exercise_dir, 'student.h'), 'w') as f:
+                f.write('__global__ void bench(float *a, int n);\n')
+            manifest['declarations'] = 'student.h'
+        with open(os.path.join(exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f)
+        return ExerciseManifest.load(exercise_dir)
+
+    # Tipo di file -> (numero di file, secondi di compilazione) dal log del compilatore finto
+    @staticmethod
+    def read_costs(log_path):
+        costs = defaultdict(lambda: [0, 0.0])
+        with open(log_path) as f:
+            for line in f:
+                kind, _, seconds = line.split()
+                costs[kind][0] += 1
+                costs[kind][1] += float(seconds)
+        return {kind: tuple(value) for kind, value in costs.items()}
@@ -0,0 +1,141 @@
+import select
+import subprocess
+import sys
+import threading
+import time
+from core.bench import percentile
+from core.benchmarks import BaseBenchmark
+from core.io_engine import IOEngine, EVENT_OUTPUT, EVENT_EXIT
+
+# Processo figlio: resta inattivo, poi stampa il proprio timestamp a intervalli regolari
+CHILD_SCRIPT = (
+    'import sys, time\n'
+    'time.sleep({idle})\n'
+    'for _ in range({lines}):\n'
+    '    sys.stdout.write(repr(time.time()) + "\\n"); sys.stdout.flush()\n'
+    '    time.sleep({interval})\n'
+)
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark del motore I/O: CPU a riposo e latenza dell\'output con molti processi concorrenti.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=50,
+            help='Numero di processi concorrenti (default: 50)',
+        )
+        parser.add_argument(
+            '--idle',
+            type=float,
+            default=3.0,
+            help='Secondi di inattività dei processi prima di produrre output (default: 3)',
+        )
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=50,
+            help='Righe di output per processo (default: 50)',
+        )
+        parser.add_argument(
+            '--interval-ms',
+            type=float,
+            default=20.0,
+            help='Intervallo tra le righe in millisecondi (default: 20)',
+        )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Confronta anche con il vecchio polling a 10 ms (un thread per processo)',
+        )
+
+    def handle(self, *args, **options):
+        # Motore dedicato al benchmark (non condiviso con i task reali)
+        self.io_engine = IOEngine()
+        self.io_engine.start()
+
+        modes = [('motore I/O', self.consume_engine)]
+        if options['legacy']:
+            modes.append(('polling 10 ms', self.consume_legacy))
+
+        for label, consumer in modes:
+            self.stdout.write(f'[bench_io_engine] {label}: {options["processes"]} processi')
+            idle_cpu, latencies = self.run_mode(consumer, options)
+            latencies_ms = [lat * 1000.0 for lat in latencies]
+            self.stdout.write(f'  - CPU a riposo: {idle_cpu:.2f}% di un core')
+            self.stdout.write(f'  - Latenza output: p50 {percentile(latencies_ms, 50):.3f} ms, '
+                              f'p95 {percentile(latencies_ms, 95):.3f} ms, max {max(latencies_ms, default=0):.3f} ms '
+                              f'({len(latencies_ms)} righe)')
+
+    def run_mode(self, consumer, options):
+        script = CHILD_SCRIPT.format(
+            idle=options['idle'],
+            lines=options['lines'],
+            interval=options['interval_ms'] / 1000.0,
+        )
+        latencies = []
+        lock = threading.Lock()
+
+        # Callback comune: registra la latenza di ogni riga completa
+        def record(lines):
+            now = time.time()
+            with lock:
+                for line in lines:
+                    try:
+                        latencies.append(now - float(line))
+                    except ValueError:
+                        pass
+
+        started = time.monotonic()
+        threads = []
+        for _ in range(options['processes']):
+            thread = threading.Thread(target=consumer, args=(script, record), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        # Misura la CPU del processo mentre tutti i figli sono inattivi
+        time.sleep(min(1.0, options['idle'] / 3))
+        window = max(0.5, options['idle'] - (time.monotonic() - started) - 0.5)
+        cpu_before = time.process_time()
+        time.sleep(window)
+        idle_cpu = (time.process_time() - cpu_before) / window * 100.0
+
+        for thread in threads:
+            thread.join()
+        return idle_cpu, latencies
+
+    # Consumatore basato sul motore I/O (come TaskExecutor._monitor_process)
+    def consume_engine(self, script, record):
+        engine = self.io_engine
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        watch = engine.watch(process)
+        partial = ''
+        while True:
+            event = watch.next_event()
+            if event in (EVENT_OUTPUT, EVENT_EXIT):
+                stdout, _ = watch.take_output()
+                partial += stdout
+                *lines, partial = partial.split('\n')
+                record(lines)
+            if event == EVENT_EXIT:
+                return
+
+    # Consumatore con il vecchio polling (select + readline ogni 10 ms)
+    def consume_legacy(self, script, record):
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+        while process.poll() is None:
+            for pipe in (process.stdout, process.stderr):
+                while True:
+                    rlist, _, _ = select.select([pipe], [], [], 0)
+                    if not rlist:
+                        break
+                    line = pipe.readline()
+                    if not line:
+                        break
+                    if pipe is process.stdout:
+                        record([line.strip()])
+            time.sleep(0.01)
+        remaining, _ = process.communicate()
+        record(remaining.split())
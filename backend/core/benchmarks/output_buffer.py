@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from core.benchmarks import BaseBenchmark
+from core.output_buffer import OutputBuffer
+
+
+# Oggetto che conserva un riferimento all'output, come task.stdout nel vecchio monitor
+class _Holder:
+    stdout = ''
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Microbenchmark del buffer di output: concatenazione di stringhe contro OutputBuffer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='100000,200000,400000,800000',
+            help='Dimensioni di output da provare, in caratteri (default: 100000,200000,400000,800000)',
+        )
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=40,
+            help='Dimensione di ogni blocco di output (default: 40)',
+        )
+        parser.add_argument(
+            '--tail',
+            type=int,
+            default=0,
+            help='Caratteri di coda conservati dal buffer (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        chunk = 'y' * (options['chunk'] - 1) + '\n'
+        self.stdout.write(f'[bench_output_buffer] blocchi da {len(chunk)} caratteri')
+        self.stdout.write(f'  {"caratteri":>10} | {"concatenazione":>22} | {"OutputBuffer":>22}')
+        for size in [int(value) for value in options['sizes'].split(',')]:
+            chunks = size // len(chunk)
+            legacy_time, legacy_peak = self.measure(self.legacy, chunk, chunks)
+            buffer_time, buffer_peak = self.measure(self.buffered, chunk, chunks, options['tail'])
+            self.stdout.write(
+                f'  {size:>10} | {legacy_time * 1000:>8.1f} ms {legacy_peak / 1024:>8.0f} KiB | '
+                f'{buffer_time * 1000:>8.1f} ms {buffer_peak / 1024:>8.0f} KiB'
+            )
+
+    # Tempo e picco di memoria di una strategia
+    def measure(self, strategy, chunk, chunks, *args):
+        tracemalloc.start()
+        started = time.perf_counter()
+        strategy(chunk, chunks, *args)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak
+
+    # Vecchio monitor: stdout += blocco, len() e copia in task.stdout a ogni iterazione
+    def legacy(self, chunk, chunks):
+        holder = _Holder()
+        stdout = ''
+        sent = 0
+        for _ in range(chunks):
+            stdout += chunk
+            if len(stdout) > sent:
+                holder.stdout = stdout
+                _ = stdout[sent:]
+                sent = len(stdout)
+
+    # Nuovo monitor: scrittura nel buffer e lettura delle sole novità
+    def buffered(self, chunk, chunks, tail=0):
+        buffer = OutputBuffer(max_size=chunks * len(chunk), tail_size=tail)
+        sent = 0
+        for _ in range(chunks):
+            buffer.write(chunk)
+            if buffer.head_size > sent:
+                _ = buffer.read_since(sent)
+                sent = buffer.head_size
+        buffer.getvalue()
@@ -0,0 +1,128 @@
+import threading
+import time
+from django.db import OperationalError, connection
+from core.bench import bench_database, create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.models import Task
+from core.output_buffer import OutputBuffer
+from core.output_writer import LiveOutputWriter
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark delle scritture di output live: salvataggio a ogni blocco contro scrittura accorpata.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=20,
+            help='Numero di task "chiacchieroni" concorrenti (default: 20)',
+        )
+        parser.add_argument(
+            '--chunks',
+            type=int,
+            default=200,
+            help='Blocchi di output prodotti da ogni task (default: 200)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Caratteri per blocco (default: 200)',
+        )
+        parser.add_argument(
+            '--interval-ms',
+            type=float,
+            default=5.0,
+            help='Pausa tra due blocchi in millisecondi (default: 5)',
+        )
+        parser.add_argument(
+            '--lock-threshold-ms',
+            type=float,
+            default=20.0,
+            help='Scritture più lente di questa soglia contano come attese di lock (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        with bench_database():
+            _, exercise, (user,) = create_bench_fixtures()
+            self.stdout.write(
+                f'[bench_output_writes] {options["tasks"]} task, {options["chunks"]} blocchi da '
+                f'{options["chunk_size"]} caratteri ogni {options["interval_ms"]} ms'
+            )
+            self.stdout.write(
+                f'  {"strategia":<10} | {"scritture":>9} | {"MiB scritti":>11} | {"p95 ms":>7} | '
+                f'{"max ms":>8} | {"attese lock":>11} | {"locked":>6} | {"tempo s":>7}'
+            )
+            for label, batched in (('per-blocco', False), ('accorpata', True)):
+                self.run_strategy(label, batched, user, exercise, options)
+
+    # Esegue N task concorrenti con la strategia indicata e stampa i risultati
+    def run_strategy(self, label, batched, user, exercise, options):
+        tasks = [
+            Task.objects.create(user=user, exercise=exercise, code='// stub', status='running')
+            for _ in range(options['tasks'])
+        ]
+        chunk = 'x' * (options['chunk_size'] - 1) + '\n'
+        pause = options['interval_ms'] / 1000.0
+        latencies = []
+        errors = [0]
+        writes = [0]
+        written = [0]
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(tasks))
+
+        # Salvataggio cronometrato del task (stesso percorso usato dall'executor)
+        def timed_save(save, **kwargs):
+            started = time.perf_counter()
+            try:
+                save(**kwargs)
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        # Task simulato: produce output a intervalli regolari
+        def run_task(task):
+            stdout = OutputBuffer(max_size=options['chunks'] * len(chunk))
+            stderr = OutputBuffer(max_size=1)
+            save = task.save
+            task.save = lambda **kwargs: timed_save(save, **kwargs)
+            writer = LiveOutputWriter(task, stdout, stderr)
+            barrier.wait()
+            try:
+                for _ in range(options['chunks']):
+                    stdout.write(chunk)
+                    writer.mark(len(chunk))
+                    if batched:
+                        writer.flush_if_due()
+                    else:
+                        writer.flush()
+                    time.sleep(pause)
+                # Salvataggio finale (eseguito da complete() nell'executor)
+                task.stdout = stdout.getvalue()
+                task.save(update_fields=['stdout', 'stderr'])
+                writer.finish()
+                with lock:
+                    writes[0] += writer.writes
+                    written[0] += writer.bytes_written
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run_task, args=(task,)) for task in tasks]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        threshold = options['lock_threshold_ms'] / 1000.0
+        lock_waits = sum(1 for value in latencies if value > threshold)
+        self.stdout.write(
+            f'  {label:<10} | {writes[0]:>9} | {written[0] / 2**20:>11.2f} | '
+            f'{percentile(latencies, 95) * 1000:>7.1f} | {max(latencies or [0]) * 1000:>8.1f} | '
+            f'{lock_waits:>11} | {errors[0]:>6} | {elapsed:>7.2f}'
+        )
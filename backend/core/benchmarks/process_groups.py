@@ -0,0 +1,217 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from django.core.management.base import CommandError
+from core.benchmarks import BaseBenchmark
+from core.io_engine import IOEngine, EVENT_EXIT, EVENT_TIMEOUT
+from core.process_group import (ResourceLimits, classify_exhaustion, run, spawn, terminate_group,
+                                EXHAUSTION_CPU, EXHAUSTION_FILE_SIZE, EXHAUSTION_OOM)
+
+# Albero di processi: il processo principale crea dei figli che creano a loro volta un nipote
+# (uno dei figli ignora SIGTERM), scrive i pid su stdout, consuma CPU e memoria e poi esce
+# ('exit') o resta in attesa finché non viene terminato ('timeout')
+TREE_SCRIPT = r'''
+import os, signal, sys, time
+for i in range({children}):
+    if os.fork() == 0:
+        if i == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        if os.fork() == 0:
+            os.write(1, b"%d\n" % os.getpid())
+            time.sleep(600)
+            os._exit(0)
+        os.write(1, b"%d\n" % os.getpid())
+        time.sleep(600)
+        os._exit(0)
+memory = bytearray({memory_mb} * 1024 * 1024)
+started = time.process_time()
+while time.process_time() - started < {cpu}:
+    pass
+if sys.argv[1] == "exit":
+    sys.exit(3)
+time.sleep(600)
+'''
+
+# Programmi che superano un limite di risorse: (nome, comando, limiti, motivo atteso)
+LIMIT_CASES = [
+    ('memoria', [sys.executable, '-c', 'x = bytearray(512 * 1024 * 1024)'],
+     ResourceLimits(memory_mb=128), EXHAUSTION_OOM),
+    ('CPU', [sys.executable, '-c', 'while True: pass'],
+     ResourceLimits(cpu_seconds=1), EXHAUSTION_CPU),
+    ('dimensione file', ['bash', '-c', 'echo inizio; head -c 4194304 /dev/zero > "$0"', '{file}'],
+     ResourceLimits(file_size_mb=1), EXHAUSTION_FILE_SIZE),
+    ('nessun limite superato', [sys.executable, '-c', 'x = bytearray(16 * 1024 * 1024)'],
+     ResourceLimits(memory_mb=512, cpu_seconds=5, file_size_mb=1), None),
+]
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Verifica dei gruppi di processi: alberi di processi che creano figli e nipoti vengono '
+            'terminati per intero (anche se il processo principale esce da solo), il consumo di '
+            'risorse misurato con wait4 viene riportato e i limiti di memoria, CPU e dimensione dei '
+            'file vengono applicati e riconosciuti.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trees',
+            type=int,
+            default=10,
+            help='Alberi di processi per ogni scenario (default: 10)',
+        )
+        parser.add_argument(
+            '--children',
+            type=int,
+            default=3,
+            help='Figli del processo principale, ognuno con un nipote (default: 3)',
+        )
+        parser.add_argument(
+            '--cpu',
+            type=float,
+            default=0.2,
+            help='Secondi di CPU consumati dal processo principale (default: 0.2)',
+        )
+        parser.add_argument(
+            '--memory-mb',
+            type=int,
+            default=64,
+            help='MB allocati dal processo principale (default: 64)',
+        )
+
+    def handle(self, *args, **options):
+        # Motore dedicato al benchmark (non condiviso con i task reali)
+        self.io_engine = IOEngine()
+        self.io_engine.start()
+        script = TREE_SCRIPT.format(
+            children=options['children'], memory_mb=options['memory_mb'], cpu=options['cpu'],
+        )
+        expected = options['children'] * 2
+        errors = []
+
+        for scenario in ('exit', 'timeout'):
+            survivors, usages, kill_times = 0, [], []
+            for _ in range(options['trees']):
+                pids, returncode, usage, kill_time = self.run_tree(script, scenario, options['cpu'] + 1.0)
+                alive = [pid for pid in pids if self.is_alive(pid)]
+                survivors += len(alive)
+                if len(pids) != expected:
+                    errors.append(f'{scenario}: {len(pids)} pid ricevuti invece di {expected}')
+                if alive:
+                    errors.append(f'{scenario}: processi sopravvissuti {alive}')
+                    self.kill(alive)
+                if usage is None:
+                    errors.append(f'{scenario}: consumo di risorse non disponibile')
+                else:
+                    usages.append(usage)
+                if scenario == 'exit' and returncode != 3:
+                    errors.append(f'exit: codice di uscita {returncode} invece di 3')
+                if kill_time is not None:
+                    kill_times.append(kill_time)
+
+            self.stdout.write(f'[bench_process_groups] {scenario}: {options["trees"]} alberi da {expected + 1} processi')
+            self.stdout.write(f'  - Processi sopravvissuti: {survivors}')
+            if usages:
+                self.stdout.write(
+                    f'  - CPU media {sum(u.cpu_seconds for u in usages) / len(usages):.3f}s, '
+                    f'RSS massima {max(u.max_rss_kb for u in usages) / 1024:.1f} MB, '
+                    f'durata media {sum(u.wall_seconds or 0 for u in usages) / len(usages):.3f}s'
+                )
+            if kill_times:
+                self.stdout.write(f'  - Terminazione del gruppo: max {max(kill_times) * 1000:.1f} ms')
+            for usage in usages:
+                if usage.cpu_seconds < options['cpu'] * 0.5:
+                    errors.append(f'{scenario}: tempo CPU misurato {usage.cpu_seconds:.3f}s')
+                if usage.max_rss_kb < options['memory_mb'] * 1024 * 0.5:
+                    errors.append(f'{scenario}: RSS massima misurata {usage.max_rss_kb} KB')
+
+        # Limiti di risorse applicati all'avvio e classificazione dell'uscita
+        for name, cmd, limits, expected_reason in LIMIT_CASES:
+            reason, returncode = self.run_limited(cmd, limits)
+            self.stdout.write(f'[bench_process_groups] limite {name}: uscita {returncode}, motivo {reason or "-"}')
+            if reason != expected_reason:
+                errors.append(f'limite {name}: motivo {reason} invece di {expected_reason}')
+
+        # Compilazione con timeout: anche i processi in background del compilatore vengono terminati
+        marker = f'bench-process-groups-{os.getpid()}'
+        try:
+            run(['bash', '-c', f'exec -a {marker} sleep 600 & sleep 600'], timeout=0.3)
+            errors.append('run: timeout non rispettato')
+        except subprocess.TimeoutExpired:
+            pass
+        time.sleep(0.1)
+        leftover = subprocess.run(['pgrep', '-f', marker], capture_output=True, text=True).stdout.split()
+        self.stdout.write(f'[bench_process_groups] run con timeout: processi sopravvissuti {len(leftover)}')
+        if leftover:
+            errors.append(f'run: processi sopravvissuti {leftover}')
+            self.kill([int(pid) for pid in leftover])
+
+        if errors:
+            raise CommandError('; '.join(sorted(set(errors))))
+        self.stdout.write(self.style.SUCCESS('[bench_process_groups] Tutti i processi sono stati raccolti'))
+
+    # Avvia un albero, lo termina (scenario 'timeout') o lo lascia uscire e restituisce i pid dei discendenti
+    def run_tree(self, script, scenario, timeout):
+        process = spawn([sys.executable, '-c', script, scenario],
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        watch = self.io_engine.watch(process, timeout=timeout)
+        output, kill_time = '', None
+        try:
+            while True:
+                event = watch.next_event(timeout=timeout + 10)
+                if event is None:
+                    raise CommandError('Nessun evento dal motore I/O')
+                output += watch.take_output()[0]
+                if event == EVENT_TIMEOUT:
+                    started = time.monotonic()
+                    terminate_group(process.pid, watch.wait_exit, 0.5)
+                    kill_time = time.monotonic() - started
+                    watch.wait_exit(2.0)
+                    output += watch.take_output()[0]
+                    break
+                if event == EVENT_EXIT:
+                    break
+        finally:
+            watch.close()
+        time.sleep(0.05)   # I processi uccisi con SIGKILL vengono raccolti da init
+        return [int(pid) for pid in output.split()], watch.returncode, watch.usage, kill_time
+
+    # Esegue un comando con i limiti indicati e classifica la sua uscita
+    def run_limited(self, cmd, limits):
+        fd, path = tempfile.mkstemp(prefix='bench_limits_')
+        os.close(fd)
+        try:
+            process = spawn([part.format(file=path) for part in cmd], limits=limits,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+            watch = self.io_engine.watch(process, timeout=10.0)
+            stderr, event = '', None
+            try:
+                while True:
+                    event = watch.next_event(timeout=20.0)
+                    stderr += watch.take_output()[1]
+                    if event in (EVENT_EXIT, EVENT_TIMEOUT, None):
+                        break
+            finally:
+                if event != EVENT_EXIT:
+                    terminate_group(process.pid, watch.wait_exit, 0.5)
+                watch.close()
+        finally:
+            os.unlink(path)
+        return classify_exhaustion(watch.returncode, limits, watch.usage, stderr), watch.returncode
+
+    # True se il processo esiste e non è uno zombie
+    @staticmethod
+    def is_alive(pid):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+        except (OSError, IndexError):
+            return False
+
+    @staticmethod
+    def kill(pids):
+        for pid in pids:
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
@@ -0,0 +1,125 @@
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connection
+from core.bench import create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.credits import reset_credits_batch
+from core.models import CreditLedgerEntry, User
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark del reset giornaliero crediti: UPDATE unico contro blocchi per chiave primaria, con addebiti concorrenti.'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100_000,
+            help='Numero di utenti da reimpostare (default: 100000)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.DAILY_CREDITS_RESET_BATCH_SIZE,
+            help='Utenti per blocco (default: settings.DAILY_CREDITS_RESET_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--throttle',
+            type=float,
+            default=settings.DAILY_CREDITS_RESET_THROTTLE,
+            help='Pausa in secondi tra i blocchi (default: settings.DAILY_CREDITS_RESET_THROTTLE)',
+        )
+        parser.add_argument(
+            '--credits',
+            type=int,
+            default=10,
+            help='Crediti assegnati dal reset (default: 10)',
+        )
+
+    def run_benchmark(self, options):
+        credits = options['credits']
+        course, _, (charged_user,) = create_bench_fixtures(credits=1_000_000)
+        User.objects.bulk_create(
+            [
+                User(email=f'reset{i}@example.com', matr=f'R{i:07d}',
+                     first_name='Reset', last_name=str(i), password='!', course=course, credits=0)
+                for i in range(options['users'])
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f'[bench_reset_credits] {options["users"]} utenti a 0 crediti, reset a {credits}, '
+            f'addebiti continui di un utente attivo in parallelo'
+        )
+
+        # 1. Comportamento precedente: un solo UPDATE su tutta la tabella
+        def single_update():
+            User.objects.filter(credits__lt=credits).update(credits=credits)
+            return 1
+
+        # 2. Stesso reset con i movimenti nel registro, ma in un'unica transazione
+        def single_transaction():
+            reset_credits_batch(credits, 0, options['users'] + 1)
+            return 1
+
+        # 3. Blocchi per chiave primaria con movimenti nel registro e pausa tra i blocchi
+        def chunked():
+            after_pk, batches = 0, 0
+            while True:
+                after_pk, _ = reset_credits_batch(credits, after_pk, options['batch_size'])
+                if after_pk is None:
+                    return batches
+                batches += 1
+                time.sleep(options['throttle'])
+
+        strategies = (
+            ('UPDATE unico (senza registro)', single_update),
+            ('transazione unica', single_transaction),
+            ('a blocchi', chunked),
+        )
+        for label, strategy in strategies:
+            User.objects.exclude(pk=charged_user.pk).update(credits=0)
+            CreditLedgerEntry.objects.filter(reason='daily_reset').delete()
+            self.run_strategy(label, strategy, charged_user)
+
+    # Esegue il reset mentre un thread addebita crediti in continuazione e misura le attese degli addebiti
+    def run_strategy(self, label, strategy, charged_user):
+        latencies = []
+        locked = [0]
+        stop = threading.Event()
+
+        def charge():
+            user = User.objects.get(pk=charged_user.pk)
+            try:
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    try:
+                        user.reduce_credits(1, reason='task_usage')
+                    except OperationalError:
+                        locked[0] += 1
+                    latencies.append(time.perf_counter() - t0)
+                    time.sleep(0.001)
+            finally:
+                connection.close()
+
+        charger = threading.Thread(target=charge)
+        charger.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        try:
+            batches = strategy()
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            charger.join()
+
+        self.stdout.write(f'  {label}')
+        self.stdout.write(f'    durata reset:     {elapsed:.2f} s ({batches} transazioni)')
+        self.stdout.write(f'    movimenti:        {CreditLedgerEntry.objects.filter(reason="daily_reset").count()} daily_reset')
+        self.stdout.write(
+            f'    addebiti:         {len(latencies)} (p50 {percentile(latencies, 50) * 1000:.2f} ms, '
+            f'p99 {percentile(latencies, 99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms, '
+            f'errori di lock {locked[0]})'
+        )
@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from core.bench import percentile, write_stub_compiler
+from core.benchmarks import BaseBenchmark
+from core.compiler import CompileCache
+from core.manifest import MANIFEST_NAME, ExerciseManifest
+from core.runner import RunnerClient, RunnerDaemon
+
+# Vecchio script per esercizio (gpu/<esercizio>/run.sh, sostituito dai manifest): riprodotto
+# solo come termine di confronto con i livelli di shell e la compilazione nella cartella dell'esercizio
+LEGACY_RUN_SCRIPT = r'''set -e
+cd gpu/$2
+EXECUTABLE_NAME="${3}_$(date +%s)_$$.out"
+trap 'rm -f "$EXECUTABLE_NAME"' EXIT
+nvcc main.cu -DTEMP_FILE_PATH="\"$1\"" -o "$EXECUTABLE_NAME"
+./"$EXECUTABLE_NAME"
+'''
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark della latenza sottomissione -> primo output: script shell, esecuzione locale e runner daemon.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=50,
+            help='Esecuzioni per ogni modalità (default: 50)',
+        )
+        parser.add_argument(
+            '--same-source',
+            action='store_true',
+            help='Sottomette sempre lo stesso sorgente (hit della cache) invece di sorgenti distinti',
+        )
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix='gpu_bench_runner_')
+        try:
+            self.run_benchmark(work_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_benchmark(self, work_dir, options):
+        # Struttura minima del backend: esercizio con manifest e compilatore finto
+        bin_dir = os.path.join(work_dir, 'bin')
+        exercise_dir = os.path.join(work_dir, 'gpu', 'bench')
+        os.makedirs(bin_dir)
+        os.makedirs(exercise_dir)
+        compiler = write_stub_compiler(bin_dir)
+        with open(os.path.join(exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'harness': 'main.cu'}, f)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\n')
+        manifest = ExerciseManifest.load(exercise_dir)
+
+        env = dict(os.environ, PATH=f'{bin_dir}{os.pathsep}{os.environ.get("PATH", "")}')
+        stdbuf = ['stdbuf', '-oL', '-eL'] if shutil.which('stdbuf') else []
+        counter = iter(range(1_000_000_000))
+
+        # Sorgente da sottomettere (distinto a ogni esecuzione, salvo --same-source)
+        def make_source():
+            n = 0 if options['same_source'] else next(counter)
+            fd, path = tempfile.mkstemp(prefix='tmp_', suffix='.cu', dir=exercise_dir)
+            with os.fdopen(fd, 'w') as f:
+                f.write(f'# sottomissione {n}\necho pronto\n')
+            return path
+
+        # 1. Script shell: stdbuf -> bash -> nvcc -> eseguibile nella cartella dell'esercizio
+        def legacy():
+            source = make_source()
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                stdbuf + ['bash', '-c', LEGACY_RUN_SCRIPT, 'run.sh', source, 'bench', 'B000000'],
+                cwd=work_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+            )
+            return self.first_output(process, started, source)
+
+        # 2. Esecuzione locale: cache di compilazione nel processo Django ed eseguibile diretto
+        local_cache = CompileCache(directory=os.path.join(work_dir, 'cache_local'), compiler=compiler, flags=[])
+
+        def local():
+            source = make_source()
+            started = time.perf_counter()
+            compiled = local_cache.compile(source, manifest)
+            process = subprocess.Popen(
+                stdbuf + [compiled.binary],
+                cwd=exercise_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+            )
+            return self.first_output(process, started, source)
+
+        # 3. Runner daemon: richiesta sul socket Unix, pipe ricevute con SCM_RIGHTS
+        socket_path = os.path.join(work_dir, 'runner.sock')
+        daemon = RunnerDaemon(
+            socket_path,
+            gpu_dir=os.path.join(work_dir, 'gpu'),
+            cache=CompileCache(directory=os.path.join(work_dir, 'cache_runner'), compiler=compiler, flags=[]),
+        )
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        client = RunnerClient(socket_path)
+
+        def runner():
+            source = make_source()
+            started = time.perf_counter()
+            launch = client.run('bench', source)
+            latency = self.first_output(launch.process, started, source)
+            launch.process.stderr.close()
+            return latency
+
+        self.stdout.write(
+            f'[bench_runner] {options["runs"]} esecuzioni per modalità, '
+            f'{"stesso sorgente" if options["same_source"] else "sorgenti distinti"}, compilatore finto'
+        )
+        try:
+            for label, strategy in (('script shell', legacy), ('locale', local), ('runner daemon', runner)):
+                strategy()  # Riscaldamento
+                latencies = [strategy() for _ in range(options['runs'])]
+                self.stdout.write(
+                    f'  {label:<14} p50 {percentile(latencies, 50) * 1000:>7.2f} ms   '
+                    f'p95 {percentile(latencies, 95) * 1000:>7.2f} ms   max {max(latencies) * 1000:>7.2f} ms'
+                )
+        finally:
+            daemon.shutdown()
+            daemon.server_close()
+
+    # Attende il primo byte di output e chiude il processo
+    def first_output(self, process, started, source):
+        process.stdout.read(1)
+        latency = time.perf_counter() - started
+        process.stdout.close()
+        process.wait()
+        os.unlink(source)
+        return latency
@@ -0,0 +1,93 @@
+import threading
+import time
+from django.conf import settings
+from core.bench import create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.models import Task
+from core.scheduler import TaskScheduler
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark dello scheduler: accoda migliaia di task fittizi e misura throughput e attese in coda.'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=3000,
+            help='Numero di task fittizi da accodare (default: 3000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.MAX_CONCURRENT_TASKS,
+            help='Numero di worker del pool (default: settings.MAX_CONCURRENT_TASKS)',
+        )
+        parser.add_argument(
+            '--work-ms',
+            type=float,
+            default=1.0,
+            help='Durata simulata di ogni task in millisecondi (default: 1)',
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=int,
+            default=2,
+            help='Quante volte ogni task viene sottomesso, per verificare la prenotazione atomica (default: 2)',
+        )
+
+    def run_benchmark(self, options):
+        total = options['tasks']
+        work = options['work_ms'] / 1000.0
+        _, exercise, (user,) = create_bench_fixtures()
+
+        Task.objects.bulk_create([
+            Task(user=user, exercise=exercise, code='// stub', status='pending')
+            for _ in range(total)
+        ])
+        task_ids = list(Task.objects.order_by('id').values_list('id', flat=True))
+
+        executions = []
+        executions_lock = threading.Lock()
+        done = threading.Event()
+
+        # Esecuzione fittizia: simula il lavoro e chiude il task
+        def stub_execute(task: Task) -> None:
+            time.sleep(work)
+            Task.objects.filter(id=task.id).update(status='completed')
+            with executions_lock:
+                executions.append(task.id)
+                if len(executions) >= total:
+                    done.set()
+
+        scheduler = TaskScheduler(stub_execute, workers=options['workers'], refill_interval=0)
+        scheduler.start()
+        self.stdout.write(f'[bench_scheduler] {total} task, {scheduler.workers} worker, lavoro {options["work_ms"]} ms')
+
+        started = time.perf_counter()
+        for _ in range(options['duplicates']):
+            for task_id in task_ids:
+                scheduler.submit(task_id)
+        submitted = time.perf_counter()
+        done.wait()
+        elapsed = time.perf_counter() - started
+        scheduler.stop()
+
+        stats = scheduler.stats()
+        waits = [w * 1000.0 for w in stats['wait_times']]
+        duplicated = len(executions) - len(set(executions))
+
+        self.stdout.write(f'  - Sottomissione: {(submitted - started) * 1000:.1f} ms')
+        self.stdout.write(f'  - Tempo totale: {elapsed:.2f} s')
+        self.stdout.write(f'  - Throughput: {total / elapsed:.0f} task/s (ideale {scheduler.workers / work:.0f} task/s)' if work else
+                          f'  - Throughput: {total / elapsed:.0f} task/s')
+        self.stdout.write(f'  - Attesa in coda: p50 {percentile(waits, 50):.1f} ms, '
+                          f'p95 {percentile(waits, 95):.1f} ms, max {max(waits, default=0):.1f} ms')
+        self.stdout.write(f'  - Prenotazioni: {stats["claimed"]}, conflitti: {stats["claim_conflicts"]}, errori: {stats["errors"]}')
+        self.stdout.write(f'  - Thread worker: {scheduler.workers} (indipendente dal numero di task)')
+
+        if duplicated:
+            self.stdout.write(self.style.ERROR(f'[bench_scheduler] {duplicated} task eseguiti più di una volta!'))
+        else:
+            self.stdout.write(self.style.SUCCESS('[bench_scheduler] Nessun task eseguito più di una volta'))
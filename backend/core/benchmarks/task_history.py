@@ -0,0 +1,129 @@
+import time
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.bench import create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.models import Exercise, Task
+from core.serializers import TaskSerializer
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Benchmark della cronologia task: lista completa con TaskSerializer contro cronologia paginata '
+            'a cursore con campi scelti. Fallisce se le query per pagina non sono costanti.')
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=5000,
+            help='Task dell\'utente nel database temporaneo (default: 5000)',
+        )
+        parser.add_argument(
+            '--output-size',
+            type=int,
+            default=20_000,
+            help='Caratteri di stdout per task (default: 20000)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=50,
+            help='Task per pagina (default: 50)',
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=20,
+            help='Pagine lette in sequenza (default: 20)',
+        )
+        parser.add_argument(
+            '--fields',
+            default='id,status,exercise_name,created_at,credits_cost',
+            help='Campi richiesti alla cronologia (default: id,status,exercise_name,created_at,credits_cost)',
+        )
+
+    def run_benchmark(self, options):
+        _, exercise, (user,) = create_bench_fixtures()
+        exercises = [exercise] + [
+            Exercise.objects.create(name=f'bench_{i}', return_type='void') for i in range(9)
+        ]
+        started = time.perf_counter()
+        Task.objects.bulk_create(
+            [
+                Task(user=user, exercise=exercises[i % len(exercises)], code=f'// task {i}\n' * 20,
+                     stdout=f'riga {i}\n' * (options['output_size'] // 8), status='completed')
+                for i in range(options['tasks'])
+            ],
+            batch_size=500,
+        )
+        self.stdout.write(
+            f'[bench_task_history] {options["tasks"]} task con {options["output_size"]} caratteri di output — '
+            f'popolamento in {time.perf_counter() - started:.1f} s'
+        )
+
+        page_size, pages = options['page_size'], options['pages']
+        legacy = self.bench_legacy(user, page_size, pages)
+        history = self.bench_history(user, page_size, pages, options['fields'])
+
+        self.stdout.write(f'  {"strategia":<24} | {"query/pagina":>12} | {"p50":>9} | {"p95":>9} | {"byte JSON/pagina":>16}')
+        for label, (queries, timings, sizes) in (('TaskSerializer completo', legacy), ('cronologia a cursore', history)):
+            self.stdout.write(
+                f'  {label:<24} | {self.query_range(queries):>12} | {percentile(timings, 50) * 1000:>6.2f} ms | '
+                f'{percentile(timings, 95) * 1000:>6.2f} ms | {sum(sizes) / len(sizes):>16.0f}'
+            )
+
+        # Verifica: numero di query costante e nessuna colonna di codice o output letta
+        history_queries = history[0]
+        if len(set(history_queries)) != 1:
+            raise CommandError(f'Query per pagina non costanti nella cronologia: {history_queries}')
+        self.stdout.write(self.style.SUCCESS(
+            f'[bench_task_history] OK — {history_queries[0]} query per pagina su {len(history_queries)} pagine, '
+            f'codice e output mai letti'
+        ))
+
+    # Vecchio comportamento: TaskSerializer completo, paginazione a OFFSET senza select_related
+    def bench_legacy(self, user, page_size, pages):
+        queries, timings, sizes = [], [], []
+        for page in range(pages):
+            connection.queries_log.clear()  # Il log ha una lunghezza massima: il popolamento lo ha già riempito
+            t0 = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                tasks = Task.objects.filter(user=user).order_by('-created_at')[page * page_size:(page + 1) * page_size]
+                data = TaskSerializer(tasks, many=True).data
+            timings.append(time.perf_counter() - t0)
+            queries.append(len(captured))
+            sizes.append(len(str(data)))
+        return queries, timings, sizes
+
+    # Nuova cronologia: segue i cursori 'next' tramite l'API
+    def bench_history(self, user, page_size, pages, fields):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        url = f'/api/tasks/history/?fields={fields}&page_size={page_size}'
+        queries, timings, sizes = [], [], []
+        for _ in range(pages):
+            connection.queries_log.clear()
+            t0 = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+            timings.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                raise CommandError(f'Cronologia: risposta {response.status_code} {response.data}')
+            for query in captured.captured_queries:
+                sql = query['sql'].lower()
+                if '"stdout"' in sql or '"code"' in sql:
+                    raise CommandError(f'La cronologia legge codice o output: {query["sql"]}')
+            queries.append(len(captured))
+            sizes.append(len(response.content))
+            url = response.data['next']
+            if not url:
+                break
+        return queries, timings, sizes
+
+    @staticmethod
+    def query_range(queries):
+        low, high = min(queries), max(queries)
+        return str(low) if low == high else f'{low}-{high}'
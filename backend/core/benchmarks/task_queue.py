@@ -0,0 +1,164 @@
+import random
+import time
+from django.conf import settings
+from django.db import connection
+from core.bench import create_bench_fixtures, percentile
+from core.benchmarks import BaseBenchmark
+from core.models import Task, User
+from core.scheduler import QUEUE_POLICIES, TaskScheduler
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark delle query sulla coda dei task con una tabella di milioni di righe, con e senza indici.'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=1_000_000,
+            help='Task storici nella tabella (default: 1000000)',
+        )
+        parser.add_argument(
+            '--pending',
+            type=int,
+            default=1000,
+            help='Task in attesa tra quelli creati (default: 1000)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Utenti tra cui distribuire i task (default: 1000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Ripetizioni di ogni query (default: 50)',
+        )
+
+    def run_benchmark(self, options):
+        course, exercise, (first_user,) = create_bench_fixtures()
+        User.objects.bulk_create(
+            [
+                User(email=f'queue{i}@example.com', matr=f'Q{i:06d}', first_name='Queue', last_name=str(i),
+                     password='!', course=course, credits=0)
+                for i in range(options['users'] - 1)
+            ],
+            batch_size=5000,
+        )
+        user_ids = list(User.objects.values_list('id', flat=True))
+
+        # Tabella storica: i task in attesa e in esecuzione sono i più recenti, come in produzione
+        started = time.perf_counter()
+        self.seed_tasks(exercise, user_ids, options)
+        self.stdout.write(
+            f'[bench_task_queue] {options["tasks"]} task ({options["pending"]} in attesa), '
+            f'{len(user_ids)} utenti — popolamento in {time.perf_counter() - started:.1f} s'
+        )
+
+        pending = list(Task.objects.filter(status='pending').order_by('created_at'))
+        middle = pending[len(pending) // 2]
+        rng = random.Random(7)
+        queries = {
+            'prossimo in attesa': lambda: Task.get_next_pending_task(),
+            'task in esecuzione': lambda: Task.get_running_tasks_count(),
+            'conteggio in attesa': lambda: Task.objects.filter(status='pending').count(),
+            'id in attesa (FIFO)': lambda: Task.pending_ids(),
+            'posizione da database': lambda: middle.pending_position(),
+            'cronologia utente': lambda: list(
+                Task.objects.filter(user_id=rng.choice(user_ids)).order_by('-created_at')[:10]
+            ),
+        }
+
+        indexes = [index for index in Task._meta.indexes]
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Task, index)
+        without = self.time_queries(queries, options['repeat'])
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Task, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        indexed = self.time_queries(queries, options['repeat'])
+
+        self.stdout.write(f'  {"query":<22} | {"senza indici p50":>16} | {"con indici p50":>14} | {"con indici p95":>14}')
+        for label in queries:
+            self.stdout.write(
+                f'  {label:<22} | {percentile(without[label], 50) * 1000:>13.2f} ms | '
+                f'{percentile(indexed[label], 50) * 1000:>11.2f} ms | {percentile(indexed[label], 95) * 1000:>11.2f} ms'
+            )
+
+        self.bench_positions(len(pending), len(user_ids), options['repeat'])
+
+    # Inserisce i task a blocchi: storici (completati/falliti), poi in esecuzione e in attesa
+    def seed_tasks(self, exercise, user_ids, options):
+        rng = random.Random(42)
+        historical = options['tasks'] - options['pending'] - 8
+        batch = []
+
+        def flush():
+            Task.objects.bulk_create(batch)
+            batch.clear()
+
+        for i in range(options['tasks']):
+            if i < historical:
+                state = 'completed' if rng.random() < 0.9 else 'failed'
+            elif i < historical + 8:
+                state = 'running'
+            else:
+                state = 'pending'
+            batch.append(Task(user_id=rng.choice(user_ids), exercise=exercise, code='// bench', status=state))
+            if len(batch) >= 20_000:
+                flush()
+        if batch:
+            flush()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def time_queries(self, queries, repeat):
+        timings = {}
+        for label, query in queries.items():
+            query()  # Riscaldamento
+            samples = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                query()
+                samples.append(time.perf_counter() - t0)
+            timings[label] = samples
+        return timings
+
+    # Posizione in coda in memoria per ogni politica (la politica di default per prima)
+    # contro la ricerca lineare nella coda
+    def bench_positions(self, pending, users, repeat):
+        queued = max(pending, 100_000)
+        rng = random.Random(3)
+        lookups = [rng.randrange(queued) for _ in range(repeat * 20)]
+        estimates = [rng.choice((0.5, 2.0, 10.0, 30.0)) for _ in range(100)]
+        policies = sorted(QUEUE_POLICIES, key=lambda policy: policy != settings.SCHEDULER_POLICY)
+
+        self.stdout.write(f'  posizione in memoria ({queued} task in coda, {users} utenti):')
+        for policy in policies:
+            scheduler = TaskScheduler(lambda task: None, workers=1, refill_interval=0, pending=lambda: [],
+                                      policy=policy, estimate=lambda exercise_id: estimates[exercise_id])
+            for task_id in range(queued):
+                scheduler.submit(task_id, user_id=task_id % users, exercise_id=task_id % len(estimates))
+            timings = []
+            for task_id in lookups:
+                t0 = time.perf_counter()
+                scheduler.position(task_id)
+                timings.append(time.perf_counter() - t0)
+            default = ' (default)' if policy == settings.SCHEDULER_POLICY else ''
+            self.stdout.write(
+                f'    {policy + default:<14} p50 {percentile(timings, 50) * 1e6:>8.2f} µs   '
+                f'p95 {percentile(timings, 95) * 1e6:>8.2f} µs'
+            )
+
+        entries = list(range(queued))
+        t0 = time.perf_counter()
+        for task_id in lookups:
+            entries.index(task_id)
+        scan_seconds = (time.perf_counter() - t0) / len(lookups)
+        self.stdout.write(f'    ricerca lineare p50 {scan_seconds * 1e6:>8.0f} µs')
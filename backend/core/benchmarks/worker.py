@@ -0,0 +1,159 @@
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from core import scheduler
+from core.bench import bench_database, create_bench_fixtures, percentile, write_stub_compiler
+from core.benchmarks import BaseBenchmark
+from core.models import Task
+
+# "Codice dello studente": con il compilatore finto diventa lo script eseguito dal worker
+STUB_RUN_SCRIPT = 'echo "inizio {n}"\nsleep {duration}\necho "fine {n}"\n'
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Verifica del worker di esecuzione separato con compilatore e script finti: i processi HTTP '
+            'accodano soltanto, run_worker esegue, e un riavvio del worker non perde né interrompe task.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=40,
+            help='Task sottomessi tramite /api/run/ (default: 40)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=0.3,
+            help='Secondi di esecuzione di ogni task (default: 0.3)',
+        )
+        parser.add_argument(
+            '--run-workers',
+            type=int,
+            default=4,
+            help='Esecuzioni in parallelo del worker (default: 4)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=120.0,
+            help='Secondi massimi di attesa per il completamento dei task (default: 120)',
+        )
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix='gpu_bench_worker_')
+        try:
+            with bench_database() as db_path:
+                self.run_benchmark(db_path, work_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_benchmark(self, db_path, work_dir, options):
+        _, exercise, (user,) = create_bench_fixtures()
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+
+        # Processo del worker: stesso database, compilatore finto, cache di compilazione temporanea
+        env = dict(
+            os.environ,
+            DATABASE_NAME=db_path,
+            EXECUTION_MODE='worker',
+            CUDA_COMPILER=write_stub_compiler(work_dir),
+            COMPILE_CACHE_ENABLED='True',
+            COMPILE_CACHE_DIR=os.path.join(work_dir, 'cache'),
+            RUNNER_SOCKET='',
+            MAX_ACTIVE_TASKS_PER_USER='0',
+        )
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'run_worker',
+            '--run-workers', str(options['run_workers']), '--poll-interval', '0.2',
+        ]
+
+        # Sottomissione: il processo HTTP salva il task e notifica, senza eseguire nulla
+        total = options['tasks']
+        latencies = []
+        with override_settings(EXECUTION_MODE='worker', MAX_ACTIVE_TASKS_PER_USER=0):
+            for n in range(total):
+                code = STUB_RUN_SCRIPT.format(n=n, duration=options['duration'])
+                started = time.perf_counter()
+                response = client.post('/api/run/', {'code': code, 'exercise_id': exercise.id}, format='json')
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'/api/run/: risposta {response.status_code} {response.data}')
+        if scheduler._scheduler is not None:
+            raise CommandError('Il processo HTTP ha avviato la pipeline di esecuzione')
+        self.stdout.write(
+            f'[bench_worker] {total} task accodati via /api/run/: p50 {percentile(latencies, 50) * 1000:.2f} ms, '
+            f'p95 {percentile(latencies, 95) * 1000:.2f} ms (nessuna esecuzione nel processo HTTP)'
+        )
+
+        # Primo worker: arrestato con SIGTERM a metà lavoro, i task in corso devono terminare
+        started = time.monotonic()
+        log_path = os.path.join(work_dir, 'worker.log')
+        first = self.start_worker(command, env, log_path)
+        self.wait_for(lambda: self.finished() >= total // 2, first, log_path, options['timeout'])
+        first.send_signal(signal.SIGTERM)
+        first.wait(options['timeout'])
+        after_first = self.finished()
+        self.stdout.write(f'  worker 1 arrestato dopo {after_first}/{total} task conclusi (uscita {first.returncode})')
+        if Task.objects.filter(status='running', run_status='running').exists():
+            raise CommandError(f'Task rimasti in esecuzione dopo l\'arresto del worker:\n{self.read_log(log_path)}')
+
+        # Secondo worker: riprende dal database i task rimasti in coda
+        second = self.start_worker(command, env, log_path)
+        try:
+            self.wait_for(lambda: self.finished() >= total, second, log_path, options['timeout'])
+        finally:
+            second.send_signal(signal.SIGTERM)
+            second.wait(options['timeout'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'  worker 2 ha concluso i restanti {total - after_first} task')
+
+        # Verifica: ogni task completato una sola volta con il proprio output
+        for task in Task.objects.filter(user=user).order_by('id'):
+            task.load_payload()
+            n = task.code.split('"inizio ', 1)[1].split('"', 1)[0]
+            if task.status != 'completed' or f'fine {n}' not in task.stdout:
+                raise CommandError(
+                    f'Task {task.id}: stato {task.status}, output {task.stdout!r}, errore {task.stderr!r}\n'
+                    f'{self.read_log(log_path)}'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'[bench_worker] OK — {total} task completati in {elapsed:.1f}s con un riavvio del worker, '
+            f'{total / elapsed:.1f} task/s'
+        ))
+
+    # Avvia run_worker con l'output accodato al file di log
+    @staticmethod
+    def start_worker(command, env, log_path):
+        with open(log_path, 'a') as log:
+            return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    @staticmethod
+    def read_log(log_path):
+        with open(log_path) as f:
+            return f.read()
+
+    @staticmethod
+    def finished():
+        return Task.objects.exclude(status__in=['pending', 'running']).count()
+
+    # Attende la condizione, fallendo se il worker termina o scade il timeout
+    @staticmethod
+    def wait_for(condition, process, log_path, timeout):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if process.poll() is not None:
+                raise CommandError(f'run_worker terminato in anticipo:\n{Command.read_log(log_path)}')
+            if time.monotonic() > deadline:
+                process.kill()
+                raise CommandError(f'Timeout: {Command.finished()} task conclusi')
+            time.sleep(0.1)
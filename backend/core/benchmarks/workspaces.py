@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.core.management.base import CommandError
+from core.bench import percentile
+from core.benchmarks import BaseBenchmark
+from core.manifest import MANIFEST_NAME, ExerciseManifest
+from core.workspace import WORKSPACE_ROOT_NAME, WorkspacePool, default_base_dir
+
+
+class Benchmark(BaseBenchmark):
+    help = ('Benchmark delle cartelle di lavoro dei task: cartella temporanea con copia degli input '
+            'contro pool riutilizzabile su filesystem veloce con hard link, con verifica di isolamento '
+            'tra task, ricostruzione del modello e pulizia all\'avvio.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=500,
+            help='Task simulati per ogni strategia (default: 500)',
+        )
+        parser.add_argument(
+            '--input-mb',
+            type=int,
+            default=8,
+            help='Dimensione del file di input dell\'esercizio in MB (default: 8)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Task concorrenti (default: 8)',
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default='',
+            help='Filesystem del pool (default: /dev/shm se disponibile)',
+        )
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix='gpu_bench_ws_')
+        base_dir = tempfile.mkdtemp(prefix='gpu_bench_ws_', dir=options['dir'] or default_base_dir())
+        try:
+            self.run_benchmark(work_dir, base_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    def run_benchmark(self, work_dir, base_dir, options):
+        # Esercizio con harness e un file di input voluminoso
+        exercise_dir = os.path.join(work_dir, 'bench')
+        os.makedirs(exercise_dir)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\nint main() { return 0; }\n')
+        with open(os.path.join(exercise_dir, 'data.bin'), 'wb') as f:
+            f.write(os.urandom(options['input_mb'] * 1024 * 1024))
+        with open(os.path.join(exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'harness': 'main.cu', 'inputs': ['data.bin']}, f)
+        manifest = ExerciseManifest.load(exercise_dir)
+        errors = []
+
+        # 1. Cartella temporanea per task: copia di harness e input, eliminazione alla fine
+        def scratch():
+            workspace = tempfile.mkdtemp(prefix='task_', dir=work_dir)
+            for relative, path in [(manifest.harness, manifest.harness_path), *manifest.input_paths()]:
+                shutil.copyfile(path, os.path.join(workspace, relative))
+            return workspace
+
+        def scratch_task(n):
+            workspace = scratch()
+            self.simulate(workspace, n)
+            shutil.rmtree(workspace)
+
+        # 2. Pool: hard link dal modello, cartella ripulita e riusata
+        pool = WorkspacePool(base_dir=base_dir, pool_size=options['threads'])
+
+        def pooled_task(n):
+            workspace = pool.acquire(manifest)
+            try:
+                leftovers = set(os.listdir(workspace)) - {'main.cu', 'data.bin'}
+                if leftovers:
+                    errors.append(f'pool: file del task precedente visibili {sorted(leftovers)}')
+                self.simulate(workspace, n)
+            finally:
+                pool.release(workspace)
+
+        self.stdout.write(
+            f'[bench_workspaces] {options["tasks"]} task per strategia, {options["threads"]} concorrenti, '
+            f'input {options["input_mb"]} MB, pool su {base_dir}'
+        )
+        for label, strategy in (('temporanea', scratch_task), ('pool', pooled_task)):
+            latencies, elapsed = self.run_tasks(strategy, options['tasks'], options['threads'])
+            self.stdout.write(
+                f'  {label:<11} p50 {percentile(latencies, 50) * 1000:>7.2f} ms   '
+                f'p95 {percentile(latencies, 95) * 1000:>7.2f} ms   {options["tasks"] / elapsed:>8.0f} task/s'
+            )
+        stats = pool.stats()
+        self.stdout.write(
+            f'  pool: {stats["created"]} create, {stats["reused"]} riusate, {stats["recycled"]} ripulite, '
+            f'{stats["discarded"]} eliminate, {stats["idle"]} pronte'
+        )
+        if stats['created'] > options['threads']:
+            errors.append(f'pool: {stats["created"]} cartelle create (attese al più {options["threads"]})')
+
+        # Un programma che scrive sull'input tramite l'hard link: il modello viene ricreato
+        workspace = pool.acquire(manifest)
+        data = os.path.join(workspace, 'data.bin')
+        os.chmod(data, 0o644)
+        with open(data, 'r+b') as f:
+            f.write(b'modificato')
+        pool.release(workspace)
+        workspace = pool.acquire(manifest)
+        with open(os.path.join(workspace, 'data.bin'), 'rb') as f, open(manifest.input_paths()[0][1], 'rb') as original:
+            rebuilt = f.read() == original.read()
+        pool.release(workspace)
+        self.stdout.write(f'  input modificato tramite hard link: modello ricreato {"sì" if rebuilt else "no"}')
+        if not rebuilt:
+            errors.append('pool: input modificato da un task visibile al task successivo')
+
+        # Pulizia all'avvio: la cartella di un processo terminato viene eliminata, quella di un processo attivo no
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        root = os.path.join(base_dir, WORKSPACE_ROOT_NAME)
+        for pid in (dead.pid, os.getppid()):
+            os.makedirs(os.path.join(root, str(pid), 'bench', 'ws_rimasta'), exist_ok=True)
+        restarted = WorkspacePool(base_dir=base_dir)
+        remaining = sorted(os.listdir(root))
+        self.stdout.write(f'  pulizia all\'avvio: {restarted.stats()["collected"]} elementi eliminati, restano {remaining}')
+        if str(dead.pid) in remaining or str(os.getppid()) not in remaining:
+            errors.append(f'pulizia all\'avvio: cartelle rimaste {remaining}')
+
+        if errors:
+            raise CommandError('; '.join(sorted(set(errors))))
+        self.stdout.write(self.style.SUCCESS('[bench_workspaces] Cartelle di lavoro isolate e riutilizzate'))
+
+    # Esegue i task su più thread e restituisce le durate di ognuno e il tempo totale
+    def run_tasks(self, strategy, total, threads):
+        latencies, counter, lock = [], iter(range(total)), threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                started = time.perf_counter()
+                strategy(n)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return latencies, time.perf_counter() - started
+
+    # Task simulato: sorgente, eseguibile e file di output scritti nella cartella di lavoro
+    @staticmethod
+    def simulate(workspace, n):
+        with open(os.path.join(workspace, 'submission.cu'), 'w') as f:
+            f.write(f'// sottomissione {n}\n')
+        with open(os.path.join(workspace, 'a.out'), 'wb') as f:
+            f.write(b'\0' * 64 * 1024)
+        os.makedirs(os.path.join(workspace, 'risultati'))
+        with open(os.path.join(workspace, 'risultati', f'output_{n}.txt'), 'w') as f:
+            f.write('ok\n')
@@ -0,0 +1,71 @@
+import json
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.bench import create_bench_fixtures
+from core.benchmarks import BaseBenchmark
+from core.models import Task
+from core.serializers import TaskSerializer
+from core.streaming import output_delta, status_delta
+
+
+class Benchmark(BaseBenchmark):
+    help = 'Benchmark dello streaming WebSocket: payload completo (TaskSerializer) contro messaggi incrementali.'
+    uses_database = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-size',
+            type=int,
+            default=50_000,
+            help='Caratteri di output prodotti dal programma (default: 50000)',
+        )
+        parser.add_argument(
+            '--line-length',
+            type=int,
+            default=50,
+            help='Lunghezza di ogni riga stampata (default: 50)',
+        )
+
+    def run_benchmark(self, options):
+        _, exercise, (user,) = create_bench_fixtures()
+        line = 'x' * (options['line_length'] - 1) + '\n'
+        lines = max(1, options['output_size'] // len(line))
+        code = '// codice dello studente\n' * 40
+
+        task = Task.objects.create(user=user, exercise=exercise, code=code, status='running')
+        self.stdout.write(f'[bench_ws_stream] {lines} righe da {len(line)} caratteri ({lines * len(line)} caratteri totali)')
+
+        # Comportamento precedente: payload completo a ogni blocco di output
+        task = Task.objects.get(id=task.id)
+        full_bytes, full_time, full_queries = 0, 0.0, 0
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(lines):
+                task.stdout += line
+                full_bytes += len(json.dumps(TaskSerializer(task).data).encode())
+            full_time = time.perf_counter() - started
+            full_queries = len(queries)
+
+        # Protocollo incrementale: solo il blocco aggiunto con il suo offset
+        task = Task.objects.get(id=task.id)
+        delta_bytes, offset = 0, 0
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(lines):
+                delta_bytes += len(json.dumps(output_delta(task.id, 'stdout', offset, line)).encode())
+                offset += len(line)
+            task.stdout = line * lines
+            task.status = 'completed'
+            delta_bytes += len(json.dumps(status_delta(task)).encode())
+            delta_time = time.perf_counter() - started
+            delta_queries = len(queries)
+
+        self.stdout.write('  - Payload completo:')
+        self.stdout.write(f'      byte inviati: {full_bytes:,}  serializzazione: {full_time * 1000:.1f} ms  query: {full_queries}')
+        self.stdout.write('  - Messaggi incrementali:')
+        self.stdout.write(f'      byte inviati: {delta_bytes:,}  serializzazione: {delta_time * 1000:.1f} ms  query: {delta_queries}')
+        self.stdout.write(self.style.SUCCESS(
+            f'[bench_ws_stream] Traffico ridotto di {full_bytes / max(delta_bytes, 1):.0f}x, '
+            f'serializzazione {full_time / max(delta_time, 1e-9):.0f}x più veloce'
+        ))
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# INVIO DEI MESSAGGI WEBSOCKET DAI THREAD DEI TASK
+# =============================================================================
+
+# I thread dei task non hanno un event loop: prima ogni messaggio passava da
+# async_to_sync, che crea un loop nuovo a ogni chiamata e con Redis apre una nuova
+# connessione per ciascun loop. Il broadcaster tiene un solo loop in un thread
+# dedicato (quindi un solo pool di connessioni verso il channel layer) e accoda i
+# messaggi senza bloccare il task. Ogni gruppo è assegnato sempre allo stesso shard,
+# così i delta di un task arrivano ai client nell'ordine in cui sono stati prodotti.
+# Il channel layer in memoria non è thread-safe (le sue code appartengono al loop del
+# server): in quel caso l'invio viene eseguito sul loop dei consumer WebSocket.
+BROADCAST_SHARDS = 4    # Invii in parallelo verso il channel layer
+
+
+class ChannelBroadcaster:
+
+    def __init__(self, queue_size: int = 10000, shards: int = BROADCAST_SHARDS) -> None:
+        self.queue_size = max(1, queue_size)
+        self.shards = max(1, shards)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._thread: Optional[threading.Thread] = None
+        self._consumer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'queued': 0, 'sent': 0, 'dropped': 0, 'errors': 0}
+
+    ### Avvia il thread del loop (idempotente) ###
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ws-broadcast', daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    ### Accoda un messaggio per il gruppo (non blocca il thread chiamante) ###
+    def send(self, group: str, message: Dict[str, Any]) -> None:
+        self.start()
+        shard = zlib.crc32(group.encode('utf-8')) % self.shards
+        self._loop.call_soon_threadsafe(self._enqueue, shard, group, message)
+
+    ### Registra il loop dei consumer WebSocket (usato solo dal channel layer in memoria) ###
+    def attach_consumer_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._consumer_loop = loop
+
+    ### Attende che i messaggi accodati finora siano stati inviati ###
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        if self._loop is None:
+            return True
+        future = asyncio.run_coroutine_threadsafe(self._join(), self._loop)
+        try:
+            future.result(timeout)
+            return True
+        except Exception:
+            future.cancel()
+            return False
+
+    ### Contatori dei messaggi accodati, inviati, scartati e falliti ###
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.shards)]
+        for queue in self._queues:
+            self._loop.create_task(self._drain(queue))
+        self._ready.set()
+        self._loop.run_forever()
+
+    def _enqueue(self, shard: int, group: str, message: Dict[str, Any]) -> None:
+        try:
+            self._queues[shard].put_nowait((group, message))
+            self._count('queued')
+        except asyncio.QueueFull:
+            # Channel layer lento o irraggiungibile: meglio perdere un delta (il client
+            # si risincronizza dagli offset) che bloccare l'esecuzione dei task
+            self._count('dropped')
+
+    async def _drain(self, queue: asyncio.Queue) -> None:
+        channel_layer = get_channel_layer()
+        in_memory = isinstance(channel_layer, InMemoryChannelLayer)
+        while True:
+            group, message = await queue.get()
+            try:
+                if in_memory:
+                    # Senza consumer nel processo non c'è nessun client da raggiungere
+                    consumer_loop = self._consumer_loop
+                    if consumer_loop is not None and not consumer_loop.is_closed():
+                        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                            channel_layer.group_send(group, message), consumer_loop
+                        ))
+                elif channel_layer is not None:
+                    await channel_layer.group_send(group, message)
+                self._count('sent')
+            except Exception:
+                self._count('errors')
+                logger.warning('Invio WebSocket fallito per il gruppo %s', group, exc_info=True)
+            finally:
+                queue.task_done()
+
+    async def _join(self) -> None:
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_broadcaster: Optional[ChannelBroadcaster] = None
+_broadcaster_lock = threading.Lock()
+
+
+# Restituisce il broadcaster di processo
+def get_broadcaster() -> ChannelBroadcaster:
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = ChannelBroadcaster(settings.WS_BROADCAST_QUEUE_SIZE)
+        return _broadcaster
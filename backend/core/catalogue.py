@@ -0,0 +1,55 @@
+import hashlib
+import json
+from typing import Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Exercise
+
+
+# =============================================================================
+# CATALOGO ESERCIZI IN CACHE (per corso)
+# =============================================================================
+
+# Il catalogo di un corso (esercizi serializzati con la firma già costruita) viene
+# calcolato una volta e tenuto nella cache di Django per EXERCISE_CATALOGUE_CACHE_TTL
+# secondi, insieme al suo ETag. I segnali in core/signals.py lo invalidano quando
+# un esercizio, i suoi corsi o un corso cambiano; il TTL limita la durata di un
+# catalogo non aggiornato da un altro processo (es. un comando di gestione) se la
+# cache non è condivisa.
+CACHE_KEY_PREFIX = 'exercise_catalogue'
+ALL_COURSES = 'all'   # Catalogo completo (superuser)
+
+
+def _cache_key(course_id) -> str:
+    return f'{CACHE_KEY_PREFIX}:{course_id}'
+
+
+# Catalogo di un corso (None = tutti gli esercizi): restituisce (dati serializzati, ETag)
+def get_catalogue(course_id: Optional[int]) -> Tuple[List[dict], str]:
+    key = _cache_key(ALL_COURSES if course_id is None else course_id)
+    ttl = settings.EXERCISE_CATALOGUE_CACHE_TTL
+    if ttl > 0:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    catalogue = build_catalogue(course_id)
+    if ttl > 0:
+        cache.set(key, catalogue, ttl)
+    return catalogue
+
+
+# Serializza gli esercizi del corso e calcola l'ETag sul contenuto
+def build_catalogue(course_id: Optional[int]) -> Tuple[List[dict], str]:
+    from .serializers import ExerciseSerializer
+    exercises = Exercise.objects.order_by('id')
+    if course_id is not None:
+        exercises = exercises.filter(courses=course_id)
+    data = ExerciseSerializer(exercises, many=True).data
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode('utf-8')
+    return data, f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
+# Invalida il catalogo dei corsi indicati (e sempre quello completo)
+def invalidate_catalogue(course_ids: Iterable[int] = ()) -> None:
+    cache.delete_many([_cache_key(ALL_COURSES)] + [_cache_key(course_id) for course_id in course_ids])
@@ -0,0 +1,12 @@
+from django.core.checks import Error, register
+from .manifest import get_manifest_registry
+
+
+# Controllo all'avvio (manage.py check, runserver, run_worker): i manifest degli esercizi devono essere validi
+@register()
+def check_exercise_manifests(app_configs, **kwargs):
+    return [
+        Error(message, hint='Correggere il file exercise.json della cartella gpu/<esercizio>/',
+              id='core.E001')
+        for message in get_manifest_registry().validate()
+    ]
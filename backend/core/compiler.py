@@ -0,0 +1,343 @@
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from . import process_group
+from .manifest import ExerciseManifest
+
+
+# =============================================================================
+# CACHE DI COMPILAZIONE INDIRIZZATA PER CONTENUTO
+# =============================================================================
+
+# Risultato di una compilazione (o di un riuso dalla cache)
+class CompileResult:
+    def __init__(self, binary: Optional[str], hit: bool, returncode: int = 0,
+                 stdout: str = '', stderr: str = '', timed_out: bool = False) -> None:
+        self.binary = binary          # Percorso dell'eseguibile (None se la compilazione è fallita)
+        self.hit = hit                # True se l'eseguibile proviene dalla cache
+        self.returncode = returncode  # Codice di uscita del compilatore
+        self.stdout = stdout          # Output del compilatore
+        self.stderr = stderr          # Errori del compilatore
+        self.timed_out = timed_out    # True se la compilazione ha superato CODE_COMPILATION_TIMEOUT
+        self.harness: Optional[str] = None   # Harness precompilato: 'hit', 'built' (None = compilato con il sorgente)
+
+    @property
+    def ok(self) -> bool:
+        return self.binary is not None
+
+
+# Cache degli eseguibili compilati: la chiave è l'hash di sorgente utente,
+# harness dell'esercizio, flag e versione del compilatore. Gli eseguibili sono
+# salvati in COMPILE_CACHE_DIR ed eliminati in ordine LRU (data di ultimo uso)
+# quando la dimensione totale supera COMPILE_CACHE_MAX_SIZE byte.
+# Gli esercizi con un header dei prototipi ("declarations" nel manifest) hanno
+# l'harness precompilato in COMPILE_CACHE_DIR/harness/<esercizio>-<hash>.o: una
+# nuova versione dell'harness ha un nuovo hash e sostituisce l'oggetto precedente.
+class CompileCache:
+
+    def __init__(self, directory: Optional[str] = None, max_size: Optional[int] = None,
+                 compiler: Optional[str] = None, flags: Optional[List[str]] = None) -> None:
+        self.directory = str(directory if directory is not None else settings.COMPILE_CACHE_DIR)
+        self.max_size = max_size if max_size is not None else settings.COMPILE_CACHE_MAX_SIZE
+        self.compiler = compiler if compiler is not None else settings.CUDA_COMPILER
+        self.flags = flags if flags is not None else shlex.split(settings.CUDA_COMPILER_FLAGS)
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple[tuple, str]] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.harness_hits = 0
+        self.harness_builds = 0
+
+    ### Compila il sorgente per l'esercizio o riusa l'eseguibile in cache ###
+    def compile(self, source_path: str, manifest: ExerciseManifest) -> CompileResult:
+        key = self.key(source_path, manifest)
+        binary = os.path.join(self.directory, f'{key}.out')
+        result = self._lookup(binary)
+        if result is not None:
+            return result
+
+        # Una sola compilazione per chiave: chi arriva dopo attende e riusa l'eseguibile
+        with self._lock:
+            key_lock = self._building.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                result = self._lookup(binary)
+                if result is not None:
+                    return result
+                with self._lock:
+                    self.misses += 1
+                return self._build(key, binary, source_path, manifest)
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    # HIT: aggiorna la data di ultimo uso (ordine LRU) e riusa l'eseguibile
+    def _lookup(self, binary: str) -> Optional[CompileResult]:
+        try:
+            os.utime(binary)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.hits += 1
+        return CompileResult(binary, hit=True)
+
+    # MISS: compila in un file temporaneo e lo pubblica con una rename atomica
+    def _build(self, key: str, binary: str, source_path: str, manifest: ExerciseManifest) -> CompileResult:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_binary = tempfile.mkstemp(prefix=f'{key}.', suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        result = self.build(source_path, manifest, tmp_binary)
+        if not result.ok:
+            return result
+        os.replace(tmp_binary, binary)
+        self._evict(keep=binary)
+        compiled = CompileResult(binary, hit=False, stdout=result.stdout, stderr=result.stderr)
+        compiled.harness = result.harness
+        return compiled
+
+    ### Compila senza passare dalla cache (eseguibile in 'output', rimosso se la compilazione fallisce) ###
+    def build(self, source_path: str, manifest: ExerciseManifest, output: str) -> CompileResult:
+        deadline = time.monotonic() + settings.CODE_COMPILATION_TIMEOUT
+        compiler = manifest.compiler or self.compiler
+        flags = [*self.flags, *manifest.flags]
+        if not manifest.declarations:
+            # Harness e sorgente in un'unica unità di traduzione
+            result = self._run(
+                [compiler, *flags, manifest.harness, f'-D{manifest.source_define}="{source_path}"', '-o', output],
+                manifest.directory, output, deadline,
+            )
+        else:
+            # Harness precompilato: si compila solo il sorgente dello studente e si collega
+            harness = self.harness_object(manifest, deadline)
+            if not harness.ok:
+                return harness
+            student = f'{output}.o'
+            result = self._run(
+                [compiler, *flags, '-include', manifest.declarations_path, '-c', source_path, '-o', student],
+                manifest.directory, student, deadline,
+            )
+            if result.ok:
+                result = self._run([compiler, *flags, harness.binary, student, '-o', output],
+                                   manifest.directory, output, deadline)
+            self._unlink(student)
+            result.harness = 'hit' if harness.hit else 'built'
+        if result.ok:
+            os.chmod(output, 0o755)
+        return result
+
+    ### Oggetto precompilato dell'harness (uno per versione dell'esercizio, ricompilato se l'hash cambia) ###
+    def harness_object(self, manifest: ExerciseManifest, deadline: Optional[float] = None) -> CompileResult:
+        key = self.harness_key(manifest)
+        directory = os.path.join(self.directory, 'harness')
+        target = os.path.join(directory, f'{manifest.name}-{key[:16]}.o')
+        result = self._harness_lookup(target)
+        if result is not None:
+            return result
+
+        # Una sola compilazione per versione: le sottomissioni concorrenti attendono l'oggetto
+        with self._lock:
+            key_lock = self._building.setdefault(f'harness:{key}', threading.Lock())
+        try:
+            with key_lock:
+                result = self._harness_lookup(target)
+                if result is not None:
+                    return result
+                return self._build_harness(manifest, directory, target, deadline)
+        finally:
+            with self._lock:
+                self._building.pop(f'harness:{key}', None)
+
+    # HIT dell'harness: l'oggetto di questa versione esiste già
+    def _harness_lookup(self, target: str) -> Optional[CompileResult]:
+        if not os.path.isfile(target):
+            return None
+        with self._lock:
+            self.harness_hits += 1
+        return CompileResult(target, hit=True)
+
+    # MISS dell'harness: compila l'oggetto, lo pubblica con una rename atomica ed elimina le versioni precedenti
+    def _build_harness(self, manifest: ExerciseManifest, directory: str, target: str,
+                       deadline: Optional[float]) -> CompileResult:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_object = tempfile.mkstemp(prefix=f'{manifest.name}-', suffix='.tmp.o', dir=directory)
+        os.close(fd)
+        result = self._run(
+            [manifest.compiler or self.compiler, *self.flags, *manifest.flags, '-c', manifest.harness,
+             f'-D{manifest.source_define}="{manifest.declarations_path}"', '-o', tmp_object],
+            manifest.directory, tmp_object, deadline or time.monotonic() + settings.CODE_COMPILATION_TIMEOUT,
+        )
+        if not result.ok:
+            result.stderr = f"Compilazione dell'harness dell'esercizio fallita:\n{result.stderr}"
+            return result
+        os.replace(tmp_object, target)
+        with self._lock:
+            self.harness_builds += 1
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(f'{manifest.name}-') and not name.endswith('.tmp.o') and path != target:
+                self._unlink(path)
+        return CompileResult(target, hit=False, stdout=result.stdout, stderr=result.stderr)
+
+    # Esegue un passo di compilazione entro il tempo rimasto ('output' rimosso se fallisce)
+    def _run(self, cmd: List[str], cwd: str, output: str, deadline: float) -> CompileResult:
+        try:
+            # Nuovo gruppo di processi: al timeout termina anche cicc/ptxas avviati da nvcc
+            completed = process_group.run(
+                cmd,
+                cwd=cwd,
+                text=True,
+                errors='replace',
+                timeout=max(deadline - time.monotonic(), 0.001),
+            )
+        except subprocess.TimeoutExpired as e:
+            self._unlink(output)
+            return CompileResult(None, hit=False, returncode=-1,
+                                 stdout=self._text(e.stdout), stderr=self._text(e.stderr), timed_out=True)
+        except OSError as e:
+            self._unlink(output)
+            return CompileResult(None, hit=False, returncode=-1, stderr=str(e))
+
+        if completed.returncode != 0 or not os.path.isfile(output) or not os.path.getsize(output):
+            self._unlink(output)
+            return CompileResult(None, hit=False, returncode=completed.returncode or 1,
+                                 stdout=completed.stdout, stderr=completed.stderr)
+        return CompileResult(output, hit=False, stdout=completed.stdout, stderr=completed.stderr)
+
+    ### Chiave della cache: hash del sorgente e della versione dell'harness ###
+    def key(self, source_path: str, manifest: ExerciseManifest) -> str:
+        return self._digest(self._read(source_path), self.harness_key(manifest).encode())
+
+    ### Versione dell'harness: hash di harness, header dei prototipi, flag e versione del compilatore ###
+    def harness_key(self, manifest: ExerciseManifest) -> str:
+        return self._digest(
+            self._read(manifest.harness_path),
+            self._read(manifest.declarations_path) if manifest.declarations else b'',
+            '\0'.join([*self.flags, *manifest.flags, manifest.source_define]).encode(),
+            self.compiler_version(manifest.compiler).encode(),
+        )
+
+    ### Versione del compilatore (ricalcolata solo se l'eseguibile cambia) ###
+    def compiler_version(self, compiler: Optional[str] = None) -> str:
+        path = self._resolve_compiler(compiler or self.compiler)
+        try:
+            stat = os.stat(path)
+            identity = (path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            identity = (path, None, None)
+        cached = self._versions.get(path)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        try:
+            completed = subprocess.run(
+                [path, '--version'], capture_output=True, text=True, errors='replace', timeout=10,
+            )
+            version = completed.stdout.strip() or completed.stderr.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            version = ''
+        self._versions[path] = (identity, version)
+        return version
+
+    ### Contatori della cache ###
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'harness_hits': self.harness_hits,
+                'harness_builds': self.harness_builds,
+            }
+
+    ### Riepilogo per il messaggio del task ###
+    def summary(self, result: CompileResult) -> str:
+        stats = self.stats()
+        outcome = 'hit' if result.hit else 'miss'
+        harness = {'hit': ' Harness precompilato.', 'built': ' Harness compilato (nuova versione).'}
+        return (f"Cache compilazione: {outcome} ({stats['hits']} hit / {stats['misses']} miss)."
+                f"{harness.get(result.harness, '')}")
+
+    # Elimina gli eseguibili meno usati finché la cache non rientra nel limite
+    def _evict(self, keep: Optional[str] = None) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                return
+            for name in names:
+                if not name.endswith('.out'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_size:
+                    break
+                if path == keep:
+                    continue
+                self._unlink(path)
+                total -= size
+                self.evictions += 1
+
+    @staticmethod
+    def _resolve_compiler(compiler: str) -> str:
+        return shutil.which(compiler) or compiler
+
+    @staticmethod
+    def _digest(*parts: bytes) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def _text(data) -> str:
+        if data is None:
+            return ''
+        if isinstance(data, bytes):
+            return data.decode(errors='replace')
+        return data
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_cache: Optional[CompileCache] = None
+_cache_lock = threading.Lock()
+
+
+# Restituisce la cache di compilazione di processo
+def get_compile_cache() -> CompileCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompileCache()
+        return _cache
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+
+
+# =============================================================================
+# COMPRESSIONE DEI CAMPI DI TESTO (codice e output dei task)
+# =============================================================================
+
+# Formato su database: un byte di intestazione seguito dal contenuto.
+#   0x00 + testo UTF-8                      (valori corti: comprimere non conviene)
+#   0x01 + deflate                          (nessun dizionario disponibile)
+#   0x02 + id dizionario (4 byte) + deflate (dizionario condiviso preimpostato)
+#   0x03 + sha256 (32 byte)                 (riferimento a un TextBlob deduplicato)
+# La stringa vuota resta vuota. Le righe scritte prima della compressione arrivano
+# dal database come str e vengono restituite così come sono.
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZLIB_DICT = 0x02
+FORMAT_BLOB = 0x03
+
+DICTIONARY_MAX_SIZE = 32 * 1024   # Finestra di deflate: il resto del dizionario non verrebbe usato
+DICTIONARY_REFRESH_INTERVAL = 60.0  # Secondi tra due controlli di un dizionario più recente
+BLOB_CACHE_SIZE = 2048              # Blob deduplicati tenuti in memoria (LRU)
+
+# Frammenti ricorrenti nelle soluzioni CUDA, in coda al dizionario gli esercizi reali
+CUDA_VOCABULARY = [
+    '#include <stdio.h>\n#include <stdlib.h>\n#include <cuda_runtime.h>\n',
+    'int idx = blockIdx.x * blockDim.x + threadIdx.x;\n',
+    'int i = blockIdx.x * blockDim.x + threadIdx.x;\n',
+    'for (int i = 0; i < n; i++) {\n',
+    'if (idx < n) {\n',
+    '__syncthreads();\n',
+    '__shared__ float ',
+    'cudaMalloc(&', 'cudaMemcpy(', 'cudaMemcpyHostToDevice', 'cudaMemcpyDeviceToHost',
+    'cudaDeviceSynchronize();\n', 'cudaFree(', 'cudaGetLastError()', 'cudaGetErrorString(',
+    'printf("%d\\n", ', 'printf("%f\\n", ', 'return 0;\n}\n',
+    '__global__ void ', '__device__ ', 'const float *', 'float *', 'int *',
+]
+
+_dictionaries: Dict[int, bytes] = {}
+_current: Optional[Tuple[int, bytes]] = None
+_current_checked: Optional[float] = None   # Istante dell'ultimo controllo sul database
+_blobs: 'OrderedDict[str, str]' = OrderedDict()
+_lock = threading.Lock()
+
+
+# Riferimento a un TextBlob che non esiste nel database
+class BlobNotFound(LookupError):
+    pass
+
+
+# Comprime un testo (con il dizionario condiviso più recente, se presente)
+def encode(text: str) -> bytes:
+    if not text:
+        return b''
+    raw = text.encode('utf-8')
+    if len(raw) < settings.STORAGE_COMPRESSION_MIN_SIZE:
+        return bytes([FORMAT_RAW]) + raw
+
+    dictionary = current_dictionary()
+    if dictionary is None:
+        compressor = zlib.compressobj(settings.STORAGE_COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+        header = bytes([FORMAT_ZLIB])
+    else:
+        dict_id, zdict = dictionary
+        compressor = zlib.compressobj(settings.STORAGE_COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+        header = bytes([FORMAT_ZLIB_DICT]) + dict_id.to_bytes(4, 'big')
+    compressed = compressor.compress(raw) + compressor.flush()
+    if len(header) + len(compressed) >= len(raw) + 1:
+        return bytes([FORMAT_RAW]) + raw
+    return header + compressed
+
+
+# Decomprime un valore letto dal database
+def decode(data) -> str:
+    if data is None:
+        return data
+    if isinstance(data, str):
+        return data   # Riga scritta prima della compressione
+    data = bytes(data)
+    if not data:
+        return ''
+    kind, body = data[0], data[1:]
+    if kind == FORMAT_RAW:
+        return body.decode('utf-8')
+    if kind == FORMAT_ZLIB:
+        return zlib.decompress(body, -15).decode('utf-8')
+    if kind == FORMAT_ZLIB_DICT:
+        zdict = get_dictionary(int.from_bytes(body[:4], 'big'))
+        decompressor = zlib.decompressobj(-15, zdict=zdict)
+        return (decompressor.decompress(body[4:]) + decompressor.flush()).decode('utf-8')
+    if kind == FORMAT_BLOB:
+        return load_blob(body.hex())
+    raise ValueError(f'Formato di compressione sconosciuto: {kind}')
+
+
+# =============================================================================
+# DIZIONARI CONDIVISI (versionati: i dati vecchi restano leggibili)
+# =============================================================================
+
+# Dizionario usato per le nuove scritture: (id, contenuto) o None
+def current_dictionary() -> Optional[Tuple[int, bytes]]:
+    global _current, _current_checked
+    with _lock:
+        if _current_checked is not None and time.monotonic() - _current_checked < DICTIONARY_REFRESH_INTERVAL:
+            return _current
+    from .models import CompressionDictionary
+    latest_id = CompressionDictionary.objects.order_by('-id').values_list('id', flat=True).first()
+    current = (latest_id, get_dictionary(latest_id)) if latest_id is not None else None
+    with _lock:
+        _current = current
+        _current_checked = time.monotonic()
+        return _current
+
+
+# Contenuto di un dizionario dato il suo id (in memoria dopo la prima lettura)
+def get_dictionary(dict_id: int) -> bytes:
+    with _lock:
+        zdict = _dictionaries.get(dict_id)
+    if zdict is None:
+        from .models import CompressionDictionary
+        zdict = bytes(CompressionDictionary.objects.values_list('data', flat=True).get(id=dict_id))
+        with _lock:
+            _dictionaries[dict_id] = zdict
+    return zdict
+
+
+# Dimentica il dizionario corrente (ricaricato alla prossima scrittura)
+def reset_dictionary_cache() -> None:
+    global _current, _current_checked
+    with _lock:
+        _current = None
+        _current_checked = None
+
+
+# Costruisce il dizionario dai template degli esercizi: vocabolario CUDA, harness
+# dei manifest degli esercizi e firme generate da Exercise.build_signature (i frammenti più
+# probabili vanno in fondo, dove deflate li raggiunge con distanze più corte)
+def build_dictionary() -> bytes:
+    from .manifest import ManifestError, get_manifest
+    from .models import Exercise
+    parts = list(CUDA_VOCABULARY)
+    exercises = list(Exercise.objects.all())
+    for exercise in exercises:
+        try:
+            template = get_manifest(exercise.name).harness_path
+        except ManifestError:
+            continue
+        with open(template, encoding='utf-8', errors='replace') as f:
+            parts.append(f.read())
+    parts.extend(exercise.build_signature() for exercise in exercises)
+    return ''.join(parts).encode('utf-8')[-DICTIONARY_MAX_SIZE:]
+
+
+# Salva un nuovo dizionario se i template sono cambiati; restituisce (id, creato)
+def train_dictionary() -> Tuple[int, bool]:
+    from .models import CompressionDictionary
+    data = build_dictionary()
+    latest = CompressionDictionary.objects.order_by('-id').first()
+    if latest is not None and bytes(latest.data) == data:
+        return latest.id, False
+    created = CompressionDictionary.objects.create(data=data)
+    reset_dictionary_cache()
+    return created.id, True
+
+
+# =============================================================================
+# DEDUPLICAZIONE PER CONTENUTO (TextBlob)
+# =============================================================================
+
+# Salva il testo una sola volta per hash e restituisce il riferimento da scrivere nella riga
+def store_blob(text: str) -> bytes:
+    from .models import TextBlob
+    raw = text.encode('utf-8')
+    digest = hashlib.sha256(raw).digest()
+    TextBlob.objects.get_or_create(digest=digest.hex(), defaults={'content': text, 'size': len(raw)})
+    return bytes([FORMAT_BLOB]) + digest
+
+
+# Testo di un blob (i blob sono immutabili: la cache non va mai invalidata)
+def load_blob(digest: str) -> str:
+    return load_blobs([digest])[digest]
+
+
+# Testi di più blob con una sola query per quelli non in cache (es. una pagina di task).
+# Un riferimento senza blob è un errore: non viene mai restituito (né messo in cache) testo vuoto.
+def load_blobs(digests: Iterable[str]) -> Dict[str, str]:
+    from .models import TextBlob
+    found, missing = {}, []
+    with _lock:
+        for digest in dict.fromkeys(digests):
+            content = _blobs.get(digest)
+            if content is None:
+                missing.append(digest)
+            else:
+                _blobs.move_to_end(digest)
+                found[digest] = content
+    if missing:
+        loaded = dict(TextBlob.objects.filter(digest__in=missing).values_list('digest', 'content'))
+        absent = [digest for digest in missing if digest not in loaded]
+        if absent:
+            raise BlobNotFound(f'TextBlob non trovati: {", ".join(absent)}')
+        with _lock:
+            for digest, content in loaded.items():
+                _blobs[digest] = content
+            while len(_blobs) > BLOB_CACHE_SIZE:
+                _blobs.popitem(last=False)
+        found.update(loaded)
+    return found
+
+
+# Riferimenti ai blob contenuti in valori letti dal database (ancora codificati)
+def blob_digests(values: Iterable) -> List[str]:
+    digests = []
+    for value in values:
+        if isinstance(value, (bytes, bytearray, memoryview)) and len(value) and value[0] == FORMAT_BLOB:
+            digests.append(bytes(value[1:]).hex())
+    return digests
+
+
+# Dimentica i blob in cache (es. dopo l'eliminazione dei blob orfani)
+def reset_blob_cache() -> None:
+    with _lock:
+        _blobs.clear()
@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from .models import CreditLedgerEntry, User
+
+
+# =============================================================================
+# SALDO CREDITI IN CACHE (per utente, riallineato al database)
+# =============================================================================
+
+# I controlli dei crediti usano un saldo in memoria per utente invece di
+# rileggere la riga User a ogni controllo. Il saldo viene ricaricato dopo
+# CREDITS_CACHE_TTL secondi e ogni volta che risulterebbe insufficiente; i
+# decrementi restano atomici sul database (UPDATE ... WHERE credits >= n) e
+# registrati nel CreditLedgerEntry, quindi la cache non può causare addebiti errati.
+class CreditBalanceCache:
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl if ttl is not None else settings.CREDITS_CACHE_TTL
+        self._balances: Dict[int, Tuple[int, float]] = {}   # user_id -> (saldo, istante di lettura)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+
+    ### Saldo dell'utente (dalla cache se ancora valido) ###
+    def balance(self, user_id: int) -> int:
+        with self._lock:
+            cached = self._balances.get(user_id)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                self.hits += 1
+                return cached[0]
+        return self.reload(user_id)
+
+    ### True se l'utente può spendere 'amount' crediti (ricarica prima di rispondere no) ###
+    def has(self, user_id: int, amount: int) -> bool:
+        if self.balance(user_id) >= amount:
+            return True
+        return self.reload(user_id) >= amount
+
+    ### Rilegge il saldo dal database ###
+    def reload(self, user_id: int) -> int:
+        credits = User.objects.values_list('credits', flat=True).get(pk=user_id)
+        with self._lock:
+            self.reloads += 1
+            self._balances[user_id] = (credits, time.monotonic())
+        return credits
+
+    ### Applica un movimento già registrato sul database al saldo in cache ###
+    def apply(self, user_id: int, delta: int) -> None:
+        with self._lock:
+            cached = self._balances.get(user_id)
+            if cached is not None:
+                self._balances[user_id] = (cached[0] + delta, cached[1])
+
+    ### Invalida il saldo di un utente (o di tutti) ###
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._balances.clear()
+            else:
+                self._balances.pop(user_id, None)
+
+
+# =============================================================================
+# RESET GIORNALIERO A BLOCCHI
+# =============================================================================
+
+# Riporta a 'credits' il saldo del blocco successivo di utenti (in ordine di id) in un'unica
+# transazione breve e registra per ognuno il movimento 'daily_reset' corrispondente.
+# Restituisce (ultimo id del blocco o None se non ci sono altri utenti, utenti aggiornati);
+# con rollback=True le modifiche vengono annullate (stima della durata senza effetti).
+def reset_credits_batch(credits: int, after_pk: int = 0, batch_size: int = 1000,
+                        rollback: bool = False) -> Tuple[Optional[int], int]:
+    with transaction.atomic():
+        rows = list(
+            User.objects.select_for_update()
+            .filter(pk__gt=after_pk, credits__lt=credits)
+            .order_by('pk')
+            .values_list('pk', 'credits')[:batch_size]
+        )
+        if not rows:
+            return None, 0
+
+        # Le righe lette sono bloccate fino al commit: lo stesso intervallo di id le aggiorna tutte
+        last_pk = rows[-1][0]
+        User.objects.filter(pk__gt=after_pk, pk__lte=last_pk, credits__lt=credits).update(credits=credits)
+        CreditLedgerEntry.objects.bulk_create(
+            CreditLedgerEntry(user_id=pk, delta=credits - balance, reason='daily_reset')
+            for pk, balance in rows
+        )
+
+        if rollback:
+            transaction.set_rollback(True)
+    if not rollback:
+        get_balance_cache().invalidate()
+    return last_pk, len(rows)
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_cache: Optional[CreditBalanceCache] = None
+_cache_lock = threading.Lock()
+
+
+# Restituisce la cache dei saldi di processo
+def get_balance_cache() -> CreditBalanceCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CreditBalanceCache()
+        return _cache
@@ -0,0 +1,514 @@
+import logging
+import threading
+import shutil
+import subprocess
+import time
+import os
+from typing import Dict, Any, Optional, Tuple
+from django.conf import settings
+from django.utils import timezone
+from .models import Task
+from .streaming import status_delta, output_delta, credits_delta
+from .output_buffer import OutputBuffer
+from .output_writer import LiveOutputWriter
+from .compiler import CompileResult, get_compile_cache
+from .manifest import ExerciseManifest
+from .workspace import get_workspace_pool
+from .runner import RunnerClient, RunnerUnavailable
+from .io_engine import get_io_engine, ProcessWatch, EVENT_OUTPUT, EVENT_TICK, EVENT_TIMEOUT, EVENT_EXIT
+from .broadcast import get_broadcaster
+from .process_group import (ResourceLimits, ResourceUsage, classify_exhaustion, spawn, terminate_group,
+                            EXHAUSTION_CPU, EXHAUSTION_FILE_SIZE, EXHAUSTION_PROCESSES)
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# ESECUZIONE DEI TASK
+# =============================================================================
+
+# Task compilato in attesa della fase di esecuzione
+class PreparedTask:
+    def __init__(self, workspace: str, binary: str, manifest: ExerciseManifest, via: str = 'local',
+                 compile_note: str = '', compile_seconds: float = 0.0) -> None:
+        self.workspace = workspace              # Cartella di lavoro del task (sorgente e input)
+        self.binary = binary                    # Eseguibile compilato
+        self.manifest = manifest                # Manifest dell'esercizio
+        self.via = via                          # 'runner', 'local' (cache) o 'direct' (senza cache)
+        self.compile_note = compile_note        # Riepilogo della cache di compilazione
+        self.compile_seconds = compile_seconds  # Durata della compilazione (addebitata come esecuzione)
+
+
+# Esegue i task in due fasi (compilazione ed esecuzione) prenotate dalla pipeline
+class TaskExecutor:
+
+    def __init__(self) -> None:
+        self._prepared: Dict[int, PreparedTask] = {}   # Task compilati in attesa di esecuzione
+        self._lock = threading.Lock()
+
+    ### Fase 1: compilazione (True se il task passa alla fase di esecuzione) ###
+    def compile(self, task: Task) -> bool:
+        workspace = None
+        try:
+            # Il task è già stato prenotato dalla pipeline (compile_status 'running')
+            self._ws_status(task)
+            started = time.time()
+            manifest = task.exercise.manifest()
+            workspace, source = self._create_workspace(task, manifest)
+            prepared = self._compile_source(task, manifest, workspace, source)
+            if prepared is None:
+                # Compilazione fallita: il task è già stato chiuso
+                self._cleanup_workspace(workspace)
+                return False
+            prepared.compile_seconds = time.time() - started
+
+            # Passa alla fase di esecuzione solo se il task non è stato interrotto nel frattempo
+            task.compile_status = 'completed'
+            task.compile_finished_at = timezone.now()
+            task.message = f"In attesa di esecuzione... {prepared.compile_note}".strip()
+            updated = Task.objects.filter(id=task.id, status='running').update(
+                compile_status=task.compile_status,
+                compile_finished_at=task.compile_finished_at,
+                message=task.message,
+            )
+            if not updated:
+                self._cleanup_workspace(workspace)
+                return False
+            with self._lock:
+                self._prepared[task.id] = prepared
+            self._ws_status(task)
+            return True
+
+        except Exception as e:
+            self._fail_with_error(task, e)
+            self._cleanup_workspace(workspace)
+            return False
+
+    ### Prenota un task compilato per la fase di esecuzione ###
+    def claim_run(self, task_id: int) -> Optional[Task]:
+        task = Task.claim_run(task_id)
+        if task is None and not Task.objects.filter(id=task_id, status='running').exists():
+            # Task interrotto o chiuso mentre era in coda: libera la cartella di lavoro
+            self._discard_prepared(task_id)
+        return task
+
+    ### Fase 2: esecuzione con controllo crediti ###
+    def run(self, task: Task) -> None:
+        prepared = self._take_prepared(task)
+        if prepared is None:
+            return
+        workspace = prepared.workspace
+        try:
+            # Il task è già stato prenotato dalla pipeline (run_status 'running')
+            limits = task.exercise.resource_limits(prepared.manifest)
+            process = self._start_prepared(task, prepared, limits)
+            task.message = f"Task in esecuzione... {prepared.compile_note}".strip()
+            task.process_id = process.pid
+            task.save(update_fields=['process_id', 'message'])
+            self._ws_status(task)
+
+            # Monitoraggio task (la durata della compilazione resta addebitata come prima)
+            timeout, timeout_message = self._run_timeout(prepared)
+            output_data = self._monitor_process(
+                process, task, workspace,
+                start_time=time.time() - prepared.compile_seconds,
+                timeout=timeout,
+                timeout_message=timeout_message,
+            )
+            output_data['compile_note'] = prepared.compile_note
+            output_data['limits'] = limits
+
+            if not output_data['interrupted']:
+                self._finalize_task(task, process, output_data)
+            output_data['writer'].finish()
+
+        except Exception as e:
+            self._fail_with_error(task, e)
+            # Pulisce la cartella di lavoro anche in caso di errore
+            self._cleanup_workspace(workspace)
+
+    ### Segna il task come fallito per un errore imprevisto ###
+    def _fail_with_error(self, task: Task, error: Exception) -> None:
+        task.fail(
+            stdout='',
+            stderr=f'Errore durante l\'esecuzione: {str(error)}',
+            message=f'Errore durante l\'esecuzione: {str(error)}'
+            )
+        self._ws_status(task)
+
+    ### Prende dal pool la cartella di lavoro del task (harness e input già presenti) e scrive il sorgente ###
+    def _create_workspace(self, task: Task, manifest: ExerciseManifest) -> Tuple[str, str]:
+        workspace = get_workspace_pool().acquire(manifest)
+        try:
+            source = os.path.join(workspace, f'submission{task.exercise.file_extension}')
+            with open(source, 'w') as f:
+                f.write(task.code)
+        except Exception:
+            self._cleanup_workspace(workspace)
+            raise
+        return workspace, source
+
+    ### Compila il sorgente: runner daemon, cache locale o compilazione diretta nella cartella di lavoro ###
+    def _compile_source(self, task: Task, manifest: ExerciseManifest, workspace: str,
+                        source: str) -> Optional[PreparedTask]:
+        compiled = None
+        compile_note = ''
+        via = 'direct'
+
+        if settings.RUNNER_SOCKET:
+            # Runner daemon: eseguibile nella cache del runner
+            try:
+                launch = RunnerClient().compile(task.exercise.name, source)
+                compiled, compile_note, via = launch.compiled, launch.summary, 'runner'
+            except RunnerUnavailable as e:
+                logger.warning('Runner non disponibile (%s): compilazione locale del task %s', e, task.id)
+
+        if compiled is None and settings.COMPILE_CACHE_ENABLED:
+            # Compilazione (o riuso dalla cache) nel processo corrente
+            cache = get_compile_cache()
+            compiled = cache.compile(source, manifest)
+            compile_note = cache.summary(compiled)
+            via = 'local'
+
+        if compiled is None:
+            # Senza cache: l'eseguibile resta nella cartella di lavoro del task
+            compiled = get_compile_cache().build(source, manifest, os.path.join(workspace, 'a.out'))
+
+        if not compiled.ok:
+            self._fail_compilation(task, compiled, compile_note)
+            return None
+        return PreparedTask(workspace, compiled.binary, manifest, via, compile_note)
+
+    ### Task compilato dalla fase precedente (ricompilato se il contesto è andato perso) ###
+    def _take_prepared(self, task: Task) -> Optional[PreparedTask]:
+        with self._lock:
+            prepared = self._prepared.pop(task.id, None)
+        if prepared is not None:
+            return prepared
+
+        # Es. riavvio del processo tra le due fasi: di solito è un hit della cache
+        workspace = None
+        try:
+            manifest = task.exercise.manifest()
+            workspace, source = self._create_workspace(task, manifest)
+            prepared = self._compile_source(task, manifest, workspace, source)
+        except Exception as e:
+            self._fail_with_error(task, e)
+            prepared = None
+        if prepared is None:
+            self._cleanup_workspace(workspace)
+        return prepared
+
+    ### Dimentica un task compilato che non verrà eseguito ###
+    def _discard_prepared(self, task_id: int) -> None:
+        with self._lock:
+            prepared = self._prepared.pop(task_id, None)
+        if prepared is not None:
+            self._cleanup_workspace(prepared.workspace)
+
+    ### Libera i task compilati non ancora eseguiti (arresto della pipeline) ###
+    def release_prepared(self) -> None:
+        # Restano nella coda di esecuzione sul database: il prossimo worker li ricompila
+        with self._lock:
+            prepared, self._prepared = list(self._prepared.values()), {}
+        for item in prepared:
+            self._cleanup_workspace(item.workspace)
+
+    ### Avvia il processo della fase di esecuzione ###
+    def _start_prepared(self, task: Task, prepared: PreparedTask, limits: Optional[ResourceLimits] = None):
+        if prepared.via == 'runner':
+            try:
+                return RunnerClient().execute(task.exercise.name, prepared.binary, prepared.workspace, limits)
+            except RunnerUnavailable as e:
+                # Con la stessa COMPILE_CACHE_DIR l'eseguibile è raggiungibile anche localmente
+                logger.warning('Runner non disponibile (%s): esecuzione locale del task %s', e, task.id)
+                if not os.path.isfile(prepared.binary):
+                    raise
+        return self._start_binary(prepared.binary, prepared.manifest, prepared.workspace, limits)
+
+    ### Timeout della fase di esecuzione e relativo messaggio ###
+    def _run_timeout(self, prepared: PreparedTask) -> Tuple[float, str]:
+        max_message = f"Task terminato per timeout massimo ({settings.MAX_TASK_EXECUTION_TIME}s)"
+        remaining = settings.MAX_TASK_EXECUTION_TIME - prepared.compile_seconds
+        if settings.PROGRAM_EXECUTION_TIMEOUT <= remaining:
+            return (
+                settings.PROGRAM_EXECUTION_TIMEOUT,
+                f"Task terminato per timeout di esecuzione ({settings.PROGRAM_EXECUTION_TIMEOUT}s)",
+            )
+        return max(remaining, 0.001), max_message
+
+    ### Avvia direttamente l'eseguibile compilato (nella cartella di lavoro del task) ###
+    def _start_binary(self, binary: str, manifest: ExerciseManifest, workspace: str,
+                      limits: Optional[ResourceLimits] = None) -> subprocess.Popen:
+        if shutil.which('stdbuf'):
+            cmd = ['stdbuf', '-oL', '-eL', binary, *manifest.args]
+        else:
+            cmd = [binary, *manifest.args]
+
+        # Pipe in modalità binaria: il motore I/O legge blocchi di byte senza buffering di riga.
+        # Nuovo gruppo di processi: la terminazione raggiunge anche i processi creati dal programma
+        return spawn(
+            cmd,
+            limits=limits,
+            cwd=workspace,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+
+    ### Segna il task come fallito per errore (o timeout) di compilazione ###
+    def _fail_compilation(self, task: Task, compiled: CompileResult, compile_note: str) -> None:
+        if compiled.timed_out:
+            reason = f"Compilazione terminata per timeout ({settings.CODE_COMPILATION_TIMEOUT}s)"
+            stderr = f"{compiled.stderr.strip()}{reason}"
+        else:
+            reason = "Errore di compilazione."
+            stderr = compiled.stderr.strip()
+        task.fail(
+            stdout=compiled.stdout.strip(),
+            stderr=stderr,
+            message=f"{reason} {compile_note}"
+        )
+        self._ws_status(task)
+
+    ### Monitora il processo tramite il motore I/O e gestisce i crediti ###
+    def _monitor_process(self, process: subprocess.Popen, task: Task, workspace: str = None,
+                         start_time: Optional[float] = None, timeout: Optional[float] = None,
+                         timeout_message: Optional[str] = None) -> Dict[str, Any]:
+        # Buffer limitati per accumulare l'output del processo
+        stdout = OutputBuffer(tail_size=settings.OUTPUT_TAIL_SIZE)
+        stderr = OutputBuffer(tail_size=settings.OUTPUT_TAIL_SIZE)
+        writer = LiveOutputWriter(task, stdout, stderr)  # Salvataggi accorpati dell'output live
+        start_time = start_time or time.time()  # Timestamp inizio esecuzione (compilazione inclusa)
+        timeout = timeout or settings.MAX_TASK_EXECUTION_TIME
+        timeout_message = timeout_message or f"Task terminato per timeout massimo ({settings.MAX_TASK_EXECUTION_TIME}s)"
+        task_interrupted = False     # Flag per interruzione task
+
+        # Il motore I/O legge le pipe e arma i timer di timeout e controllo crediti
+        watch = get_io_engine().watch(
+            process,
+            timeout=timeout,
+            tick_interval=settings.REDUCE_CREDITS_TIME_AMOUNT,
+        )
+
+        try:
+            # Loop principale: il worker dorme finché il motore I/O non notifica un evento
+            while True:
+                event = watch.next_event(timeout=writer.time_until_due())
+
+                # 0. NESSUN EVENTO: è scaduto l'intervallo di salvataggio dell'output
+                if event is None:
+                    writer.flush_if_due()
+                    continue
+
+                # 1. NUOVO OUTPUT (l'evento di uscita porta con sé l'ultimo output)
+                if event in (EVENT_OUTPUT, EVENT_EXIT):
+                    new_stdout, new_stderr = watch.take_output()
+                    if new_stdout or new_stderr:
+                        stdout_offset, stderr_offset = stdout.head_size, stderr.head_size
+                        stdout.write(new_stdout)
+                        stderr.write(new_stderr)
+                        try:
+                            # 1a. CONTROLLO DIMENSIONE MASSIMA OUTPUT (il buffer è già limitato)
+                            overflowed = stdout.overflowed or stderr.overflowed
+                            if overflowed and settings.OUTPUT_OVERFLOW_ACTION == 'terminate':
+                                # TERMINA IL PROCESSO se l'output è troppo grande
+                                self._terminate_process(watch)
+                                self._record_usage(task, watch.usage)
+                                task.failure_reason = 'output_size'
+                                task.fail(
+                                    stdout=stdout.getvalue().strip(),
+                                    stderr=f"{stderr.getvalue().strip()}Task terminato per output troppo grande (max {settings.MAX_OUTPUT_BUFFER_SIZE} caratteri)",
+                                    message=f"Task terminato per output troppo grande (max {settings.MAX_OUTPUT_BUFFER_SIZE} caratteri)"
+                                )
+                                self._ws_status(task)
+                                task_interrupted = True
+
+                                # PULIZIA: rimuove la cartella di lavoro
+                                self._cleanup_workspace(workspace)
+                                break
+
+                            # 1b. SALVA L'OUTPUT (ACCORPATO) E INVIA AL CLIENT SOLO L'OUTPUT AGGIUNTO
+                            # (oltre il limite la coda viene inviata solo con lo stato finale)
+                            writer.mark(len(new_stdout) + len(new_stderr))
+                            if event != EVENT_EXIT:
+                                writer.flush_if_due()
+                            if stdout.head_size > stdout_offset:
+                                self._ws_output(task, 'stdout', stdout_offset, stdout.read_since(stdout_offset))
+                            if stderr.head_size > stderr_offset:
+                                self._ws_output(task, 'stderr', stderr_offset, stderr.read_since(stderr_offset))
+                        except Exception:
+                            # Non interrompere il loop in caso di errori di I/O/WS
+                            pass
+                    if event == EVENT_EXIT:
+                        break
+
+                # 2. CONTROLLO TIMEOUT DELLA FASE DI ESECUZIONE (timer del motore I/O)
+                elif event == EVENT_TIMEOUT:
+                    # TERMINA IL PROCESSO per timeout
+                    self._terminate_process(watch)
+                    self._get_remaining_output(watch, stdout, stderr)
+                    self._record_usage(task, watch.usage)
+                    task.failure_reason = 'timeout'
+                    task.fail(
+                        stdout=stdout.getvalue().strip(),
+                        stderr=f"{stderr.getvalue().strip()}{timeout_message}",
+                        message=timeout_message
+                    )
+                    self._ws_status(task)
+                    task_interrupted = True
+
+                    # PULIZIA: rimuove la cartella di lavoro
+                    self._cleanup_workspace(workspace)
+                    break
+
+                # 3. CONTROLLO CREDITI PERIODICO (timer del motore I/O)
+                elif event == EVENT_TICK:
+                    elapsed_seconds = time.time() - start_time
+
+                    # Controlla se l'utente ha ancora crediti e li riduce se necessario
+                    # (saldo in cache, decremento atomico sul database)
+                    task_interrupted = self._handle_credits_deduction(task, elapsed_seconds, watch)
+
+                    if task_interrupted:  # Se l'utente non ha più crediti
+                        # Cattura l'output rimanente dal processo terminato
+                        self._get_remaining_output(watch, stdout, stderr)
+                        self._record_usage(task, watch.usage)
+
+                        # Segna il task come interrotto per crediti esauriti
+                        task.interrupt(
+                            stdout=stdout.getvalue().strip(),
+                            stderr=stderr.getvalue().strip(),
+                            message="Crediti esauriti."
+                        )
+                        self._ws_status(task)
+                        self._cleanup_workspace(workspace)
+                        break
+        finally:
+            watch.close()
+
+        # 4. RESTITUISCE I RISULTATI DEL MONITORAGGIO
+        return {
+            'stdout': stdout.getvalue(),       # Output conservato del programma
+            'stderr': stderr.getvalue(),       # Errori conservati del programma
+            'interrupted': task_interrupted,   # Se il task è stato interrotto
+            'start_time': start_time,          # Timestamp di inizio
+            'workspace': workspace,            # Cartella di lavoro del task
+            'returncode': watch.returncode,    # Codice di uscita del processo
+            'usage': watch.usage,              # Consumo di risorse del processo
+            'writer': writer,                  # Statistiche di scrittura dell'output
+        }
+
+    ### Gestisce la deduzione dei crediti e l'interruzione se necessario ###
+    def _handle_credits_deduction(self, task: Task, elapsed_seconds: float, watch: ProcessWatch) -> bool:
+        credits_needed = int(elapsed_seconds * settings.DEFAULT_CREDIT_COST_PER_TIME_AMOUNT)
+
+        credits_to_deduct = credits_needed - task.credits_cost
+        if credits_to_deduct <= 0:
+            return False
+
+        # Controlla se l'utente ha abbastanza crediti per continuare: il saldo in cache
+        # evita di rileggere l'utente, il decremento condizionato è quello che conta
+        if task.user.has_credits(credits_to_deduct) and \
+                task.user.reduce_credits(credits_to_deduct, reason='task_usage', task=task):
+            task.credits_cost = credits_needed
+            task.save(update_fields=['credits_cost'])
+            self._ws_credits(task)
+            return False
+        else:
+            self._terminate_process(watch)
+            return True
+
+    ### Termina il processo con tutto il suo gruppo (lo raccoglie il motore I/O) ###
+    def _terminate_process(self, watch: ProcessWatch) -> None:
+        terminate_group(watch.process.pid, watch.wait_exit, min(0.5, settings.PROGRAM_EXECUTION_TIMEOUT))
+
+    ### Copia sul task il consumo di risorse della fase di esecuzione (salvato con lo stato finale) ###
+    def _record_usage(self, task: Task, usage: Optional[ResourceUsage]) -> None:
+        if usage is None:
+            return
+        task.run_cpu_seconds = round(usage.cpu_seconds, 3)
+        task.run_max_rss_kb = usage.max_rss_kb
+        if usage.wall_seconds is not None:
+            task.run_wall_seconds = round(usage.wall_seconds, 3)
+
+    ### Aggiunge ai buffer l'output rimanente del processo terminato ###
+    def _get_remaining_output(self, watch: ProcessWatch, stdout: OutputBuffer, stderr: OutputBuffer) -> None:
+        watch.wait_exit(timeout=min(0.5, settings.PROGRAM_EXECUTION_TIMEOUT))
+        remaining_stdout, remaining_stderr = watch.take_output()
+        stdout.write(remaining_stdout)
+        stderr.write(remaining_stderr)
+
+    ### Finalizza il task con l'output completo ###
+    def _finalize_task(self, task: Task, process: subprocess.Popen, output_data: Dict[str, Any]) -> None:
+
+        # L'output è già stato letto interamente dal motore I/O
+        final_stdout = output_data['stdout']
+        final_stderr = output_data['stderr']
+
+        # Calcolo tempo di esecuzione e crediti utilizzati
+        total_seconds = time.time() - output_data['start_time']
+        total_credits_used = int(total_seconds * settings.DEFAULT_CREDIT_COST_PER_TIME_AMOUNT)
+
+        # Deduzione crediti se necessario
+        if total_credits_used > task.credits_cost:
+            remaining_credits = total_credits_used - task.credits_cost
+            task.user.reduce_credits(remaining_credits, reason='task_usage', task=task)
+            task.credits_cost = total_credits_used   # Salvato con lo stato finale
+
+        compile_note = output_data.get('compile_note', '')
+        self._record_usage(task, output_data.get('usage'))
+        if output_data['returncode'] == 0:
+            message = f"Task completato con successo. {compile_note}".strip()
+            task.complete(stdout=final_stdout.strip(), stderr=final_stderr.strip(), message=message)
+        else:
+            # Terminazione per esaurimento delle risorse: motivo specifico nel messaggio e su stderr
+            limits = output_data.get('limits')
+            reason = classify_exhaustion(output_data['returncode'], limits, output_data.get('usage'), final_stderr)
+            if reason is not None:
+                task.failure_reason = reason
+                reason_message = self._exhaustion_message(reason, limits or ResourceLimits())
+                final_stderr = f"{final_stderr.strip()}\n{reason_message}"
+                compile_note = f"{reason_message} {compile_note}"
+            task.fail(stdout=final_stdout.strip(), stderr=final_stderr.strip(), message=compile_note.strip())
+        self._ws_status(task)
+
+        # Pulisce la cartella di lavoro
+        self._cleanup_workspace(output_data.get('workspace'))
+
+    ### Messaggio per un task terminato per esaurimento delle risorse ###
+    def _exhaustion_message(self, reason: str, limits: ResourceLimits) -> str:
+        if reason == EXHAUSTION_CPU:
+            return f"Task terminato per limite di tempo CPU ({limits.cpu_seconds}s)"
+        if reason == EXHAUSTION_FILE_SIZE:
+            return f"Task terminato per limite di dimensione dei file ({limits.file_size_mb} MB)"
+        if reason == EXHAUSTION_PROCESSES:
+            return f"Task terminato per limite di processi ({limits.processes})"
+        if limits.memory_mb:
+            return f"Task terminato per memoria esaurita (max {limits.memory_mb} MB)"
+        return "Task terminato per memoria esaurita"
+
+    ### Restituisce la cartella di lavoro al pool (sorgente e file scritti dal programma vengono eliminati) ###
+    def _cleanup_workspace(self, workspace: Optional[str]) -> None:
+        get_workspace_pool().release(workspace)
+
+    ### Invia un cambio di stato del task attraverso WebSocket ###
+    def _ws_status(self, task: Task) -> None:
+        self._ws_broadcast(task.id, status_delta(task))
+
+    ### Invia solo il blocco di output aggiunto (con il suo offset) ###
+    def _ws_output(self, task: Task, stream: str, offset: int, data: str) -> None:
+        self._ws_broadcast(task.id, output_delta(task.id, stream, offset, data))
+
+    ### Invia l'aggiornamento dei crediti consumati ###
+    def _ws_credits(self, task: Task) -> None:
+        self._ws_broadcast(task.id, credits_delta(task))
+
+    ### Invia un messaggio incrementale ai client del task attraverso WebSocket ###
+    def _ws_broadcast(self, task_id: int, data: Dict[str, Any]) -> None:
+        try:
+            # Accodato al broadcaster: il task non attende il channel layer (Redis con più worker)
+            get_broadcaster().send(f'task_{task_id}', { 'type': 'task_delta', 'data': data })
+        except Exception:
+            # Ignora errori WebSocket
+            pass
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import models
+from . import compression
+
+
+# =============================================================================
+# CAMPI PERSONALIZZATI
+# =============================================================================
+
+# Campo di testo compresso in modo trasparente: il modello e i serializer vedono una
+# stringa, sul database viene salvato un BLOB nel formato di core/compression.py.
+# Con dedup=True i valori lunghi vengono salvati una sola volta in TextBlob e la riga
+# contiene solo il riferimento per hash (sottomissioni identiche occupano 33 byte).
+class CompressedTextField(models.TextField):
+
+    def __init__(self, *args, dedup: bool = False, **kwargs) -> None:
+        self.dedup = dedup
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.dedup:
+            kwargs['dedup'] = True
+        return name, path, args, kwargs
+
+    ### Colonna binaria (BLOB su SQLite, bytea su PostgreSQL) ###
+    def get_internal_type(self) -> str:
+        return 'BinaryField'
+
+    ### Database -> Python ###
+    def from_db_value(self, value, expression, connection):
+        return compression.decode(value)
+
+    ### Python -> database (scritture e confronti) ###
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return value
+        return connection.Database.Binary(compression.encode(value))
+
+    ### Python -> database (solo scritture: qui avviene la deduplicazione) ###
+    def get_db_prep_save(self, value, connection):
+        if self.dedup and isinstance(value, str) and len(value) >= settings.STORAGE_DEDUP_MIN_SIZE:
+            return connection.Database.Binary(compression.store_blob(value))
+        return super().get_db_prep_save(value, connection)
+
+
+# Oggetti del queryset con i campi compressi indicati risolti in blocco: i valori vengono letti
+# ancora codificati e i TextBlob a cui rimandano caricati con una sola query (invece di una
+# query per riga in un processo appena avviato, es. una pagina di task)
+def load_with_blobs(queryset, *fields) -> list:
+    encoded = {name: f'_encoded_{name}' for name in fields}
+    rows = list(queryset.defer(*fields).annotate(**{
+        alias: models.ExpressionWrapper(models.F(name), output_field=models.BinaryField())
+        for name, alias in encoded.items()
+    }))
+    compression.load_blobs(compression.blob_digests(
+        getattr(row, alias) for row in rows for alias in encoded.values()
+    ))
+    for row in rows:
+        for name, alias in encoded.items():
+            setattr(row, name, compression.decode(getattr(row, alias)))
+    return rows
@@ -0,0 +1,306 @@
+import codecs
+import heapq
+import itertools
+import os
+import queue
+import selectors
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .process_group import ResourceUsage, has_exited, reap
+
+
+# =============================================================================
+# MOTORE I/O A EVENTI (un solo loop per tutti i processi in esecuzione)
+# =============================================================================
+
+READ_CHUNK_SIZE = 64 * 1024     # Byte letti per ogni evento di lettura
+EXIT_POLL_INTERVAL = 0.05       # Controllo uscita se pidfd non è disponibile
+
+# Eventi notificati al worker che osserva il processo
+EVENT_OUTPUT = 'output'         # Nuovo output disponibile (coalescente)
+EVENT_TICK = 'tick'             # Timer periodico (controllo crediti)
+EVENT_TIMEOUT = 'timeout'       # Superato il tempo massimo di esecuzione
+EVENT_EXIT = 'exit'             # Processo terminato, output completamente letto
+
+
+# Timer registrato sul loop (annullabile)
+class Timer:
+    def __init__(self, callback: Callable[[], None]) -> None:
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+# Stato di un processo osservato dal motore I/O
+class ProcessWatch:
+
+    def __init__(self, engine: 'IOEngine', process: subprocess.Popen) -> None:
+        self.engine = engine
+        self.process = process
+        self.returncode: Optional[int] = None
+        self.usage: Optional[ResourceUsage] = None     # Consumo di risorse (disponibile all'uscita)
+        self._events = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._chunks: Dict[str, List[str]] = {'stdout': [], 'stderr': []}
+        self._decoders = {
+            name: codecs.getincrementaldecoder('utf-8')(errors='replace')
+            for name in ('stdout', 'stderr')
+        }
+        self._output_signalled = False
+        self._exited = threading.Event()
+        self._timers: Dict[str, Timer] = {}
+        self._open_streams: Dict[int, str] = {}
+        self._pidfd: Optional[int] = None
+
+    ### Attende il prossimo evento (None allo scadere del timeout) ###
+    def next_event(self, timeout: Optional[float] = None) -> Optional[str]:
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    ### Restituisce e svuota l'output accumulato dall'ultima chiamata ###
+    def take_output(self) -> Tuple[str, str]:
+        with self._lock:
+            stdout = ''.join(self._chunks['stdout'])
+            stderr = ''.join(self._chunks['stderr'])
+            self._chunks['stdout'].clear()
+            self._chunks['stderr'].clear()
+            self._output_signalled = False
+        return stdout, stderr
+
+    ### Attende la terminazione del processo e la lettura di tutto l'output ###
+    def wait_exit(self, timeout: Optional[float] = None) -> bool:
+        return self._exited.wait(timeout)
+
+    ### Smette di osservare il processo ###
+    def close(self) -> None:
+        self.engine.call_soon(lambda: self.engine._release(self))
+
+    # --- Metodi eseguiti sul thread del loop ---
+
+    def _post(self, event: str) -> None:
+        self._events.put(event)
+
+    def _feed(self, stream: str, data: bytes, final: bool = False) -> None:
+        text = self._decoders[stream].decode(data, final)
+        if not text:
+            return
+        with self._lock:
+            self._chunks[stream].append(text)
+            signal = not self._output_signalled
+            self._output_signalled = True
+        if signal:
+            self._post(EVENT_OUTPUT)
+
+
+# Loop singolo basato su selectors che multiplexa le pipe di tutti i processi
+class IOEngine:
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._timers: List[tuple] = []
+        self._sequence = itertools.count()
+        self._callbacks = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    ### Avvia il thread del loop (idempotente) ###
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='io-engine', daemon=True)
+                self._thread.start()
+
+    ### Inizia a osservare un processo avviato con stdout/stderr in PIPE ###
+    def watch(self, process: subprocess.Popen, timeout: Optional[float] = None,
+              tick_interval: Optional[float] = None) -> ProcessWatch:
+        self.start()
+        watch = ProcessWatch(self, process)
+        self.call_soon(lambda: self._register(watch, timeout, tick_interval))
+        return watch
+
+    ### Esegue una callback sul thread del loop ###
+    def call_soon(self, callback: Callable[[], None]) -> None:
+        self._callbacks.put(callback)
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    ### Programma una callback dopo 'delay' secondi (solo dal thread del loop) ###
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        timer = Timer(callback)
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._sequence), timer))
+        return timer
+
+    # --- Metodi eseguiti sul thread del loop ---
+
+    def _register(self, watch: ProcessWatch, timeout: Optional[float], tick_interval: Optional[float]) -> None:
+        process = watch.process
+        for name in ('stdout', 'stderr'):
+            pipe = getattr(process, name)
+            if pipe is None:
+                continue
+            fd = pipe.fileno()
+            os.set_blocking(fd, False)
+            watch._open_streams[fd] = name
+            self._selector.register(fd, selectors.EVENT_READ, (watch, name))
+
+        # Notifica di uscita tramite pidfd (Linux >= 5.3), altrimenti polling leggero
+        try:
+            watch._pidfd = os.pidfd_open(process.pid)
+            self._selector.register(watch._pidfd, selectors.EVENT_READ, (watch, None))
+        except (AttributeError, OSError):
+            watch._pidfd = None
+            self._schedule_exit_poll(watch)
+
+        if timeout:
+            watch._timers['timeout'] = self.call_later(timeout, lambda: watch._post(EVENT_TIMEOUT))
+        if tick_interval:
+            self._schedule_tick(watch, tick_interval)
+
+    def _schedule_tick(self, watch: ProcessWatch, interval: float) -> None:
+        def tick() -> None:
+            watch._post(EVENT_TICK)
+            self._schedule_tick(watch, interval)
+        watch._timers['tick'] = self.call_later(interval, tick)
+
+    def _schedule_exit_poll(self, watch: ProcessWatch) -> None:
+        def poll() -> None:
+            if has_exited(watch.process):
+                self._finish(watch)
+            else:
+                self._schedule_exit_poll(watch)
+        watch._timers['exit_poll'] = self.call_later(EXIT_POLL_INTERVAL, poll)
+
+    # Legge un blocco di byte dalla pipe (True se sono stati letti dati)
+    def _read(self, watch: ProcessWatch, fd: int, name: str) -> bool:
+        try:
+            data = os.read(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return False
+        except OSError:
+            data = b''
+        if not data:
+            self._close_stream(watch, fd, name)
+            return False
+        watch._feed(name, data)
+        return True
+
+    def _close_stream(self, watch: ProcessWatch, fd: int, name: str) -> None:
+        if watch._open_streams.pop(fd, None) is None:
+            return
+        try:
+            self._selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+        watch._feed(name, b'', final=True)
+
+    def _finish(self, watch: ProcessWatch) -> None:
+        if watch._exited.is_set():
+            return
+        # Drena l'output rimasto nelle pipe prima di notificare l'uscita
+        for fd, name in list(watch._open_streams.items()):
+            while self._read(watch, fd, name):
+                pass
+        self._release(watch)
+        # Raccoglie il processo (e uccide quelli rimasti nel suo gruppo) leggendo il consumo di risorse
+        watch.returncode, watch.usage = reap(watch.process)
+        watch._exited.set()
+        watch._post(EVENT_EXIT)
+
+    def _release(self, watch: ProcessWatch) -> None:
+        for timer in watch._timers.values():
+            timer.cancel()
+        watch._timers.clear()
+        for fd, name in list(watch._open_streams.items()):
+            self._close_stream(watch, fd, name)
+        for pipe in (watch.process.stdout, watch.process.stderr):
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+        if watch._pidfd is not None:
+            try:
+                self._selector.unregister(watch._pidfd)
+            except (KeyError, ValueError):
+                pass
+            os.close(watch._pidfd)
+            watch._pidfd = None
+
+    def _run_callbacks(self) -> None:
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                callback = self._callbacks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def _run_timers(self) -> Optional[float]:
+        now = time.monotonic()
+        while self._timers:
+            deadline, _, timer = self._timers[0]
+            if timer.cancelled:
+                heapq.heappop(self._timers)
+                continue
+            if deadline > now:
+                return deadline - now
+            heapq.heappop(self._timers)
+            try:
+                timer.callback()
+            except Exception:
+                pass
+        return None
+
+    def _run(self) -> None:
+        while True:
+            timeout = self._run_timers()
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    self._run_callbacks()
+                    continue
+                watch, name = key.data
+                try:
+                    if name is None:
+                        self._finish(watch)
+                    elif key.fd in watch._open_streams:
+                        self._read(watch, key.fd, name)
+                        if not watch._open_streams and watch._pidfd is None and has_exited(watch.process):
+                            self._finish(watch)
+                except Exception:
+                    # Un errore su un processo non deve fermare il loop degli altri
+                    pass
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_engine: Optional[IOEngine] = None
+_engine_lock = threading.Lock()
+
+
+# Restituisce il motore I/O di processo
+def get_io_engine() -> IOEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = IOEngine()
+        return _engine
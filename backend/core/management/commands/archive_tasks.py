@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.conf import settings
+from core.archive import archivable_tasks, archive_batch, table_sizes
+from core.models import Task, TaskArchive
+
+
+class Command(BaseCommand):
+    help = 'Sposta codice e output dei task conclusi più vecchi nella tabella di archivio, a blocchi.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TASK_ARCHIVE_AFTER_DAYS,
+            help='Archivia i task conclusi creati da più di N giorni (default: settings.TASK_ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASK_ARCHIVE_BATCH_SIZE,
+            help='Task archiviati per transazione (default: settings.TASK_ARCHIVE_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--throttle',
+            type=float,
+            default=0.0,
+            help='Pausa in secondi tra un blocco e il successivo (default: 0)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Non modifica nulla: riporta task e byte che verrebbero archiviati'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Esegue VACUUM al termine per restituire al file lo spazio liberato (solo SQLite)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = max(1, options['batch_size'])
+        started_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+        self.stdout.write(
+            f'[archive_tasks] Inizio archiviazione dei task conclusi prima del '
+            f'{cutoff.strftime("%Y-%m-%d %H:%M")} — blocchi da {batch_size} — {started_at}'
+        )
+
+        if options['dry_run']:
+            totals = archivable_tasks(cutoff).aggregate(
+                code=Sum(Length('code')), stdout=Sum(Length('stdout')), stderr=Sum(Length('stderr')),
+            )
+            count = archivable_tasks(cutoff).count()
+            stored = sum(value or 0 for value in totals.values())
+            self.stdout.write(self.style.SUCCESS(
+                f'[archive_tasks] Dry run — {count} task da archiviare, {stored / 1024 / 1024:.2f} MiB su database (compressi)'
+            ))
+            return
+
+        sizes_before = table_sizes()
+        started = time.perf_counter()
+        after_pk = 0
+        archived = moved = batches = 0
+        while True:
+            t0 = time.perf_counter()
+            after_pk, batch_archived, batch_moved = archive_batch(cutoff, after_pk, batch_size)
+            if after_pk is None:
+                break
+            batches += 1
+            archived += batch_archived
+            moved += batch_moved
+            self.stdout.write(
+                f'  blocco {batches}: {batch_archived} task, {batch_moved / 1024:.1f} KiB, fino a id {after_pk}, '
+                f'{(time.perf_counter() - t0) * 1000:.1f} ms'
+            )
+            if batch_archived < batch_size:
+                break
+            if options['throttle']:
+                time.sleep(options['throttle'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'  spostati fuori dalla tabella Task: {moved / 1024 / 1024:.2f} MiB')
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        sizes_after = table_sizes()
+        task_table, archive_table = Task._meta.db_table, TaskArchive._meta.db_table
+        if task_table in sizes_before and task_table in sizes_after:
+            reclaimed = sizes_before[task_table] - sizes_after[task_table]
+            self.stdout.write(
+                f'  tabella {task_table}: {sizes_before[task_table] / 1024 / 1024:.2f} -> '
+                f'{sizes_after[task_table] / 1024 / 1024:.2f} MiB (recuperati {reclaimed / 1024 / 1024:.2f} MiB'
+                f'{"" if options["vacuum"] else ", pagine libere fino a VACUUM"})'
+            )
+            self.stdout.write(
+                f'  tabella {archive_table}: {sizes_after.get(archive_table, 0) / 1024 / 1024:.2f} MiB'
+            )
+
+        finished_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+        self.stdout.write(self.style.SUCCESS(
+            f'[archive_tasks] Completato — archiviati {archived} task in {batches} blocchi, {elapsed:.2f}s — {finished_at}'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.benchmarks import benchmark_names, load_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Esegue un benchmark: python manage.py bench <nome> [opzioni] (elenco: python manage.py bench --help).'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', metavar='nome', required=True)
+        for name in benchmark_names():
+            benchmark = load_benchmark(name)
+            subparser = subparsers.add_parser(name, help=benchmark.help, description=benchmark.help)
+            benchmark().add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        benchmark = load_benchmark(options.pop('benchmark'))()
+        # Stesso output (e stessi colori) del comando
+        benchmark.stdout, benchmark.stderr, benchmark.style = self.stdout, self.stderr, self.style
+        return benchmark.handle(*args, **options)
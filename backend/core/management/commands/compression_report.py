@@ -0,0 +1,151 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from core import compression
+from core.models import Task, TaskArchive, TextBlob
+
+
+class Command(BaseCommand):
+    help = 'Riporta rapporto di compressione, deduplicazione e costo di lettura/scrittura dei campi compressi.'
+
+    FIELDS = ('code', 'stdout', 'stderr')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--train-dictionary',
+            action='store_true',
+            help='Ricostruisce il dizionario condiviso dai template degli esercizi prima del report',
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=200,
+            help='Valori usati per misurare il costo di compressione e decompressione (default: 200)',
+        )
+        parser.add_argument(
+            '--gc-blobs',
+            action='store_true',
+            help='Elimina i TextBlob non più referenziati da nessun task (es. dopo clear_tasks)',
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        self.stdout.write(
+            f'[compression_report] Inizio analisi — {started_at.strftime("%Y-%m-%d %H:%M:%S %Z")}'
+        )
+
+        if options['train_dictionary']:
+            dict_id, created = compression.train_dictionary()
+            self.stdout.write(
+                f'  dizionario condiviso: id {dict_id} '
+                f'({"nuovo" if created else "invariato"}, {len(compression.get_dictionary(dict_id))} byte)'
+            )
+
+        # Scansione delle righe: byte logici (testo) contro byte salvati (colonna)
+        sample = []
+        referenced = set()
+        totals = {field: [0, 0] for field in self.FIELDS}
+        for model in (Task, TaskArchive):
+            self.scan_table(model, totals, sample, referenced, options['sample'])
+
+        blob_stats = TextBlob.objects.values_list('size', flat=True)
+        blob_count, blob_logical = len(blob_stats), sum(blob_stats)
+        blob_stored = self.stored_bytes(TextBlob._meta.db_table, 'content')
+
+        self.stdout.write(f'  {"campo":<8} | {"testo":>12} | {"su database":>12} | {"rapporto":>8}')
+        for field, (logical, stored) in totals.items():
+            if field == 'code':
+                stored += blob_stored   # Riferimenti nelle righe + contenuti deduplicati
+            self.stdout.write(
+                f'  {field:<8} | {self.mib(logical):>8.2f} MiB | {self.mib(stored):>8.2f} MiB | '
+                f'{(logical / stored if stored else 0):>7.1f}x'
+            )
+        self.stdout.write(
+            f'  deduplicazione: {len(referenced)} contenuti distinti referenziati, {blob_count} TextBlob '
+            f'({self.mib(blob_logical):.2f} MiB di testo, {self.mib(blob_stored):.2f} MiB salvati)'
+        )
+
+        self.report_overhead(sample)
+
+        if options['gc_blobs']:
+            orphans = TextBlob.objects.filter(created_at__lt=started_at).exclude(digest__in=referenced)
+            deleted, _ = orphans.delete()
+            compression.reset_blob_cache()
+            self.stdout.write(f'  TextBlob orfani eliminati: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[compression_report] Completato in {(timezone.now() - started_at).total_seconds():.2f}s'
+        ))
+
+    # Legge le colonne così come sono salvate (senza passare dal campo) a blocchi per id
+    def scan_table(self, model, totals, sample, referenced, sample_size):
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        columns = ', '.join(connection.ops.quote_name(field) for field in self.FIELDS)
+        after_pk = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    f'SELECT {pk}, {columns} FROM {table} WHERE {pk} > %s ORDER BY {pk} LIMIT %s',
+                    [after_pk, 2000],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    return
+                after_pk = rows[-1][0]
+                for row in rows:
+                    for field, stored in zip(self.FIELDS, row[1:]):
+                        if stored is None:
+                            continue
+                        text = compression.decode(stored)
+                        if isinstance(stored, str):
+                            stored = stored.encode('utf-8')   # Riga non ancora compressa
+                        stored = bytes(stored)
+                        totals[field][0] += len(text.encode('utf-8'))
+                        totals[field][1] += len(stored)
+                        if stored[:1] == bytes([compression.FORMAT_BLOB]):
+                            referenced.add(stored[1:].hex())
+                        if text and len(sample) < sample_size:
+                            sample.append(text)
+
+    # Costo medio per valore: compressione contro semplice codifica UTF-8
+    def report_overhead(self, sample):
+        if not sample:
+            self.stdout.write('  nessun valore da misurare')
+            return
+        t0 = time.perf_counter()
+        encoded = [compression.encode(text) for text in sample]
+        encode_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        plain = [text.encode('utf-8') for text in sample]
+        plain_encode_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for data in encoded:
+            compression.decode(data)
+        decode_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for data in plain:
+            data.decode('utf-8')
+        plain_decode_seconds = time.perf_counter() - t0
+
+        n = len(sample)
+        self.stdout.write(
+            f'  costo su {n} valori ({self.mib(sum(map(len, plain))) * 1024:.1f} KiB): '
+            f'scrittura {encode_seconds / n * 1e6:.1f} µs/valore (UTF-8 {plain_encode_seconds / n * 1e6:.1f} µs), '
+            f'lettura {decode_seconds / n * 1e6:.1f} µs/valore (UTF-8 {plain_decode_seconds / n * 1e6:.1f} µs)'
+        )
+
+    # Byte salvati in una colonna, come li restituisce il database
+    def stored_bytes(self, table, column):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT SUM(LENGTH(CAST({connection.ops.quote_name(column)} AS BLOB))) '
+                f'FROM {connection.ops.quote_name(table)}'
+            )
+            return cursor.fetchone()[0] or 0
+
+    @staticmethod
+    def mib(value):
+        return value / 1024 / 1024
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from core.models import Exercise, Course
+from core.compression import train_dictionary
 
 class Command(BaseCommand):
     help = 'Genera esercizi di esempio per i corsi'
@@ -221,3 +222,8 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(f'Esercizio già esistente: {ex.name}'))
 
         self.stdout.write(self.style.SUCCESS(f'Generazione esercizi completata! Creati {created_count} nuovi esercizi.'))
+
+        # Il dizionario di compressione dipende dai template: lo aggiorna se sono cambiati
+        dict_id, dict_created = train_dictionary()
+        if dict_created:
+            self.stdout.write(self.style.SUCCESS(f'Dizionario di compressione aggiornato (id {dict_id})'))
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.reaper import TaskReaper
+
+
+class Command(BaseCommand):
+    help = ('Recupera i task rimasti in esecuzione senza worker (processo terminato o heartbeat scaduto): '
+            'li rimette in coda o li chiude come falliti con il rimborso dei crediti.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra i task orfani senza modificarli',
+        )
+        parser.add_argument(
+            '--heartbeat-timeout',
+            type=float,
+            default=settings.TASK_HEARTBEAT_TIMEOUT,
+            help='Secondi senza heartbeat dopo cui un task è orfano (default: TASK_HEARTBEAT_TIMEOUT)',
+        )
+        parser.add_argument(
+            '--max-requeues',
+            type=int,
+            default=settings.TASK_REAPER_MAX_REQUEUES,
+            help='Volte in cui un task può essere rimesso in coda prima di fallire (default: TASK_REAPER_MAX_REQUEUES)',
+        )
+
+    def handle(self, *args, **options):
+        reaper = TaskReaper(heartbeat_timeout=options['heartbeat_timeout'], max_requeues=options['max_requeues'])
+        orphans = reaper.find_orphans()
+        self.stdout.write(f'[reap_tasks] {len(orphans)} task orfani — {timezone.now().strftime("%Y-%m-%d %H:%M:%S %Z")}')
+        for task in orphans:
+            last_seen = task.heartbeat_at or task.started_at
+            self.stdout.write(
+                f'  task {task.id}: worker {task.worker_id or "?"}, fase '
+                f'{"esecuzione" if task.run_status == "running" else "compilazione"}, '
+                f'ultimo heartbeat {last_seen.strftime("%H:%M:%S") if last_seen else "mai"}, '
+                f'rimesso in coda {task.recovery_count} volte'
+            )
+        if options['dry_run'] or not orphans:
+            return
+
+        counts = reaper.reap()
+        self.stdout.write(self.style.SUCCESS(
+            f'[reap_tasks] Rimessi in coda {counts["requeued"]}, falliti {counts["failed"]}, '
+            f'processi terminati {counts["processes_killed"]}, crediti rimborsati {counts["credits_refunded"]}, '
+            f'conflitti {counts["conflicts"]}'
+        ))
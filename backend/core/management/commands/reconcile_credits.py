@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from core.credits import get_balance_cache
+from core.models import CreditLedgerEntry, User
+
+
+class Command(BaseCommand):
+    help = 'Confronta il saldo crediti degli utenti con la somma dei movimenti del registro crediti.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Registra una rettifica per allineare il registro al saldo attuale degli utenti',
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+        self.stdout.write(f'[reconcile_credits] Inizio verifica registro crediti — {started_at}')
+
+        # Somma dei movimenti per utente (0 se l'utente non ha movimenti)
+        ledger = dict(
+            CreditLedgerEntry.objects.values('user_id')
+            .annotate(total=Sum('delta'))
+            .values_list('user_id', 'total')
+        )
+        drifts = []
+        for user_id, email, credits in User.objects.values_list('id', 'email', 'credits').iterator():
+            total = ledger.get(user_id, 0)
+            if total != credits:
+                drifts.append((user_id, email, credits, total))
+
+        for user_id, email, credits, total in drifts:
+            self.stdout.write(self.style.WARNING(
+                f'  {email}: saldo {credits}, registro {total} (differenza {credits - total:+d})'
+            ))
+
+        if drifts and options['fix']:
+            with transaction.atomic():
+                CreditLedgerEntry.objects.bulk_create(
+                    [
+                        CreditLedgerEntry(user_id=user_id, delta=credits - total, reason='adjustment')
+                        for user_id, _, credits, total in drifts
+                    ],
+                    batch_size=1000,
+                )
+            get_balance_cache().invalidate()
+            self.stdout.write(f'[reconcile_credits] Registrate {len(drifts)} rettifiche')
+
+        finished_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
+        message = f'[reconcile_credits] Completato — {len(drifts)} utenti non allineati — {finished_at}'
+        self.stdout.write(self.style.SUCCESS(message) if not drifts or options['fix'] else self.style.WARNING(message))
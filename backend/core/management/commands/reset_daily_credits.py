@@ -1,7 +1,8 @@
+import time
 from django.core.management.base import BaseCommand
-from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
+from core.credits import reset_credits_batch
 from core.models import User
 
 
@@ -15,14 +16,86 @@ class Command(BaseCommand):
             default=settings.DAILY_CREDITS_RESET_AMOUNT,
             help='Numero di crediti da assegnare (default: settings.DAILY_CREDITS_RESET_AMOUNT)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.DAILY_CREDITS_RESET_BATCH_SIZE,
+            help='Utenti aggiornati per transazione (default: settings.DAILY_CREDITS_RESET_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--throttle',
+            type=float,
+            default=settings.DAILY_CREDITS_RESET_THROTTLE,
+            help='Pausa in secondi tra un blocco e il successivo (default: settings.DAILY_CREDITS_RESET_THROTTLE)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Non modifica i crediti: riporta utenti da aggiornare, blocchi e durata stimata'
+        )
 
     def handle(self, *args, **options):
         credits = options['credits']
+        batch_size = max(1, options['batch_size'])
+        throttle = max(0.0, options['throttle'])
         started_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
-        self.stdout.write(f'[reset_daily_credits] Inizio reset crediti a {credits} — {started_at}')
+        self.stdout.write(
+            f'[reset_daily_credits] Inizio reset crediti a {credits} — blocchi da {batch_size}, '
+            f'pausa {throttle}s — {started_at}'
+        )
+
+        if options['dry_run']:
+            self.dry_run(credits, batch_size, throttle)
+            return
 
-        # Aggiorna solo gli utenti con crediti < credits
-        updated = User.objects.filter(credits__lt=credits).update(credits=credits)
+        # Blocchi per chiave primaria: ogni transazione tiene il lock di scrittura solo per il
+        # proprio blocco e tra un blocco e l'altro gli addebiti dei task possono procedere
+        started = time.perf_counter()
+        after_pk = 0
+        updated = batches = 0
+        while True:
+            t0 = time.perf_counter()
+            after_pk, batch_updated = reset_credits_batch(credits, after_pk, batch_size)
+            if after_pk is None:
+                break
+            batches += 1
+            updated += batch_updated
+            self.stdout.write(
+                f'  blocco {batches}: {batch_updated} utenti, fino a id {after_pk}, '
+                f'{(time.perf_counter() - t0) * 1000:.1f} ms'
+            )
+            if batch_updated < batch_size:
+                break
+            if throttle:
+                time.sleep(throttle)
+        elapsed = time.perf_counter() - started
 
         finished_at = timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')
-        self.stdout.write(self.style.SUCCESS(f'[reset_daily_credits] Completato — aggiornati {updated} utenti — {finished_at}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'[reset_daily_credits] Completato — aggiornati {updated} utenti in {batches} blocchi, '
+            f'{elapsed:.2f}s — {finished_at}'
+        ))
+
+    # Conta gli utenti da aggiornare e stima la durata misurando un blocco annullato
+    def dry_run(self, credits, batch_size, throttle):
+        t0 = time.perf_counter()
+        pending = User.objects.filter(credits__lt=credits).count()
+        count_seconds = time.perf_counter() - t0
+        batches = -(-pending // batch_size)
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('[reset_daily_credits] Dry run — nessun utente da aggiornare'))
+            return
+
+        t0 = time.perf_counter()
+        _, sample = reset_credits_batch(credits, 0, batch_size, rollback=True)
+        sample_seconds = time.perf_counter() - t0
+        per_user = sample_seconds / max(sample, 1)
+        estimate = pending * per_user + (batches - 1) * throttle
+
+        self.stdout.write(f'  utenti da aggiornare: {pending} (conteggio in {count_seconds * 1000:.1f} ms)')
+        self.stdout.write(f'  blocchi:              {batches} da {batch_size}')
+        self.stdout.write(f'  blocco di prova:      {sample} utenti in {sample_seconds * 1000:.1f} ms (annullato)')
+        self.stdout.write(self.style.SUCCESS(
+            f'[reset_daily_credits] Dry run — durata stimata {estimate:.2f}s '
+            f'(di cui {(batches - 1) * throttle:.2f}s di pausa tra i blocchi)'
+        ))
@@ -0,0 +1,41 @@
+import os
+import signal
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from core.runner import RunnerDaemon
+
+
+class Command(BaseCommand):
+    help = 'Avvia il runner daemon che compila ed esegue i task senza livelli di shell (socket Unix).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            type=str,
+            default=settings.RUNNER_SOCKET or os.path.join(settings.BASE_DIR, 'runner.sock'),
+            help='Percorso del socket Unix (default: settings.RUNNER_SOCKET o runner.sock nel backend)',
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        try:
+            server = RunnerDaemon(socket_path)
+        except OSError as e:
+            raise CommandError(f'Impossibile aprire il socket {socket_path}: {e}')
+
+        exercises = ', '.join(sorted(server.load_exercises())) or 'nessuno'
+        self.stdout.write(f'[run_runner] In ascolto su {socket_path} — esercizi: {exercises}')
+        if settings.RUNNER_SOCKET != socket_path:
+            self.stdout.write(self.style.WARNING(
+                f'[run_runner] Impostare RUNNER_SOCKET={socket_path} nel backend per usare il daemon'
+            ))
+        # SIGTERM chiude il daemon come Ctrl+C (rimuovendo il socket)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(self.style.SUCCESS('[run_runner] Terminato'))
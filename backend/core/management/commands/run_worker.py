@@ -0,0 +1,78 @@
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.scheduler import TaskPipeline
+from core.worker import TaskWorker
+
+
+class Command(BaseCommand):
+    help = ('Avvia il worker di esecuzione: consuma la coda dei task, compila, esegue e pubblica gli '
+            'aggiornamenti WebSocket. Si può riavviare indipendentemente dai processi HTTP.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compile-workers',
+            type=int,
+            default=settings.MAX_CONCURRENT_COMPILES,
+            help='Compilazioni in parallelo (default: MAX_CONCURRENT_COMPILES)',
+        )
+        parser.add_argument(
+            '--run-workers',
+            type=int,
+            default=settings.MAX_CONCURRENT_RUNS,
+            help='Esecuzioni in parallelo (default: MAX_CONCURRENT_RUNS)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.WORKER_POLL_INTERVAL,
+            help='Secondi tra due letture della coda sul database (default: WORKER_POLL_INTERVAL)',
+        )
+        parser.add_argument(
+            '--shutdown-timeout',
+            type=float,
+            default=settings.WORKER_SHUTDOWN_TIMEOUT,
+            help='Secondi concessi ai task in corso all\'arresto (default: WORKER_SHUTDOWN_TIMEOUT)',
+        )
+
+    def handle(self, *args, **options):
+        pipeline = TaskPipeline(
+            compile_workers=options['compile_workers'],
+            run_workers=options['run_workers'],
+            refill_interval=options['poll_interval'],
+        )
+        worker = TaskWorker(pipeline, poll_interval=options['poll_interval'])
+
+        if settings.EXECUTION_MODE == 'local':
+            self.stdout.write(self.style.WARNING(
+                '[run_worker] EXECUTION_MODE=local: anche i processi HTTP eseguono i task '
+                '(impostare EXECUTION_MODE=worker per lasciarli solo accodare)'
+            ))
+        if settings.CHANNEL_LAYER_BACKEND == 'memory':
+            self.stdout.write(self.style.WARNING(
+                '[run_worker] Channel layer in memoria: gli aggiornamenti live non raggiungono i client '
+                'collegati ai processi HTTP e i nuovi task vengono letti solo dal database (impostare REDIS_URL)'
+            ))
+
+        # SIGTERM (riavvio, deploy) e Ctrl+C: smette di prelevare task e attende quelli in corso
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: worker.request_stop())
+
+        worker.start()
+        self.stdout.write(
+            f'[run_worker] Avviato — {options["compile_workers"]} compilazioni e {options["run_workers"]} '
+            f'esecuzioni in parallelo, channel layer {settings.CHANNEL_LAYER_BACKEND}, '
+            f'lettura della coda ogni {options["poll_interval"]}s'
+        )
+        while not worker.wait(1.0):
+            pass
+
+        self.stdout.write(f'[run_worker] Arresto: attesa dei task in corso (max {options["shutdown_timeout"]}s)')
+        worker.shutdown(options['shutdown_timeout'])
+        stats = worker.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'[run_worker] Terminato — compilati {stats["compile"]["completed"]}, '
+            f'eseguiti {stats["run"]["completed"]}, notifiche ricevute {stats["notifications"]}, '
+            f'task orfani recuperati {stats["reaper"]["requeued"]} (falliti {stats["reaper"]["failed"]}), '
+            f'cartelle di lavoro riusate {stats["workspaces"]["reused"]} (create {stats["workspaces"]["created"]})'
+        ))
@@ -0,0 +1,277 @@
+import csv
+import heapq
+import random
+from collections import defaultdict
+from datetime import timedelta
+from statistics import mean
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+from core.bench import percentile
+from core.models import Task
+from core.scheduler import PriorityLanes, QueueEntry
+
+
+class Command(BaseCommand):
+    help = ('Simula le politiche di coda su una traccia di sottomissioni (file CSV, task reali dal database '
+            'o traccia sintetica di un laboratorio) e riporta i tempi di attesa per utente e per corsia.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trace',
+            help='File CSV con colonne user,submitted_at,duration (secondi) e facoltative lane,exercise; '
+                 'senza --trace usa i task del database',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Con la traccia dal database: task creati negli ultimi N giorni (default: 7)',
+        )
+        parser.add_argument(
+            '--export-trace',
+            help='Scrive la traccia usata nel file CSV indicato (per ripeterla o modificarla)',
+        )
+        parser.add_argument(
+            '--decision-log',
+            help='Scrive nel file CSV indicato ogni decisione dello scheduler simulato (per tutte le politiche)',
+        )
+        parser.add_argument(
+            '--synthetic',
+            action='store_true',
+            help='Traccia sintetica: classe al lavoro, un utente che accoda molti task, docenti e correzioni batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.MAX_CONCURRENT_RUNS,
+            help='Worker simulati (default: settings.MAX_CONCURRENT_RUNS)',
+        )
+        parser.add_argument(
+            '--per-user-limit',
+            type=int,
+            default=settings.SCHEDULER_MAX_RUNNING_PER_USER,
+            help='Task in corso per utente con le politiche fair e sjf (default: settings.SCHEDULER_MAX_RUNNING_PER_USER)',
+        )
+        parser.add_argument(
+            '--interactive-sla',
+            type=float,
+            default=settings.SCHEDULER_INTERACTIVE_SLA,
+            help='Attesa massima della corsia interattiva in secondi (default: settings.SCHEDULER_INTERACTIVE_SLA)',
+        )
+        parser.add_argument(
+            '--batch-sla',
+            type=float,
+            default=settings.SCHEDULER_BATCH_SLA,
+            help='Attesa massima della corsia batch in secondi (default: settings.SCHEDULER_BATCH_SLA)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Utenti mostrati nel dettaglio, i più penalizzati con FIFO (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        if options['trace']:
+            trace = self.read_trace(options['trace'])
+            source = options['trace']
+        elif options['synthetic']:
+            trace = self.synthetic_trace()
+            source = 'sintetica'
+        else:
+            trace = self.database_trace(options['days'])
+            source = f'database, ultimi {options["days"]} giorni'
+        if not trace:
+            raise CommandError('Traccia vuota: usa --trace, --synthetic o un database con task conclusi')
+        if options['export_trace']:
+            self.write_trace(options['export_trace'], trace)
+
+        lanes = defaultdict(int)
+        for row in trace:
+            lanes[row[3]] += 1
+        self.stdout.write(
+            f'[simulate_scheduler] Traccia {source}: {len(trace)} task di {len({row[0] for row in trace})} utenti '
+            f'({", ".join(f"{lane} {count}" for lane, count in sorted(lanes.items()))}), {options["workers"]} worker'
+        )
+
+        limit = options['per_user_limit']
+        sla = {'interactive': options['interactive_sla'], 'batch': options['batch_sla']}
+        scenarios = [
+            ('fifo senza corsie', 'fifo', 0, False),
+            ('fifo', 'fifo', 0, True),
+            ('fair', 'fair', 0, True),
+        ]
+        if limit > 0:
+            scenarios.append((f'fair, max {limit}/utente', 'fair', limit, True))
+        scenarios.append((f'sjf, max {limit}/utente' if limit > 0 else 'sjf', 'sjf', limit, True))
+        expected = self.expected_durations(trace)
+        decisions = {
+            label: self.simulate(trace, policy, options['workers'], per_user_limit, sla if use_lanes else {}, use_lanes, expected)
+            for label, policy, per_user_limit, use_lanes in scenarios
+        }
+        if options['decision_log']:
+            self.write_decisions(options['decision_log'], decisions)
+
+        # Attese complessive e per utente
+        self.stdout.write(
+            f'  {"politica":<20} | {"media":>7} | {"p50":>7} | {"p95":>7} | {"p99":>7} | '
+            f'{"p95 per utente (mediana)":>24} | {"p95 utente peggiore":>19}'
+        )
+        for label, rows in decisions.items():
+            waits = [row['waited'] for row in rows]
+            per_user_p95 = [percentile(user_waits, 95) for user_waits in self.group(rows, 'user').values()]
+            self.stdout.write(
+                f'  {label:<20} | {mean(waits):>5.1f} s | {percentile(waits, 50):>5.1f} s | {percentile(waits, 95):>5.1f} s | '
+                f'{percentile(waits, 99):>5.1f} s | {percentile(per_user_p95, 50):>22.1f} s | {max(per_user_p95):>17.1f} s'
+            )
+
+        # Attese per corsia (media / p95) e task serviti per superamento dello SLA
+        lane_names = [lane for lane in Task.PRIORITY_LANES if lanes.get(lane)]
+        header = ' | '.join(f'{lane:>17}' for lane in lane_names)
+        self.stdout.write(f'\n  {"politica":<20} | {header} | {"per SLA":>7}   (attesa media / p95)')
+        for label, rows in decisions.items():
+            by_lane = self.group(rows, 'lane')
+            cells = ' | '.join(
+                f'{mean(by_lane[lane]):>6.1f} / {percentile(by_lane[lane], 95):>6.1f} s' if by_lane.get(lane) else f'{"-":>17}'
+                for lane in lane_names
+            )
+            promoted = sum(1 for row in rows if row['reason'] == 'sla')
+            self.stdout.write(f'  {label:<20} | {cells} | {promoted:>7}')
+
+        # Dettaglio: gli utenti con l'attesa p95 più alta in FIFO (di solito i più penalizzati)
+        fifo = self.group(decisions['fifo'], 'user')
+        submissions = defaultdict(int)
+        for row in trace:
+            submissions[row[0]] += 1
+        worst = sorted(fifo, key=lambda user: percentile(fifo[user], 95), reverse=True)[:options['top']]
+        header = ' | '.join(f'{label[:20]:>20}' for label in decisions)
+        self.stdout.write(f'\n  {"utente":<10} | {"task":>5} | {header}   (attesa p50 / p95)')
+        per_user = {label: self.group(rows, 'user') for label, rows in decisions.items()}
+        for user in worst:
+            cells = ' | '.join(
+                f'{percentile(waits[user], 50):>8.1f} / {percentile(waits[user], 95):>7.1f} s' for waits in per_user.values()
+            )
+            self.stdout.write(f'  {str(user):<10} | {submissions[user]:>5} | {cells}')
+
+    # Simulazione a eventi discreti di un pool di worker che preleva dalle corsie con la
+    # politica indicata. Restituisce le decisioni nell'ordine in cui vengono prese.
+    def simulate(self, trace, policy, workers, per_user_limit, sla, use_lanes, expected):
+        clock = {'now': 0.0}
+        queue = PriorityLanes(policy, sla=sla, clock=lambda: clock['now'])
+        active = defaultdict(int)
+        running = []   # Heap di (istante di fine, utente)
+        decisions = []
+        durations = {}
+        i = 0
+
+        def blocked(user):
+            return per_user_limit > 0 and active[user] >= per_user_limit
+
+        while i < len(trace) or len(queue) or running:
+            # Avanza al prossimo evento: arrivo o fine di un task
+            next_arrival = trace[i][1] if i < len(trace) else float('inf')
+            next_finish = running[0][0] if running else float('inf')
+            now = clock['now'] = min(next_arrival, next_finish)
+            while running and running[0][0] <= now:
+                _, user = heapq.heappop(running)
+                active[user] -= 1
+            while i < len(trace) and trace[i][1] <= now:
+                user, submitted_at, duration, lane, exercise = trace[i]
+                queue.push(QueueEntry(i, user, submitted_at, lane if use_lanes else 'interactive', expected[exercise]))
+                durations[i] = duration
+                i += 1
+            # Assegna i worker liberi
+            while len(running) < workers:
+                popped = queue.pop(blocked)
+                if popped is None:
+                    break
+                entry, reason = popped
+                decisions.append({
+                    'time': now, 'task': entry.task_id, 'user': entry.user_id, 'lane': trace[entry.task_id][3],
+                    'reason': reason, 'waited': now - entry.enqueued_at, 'expected': entry.expected,
+                })
+                active[entry.user_id] += 1
+                heapq.heappush(running, (now + durations.pop(entry.task_id), entry.user_id))
+        return decisions
+
+    # Durata attesa per esercizio: media delle durate della traccia (come le medie storiche dello scheduler)
+    def expected_durations(self, trace):
+        durations = defaultdict(list)
+        for _, _, duration, _, exercise in trace:
+            durations[exercise].append(duration)
+        return {exercise: mean(values) for exercise, values in durations.items()}
+
+    @staticmethod
+    def group(rows, key):
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row[key]].append(row['waited'])
+        return grouped
+
+    # Traccia dai task conclusi: istante di creazione, durata reale, corsia ed esercizio
+    def database_trace(self, days):
+        since = timezone.now() - timedelta(days=days)
+        rows = (
+            Task.objects.filter(created_at__gte=since, status__in=Task.FINISHED_STATUSES)
+            .order_by('created_at').values_list('user_id', 'created_at', 'total_execution_time', 'priority', 'exercise_id')
+        )
+        trace = []
+        origin = None
+        for user, created_at, duration, lane, exercise in rows.iterator():
+            origin = origin or created_at
+            seconds = duration.total_seconds() if duration else 1.0
+            trace.append((user, (created_at - origin).total_seconds(), max(seconds, 0.01), lane, exercise))
+        return trace
+
+    # Laboratorio di un'ora: 40 studenti sottomettono ogni pochi minuti esercizi brevi e lunghi,
+    # uno accoda 60 task in 30 secondi, due docenti provano un esercizio e un correttore
+    # automatico accoda 80 task batch
+    def synthetic_trace(self):
+        rng = random.Random(11)
+        exercises = {'vector_add': (1, 3), 'reduce': (3, 6), 'matmul': (10, 20), 'stencil': (15, 30)}
+        names = list(exercises)
+
+        def task(user, t, lane, exercise=None):
+            exercise = exercise or rng.choice(names)
+            return (user, t, rng.uniform(*exercises[exercise]), lane, exercise)
+
+        trace = []
+        for student in range(1, 41):
+            t = rng.uniform(0, 120)
+            while t < 3600:
+                trace.append(task(student, t, 'interactive'))
+                t += rng.expovariate(1 / 240)
+        trace.extend(task(999, 600 + rng.uniform(0, 30), 'interactive') for _ in range(60))
+        trace.extend(task(f'docente{i}', 900 + rng.uniform(0, 60), 'staff', 'stencil') for i in (1, 2) for _ in range(5))
+        trace.extend(task('correttore', 1200 + rng.uniform(0, 10), 'batch', 'matmul') for _ in range(80))
+        return sorted(trace, key=lambda row: row[1])
+
+    def read_trace(self, path):
+        try:
+            with open(path, newline='') as f:
+                trace = [
+                    (row['user'], float(row['submitted_at']), float(row['duration']),
+                     row.get('lane') or 'interactive', row.get('exercise') or '')
+                    for row in csv.DictReader(f)
+                ]
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f'Traccia non valida ({path}): {e}')
+        return sorted(trace, key=lambda row: row[1])
+
+    def write_trace(self, path, trace):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['user', 'submitted_at', 'duration', 'lane', 'exercise'])
+            writer.writerows(trace)
+        self.stdout.write(f'  traccia scritta in {path}')
+
+    def write_decisions(self, path, decisions):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['scenario', 'time', 'task', 'user', 'lane', 'reason', 'waited', 'expected'])
+            for label, rows in decisions.items():
+                for row in rows:
+                    writer.writerow([label, f'{row["time"]:.3f}', row['task'], row['user'], row['lane'], row['reason'],
+                                     f'{row["waited"]:.3f}', f'{row["expected"]:.3f}'])
+        self.stdout.write(f'  decisioni scritte in {path}')
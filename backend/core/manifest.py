@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from .process_group import ResourceLimits
+
+
+# =============================================================================
+# MANIFEST DEGLI ESERCIZI
+# =============================================================================
+
+# Ogni esercizio è una cartella di gpu/ con un file exercise.json che descrive come
+# compilarlo ed eseguirlo, senza script di shell:
+#
+#   {
+#     "harness": "main.cu",                  file con main() che include il codice dello studente
+#     "source_define": "TEMP_FILE_PATH",     macro con il percorso del sorgente (#include MACRO)
+#     "declarations": "student.h",           opzionale, prototipi delle funzioni dello studente
+#     "compiler": "nvcc",                    opzionale, default CUDA_COMPILER
+#     "flags": ["-O2"],                      flag aggiuntivi (dopo CUDA_COMPILER_FLAGS)
+#     "inputs": ["data.txt"],                file presenti nella cartella di lavoro del task
+#     "args": [],                            argomenti del programma
+#     "limits": {"memory_mb": 2048, "cpu_seconds": 10, "processes": 0, "file_size_mb": 10}
+#   }
+#
+# Con "declarations" l'harness viene compilato a parte (con la macro che punta all'header dei
+# prototipi) una volta per versione dell'esercizio: per ogni sottomissione si compila solo il
+# sorgente dello studente (con l'header incluso in testa) e si collegano i due oggetti.
+# Le funzioni __device__ chiamate tra le due unità richiedono "-rdc=true" nei flag.
+#
+# I manifest vengono letti una volta e restano in memoria (ricaricati solo se il file
+# cambia). La compilazione avviene con la cartella dell'esercizio come cwd, l'esecuzione
+# in una cartella di lavoro per task: gpu/<esercizio>/ non viene mai scritta.
+MANIFEST_NAME = 'exercise.json'
+DEFAULT_SOURCE_DEFINE = 'TEMP_FILE_PATH'
+MANIFEST_KEYS = {'harness', 'source_define', 'declarations', 'compiler', 'flags', 'inputs', 'args', 'limits'}
+LIMIT_KEYS = ('memory_mb', 'cpu_seconds', 'processes', 'file_size_mb')
+
+
+# Manifest assente o non valido
+class ManifestError(Exception):
+    pass
+
+
+# Descrizione di un esercizio letta da gpu/<nome>/exercise.json
+class ExerciseManifest:
+    def __init__(self, name: str, directory: str, harness: str, source_define: str = DEFAULT_SOURCE_DEFINE,
+                 compiler: Optional[str] = None, flags: Optional[List[str]] = None,
+                 inputs: Optional[List[str]] = None, args: Optional[List[str]] = None,
+                 limits: Optional[Dict[str, Optional[int]]] = None, declarations: Optional[str] = None) -> None:
+        self.name = name                        # Nome dell'esercizio (cartella)
+        self.directory = directory              # Percorso assoluto della cartella
+        self.harness = harness                  # File con main(), relativo alla cartella
+        self.source_define = source_define      # Macro con il percorso del sorgente dello studente
+        self.compiler = compiler                # None = CUDA_COMPILER
+        self.flags = list(flags or [])
+        self.inputs = list(inputs or [])
+        self.args = list(args or [])
+        self.limits = dict(limits or {})        # Limiti di default dell'esercizio (None = RUN_*)
+        self.declarations = declarations        # Header dei prototipi (None = harness e sorgente compilati insieme)
+
+    @property
+    def harness_path(self) -> str:
+        return os.path.join(self.directory, self.harness)
+
+    @property
+    def declarations_path(self) -> Optional[str]:
+        return os.path.join(self.directory, self.declarations) if self.declarations else None
+
+    ### Percorsi assoluti dei file di input ###
+    def input_paths(self) -> List[Tuple[str, str]]:
+        return [(name, os.path.join(self.directory, name)) for name in self.inputs]
+
+    ### Legge e valida il manifest di una cartella ###
+    @classmethod
+    def load(cls, directory: str) -> 'ExerciseManifest':
+        directory = os.path.abspath(directory)
+        name = os.path.basename(directory)
+        path = os.path.join(directory, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise ManifestError(f'{name}: {MANIFEST_NAME} mancante')
+        except (OSError, ValueError) as e:
+            raise ManifestError(f'{name}: {MANIFEST_NAME} non leggibile ({e})')
+        if not isinstance(data, dict):
+            raise ManifestError(f'{name}: il manifest deve essere un oggetto JSON')
+
+        unknown = set(data) - MANIFEST_KEYS
+        if unknown:
+            raise ManifestError(f'{name}: chiavi sconosciute {sorted(unknown)}')
+        harness = data.get('harness')
+        if not isinstance(harness, str) or not harness:
+            raise ManifestError(f'{name}: "harness" obbligatorio')
+        source_define = data.get('source_define', DEFAULT_SOURCE_DEFINE)
+        if not isinstance(source_define, str) or not source_define.isidentifier():
+            raise ManifestError(f'{name}: "source_define" deve essere il nome di una macro')
+        declarations = data.get('declarations')
+        if declarations is not None and (not isinstance(declarations, str) or not declarations):
+            raise ManifestError(f'{name}: "declarations" deve essere il percorso di un header')
+        compiler = data.get('compiler')
+        if compiler is not None and (not isinstance(compiler, str) or not compiler):
+            raise ManifestError(f'{name}: "compiler" deve essere una stringa')
+        flags, inputs, args = (cls._strings(name, data, key) for key in ('flags', 'inputs', 'args'))
+
+        for relative in [harness, *([declarations] if declarations else []), *inputs]:
+            if os.path.isabs(relative) or '..' in relative.split('/'):
+                raise ManifestError(f'{name}: "{relative}" deve essere un percorso nella cartella dell\'esercizio')
+            if not os.path.isfile(os.path.join(directory, relative)):
+                raise ManifestError(f'{name}: file "{relative}" non trovato')
+
+        limits = data.get('limits') or {}
+        if not isinstance(limits, dict) or set(limits) - set(LIMIT_KEYS):
+            raise ManifestError(f'{name}: "limits" accetta solo {", ".join(LIMIT_KEYS)}')
+        for key, value in limits.items():
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise ManifestError(f'{name}: limite "{key}" non valido ({value!r})')
+
+        return cls(name, directory, harness, source_define, compiler, flags, inputs, args, limits, declarations)
+
+    @staticmethod
+    def _strings(name: str, data: Dict[str, Any], key: str) -> List[str]:
+        value = data.get(key, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ManifestError(f'{name}: "{key}" deve essere una lista di stringhe')
+        return value
+
+    ### Limiti di risorse: campo dell'esercizio, poi manifest, poi RUN_* (0 = nessun limite) ###
+    def resource_limits(self, overrides: Optional[Dict[str, Optional[int]]] = None) -> ResourceLimits:
+        defaults = {
+            'memory_mb': settings.RUN_MEMORY_LIMIT_MB,
+            'cpu_seconds': settings.RUN_CPU_TIME_LIMIT,
+            'processes': settings.RUN_MAX_PROCESSES,
+            'file_size_mb': settings.RUN_MAX_FILE_SIZE_MB,
+        }
+        values = {}
+        for key in LIMIT_KEYS:
+            for source in (overrides or {}, self.limits, defaults):
+                if source.get(key) is not None:
+                    values[key] = source[key]
+                    break
+        return ResourceLimits(**values)
+
+
+# Manifest di tutti gli esercizi di una cartella (gpu/), letti una volta e tenuti in memoria
+class ManifestRegistry:
+
+    def __init__(self, gpu_dir: Optional[str] = None) -> None:
+        self.gpu_dir = os.path.abspath(gpu_dir or os.path.join(settings.BASE_DIR, 'gpu'))
+        self._manifests: Dict[str, Tuple[int, ExerciseManifest]] = {}
+        self._lock = threading.Lock()
+
+    ### Manifest di un esercizio (riletto solo se il file è cambiato) ###
+    def get(self, name: str) -> ExerciseManifest:
+        if not name or os.sep in name or name.startswith('.'):
+            raise ManifestError(f'Esercizio non valido: {name!r}')
+        directory = os.path.join(self.gpu_dir, name)
+        try:
+            mtime = os.stat(os.path.join(directory, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            raise ManifestError(f'{name}: {MANIFEST_NAME} mancante')
+        with self._lock:
+            cached = self._manifests.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        manifest = ExerciseManifest.load(directory)
+        with self._lock:
+            self._manifests[name] = (mtime, manifest)
+        return manifest
+
+    ### Nomi delle cartelle che contengono un manifest ###
+    def names(self) -> List[str]:
+        try:
+            entries = sorted(os.listdir(self.gpu_dir))
+        except FileNotFoundError:
+            return []
+        return [name for name in entries if os.path.isfile(os.path.join(self.gpu_dir, name, MANIFEST_NAME))]
+
+    ### Carica tutti i manifest e restituisce gli errori (vuoto se sono tutti validi) ###
+    def validate(self) -> List[str]:
+        errors = []
+        try:
+            entries = sorted(os.listdir(self.gpu_dir))
+        except FileNotFoundError:
+            return [f'Cartella degli esercizi non trovata: {self.gpu_dir}']
+        for name in entries:
+            if not os.path.isdir(os.path.join(self.gpu_dir, name)) or name.startswith(('.', '_')):
+                continue
+            try:
+                self.get(name)
+            except ManifestError as e:
+                errors.append(str(e))
+        return errors
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_registry: Optional[ManifestRegistry] = None
+_registry_lock = threading.Lock()
+
+
+# Restituisce il registro dei manifest di processo (cartella gpu/ del backend)
+def get_manifest_registry() -> ManifestRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ManifestRegistry()
+        return _registry
+
+
+# Manifest di un esercizio dal registro di processo
+def get_manifest(name: str) -> ExerciseManifest:
+    return get_manifest_registry().get(name)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_alter_user_credits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='compile_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='compile_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='compile_status',
+            field=models.CharField(choices=[('pending', 'In attesa'), ('running', 'In corso'), ('completed', 'Completata'), ('failed', 'Fallita'), ('interrupted', 'Interrotta'), ('skipped', 'Saltata')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='run_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='run_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='run_status',
+            field=models.CharField(choices=[('pending', 'In attesa'), ('running', 'In corso'), ('completed', 'Completata'), ('failed', 'Fallita'), ('interrupted', 'Interrotta'), ('skipped', 'Saltata')], default='pending', max_length=20),
+        ),
+    ]
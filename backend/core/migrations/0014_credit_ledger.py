@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Il saldo attuale di ogni utente diventa il movimento iniziale del registro
+def create_initial_entries(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    CreditLedgerEntry = apps.get_model('core', 'CreditLedgerEntry')
+    CreditLedgerEntry.objects.bulk_create(
+        [
+            CreditLedgerEntry(user_id=user_id, delta=credits, reason='initial')
+            for user_id, credits in User.objects.values_list('id', 'credits')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_task_stages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('initial', 'Saldo iniziale'), ('task_start', 'Avvio task'), ('task_usage', 'Utilizzo task'), ('daily_reset', 'Reset giornaliero'), ('adjustment', 'Rettifica')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='core_credit_user_id_523c1a_idx')],
+            },
+        ),
+        migrations.RunPython(create_initial_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:21
+
+import core.fields
+from django.db import migrations, models
+
+
+# Riscrive codice e output già presenti nel formato compresso (e deduplicato per il codice)
+def compress_existing(apps, schema_editor):
+    for model_name in ('Task', 'TaskArchive'):
+        model = apps.get_model('core', model_name)
+        pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), 500):
+            rows = model.objects.filter(pk__in=pks[start:start + 500]).values('pk', 'code', 'stdout', 'stderr')
+            for row in rows:
+                model.objects.filter(pk=row.pop('pk')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_task_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompressionDictionary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TextBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', core.fields.CompressedTextField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='code',
+            field=core.fields.CompressedTextField(dedup=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='stderr',
+            field=core.fields.CompressedTextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='stdout',
+            field=core.fields.CompressedTextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='taskarchive',
+            name='code',
+            field=core.fields.CompressedTextField(dedup=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='taskarchive',
+            name='stderr',
+            field=core.fields.CompressedTextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='taskarchive',
+            name='stdout',
+            field=core.fields.CompressedTextField(blank=True),
+        ),
+        migrations.RunPython(compress_existing, migrations.RunPython.noop),
+    ]
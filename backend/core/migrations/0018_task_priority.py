@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_compressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='priority',
+            field=models.CharField(choices=[('staff', 'Docenti'), ('interactive', 'Interattiva'), ('batch', 'Batch')], default='interactive', max_length=20),
+        ),
+    ]
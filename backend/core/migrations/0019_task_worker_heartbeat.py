@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_task_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recovery_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='worker_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='creditledgerentry',
+            name='reason',
+            field=models.CharField(choices=[('initial', 'Saldo iniziale'), ('task_start', 'Avvio task'), ('task_usage', 'Utilizzo task'), ('daily_reset', 'Reset giornaliero'), ('adjustment', 'Rettifica'), ('refund', 'Rimborso')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_task_worker_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='run_cpu_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='run_max_rss_kb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='run_wall_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
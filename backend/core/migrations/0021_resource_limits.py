@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_task_resource_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='cpu_time_limit',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='max_file_size_mb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='max_processes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='memory_limit_mb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='failure_reason',
+            field=models.CharField(blank=True, choices=[('oom', 'Memoria esaurita'), ('cpu_limit', 'Limite di CPU'), ('file_size', 'Limite di dimensione dei file'), ('process_limit', 'Limite di processi'), ('timeout', 'Timeout'), ('output_size', 'Output troppo grande')], default='', max_length=20),
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from typing import Optional
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 from django.conf import settings
+from .fields import CompressedTextField
+from .manifest import ExerciseManifest, ManifestError, get_manifest
+from .process_group import ResourceLimits
 
 
 ### Manager personalizzato per creare utenti con email e matricola invece di username ###
@@ -22,7 +27,10 @@ class UserManager(BaseUserManager):
             **extra_fields
         )
         user.set_password(password)
-        user.save(using=self._db)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+            # Saldo iniziale nel registro crediti
+            CreditLedgerEntry.objects.using(self._db).create(user=user, delta=user.credits, reason='initial')
         return user
 
     def create_superuser(self, email, matr, first_name, last_name, password=None, **extra_fields):
@@ -60,21 +68,42 @@ class User(AbstractUser):
     def __str__(self) -> str:
         return f"{self.first_name} {self.last_name} ({self.matr})"
     
-    # Verifica se l'utente ha abbastanza crediti
+    # Verifica se l'utente ha abbastanza crediti (saldo in cache, ricaricato se insufficiente)
     def has_credits(self, amount=1) -> bool:
         if self.is_superuser or self.is_staff:
             return True
-        return self.credits >= amount
+        from .credits import get_balance_cache
+        return get_balance_cache().has(self.pk, amount)
     
-    # Riduce i crediti dell'utente
-    def reduce_credits(self, amount=1) -> bool:
+    # Riduce i crediti in modo atomico (UPDATE ... WHERE credits >= amount) e registra il movimento
+    def reduce_credits(self, amount=1, reason='adjustment', task=None) -> bool:
         if self.is_superuser or self.is_staff:
             return True
-        if self.has_credits(amount):
-            self.credits -= amount
-            self.save()
+        if amount <= 0:
             return True
-        return False
+        from .credits import get_balance_cache
+        with transaction.atomic():
+            updated = User.objects.filter(pk=self.pk, credits__gte=amount).update(credits=F('credits') - amount)
+            if updated:
+                CreditLedgerEntry.objects.create(user_id=self.pk, task=task, delta=-amount, reason=reason)
+        if not updated:
+            # Saldo insufficiente: la cache va riallineata al database
+            get_balance_cache().invalidate(self.pk)
+            return False
+        self.credits -= amount
+        get_balance_cache().apply(self.pk, -amount)
+        return True
+
+    # Aggiunge crediti in modo atomico e registra il movimento
+    def add_credits(self, amount, reason='adjustment', task=None) -> None:
+        if not amount:
+            return
+        from .credits import get_balance_cache
+        with transaction.atomic():
+            User.objects.filter(pk=self.pk).update(credits=F('credits') + amount)
+            CreditLedgerEntry.objects.create(user_id=self.pk, task=task, delta=amount, reason=reason)
+        self.credits += amount
+        get_balance_cache().apply(self.pk, amount)
 
 ### Modello per esercizi di programmazione con parametri JSON e autocompilamento funzione ###
 class Exercise(models.Model):
@@ -85,10 +114,34 @@ class Exercise(models.Model):
     courses = models.ManyToManyField(Course, related_name='exercises')
     file_extension = models.CharField(max_length=10, default=settings.DEFAULT_FILE_EXTENSION)
     include_files = models.JSONField(default=list, blank=True)
+    # Limiti di risorse della fase di esecuzione (vuoto = limiti del manifest o RUN_*, 0 = nessun limite)
+    memory_limit_mb = models.PositiveIntegerField(null=True, blank=True)
+    cpu_time_limit = models.PositiveIntegerField(null=True, blank=True)  # Secondi di CPU per processo
+    max_processes = models.PositiveIntegerField(null=True, blank=True)
+    max_file_size_mb = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self) -> str:
         return self.name
 
+    # Manifest dell'esercizio (gpu/<name>/exercise.json, letto una volta e tenuto in memoria)
+    def manifest(self) -> ExerciseManifest:
+        return get_manifest(self.name)
+
+    # Limiti applicati ai processi della fase di esecuzione
+    def resource_limits(self, manifest: Optional[ExerciseManifest] = None) -> ResourceLimits:
+        overrides = {
+            'memory_mb': self.memory_limit_mb,
+            'cpu_seconds': self.cpu_time_limit,
+            'processes': self.max_processes,
+            'file_size_mb': self.max_file_size_mb,
+        }
+        if manifest is None:
+            try:
+                manifest = self.manifest()
+            except ManifestError:
+                manifest = ExerciseManifest(self.name, '', '')   # Solo i default RUN_*
+        return manifest.resource_limits(overrides)
+
     # Costruisce la sintassi funzione con commenti e parametri
     def build_signature(self) -> str:
         comment_block = f"/*\n{self.comment}\n*/" if self.comment else ""
@@ -114,20 +167,79 @@ class Task(models.Model):
         ('failed', 'Fallito'),
         ('interrupted', 'Interrotto'),
     ]
+
+    # Stato delle singole fasi della pipeline (compilazione ed esecuzione)
+    STAGE_STATUS_CHOICES = [
+        ('pending', 'In attesa'),
+        ('running', 'In corso'),
+        ('completed', 'Completata'),
+        ('failed', 'Fallita'),
+        ('interrupted', 'Interrotta'),
+        ('skipped', 'Saltata'),
+    ]
+
+    # Corsie di priorità dello scheduler, dalla più alta alla più bassa
+    PRIORITY_CHOICES = [
+        ('staff', 'Docenti'),
+        ('interactive', 'Interattiva'),
+        ('batch', 'Batch'),
+    ]
+    PRIORITY_LANES = [choice[0] for choice in PRIORITY_CHOICES]
+
+    # Motivo specifico di un task fallito (vuoto = errore del programma o di compilazione)
+    FAILURE_REASON_CHOICES = [
+        ('oom', 'Memoria esaurita'),
+        ('cpu_limit', 'Limite di CPU'),
+        ('file_size', 'Limite di dimensione dei file'),
+        ('process_limit', 'Limite di processi'),
+        ('timeout', 'Timeout'),
+        ('output_size', 'Output troppo grande'),
+    ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
-    code = models.TextField(default='')
+    code = CompressedTextField(default='', dedup=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='interactive')
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
     total_execution_time = models.DurationField(null=True, blank=True)
-    stdout = models.TextField(blank=True)
-    stderr = models.TextField(blank=True)
+    stdout = CompressedTextField(blank=True)
+    stderr = CompressedTextField(blank=True)
     credits_cost = models.IntegerField(default=1)
     process_id = models.IntegerField(null=True, blank=True)
     message = models.TextField(default='', blank=True)
+    compile_status = models.CharField(max_length=20, choices=STAGE_STATUS_CHOICES, default='pending')
+    compile_started_at = models.DateTimeField(null=True, blank=True)
+    compile_finished_at = models.DateTimeField(null=True, blank=True)
+    run_status = models.CharField(max_length=20, choices=STAGE_STATUS_CHOICES, default='pending')
+    run_started_at = models.DateTimeField(null=True, blank=True)
+    run_finished_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(null=True, blank=True)  # Codice e output spostati in TaskArchive
+    worker_id = models.CharField(max_length=100, blank=True, default='')  # "<host>:<pid>" del processo che lo esegue
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Ultimo segnale di vita del worker (task in corso)
+    recovery_count = models.PositiveSmallIntegerField(default=0)  # Volte in cui il task è stato rimesso in coda dal reaper
+    run_cpu_seconds = models.FloatField(null=True, blank=True)  # Tempo CPU (utente + sistema) della fase di esecuzione
+    run_max_rss_kb = models.PositiveIntegerField(null=True, blank=True)  # Memoria residente massima (KB)
+    run_wall_seconds = models.FloatField(null=True, blank=True)  # Durata del processo di esecuzione
+    failure_reason = models.CharField(max_length=20, choices=FAILURE_REASON_CHOICES, blank=True, default='')
+
+    # Stati finali: solo questi task possono essere archiviati
+    FINISHED_STATUSES = ['completed', 'failed', 'interrupted']
+
+    # Colonne scritte alla chiusura del task (il codice non cambia e non viene riscritto)
+    FINISH_FIELDS = [
+        'status', 'finished_at', 'total_execution_time', 'stdout', 'stderr', 'message',
+        'compile_status', 'compile_finished_at', 'run_status', 'run_finished_at', 'credits_cost',
+        'failure_reason', 'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds',
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),  # Coda FIFO e conteggi per stato
+            models.Index(fields=['user', 'created_at']),    # Cronologia dei task di un utente
+        ]
 
     def __str__(self) -> str:
         return f"Task {self.id} - {self.user.matr} - {self.status}"
@@ -137,24 +249,25 @@ class Task(models.Model):
         self.status = 'running'
         self.started_at = timezone.now()
         self.message = "Task in esecuzione..."
-        self.save()
+        self.save(update_fields=['status', 'started_at', 'message'])
 
     # Segna il task come in attesa
     def pending(self) -> None:
         self.status = 'pending'
         self.message = "Task in attesa di esecuzione..."
-        self.save()
+        self.save(update_fields=['status', 'message'])
     
     # Completa il task con successo
-    def complete(self, stdout='', stderr='') -> None:
+    def complete(self, stdout='', stderr='', message="Task completato con successo.") -> None:
         self.status = 'completed'
         self.finished_at = timezone.now()
         if self.started_at is not None:
             self.total_execution_time = self.finished_at - self.started_at
+        self._close_stages('completed')
         self.stdout = stdout
         self.stderr = stderr
-        self.message = "Task completato con successo."
-        self.save()
+        self.message = message
+        self.save(update_fields=self.FINISH_FIELDS)
     
     # Segna il task come fallito
     def fail(self, stdout='', stderr='', message='') -> None:
@@ -162,10 +275,11 @@ class Task(models.Model):
         self.finished_at = timezone.now()
         if self.started_at is not None:
             self.total_execution_time = self.finished_at - self.started_at
+        self._close_stages('failed')
         self.stdout = stdout
         self.stderr = stderr
         self.message = message
-        self.save()
+        self.save(update_fields=self.FINISH_FIELDS)
     
     # Interrompe il task per crediti esauriti
     def interrupt(self, stdout='', stderr='', message='') -> None:
@@ -173,11 +287,40 @@ class Task(models.Model):
         self.finished_at = timezone.now()
         if self.started_at is not None:
             self.total_execution_time = self.finished_at - self.started_at
+        self._close_stages('interrupted')
         self.stdout = stdout
         self.stderr = stderr
         self.message = message
-        self.save()
+        self.save(update_fields=self.FINISH_FIELDS)
     
+    # Chiude come fallito il task se è ancora in corso (errore imprevisto del worker): UPDATE
+    # condizionata, un task concluso nel frattempo non viene toccato. Restituisce il task chiuso o None
+    @classmethod
+    def fail_if_running(cls, task_id: int, message: str) -> Optional['Task']:
+        task = cls.objects.select_related('user', 'exercise').filter(id=task_id, status='running').first()
+        if task is None:
+            return None
+        task.status = 'failed'
+        task.finished_at = timezone.now()
+        if task.started_at is not None:
+            task.total_execution_time = task.finished_at - task.started_at
+        task._close_stages('failed')
+        task.message = message
+        fields = ['status', 'finished_at', 'total_execution_time', 'compile_status', 'compile_finished_at',
+                  'run_status', 'run_finished_at', 'message']
+        updated = cls.objects.filter(id=task_id, status='running').update(
+            **{field: getattr(task, field) for field in fields}
+        )
+        return task if updated else None
+
+    # Carica codice e output dall'archivio se il task è stato archiviato (solo in memoria)
+    def load_payload(self) -> None:
+        if self.archived_at is None:
+            return
+        archive = TaskArchive.objects.filter(task_id=self.pk).first()
+        if archive is not None:
+            self.code, self.stdout, self.stderr = archive.code, archive.stdout, archive.stderr
+
     # Restituisce il numero di task attualmente in esecuzione
     @classmethod
     def get_running_tasks_count(cls) -> int:
@@ -192,3 +335,145 @@ class Task(models.Model):
     @classmethod
     def can_start_new_task(cls) -> bool:
         return cls.get_running_tasks_count() < settings.MAX_CONCURRENT_TASKS
+
+    # Prenota atomicamente un task in attesa per la fase di compilazione
+    # (solo una chiamata concorrente può riuscire)
+    @classmethod
+    def claim(cls, task_id: int):
+        from .reaper import current_worker_id
+        now = timezone.now()
+        claimed = cls.objects.filter(id=task_id, status='pending').update(
+            status='running',
+            started_at=now,
+            compile_status='running',
+            compile_started_at=now,
+            worker_id=current_worker_id(),
+            heartbeat_at=now,
+            message="Compilazione in corso...",
+        )
+        if not claimed:
+            return None
+        return cls.objects.select_related('user', 'exercise').get(id=task_id)
+
+    # Prenota atomicamente un task compilato per la fase di esecuzione
+    @classmethod
+    def claim_run(cls, task_id: int):
+        from .reaper import current_worker_id
+        now = timezone.now()
+        claimed = cls.objects.filter(
+            id=task_id, status='running', run_status='pending', compile_status__in=['completed', 'skipped'],
+        ).update(
+            run_status='running',
+            run_started_at=now,
+            worker_id=current_worker_id(),
+            heartbeat_at=now,
+            message="Task in esecuzione...",
+        )
+        if not claimed:
+            return None
+        return cls.objects.select_related('user', 'exercise').get(id=task_id)
+
+    # Id dei task in attesa di compilazione (ordine FIFO)
+    @classmethod
+    def pending_ids(cls) -> list:
+        return list(cls.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True))
+
+    # (id, utente, priorità, esercizio) dei task in attesa di compilazione (ordine FIFO),
+    # per riempire la coda dello scheduler
+    @classmethod
+    def pending_queue(cls) -> list:
+        return list(
+            cls.objects.filter(status='pending').order_by('created_at')
+            .values_list('id', 'user_id', 'priority', 'exercise_id')
+        )
+
+    # (id, utente, priorità, esercizio) dei task compilati in attesa di esecuzione (ordine FIFO)
+    @classmethod
+    def compiled_queue(cls) -> list:
+        return list(
+            cls.objects.filter(status='running', run_status='pending', compile_status__in=['completed', 'skipped'])
+            .order_by('created_at').values_list('id', 'user_id', 'priority', 'exercise_id')
+        )
+
+    # Task dell'utente in attesa o in esecuzione (limite MAX_ACTIVE_TASKS_PER_USER)
+    @classmethod
+    def active_count(cls, user) -> int:
+        return cls.objects.filter(user=user, status__in=['pending', 'running']).count()
+
+    # Task in attesa di compilazione creati prima di questo (posizione in coda dal database,
+    # per i task che non sono nella coda in memoria di questo processo)
+    def pending_position(self) -> int:
+        return Task.objects.filter(status='pending', created_at__lt=self.created_at).count()
+
+    # Task compilati in attesa di esecuzione creati prima di questo
+    def compiled_position(self) -> int:
+        return Task.objects.filter(
+            status='running', run_status='pending', compile_status__in=['completed', 'skipped'],
+            created_at__lt=self.created_at,
+        ).count()
+
+    # Chiude le fasi della pipeline quando il task termina
+    def _close_stages(self, outcome: str) -> None:
+        for stage in ('compile', 'run'):
+            status = getattr(self, f'{stage}_status')
+            if status == 'running':
+                setattr(self, f'{stage}_status', outcome)
+                setattr(self, f'{stage}_finished_at', self.finished_at)
+            elif status == 'pending':
+                setattr(self, f'{stage}_status', 'skipped')
+
+
+### Movimento del registro crediti (solo inserimenti: il saldo è la somma dei movimenti) ###
+class CreditLedgerEntry(models.Model):
+    REASON_CHOICES = [
+        ('initial', 'Saldo iniziale'),
+        ('task_start', 'Avvio task'),
+        ('task_usage', 'Utilizzo task'),
+        ('daily_reset', 'Reset giornaliero'),
+        ('adjustment', 'Rettifica'),
+        ('refund', 'Rimborso'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='credit_entries')
+    task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL)
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'])]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.delta:+d} ({self.reason})"
+
+
+### Codice e output di un task concluso, spostati fuori dalla tabella Task (archiviazione) ###
+class TaskArchive(models.Model):
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    code = CompressedTextField(default='', dedup=True)
+    stdout = CompressedTextField(blank=True)
+    stderr = CompressedTextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Archivio task {self.task_id}"
+
+
+### Dizionario condiviso per la compressione (costruito dai template degli esercizi) ###
+class CompressionDictionary(models.Model):
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Dizionario {self.id} ({len(self.data)} byte)"
+
+
+### Testo salvato una sola volta per contenuto (codice sorgente deduplicato) ###
+class TextBlob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)  # sha256 esadecimale del testo
+    content = CompressedTextField()
+    size = models.PositiveIntegerField()                        # Byte del testo non compresso
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Blob {self.digest[:12]} ({self.size} byte)"
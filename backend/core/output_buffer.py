@@ -0,0 +1,103 @@
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, List, Optional
+from django.conf import settings
+
+
+# =============================================================================
+# BUFFER DI OUTPUT A DIMENSIONE LIMITATA
+# =============================================================================
+
+# Marcatore aggiunto all'output troncato (come in precedenza)
+TRUNCATION_MARKER = "\n... [Output troncato per dimensione massima]"
+
+
+# Accumula l'output di un processo come lista di blocchi con lunghezza corrente.
+# La memoria è limitata a max_size caratteri: i primi (max_size - tail_size)
+# formano la "testa" stabile, gli ultimi tail_size una "coda" scorrevole che
+# conserva la fine di un log lungo. Scritture e letture costano O(dati nuovi).
+class OutputBuffer:
+
+    def __init__(self, max_size: Optional[int] = None, tail_size: int = 0) -> None:
+        self.max_size = max_size if max_size is not None else settings.MAX_OUTPUT_BUFFER_SIZE
+        self.tail_size = min(max(0, tail_size), self.max_size)
+        self.head_limit = self.max_size - self.tail_size
+        self._chunks: List[str] = []        # Blocchi della testa
+        self._starts: List[int] = []        # Offset iniziale di ogni blocco della testa
+        self._head_size = 0
+        self._tail: Deque[str] = deque()    # Blocchi della coda scorrevole
+        self._tail_size = 0
+        self._total = 0                     # Caratteri scritti in totale (anche scartati)
+
+    ### Aggiunge un blocco di output ###
+    def write(self, data: str) -> None:
+        if not data:
+            return
+        self._total += len(data)
+
+        # Riempie prima la testa
+        room = self.head_limit - self._head_size
+        if room > 0:
+            part = data if len(data) <= room else data[:room]
+            self._starts.append(self._head_size)
+            self._chunks.append(part)
+            self._head_size += len(part)
+            data = data[len(part):] if len(part) < len(data) else ''
+
+        # Il resto va nella coda scorrevole (o viene scartato se la coda è disabilitata)
+        if data and self.tail_size:
+            self._tail.append(data)
+            self._tail_size += len(data)
+            while self._tail_size > self.tail_size:
+                excess = self._tail_size - self.tail_size
+                first = self._tail[0]
+                if len(first) <= excess:
+                    self._tail.popleft()
+                    self._tail_size -= len(first)
+                else:
+                    self._tail[0] = first[excess:]
+                    self._tail_size -= excess
+
+    ### Testo della testa a partire da un offset (per inviare solo le novità) ###
+    def read_since(self, offset: int) -> str:
+        if offset >= self._head_size:
+            return ''
+        offset = max(0, offset)
+        index = bisect_right(self._starts, offset) - 1
+        first = self._chunks[index][offset - self._starts[index]:]
+        return first + ''.join(self._chunks[index + 1:])
+
+    ### Output conservato: testa, marcatore di troncamento e coda ###
+    def getvalue(self) -> str:
+        head = ''.join(self._chunks)
+        if not self.overflowed:
+            return head + ''.join(self._tail)
+        if self.tail_size:
+            return (
+                f"{head}\n... [Output troncato: omessi {self.dropped} caratteri] ...\n"
+                + ''.join(self._tail)
+            )
+        return head + TRUNCATION_MARKER
+
+    # Caratteri della testa (prefisso stabile, già inviabile ai client)
+    @property
+    def head_size(self) -> int:
+        return self._head_size
+
+    # Caratteri scritti in totale
+    @property
+    def total(self) -> int:
+        return self._total
+
+    # Caratteri scartati perché oltre il limite
+    @property
+    def dropped(self) -> int:
+        return self._total - self._head_size - self._tail_size
+
+    # True se l'output ha superato la dimensione massima
+    @property
+    def overflowed(self) -> bool:
+        return self._total > self.max_size
+
+    def __len__(self) -> int:
+        return self._head_size + self._tail_size
@@ -0,0 +1,87 @@
+import logging
+import time
+from typing import Dict, Optional
+from django.conf import settings
+from .models import Task
+from .output_buffer import OutputBuffer
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# SCRITTURA DIFFERITA DELL'OUTPUT LIVE SUL DATABASE
+# =============================================================================
+
+# Accorpa gli aggiornamenti di stdout/stderr di un task in esecuzione: il
+# salvataggio avviene solo quando sono trascorsi LIVE_OUTPUT_FLUSH_INTERVAL
+# secondi o si sono accumulati LIVE_OUTPUT_FLUSH_SIZE caratteri. Il risultato
+# finale viene scritto una sola volta da complete()/fail()/interrupt().
+class LiveOutputWriter:
+
+    def __init__(self, task: Task, stdout: OutputBuffer, stderr: OutputBuffer,
+                 interval: Optional[float] = None, flush_size: Optional[int] = None) -> None:
+        self.task = task
+        self.stdout = stdout
+        self.stderr = stderr
+        self.interval = interval if interval is not None else settings.LIVE_OUTPUT_FLUSH_INTERVAL
+        self.flush_size = flush_size if flush_size is not None else settings.LIVE_OUTPUT_FLUSH_SIZE
+        self.writes = 0            # Salvataggi eseguiti (incluso quello finale)
+        self.bytes_written = 0     # Byte di output scritti sul database
+        self._pending = 0          # Caratteri non ancora salvati
+        self._first_pending: Optional[float] = None
+
+    ### Registra nuovo output in attesa di salvataggio ###
+    def mark(self, size: int) -> None:
+        if size <= 0:
+            return
+        if not self._pending:
+            self._first_pending = time.monotonic()
+        self._pending += size
+
+    ### Secondi prima del prossimo salvataggio programmato (None = nulla in sospeso) ###
+    def time_until_due(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return max(0.0, self._first_pending + self.interval - time.monotonic())
+
+    ### True se è il momento di salvare ###
+    def due(self) -> bool:
+        if not self._pending:
+            return False
+        return self._pending >= self.flush_size or self.time_until_due() == 0.0
+
+    ### Salva l'output se è il momento ###
+    def flush_if_due(self) -> bool:
+        if self.due():
+            self.flush()
+            return True
+        return False
+
+    ### Salva subito l'output accumulato ###
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self.task.stdout = self.stdout.getvalue()
+        self.task.stderr = self.stderr.getvalue()
+        self.task.save(update_fields=["stdout", "stderr"])
+        self._count_write()
+        self._pending = 0
+        self._first_pending = None
+
+    ### Registra il salvataggio finale (eseguito dal cambio di stato del task) ###
+    def finish(self) -> None:
+        self._pending = 0
+        self._first_pending = None
+        self._count_write()
+        logger.info(
+            'Task %s: %d scritture output, %d byte scritti',
+            self.task.id, self.writes, self.bytes_written,
+        )
+
+    ### Statistiche di scrittura del task ###
+    def stats(self) -> Dict[str, int]:
+        return {'writes': self.writes, 'bytes_written': self.bytes_written}
+
+    def _count_write(self) -> None:
+        self.writes += 1
+        self.bytes_written += len(self.task.stdout.encode()) + len(self.task.stderr.encode())
@@ -0,0 +1,15 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+# =============================================================================
+# PAGINAZIONE
+# =============================================================================
+
+# Cronologia dei task a cursore: ogni pagina è una query sull'indice (user, created_at)
+# senza OFFSET né COUNT, e i task creati nel frattempo non spostano le pagine successive
+class TaskHistoryPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = settings.TASK_HISTORY_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TASK_HISTORY_MAX_PAGE_SIZE
@@ -0,0 +1,253 @@
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# =============================================================================
+# GRUPPI DI PROCESSI E CONSUMO DI RISORSE
+# =============================================================================
+
+# Ogni processo di un task (eseguibile, compilatore) viene avviato
+# in una nuova sessione: il suo pid è anche l'id del gruppo, quindi un segnale al gruppo
+# raggiunge nvcc, il programma dello studente e tutti i processi che hanno creato.
+# Quando il processo principale termina, i processi rimasti nel gruppo vengono uccisi
+# prima di raccoglierlo con wait4: finché non viene raccolto il pid (e quindi l'id del
+# gruppo) non può essere riassegnato. wait4 restituisce anche il consumo di risorse del
+# processo e dei figli che ha atteso (tempo CPU e memoria residente massima).
+# I limiti di risorse vengono applicati da prlimit (util-linux), che imposta i limiti e fa
+# exec del comando: niente preexec_fn, che in un processo con molti thread (scheduler, motore
+# I/O, reaper) può bloccare il figlio tra fork ed exec. Senza prlimit lo stesso lavoro lo fa
+# un piccolo programma Python. I limiti valgono per ogni processo dell'albero.
+
+# Motivi di terminazione per esaurimento delle risorse
+EXHAUSTION_OOM = 'oom'
+EXHAUSTION_CPU = 'cpu_limit'
+EXHAUSTION_FILE_SIZE = 'file_size'
+EXHAUSTION_PROCESSES = 'process_limit'
+
+# Opzioni di prlimit per ogni risorsa
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_AS: '--as',
+    resource.RLIMIT_CPU: '--cpu',
+    resource.RLIMIT_NPROC: '--nproc',
+    resource.RLIMIT_FSIZE: '--fsize',
+}
+
+# Alternativa a prlimit: argv[1] = "risorsa:soft:hard,...", poi il comando da eseguire
+SETRLIMIT_EXEC = (
+    'import os, resource, sys\n'
+    'for spec in sys.argv[1].split(","):\n'
+    '    limit, soft, hard = map(int, spec.split(":"))\n'
+    '    resource.setrlimit(limit, (soft, hard))\n'
+    'os.execvp(sys.argv[2], sys.argv[2:])\n'
+)
+
+# Testo su stderr di un'allocazione fallita o di una fork rifiutata
+OOM_MARKERS = ('bad_alloc', 'cannot allocate memory', 'out of memory', 'memoryerror')
+PROCESS_LIMIT_MARKERS = ('resource temporarily unavailable', 'fork: retry')
+OOM_RSS_RATIO = 0.9   # Un SIGKILL con memoria residente oltre questa frazione del limite è un OOM
+
+
+# Limiti di risorse di un processo (None = nessun limite)
+class ResourceLimits:
+    def __init__(self, memory_mb: Optional[int] = None, cpu_seconds: Optional[int] = None,
+                 processes: Optional[int] = None, file_size_mb: Optional[int] = None) -> None:
+        self.memory_mb = memory_mb or None        # RLIMIT_AS: spazio di indirizzamento (MB)
+        self.cpu_seconds = cpu_seconds or None    # RLIMIT_CPU: SIGXCPU, poi SIGKILL un secondo dopo
+        self.processes = processes or None        # RLIMIT_NPROC: processi dell'utente (tutti, non solo del task)
+        self.file_size_mb = file_size_mb or None  # RLIMIT_FSIZE: dimensione massima di un file scritto (MB)
+
+    def __bool__(self) -> bool:
+        return any((self.memory_mb, self.cpu_seconds, self.processes, self.file_size_mb))
+
+    ### Coppie (risorsa, (soft, hard)) per setrlimit ###
+    def rlimits(self) -> List[Tuple[int, Tuple[int, int]]]:
+        limits = []
+        if self.memory_mb:
+            size = self.memory_mb * 1024 * 1024
+            limits.append((resource.RLIMIT_AS, (size, size)))
+        if self.cpu_seconds:
+            limits.append((resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1)))
+        if self.processes:
+            limits.append((resource.RLIMIT_NPROC, (self.processes, self.processes)))
+        if self.file_size_mb:
+            size = self.file_size_mb * 1024 * 1024
+            limits.append((resource.RLIMIT_FSIZE, (size, size)))
+        return limits
+
+    ### Conversione per il protocollo del runner daemon ###
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'memory_mb': self.memory_mb,
+            'cpu_seconds': self.cpu_seconds,
+            'processes': self.processes,
+            'file_size_mb': self.file_size_mb,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['ResourceLimits']:
+        if not data:
+            return None
+        return cls(*(int(data[key]) if data.get(key) else None
+                     for key in ('memory_mb', 'cpu_seconds', 'processes', 'file_size_mb')))
+
+
+# Consumo di risorse di un processo terminato
+class ResourceUsage:
+    def __init__(self, cpu_user: float = 0.0, cpu_system: float = 0.0, max_rss_kb: int = 0,
+                 wall_seconds: Optional[float] = None) -> None:
+        self.cpu_user = cpu_user            # Secondi di CPU in modalità utente
+        self.cpu_system = cpu_system        # Secondi di CPU nel kernel
+        self.max_rss_kb = max_rss_kb        # Memoria residente massima (KB)
+        self.wall_seconds = wall_seconds    # Durata dall'avvio alla terminazione
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.cpu_user + self.cpu_system
+
+    @classmethod
+    def from_rusage(cls, rusage, wall_seconds: Optional[float] = None) -> 'ResourceUsage':
+        return cls(rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss, wall_seconds)
+
+    ### Conversione per il protocollo del runner daemon ###
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'cpu_user': self.cpu_user,
+            'cpu_system': self.cpu_system,
+            'max_rss_kb': self.max_rss_kb,
+            'wall_seconds': self.wall_seconds,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['ResourceUsage']:
+        if not data:
+            return None
+        return cls(float(data.get('cpu_user', 0.0)), float(data.get('cpu_system', 0.0)),
+                   int(data.get('max_rss_kb', 0)), data.get('wall_seconds'))
+
+
+# Comando che applica i limiti e poi fa exec di 'cmd' (stesso pid: gruppo e wait4 non cambiano)
+def limited_command(cmd: List[str], limits: Optional[ResourceLimits]) -> List[str]:
+    rlimits = limits.rlimits() if limits else []
+    if not rlimits:
+        return list(cmd)
+    prlimit = shutil.which('prlimit')
+    if prlimit:
+        options = [f'{PRLIMIT_OPTIONS[limit]}={soft}:{hard}' for limit, (soft, hard) in rlimits]
+        return [prlimit, *options, '--', *cmd]
+    specs = ','.join(f'{limit}:{soft}:{hard}' for limit, (soft, hard) in rlimits)
+    return [sys.executable, '-c', SETRLIMIT_EXEC, specs, *cmd]
+
+
+# Avvia un processo come capo di un nuovo gruppo (stessi argomenti di subprocess.Popen)
+def spawn(cmd: List[str], limits: Optional[ResourceLimits] = None, **kwargs) -> subprocess.Popen:
+    process = subprocess.Popen(limited_command(cmd, limits), start_new_session=True, **kwargs)
+    process.spawned_at = time.monotonic()
+    return process
+
+
+# Invia un segnale a tutto il gruppo del processo (al solo processo se non ne è il capo)
+def signal_group(pid: int, sig: int) -> bool:
+    try:
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+# Termina il gruppo: SIGTERM, poi SIGKILL se il processo non esce entro 'grace' secondi.
+# 'wait_exit' attende l'uscita senza raccogliere il processo (es. ProcessWatch.wait_exit).
+def terminate_group(pid: int, wait_exit: Callable[[float], bool], grace: float) -> None:
+    signal_group(pid, signal.SIGTERM)
+    if not wait_exit(grace):
+        signal_group(pid, signal.SIGKILL)
+        wait_exit(grace)
+
+
+# True se il processo è terminato (senza raccoglierlo: il consumo resta leggibile da wait4)
+def has_exited(process) -> bool:
+    if not isinstance(process, subprocess.Popen):
+        return process.poll() is not None   # Es. processo del runner daemon
+    if process.returncode is not None:
+        return True
+    try:
+        return os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+    except ChildProcessError:
+        return True
+
+
+# Attende la terminazione, uccide i processi rimasti nel gruppo e raccoglie il processo
+def reap(process) -> Tuple[int, Optional[ResourceUsage]]:
+    if not isinstance(process, subprocess.Popen) or process.returncode is not None:
+        # Il processo del runner daemon porta il consumo nel messaggio di uscita
+        return process.wait(), getattr(process, 'usage', None)
+    try:
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        signal_group(process.pid, signal.SIGKILL)   # Il processo è uno zombie: il gruppo è ancora suo
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait(), None                 # Già raccolto altrove
+    process.returncode = os.waitstatus_to_exitcode(status)
+    spawned_at = getattr(process, 'spawned_at', None)
+    wall_seconds = time.monotonic() - spawned_at if spawned_at is not None else None
+    return process.returncode, ResourceUsage.from_rusage(rusage, wall_seconds)
+
+
+# Segnale che ha terminato il processo (anche se riportato da bash come 128 + segnale)
+def exit_signal(returncode: Optional[int]) -> Optional[int]:
+    if returncode is None or returncode == 0:
+        return None
+    if returncode < 0:
+        return -returncode
+    if returncode > 128 and returncode - 128 in (signal.SIGKILL, signal.SIGXCPU, signal.SIGXFSZ):
+        return returncode - 128
+    return None
+
+
+# Motivo di una terminazione per esaurimento delle risorse (None se il processo è uscito per altro)
+def classify_exhaustion(returncode: Optional[int], limits: Optional[ResourceLimits],
+                        usage: Optional[ResourceUsage] = None, stderr: str = '') -> Optional[str]:
+    if not returncode:
+        return None
+    limits = limits or ResourceLimits()
+    sig = exit_signal(returncode)
+    if sig == signal.SIGXCPU:
+        return EXHAUSTION_CPU
+    if sig == signal.SIGXFSZ:
+        return EXHAUSTION_FILE_SIZE
+    text = stderr[-4096:].lower()
+    if sig == signal.SIGKILL:
+        # Limite rigido della CPU oppure OOM killer del kernel (il processo non è stato terminato da noi).
+        # Senza indizi di memoria esaurita è un SIGKILL esterno (es. kill -9): nessun motivo specifico
+        if limits.cpu_seconds and usage is not None and usage.cpu_seconds >= limits.cpu_seconds:
+            return EXHAUSTION_CPU
+        if limits.memory_mb and usage is not None and usage.max_rss_kb >= limits.memory_mb * 1024 * OOM_RSS_RATIO:
+            return EXHAUSTION_OOM
+        if any(marker in text for marker in OOM_MARKERS):
+            return EXHAUSTION_OOM
+        return None
+    if limits.memory_mb and any(marker in text for marker in OOM_MARKERS):
+        return EXHAUSTION_OOM
+    if limits.processes and any(marker in text for marker in PROCESS_LIMIT_MARKERS):
+        return EXHAUSTION_PROCESSES
+    return None
+
+
+# Come subprocess.run con output catturato, ma il timeout termina tutto il gruppo
+def run(cmd: List[str], timeout: Optional[float] = None, **kwargs) -> subprocess.CompletedProcess:
+    with spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            signal_group(process.pid, signal.SIGKILL)
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(cmd, timeout, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
@@ -0,0 +1,243 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .broadcast import get_broadcaster
+from .models import Task, User
+from .process_group import signal_group
+from .streaming import status_delta
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# RECUPERO DEI TASK ORFANI
+# =============================================================================
+
+# Ogni task in corso porta l'identità del processo che lo esegue (worker_id) e un
+# heartbeat aggiornato da quel processo. Se il processo muore (crash, kill -9,
+# riavvio di uvicorn in modalità locale) il task resterebbe 'running' per sempre
+# e occuperebbe un posto nei conteggi di concorrenza: il reaper lo riconosce perché
+# il worker non è più vivo (stesso host) o perché l'heartbeat è troppo vecchio,
+# termina l'eventuale programma rimasto in esecuzione e rimette il task in coda
+# (al più TASK_REAPER_MAX_REQUEUES volte) o lo chiude come fallito con il rimborso
+# dei crediti. Ogni azione è una UPDATE condizionata allo stato letto: con più
+# worker che controllano insieme, ogni task orfano viene gestito una sola volta.
+PROCESS_START_TOLERANCE = 2.0   # Secondi di tolleranza tra run_started_at e l'avvio del processo
+
+
+# Identità del processo corrente: "<host>:<pid>"
+def current_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# True se il worker indicato è su questo host e il suo processo non esiste più
+def worker_is_dead(worker_id: str) -> bool:
+    host, _, pid = worker_id.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False    # Altro host o task precedente: decide l'heartbeat
+    return not process_exists(int(pid))
+
+
+# True se esiste un processo con questo pid (anche di un altro utente)
+def process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Istante di avvio di un processo (epoch) da /proc, None se non disponibile
+def process_start_time(pid: int) -> Optional[float]:
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime '))
+    except (OSError, IndexError, StopIteration, ValueError):
+        return None
+    return boot_time + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+
+
+# Termina un programma rimasto senza worker (con tutto il suo gruppo se ne è il leader).
+# Il pid viene terminato solo se il processo è stato avviato dopo l'inizio della fase di
+# esecuzione: dopo un riavvio lo stesso pid può appartenere a un processo estraneo.
+def kill_orphan_process(pid: int, started_after: Optional[float]) -> bool:
+    started = process_start_time(pid)
+    if started is None or started_after is None or started < started_after - PROCESS_START_TOLERANCE:
+        return False
+    return signal_group(pid, signal.SIGKILL)
+
+
+class TaskReaper:
+
+    def __init__(self, on_requeue: Optional[Callable[[Task], None]] = None,
+                 heartbeat_interval: Optional[float] = None, heartbeat_timeout: Optional[float] = None,
+                 interval: Optional[float] = None, max_requeues: Optional[int] = None) -> None:
+        self.on_requeue = on_requeue
+        self.heartbeat_interval = heartbeat_interval if heartbeat_interval is not None else settings.TASK_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = heartbeat_timeout if heartbeat_timeout is not None else settings.TASK_HEARTBEAT_TIMEOUT
+        self.interval = interval if interval is not None else settings.TASK_REAPER_INTERVAL
+        self.max_requeues = max_requeues if max_requeues is not None else settings.TASK_REAPER_MAX_REQUEUES
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'scans': 0,
+            'heartbeats': 0,
+            'orphans': 0,
+            'requeued': 0,
+            'failed': 0,
+            'processes_killed': 0,
+            'credits_refunded': 0,
+            'conflicts': 0,
+            'errors': 0,
+        }
+
+    ### Avvia il thread di heartbeat e controllo periodico ###
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='task-reaper', daemon=True)
+            self._thread.start()
+
+    ### Ferma il thread ###
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    ### Contatori delle azioni del reaper ###
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    ### Segnale di vita per tutti i task in corso in questo processo (una sola UPDATE) ###
+    def heartbeat(self) -> int:
+        updated = Task.objects.filter(status='running', worker_id=current_worker_id()).update(
+            heartbeat_at=timezone.now()
+        )
+        self._count('heartbeats')
+        return updated
+
+    ### Task in corso abbandonati dal loro worker ###
+    def find_orphans(self) -> List[Task]:
+        own = current_worker_id()
+        stale_before = timezone.now() - timedelta(seconds=self.heartbeat_timeout)
+        # I task compilati in attesa di esecuzione sono in coda (compiled_queue) e li prende il primo worker libero
+        candidates = Task.objects.filter(
+            Q(compile_status='running') | Q(run_status='running'), status='running',
+        ).exclude(worker_id=own).only(
+            'id', 'user_id', 'status', 'worker_id', 'heartbeat_at', 'started_at', 'process_id',
+            'compile_status', 'run_status', 'run_started_at', 'credits_cost', 'recovery_count',
+        )
+        orphans = []
+        for task in candidates:
+            last_seen = task.heartbeat_at or task.started_at
+            if (task.worker_id and worker_is_dead(task.worker_id)) or last_seen is None or last_seen < stale_before:
+                orphans.append(task)
+        return orphans
+
+    ### Un controllo completo: ogni task orfano viene rimesso in coda o chiuso ###
+    def reap(self) -> Dict[str, int]:
+        before = self.stats()
+        self._count('scans')
+        for task in self.find_orphans():
+            try:
+                self._recover(task)
+            except Exception:
+                self._count('errors')
+                logger.exception('Reaper: recupero del task %s fallito', task.id)
+        after = self.stats()
+        return {key: after[key] - before[key] for key in after}
+
+    # Stato finale di una fase del task chiuso dal reaper
+    @staticmethod
+    def _closed_stage(status: str) -> str:
+        return {'running': 'failed', 'pending': 'skipped'}.get(status, status)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _loop(self) -> None:
+        next_reap = time.monotonic() + self.interval if self.interval > 0 else None
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+                if next_reap is not None and time.monotonic() >= next_reap:
+                    self.reap()
+                    next_reap = time.monotonic() + self.interval
+            except Exception:
+                self._count('errors')
+                logger.warning('Reaper: heartbeat o controllo non riuscito', exc_info=True)
+            finally:
+                close_old_connections()
+
+    # Termina il programma rimasto, poi rimette in coda o chiude il task
+    def _recover(self, task: Task) -> None:
+        self._count('orphans')
+        if task.run_status == 'running' and task.process_id and worker_is_dead(task.worker_id):
+            started_after = task.run_started_at.timestamp() if task.run_started_at else None
+            if kill_orphan_process(task.process_id, started_after):
+                self._count('processes_killed')
+
+        # Solo se il task è ancora nello stato letto (nessun altro worker o reaper lo ha toccato)
+        unchanged = Task.objects.filter(
+            id=task.id, status='running', worker_id=task.worker_id, run_status=task.run_status,
+        ).filter(Q(heartbeat_at=task.heartbeat_at) if task.heartbeat_at else Q(heartbeat_at__isnull=True))
+
+        requeue = task.recovery_count < self.max_requeues
+        with transaction.atomic():
+            if requeue:
+                # Usa di nuovo solo il costo di avvio: l'utilizzo già addebitato viene rimborsato
+                refund = max(0, task.credits_cost - settings.TASK_START_COST)
+                updated = unchanged.update(
+                    status='pending', started_at=None, finished_at=None, total_execution_time=None,
+                    compile_status='pending', compile_started_at=None, compile_finished_at=None,
+                    run_status='pending', run_started_at=None, run_finished_at=None,
+                    process_id=None, worker_id='', heartbeat_at=None, stdout='', stderr='',
+                    credits_cost=task.credits_cost - refund, recovery_count=F('recovery_count') + 1,
+                    message='Task rimesso in coda dopo l\'arresto anomalo del worker.',
+                )
+            else:
+                refund = task.credits_cost
+                now = timezone.now()
+                updated = unchanged.update(
+                    status='failed', finished_at=now,
+                    total_execution_time=(now - task.started_at) if task.started_at else None,
+                    compile_status=self._closed_stage(task.compile_status),
+                    run_status=self._closed_stage(task.run_status),
+                    credits_cost=0,
+                    message='Task interrotto: il worker che lo eseguiva si è arrestato. Crediti rimborsati.',
+                )
+            if not updated:
+                self._count('conflicts')
+                return
+            if refund > 0:
+                user = User.objects.get(id=task.user_id)
+                if not (user.is_staff or user.is_superuser):   # Ai docenti non viene addebitato nulla
+                    user.add_credits(refund, reason='refund', task=task)
+                    self._count('credits_refunded', refund)
+
+        self._count('requeued' if requeue else 'failed')
+        logger.warning(
+            'Reaper: task %s del worker %s %s (rimborso %s crediti)',
+            task.id, task.worker_id or '?', 'rimesso in coda' if requeue else 'chiuso come fallito', refund,
+        )
+        recovered = Task.objects.select_related('user', 'exercise').get(id=task.id)
+        get_broadcaster().send(f'task_{task.id}', {'type': 'task_delta', 'data': status_delta(recovered)})
+        if requeue and self.on_requeue is not None:
+            self.on_requeue(recovered)
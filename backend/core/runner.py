@@ -0,0 +1,419 @@
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from .compiler import CompileCache, CompileResult, get_compile_cache
+from .manifest import ExerciseManifest, ManifestError, ManifestRegistry
+from .process_group import ResourceLimits, ResourceUsage, reap, signal_group, spawn
+from .workspace import get_workspace_pool
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_SIZE = 64 * 1024    # Dimensione massima di un messaggio del protocollo
+
+
+# =============================================================================
+# RUNNER DAEMON (compilazione ed esecuzione senza livelli di shell)
+# =============================================================================
+
+# Protocollo: una riga JSON per messaggio sul socket Unix.
+#   client -> daemon: {"action": "run", "exercise": "<nome>", "source": "<percorso>"}
+#   daemon -> client: {"ok": true, "pid": N, "hit": bool, "summary": "..."} + fd stdout/stderr (SCM_RIGHTS)
+#                     oppure {"ok": false, "compile": {...}, "summary": "..."} / {"ok": false, "error": "..."}
+#   daemon -> client: {"returncode": N, "usage": {...}} alla terminazione del processo (e del suo gruppo)
+#   client -> daemon: {"action": "compile", "exercise": "<nome>", "source": "<percorso>"}
+#   daemon -> client: {"ok": true, "binary": "<percorso>", "hit": bool, "summary": "..."} oppure come "run"
+#   client -> daemon: {"action": "exec", "exercise": "<nome>", "binary": "<percorso in cache>",
+#                      "workdir": "<cartella di lavoro del task>", "limits": {...}}
+#   daemon -> client: come "run" (senza compilazione)
+#   client -> daemon: {"action": "ping"} -> {"ok": true, "exercises": [...]}
+
+
+# Il daemon non è raggiungibile (si usa l'esecuzione locale)
+class RunnerUnavailable(Exception):
+    pass
+
+
+# Il daemon ha rifiutato la richiesta
+class RunnerError(Exception):
+    pass
+
+
+# Server del daemon: un thread per connessione, esercizi e cache di compilazione restano caricati
+class RunnerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, gpu_dir: Optional[str] = None,
+                 cache: Optional[CompileCache] = None) -> None:
+        self.socket_path = socket_path
+        self.manifests = ManifestRegistry(gpu_dir)
+        self.cache = cache or get_compile_cache()
+        self.stdbuf = shutil.which('stdbuf')
+        self.workspaces = get_workspace_pool()   # Cartelle per le richieste senza cartella di lavoro
+        self.load_exercises()
+        if os.path.exists(socket_path):
+            # Un socket rimasto da un daemon terminato viene rimosso, uno attivo no
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)
+            else:
+                raise OSError(f'Runner già attivo su {socket_path}')
+            finally:
+                probe.close()
+        super().__init__(socket_path, RunnerHandler)
+        os.chmod(socket_path, 0o600)
+
+    ### Carica i manifest degli esercizi validi (cartelle di gpu/ con exercise.json) ###
+    def load_exercises(self) -> List[str]:
+        names = []
+        for name in self.manifests.names():
+            try:
+                self.manifests.get(name)
+            except ManifestError as e:
+                logger.warning('Runner: esercizio %s ignorato: %s', name, e)
+                continue
+            names.append(name)
+        return names
+
+    ### Manifest di un esercizio (None se non esiste o non è valido) ###
+    def manifest(self, name: str) -> Optional[ExerciseManifest]:
+        try:
+            return self.manifests.get(name)
+        except ManifestError:
+            return None
+
+    ### Comando per avviare l'eseguibile (line buffering, argomenti del manifest) ###
+    def command(self, binary: str, manifest: ExerciseManifest) -> List[str]:
+        if self.stdbuf:
+            return [self.stdbuf, '-oL', '-eL', binary, *manifest.args]
+        return [binary, *manifest.args]
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+# Gestisce una richiesta del client
+class RunnerHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(_read_line(self.request, bytearray()))
+        except (ValueError, ConnectionError):
+            return
+        action = request.get('action')
+        if action == 'ping':
+            _send(self.request, {'ok': True, 'exercises': sorted(self.server.load_exercises())})
+        elif action in ('run', 'compile', 'exec'):
+            getattr(self, action)(request)
+        else:
+            _send(self.request, {'ok': False, 'error': f'Azione sconosciuta: {action}'})
+
+    ### Compila (o riusa dalla cache) e avvia l'eseguibile, poi notifica l'uscita ###
+    def run(self, request: Dict[str, Any]) -> None:
+        compiled, summary, manifest = self._compile(request)
+        if compiled is not None:
+            self._spawn(manifest, compiled.binary, request.get('workdir'), {'hit': compiled.hit, 'summary': summary},
+                        ResourceLimits.from_dict(request.get('limits')))
+
+    ### Solo compilazione: restituisce il percorso dell'eseguibile in cache ###
+    def compile(self, request: Dict[str, Any]) -> None:
+        compiled, summary, _ = self._compile(request)
+        if compiled is not None:
+            _send(self.request, {'ok': True, 'binary': compiled.binary, 'hit': compiled.hit, 'summary': summary})
+
+    ### Solo esecuzione di un eseguibile già presente in cache ###
+    def exec(self, request: Dict[str, Any]) -> None:
+        server: RunnerDaemon = self.server
+        manifest = server.manifest(str(request.get('exercise', '')))
+        binary = os.path.realpath(str(request.get('binary', '')))
+        cache_dir = os.path.realpath(server.cache.directory)
+        if manifest is None:
+            _send(self.request, {'ok': False, 'error': f"Esercizio non trovato: {request.get('exercise')}"})
+        elif not binary.startswith(cache_dir + os.sep) or not os.path.isfile(binary):
+            _send(self.request, {'ok': False, 'error': 'Eseguibile non presente nella cache del runner'})
+        else:
+            self._spawn(manifest, binary, request.get('workdir'), {}, ResourceLimits.from_dict(request.get('limits')))
+
+    # Compila il sorgente richiesto (risponde direttamente in caso di errore)
+    def _compile(self, request: Dict[str, Any]):
+        server: RunnerDaemon = self.server
+        manifest = server.manifest(str(request.get('exercise', '')))
+        source = request.get('source')
+        if manifest is None or not source:
+            _send(self.request, {'ok': False, 'error': f"Esercizio non trovato: {request.get('exercise')}"})
+            return None, '', None
+
+        compiled = server.cache.compile(source, manifest)
+        summary = server.cache.summary(compiled)
+        if not compiled.ok:
+            _send(self.request, {
+                'ok': False,
+                'summary': summary,
+                'compile': {
+                    'returncode': compiled.returncode,
+                    'stdout': compiled.stdout,
+                    'stderr': compiled.stderr,
+                    'timed_out': compiled.timed_out,
+                },
+            })
+            return None, summary, manifest
+        return compiled, summary, manifest
+
+    # Avvia l'eseguibile nella cartella di lavoro del task (o in una temporanea con gli input),
+    # passa le pipe al client e notifica il codice di uscita
+    def _spawn(self, manifest: ExerciseManifest, binary: str, workdir: Optional[str], info: Dict[str, Any],
+               limits: Optional[ResourceLimits] = None) -> None:
+        server: RunnerDaemon = self.server
+        scratch = None
+        if not workdir or not os.path.isdir(workdir):
+            workdir = scratch = server.workspaces.acquire(manifest)
+        try:
+            self._run_process(server.command(binary, manifest), workdir, info, limits)
+        finally:
+            server.workspaces.release(scratch)
+
+    def _run_process(self, cmd: List[str], workdir: str, info: Dict[str, Any],
+                     limits: Optional[ResourceLimits]) -> None:
+        process = spawn(
+            cmd,
+            limits=limits,
+            cwd=workdir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        try:
+            # Le pipe passano al client: il daemon chiude le proprie copie
+            socket.send_fds(
+                self.request,
+                [_encode({'ok': True, 'pid': process.pid, **info})],
+                [process.stdout.fileno(), process.stderr.fileno()],
+            )
+        except OSError as e:
+            logger.warning('Runner: impossibile inviare le pipe del processo %s: %s', process.pid, e)
+            process.kill()
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+
+        returncode, usage = reap(process)
+        try:
+            _send(self.request, {'returncode': returncode, 'usage': usage.to_dict() if usage else None})
+        except OSError:
+            pass
+
+
+# =============================================================================
+# CLIENT (lato Django)
+# =============================================================================
+
+# Processo avviato dal daemon, con l'interfaccia di subprocess.Popen usata da executor e motore I/O
+class RemoteProcess:
+
+    def __init__(self, conn: socket.socket, pid: int, stdout_fd: int, stderr_fd: int, buffer: bytearray) -> None:
+        self.pid = pid
+        self.stdout = os.fdopen(stdout_fd, 'rb', buffering=0)
+        self.stderr = os.fdopen(stderr_fd, 'rb', buffering=0)
+        self.returncode: Optional[int] = None
+        self.usage: Optional[ResourceUsage] = None     # Consumo di risorse misurato dal daemon
+        self._conn = conn
+        self._buffer = buffer
+        self._lock = threading.Lock()
+
+    def poll(self) -> Optional[int]:
+        return self._read_exit(0)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        returncode = self._read_exit(timeout)
+        if returncode is None:
+            raise subprocess.TimeoutExpired(['runner', str(self.pid)], timeout)
+        return returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.returncode is None:
+            signal_group(self.pid, sig)   # Il daemon avvia ogni processo in un nuovo gruppo
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    # Legge il codice di uscita inviato dal daemon (None se non è ancora arrivato)
+    def _read_exit(self, timeout: Optional[float]) -> Optional[int]:
+        with self._lock:
+            if self.returncode is not None:
+                return self.returncode
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while b'\n' not in self._buffer:
+                self._conn.settimeout(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                try:
+                    data = self._conn.recv(4096)
+                except (TimeoutError, BlockingIOError):
+                    return None
+                except OSError:
+                    data = b''
+                if not data:
+                    # Connessione persa: il processo non è più osservabile
+                    self.returncode = -1
+                    self._conn.close()
+                    return self.returncode
+                self._buffer += data
+            line, _, rest = bytes(self._buffer).partition(b'\n')
+            self._buffer[:] = rest
+            message = json.loads(line)
+            self.returncode = int(message.get('returncode', -1))
+            self.usage = ResourceUsage.from_dict(message.get('usage'))
+            self._conn.close()
+            return self.returncode
+
+
+# Esito di un avvio tramite daemon
+class RunnerLaunch:
+    def __init__(self, compiled: CompileResult, summary: str, process: Optional[RemoteProcess] = None) -> None:
+        self.compiled = compiled    # Esito della compilazione
+        self.summary = summary      # Riepilogo della cache (per il messaggio del task)
+        self.process = process      # Processo in esecuzione (None se la compilazione è fallita)
+
+
+# Client del runner daemon
+class RunnerClient:
+
+    def __init__(self, socket_path: Optional[str] = None) -> None:
+        self.socket_path = socket_path or settings.RUNNER_SOCKET
+
+    ### Chiede al daemon di compilare ed eseguire il sorgente ###
+    def run(self, exercise: str, source_path: str) -> RunnerLaunch:
+        conn, response, fds, buffer = self._request(
+            {'action': 'run', 'exercise': exercise, 'source': source_path},
+            settings.CODE_COMPILATION_TIMEOUT + 5,
+        )
+        if not response.get('ok'):
+            return RunnerLaunch(self._compile_failure(response), response['summary'])
+        process = self._remote_process(conn, response, fds, buffer)
+        return RunnerLaunch(CompileResult('', hit=response['hit']), response['summary'], process)
+
+    ### Chiede al daemon solo la compilazione (l'eseguibile resta nella cache del runner) ###
+    def compile(self, exercise: str, source_path: str) -> RunnerLaunch:
+        conn, response, _, _ = self._request(
+            {'action': 'compile', 'exercise': exercise, 'source': source_path},
+            settings.CODE_COMPILATION_TIMEOUT + 5,
+        )
+        conn.close()
+        if not response.get('ok'):
+            return RunnerLaunch(self._compile_failure(response), response['summary'])
+        return RunnerLaunch(CompileResult(response['binary'], hit=response['hit']), response['summary'])
+
+    ### Chiede al daemon di eseguire un eseguibile già compilato ###
+    def execute(self, exercise: str, binary: str, workdir: Optional[str] = None,
+                limits: Optional[ResourceLimits] = None) -> RemoteProcess:
+        conn, response, fds, buffer = self._request(
+            {'action': 'exec', 'exercise': exercise, 'binary': binary, 'workdir': workdir,
+             'limits': limits.to_dict() if limits else None}, 5,
+        )
+        if not response.get('ok'):
+            raise RunnerError(response.get('error', 'Errore del runner'))
+        return self._remote_process(conn, response, fds, buffer)
+
+    # Invia una richiesta e riceve la prima risposta (con gli eventuali fd allegati)
+    def _request(self, message: Dict[str, Any], timeout: float):
+        conn = self._connect()
+        try:
+            _send(conn, message)
+            conn.settimeout(timeout)
+            data, fds, _, _ = socket.recv_fds(conn, MAX_MESSAGE_SIZE, 2)
+            if not data:
+                raise RunnerUnavailable('Connessione chiusa dal runner')
+            buffer = bytearray(data)
+            response = json.loads(_read_line(conn, buffer))
+        except (OSError, ValueError) as e:
+            conn.close()
+            raise RunnerUnavailable(str(e))
+
+        if not response.get('ok'):
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+            if 'compile' not in response and 'error' in response:
+                raise RunnerError(response['error'])
+        return conn, response, fds, buffer
+
+    # Processo remoto a partire dalla risposta del daemon
+    def _remote_process(self, conn: socket.socket, response: Dict[str, Any], fds: List[int],
+                        buffer: bytearray) -> RemoteProcess:
+        if len(fds) != 2:
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+            raise RunnerError('Il runner non ha inviato le pipe del processo')
+        return RemoteProcess(conn, response['pid'], fds[0], fds[1], buffer)
+
+    @staticmethod
+    def _compile_failure(response: Dict[str, Any]) -> CompileResult:
+        result = response['compile']
+        return CompileResult(None, hit=False, returncode=result['returncode'], stdout=result['stdout'],
+                             stderr=result['stderr'], timed_out=result['timed_out'])
+
+    ### Verifica che il daemon sia attivo ###
+    def ping(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            _send(conn, {'action': 'ping'})
+            conn.settimeout(5)
+            return json.loads(_read_line(conn, bytearray()))
+        except (OSError, ValueError) as e:
+            raise RunnerUnavailable(str(e))
+        finally:
+            conn.close()
+
+    def _connect(self) -> socket.socket:
+        if not self.socket_path:
+            raise RunnerUnavailable('RUNNER_SOCKET non configurato')
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.settimeout(1.0)
+            conn.connect(self.socket_path)
+        except OSError as e:
+            conn.close()
+            raise RunnerUnavailable(str(e))
+        return conn
+
+
+# =============================================================================
+# UTILITÀ DEL PROTOCOLLO
+# =============================================================================
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message).encode() + b'\n'
+
+
+def _send(conn: socket.socket, message: Dict[str, Any]) -> None:
+    conn.sendall(_encode(message))
+
+
+# Legge una riga dal socket usando (e aggiornando) il buffer dei dati già ricevuti
+def _read_line(conn: socket.socket, buffer: bytearray) -> bytes:
+    while b'\n' not in buffer:
+        if len(buffer) > MAX_MESSAGE_SIZE:
+            raise ValueError('Messaggio troppo lungo')
+        data = conn.recv(4096)
+        if not data:
+            raise ConnectionError('Connessione chiusa')
+        buffer += data
+    line, _, rest = bytes(buffer).partition(b'\n')
+    buffer[:] = rest
+    return line
@@ -0,0 +1,613 @@
+import bisect
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from typing import Callable, Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Avg
+from django.utils import timezone
+from .broadcast import get_broadcaster
+from .models import Task
+from .reaper import TaskReaper
+from .streaming import status_delta
+from .workspace import get_workspace_pool
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# POLITICHE DI CODA
+# =============================================================================
+
+# Voce di coda: task, utente, istante di accodamento, corsia di priorità e durata
+# stimata (usata solo dalla politica 'sjf'). Le politiche espongono la stessa
+# interfaccia: push, pop, position, oldest, len e 'in'.
+class QueueEntry(NamedTuple):
+    task_id: int
+    user_id: Optional[int]
+    enqueued_at: float
+    lane: str = 'interactive'
+    expected: float = 0.0
+
+
+# Ordine di arrivo. La coda si consuma solo dalla testa: la posizione è la distanza
+# tra il numero progressivo del task e quello in testa, in O(1).
+class FifoQueue:
+
+    def __init__(self) -> None:
+        self._entries = deque()
+        self._tickets: Dict[int, int] = {}  # Id in coda -> numero progressivo
+        self._next_ticket = 0               # Numero assegnato al prossimo task accodato
+        self._head_ticket = 0               # Numero del task in testa alla coda
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._tickets
+
+    def push(self, entry: QueueEntry) -> None:
+        self._entries.append(entry)
+        self._tickets[entry.task_id] = self._next_ticket
+        self._next_ticket += 1
+
+    # Il limite per utente non si applica: l'ordine di arrivo non salta nessun task
+    def pop(self, blocked: Callable[[Optional[int]], bool]) -> Optional[QueueEntry]:
+        if not self._entries:
+            return None
+        entry = self._entries.popleft()
+        self._tickets.pop(entry.task_id, None)
+        self._head_ticket += 1
+        return entry
+
+    def position(self, task_id: int) -> Optional[int]:
+        ticket = self._tickets.get(task_id)
+        return None if ticket is None else ticket - self._head_ticket
+
+    # Istante di accodamento del task in attesa da più tempo (None se vuota)
+    def oldest(self) -> Optional[float]:
+        return self._entries[0].enqueued_at if self._entries else None
+
+
+# Turni per utente (round-robin): ogni utente con task in coda ha la sua coda FIFO e
+# a ogni prelievo si passa all'utente successivo, saltando quelli che hanno già
+# 'per_user_limit' task in corso. Chi accoda decine di task non blocca gli altri:
+# ogni nuovo utente aspetta al più un giro. Il posto di un task nella coda del suo
+# utente si legge dai numeri progressivi (come in FifoQueue); la posizione globale
+# richiede un passaggio sugli utenti in coda, O(utenti) e non O(task).
+class FairShareQueue:
+
+    def __init__(self) -> None:
+        self._users: 'OrderedDict[Optional[int], deque]' = OrderedDict()  # Ordine dei turni
+        self._owners: Dict[int, Tuple[Optional[int], int]] = {}             # Id in coda -> (utente, numero progressivo)
+        self._next_ticket: Dict[Optional[int], int] = {}                    # Utente -> numero del prossimo task accodato
+        self._head_ticket: Dict[Optional[int], int] = {}                    # Utente -> numero del task in testa
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._owners
+
+    def push(self, entry: QueueEntry) -> None:
+        user_id = entry.user_id
+        if user_id not in self._users:
+            self._users[user_id] = deque()
+            self._next_ticket[user_id] = self._head_ticket[user_id] = 0
+        self._users[user_id].append(entry)
+        self._owners[entry.task_id] = (user_id, self._next_ticket[user_id])
+        self._next_ticket[user_id] += 1
+
+    # Primo utente di turno non bloccato; l'utente servito passa in fondo al giro
+    def pop(self, blocked: Callable[[Optional[int]], bool]) -> Optional[QueueEntry]:
+        for user_id, entries in self._users.items():
+            if not blocked(user_id):
+                break
+        else:
+            return None
+        entry = entries.popleft()
+        del self._owners[entry.task_id]
+        self._head_ticket[user_id] += 1
+        if entries:
+            self._users.move_to_end(user_id)
+        else:
+            del self._users[user_id], self._next_ticket[user_id], self._head_ticket[user_id]
+        return entry
+
+    # Task prelevati prima di questo se nessun utente è bloccato: i giri completi
+    # precedenti (al più k task per utente) più gli utenti prima di lui nel giro k
+    def position(self, task_id: int) -> Optional[int]:
+        if task_id not in self._owners:
+            return None
+        owner, ticket = self._owners[task_id]
+        k = ticket - self._head_ticket[owner]
+        ahead, before_owner = 0, True
+        for user_id, entries in self._users.items():
+            if user_id == owner:
+                before_owner = False
+            ahead += min(len(entries), k + 1 if before_owner else k)
+        return ahead
+
+    def oldest(self) -> Optional[float]:
+        return min((entries[0].enqueued_at for entries in self._users.values()), default=None)
+
+
+# Lavoro più breve per primo: i task escono in ordine di durata stimata (a parità,
+# in ordine di arrivo). Riduce l'attesa media quando le durate sono molto diverse.
+# Accanto all'heap le chiavi sono tenute ordinate: la posizione è una ricerca binaria.
+class ShortestJobFirstQueue:
+
+    def __init__(self) -> None:
+        self._heap: List[tuple] = []        # (durata stimata, progressivo, voce)
+        self._keys: List[tuple] = []        # Chiavi in coda in ordine (durata stimata, progressivo)
+        self._queued: Dict[int, tuple] = {} # Id in coda -> chiave nell'heap
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._queued
+
+    def push(self, entry: QueueEntry) -> None:
+        key = (entry.expected, next(self._counter))
+        self._queued[entry.task_id] = key
+        bisect.insort(self._keys, key)
+        heapq.heappush(self._heap, key + (entry,))
+
+    # Task più breve di un utente non bloccato (quelli saltati tornano nell'heap)
+    def pop(self, blocked: Callable[[Optional[int]], bool]) -> Optional[QueueEntry]:
+        skipped, found = [], None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            if not blocked(item[2].user_id):
+                found = item[2]
+                break
+            skipped.append(item)
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        if found is not None:
+            key = self._queued.pop(found.task_id)
+            del self._keys[bisect.bisect_left(self._keys, key)]
+        return found
+
+    def position(self, task_id: int) -> Optional[int]:
+        key = self._queued.get(task_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._keys, key)
+
+    def oldest(self) -> Optional[float]:
+        return min((item[2].enqueued_at for item in self._heap), default=None)
+
+
+QUEUE_POLICIES = {'fifo': FifoQueue, 'fair': FairShareQueue, 'sjf': ShortestJobFirstQueue}
+
+
+# Corsie di priorità, ognuna con la propria coda della politica scelta: si serve
+# sempre la corsia più alta con task prelevabili, tranne quando il task più vecchio
+# di una corsia ha superato il suo SLA (attesa massima): allora quella corsia passa
+# per prima, così i task batch non restano in coda all'infinito.
+class PriorityLanes:
+
+    def __init__(self, policy: str, sla: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.policy = policy
+        self.sla = sla if sla is not None else {
+            'interactive': settings.SCHEDULER_INTERACTIVE_SLA,
+            'batch': settings.SCHEDULER_BATCH_SLA,
+        }
+        self.lanes = OrderedDict((lane, QUEUE_POLICIES[policy]()) for lane in Task.PRIORITY_LANES)
+        self._clock = clock
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self.lanes.values())
+
+    def __contains__(self, task_id: int) -> bool:
+        return any(task_id in queue for queue in self.lanes.values())
+
+    def push(self, entry: QueueEntry) -> None:
+        if entry.lane not in self.lanes:
+            entry = entry._replace(lane='interactive')
+        self.lanes[entry.lane].push(entry)
+
+    # Restituisce (voce, motivo) con motivo 'sla' se la corsia ha superato l'attesa massima
+    def pop(self, blocked: Callable[[Optional[int]], bool]) -> Optional[Tuple[QueueEntry, str]]:
+        now = self._clock()
+        overdue = []
+        for lane, queue in self.lanes.items():
+            sla = self.sla.get(lane, 0)
+            oldest = queue.oldest() if sla > 0 and len(queue) else None
+            if oldest is not None and now - oldest > sla:
+                overdue.append((now - oldest - sla, lane))
+        for _, lane in sorted(overdue, reverse=True):
+            entry = self.lanes[lane].pop(blocked)
+            if entry is not None:
+                return entry, 'sla'
+        for queue in self.lanes.values():
+            entry = queue.pop(blocked)
+            if entry is not None:
+                return entry, 'priority'
+        return None
+
+    # Posizione: task delle corsie più alte più la posizione nella propria corsia
+    # (le corsie sono tre: il costo è quello della politica, vedi sopra)
+    def position(self, task_id: int) -> Optional[int]:
+        ahead = 0
+        for queue in self.lanes.values():
+            position = queue.position(task_id)
+            if position is not None:
+                return ahead + position
+            ahead += len(queue)
+        return None
+
+
+# =============================================================================
+# STIMA DEI TEMPI DI ESECUZIONE (per la politica 'sjf')
+# =============================================================================
+
+# Durata media dei task conclusi negli ultimi giorni, per esercizio. Una sola query
+# aggregata ogni SCHEDULER_ESTIMATE_TTL secondi; gli esercizi senza storico usano
+# la mediana degli altri.
+class RunTimeEstimates:
+
+    HISTORY_DAYS = 14
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl if ttl is not None else settings.SCHEDULER_ESTIMATE_TTL
+        self._estimates: Dict[int, float] = {}
+        self._default = settings.SCHEDULER_DEFAULT_ESTIMATE
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    ### Durata stimata in secondi di un task dell'esercizio ###
+    def expected(self, exercise_id: Optional[int]) -> float:
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+        if stale:
+            self.reload()
+        with self._lock:
+            return self._estimates.get(exercise_id, self._default)
+
+    ### Ricalcola le medie per esercizio dal database ###
+    def reload(self) -> None:
+        since = timezone.now() - timedelta(days=self.HISTORY_DAYS)
+        rows = (
+            Task.objects.filter(status__in=Task.FINISHED_STATUSES, created_at__gte=since,
+                                total_execution_time__isnull=False)
+            .values('exercise_id').annotate(average=Avg('total_execution_time'))
+        )
+        estimates = {row['exercise_id']: row['average'].total_seconds() for row in rows if row['average'] is not None}
+        ordered = sorted(estimates.values())
+        with self._lock:
+            self._estimates = estimates
+            self._default = ordered[len(ordered) // 2] if ordered else settings.SCHEDULER_DEFAULT_ESTIMATE
+            self._loaded_at = time.monotonic()
+
+
+_estimates: Optional[RunTimeEstimates] = None
+_estimates_lock = threading.Lock()
+
+
+# Stime condivise dal processo
+def get_run_time_estimates() -> RunTimeEstimates:
+    global _estimates
+    with _estimates_lock:
+        if _estimates is None:
+            _estimates = RunTimeEstimates()
+        return _estimates
+
+
+# =============================================================================
+# SCHEDULER DEI TASK (pool di worker a dimensione fissa)
+# =============================================================================
+
+# Pool di MAX_CONCURRENT_TASKS worker che consumano una coda in memoria
+# sincronizzata con la tabella Task. Ogni task viene prenotato in modo atomico
+# sul database: un id presente più volte in coda viene eseguito una sola volta.
+# I task passano per le corsie di priorità (docenti, interattivi, batch) e dentro
+# ogni corsia l'ordine dipende dalla politica (SCHEDULER_POLICY); con 'fair' e 'sjf'
+# un utente non ha mai più di SCHEDULER_MAX_RUNNING_PER_USER task in corso nello
+# stesso pool. Ogni prelievo viene registrato nel log (logger core.scheduler).
+class TaskScheduler:
+
+    def __init__(self, execute: Callable[[Task], None], workers: Optional[int] = None,
+                 refill_interval: Optional[float] = None, name: str = 'task-worker',
+                 claim: Optional[Callable[[int], Optional[Task]]] = None,
+                 pending: Optional[Callable[[], Iterable[tuple]]] = None,
+                 policy: Optional[str] = None, per_user_limit: Optional[int] = None,
+                 estimate: Optional[Callable[[Optional[int]], float]] = None) -> None:
+        self.workers = workers or settings.MAX_CONCURRENT_TASKS
+        self.refill_interval = refill_interval if refill_interval is not None else settings.SCHEDULER_REFILL_INTERVAL
+        self.name = name
+        self.policy = policy or settings.SCHEDULER_POLICY
+        self.per_user_limit = per_user_limit if per_user_limit is not None else settings.SCHEDULER_MAX_RUNNING_PER_USER
+        self._execute = execute
+        self._claim = claim or Task.claim              # Prenotazione atomica sul database
+        self._pending = pending or Task.pending_queue   # (id, utente, priorità, esercizio) presenti solo sul database
+        self._estimate = estimate or (lambda exercise_id: get_run_time_estimates().expected(exercise_id))
+        self._queue = PriorityLanes(self.policy)       # Coda pronta (evita anche i duplicati locali)
+        self._active: Dict[Optional[int], int] = {}    # Utente -> task prelevati e non ancora terminati
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._idle = 0                     # Worker in attesa di lavoro
+        self._stats = {
+            'submitted': 0,
+            'claimed': 0,
+            'claim_conflicts': 0,
+            'completed': 0,
+            'errors': 0,
+        }
+        self._wait_times = deque(maxlen=settings.SCHEDULER_STATS_WINDOW)
+        self._lane_waits = {lane: deque(maxlen=settings.SCHEDULER_STATS_WINDOW) for lane in Task.PRIORITY_LANES}
+
+    ### Avvia i worker e carica i task in attesa dal database ###
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._load_pending()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'{self.name}-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    ### Ferma i worker (i task in corso vengono completati) ###
+    def stop(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
+        self._threads = []
+
+    ### Accoda un task e restituisce la sua posizione (0 = avvio immediato) ###
+    def submit(self, task_id: int, user_id: Optional[int] = None, lane: str = 'interactive',
+               exercise_id: Optional[int] = None) -> int:
+        expected = self._expected(exercise_id)
+        with self._cond:
+            self._stats['submitted'] += 1
+            if task_id not in self._queue:
+                self._queue.push(QueueEntry(task_id, user_id, time.monotonic(), lane, expected))
+                self._cond.notify()
+            position = self._queue.position(task_id)
+            return 0 if position is None else max(0, position + 1 - self._idle)
+
+    ### Posizione di un task nella coda (0 = in testa, None se non è in coda) ###
+    def position(self, task_id: int) -> Optional[int]:
+        with self._cond:
+            return self._queue.position(task_id)
+
+    ### Numero di task nella coda pronta ###
+    def queue_size(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    ### Statistiche dello scheduler (contatori e tempi di attesa in coda) ###
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            data = dict(self._stats)
+            data['queued'] = len(self._queue)
+            data['idle_workers'] = self._idle
+            data['workers'] = self.workers
+            data['wait_times'] = list(self._wait_times)
+            data['lanes'] = {lane: list(waits) for lane, waits in self._lane_waits.items()}
+        return data
+
+    ### Sincronizza la coda con i task in attesa presenti sul database ###
+    def _load_pending(self) -> None:
+        try:
+            pending = list(self._pending())
+            expected = {exercise_id: self._expected(exercise_id) for _, _, _, exercise_id in pending}
+        except Exception:
+            # Riprova alla prossima ricarica (refill_interval)
+            logger.exception('Scheduler %s: lettura dei task in attesa dal database non riuscita', self.name)
+            return
+        finally:
+            close_old_connections()
+        now = time.monotonic()
+        with self._cond:
+            for task_id, user_id, lane, exercise_id in pending:
+                if task_id not in self._queue:
+                    self._queue.push(QueueEntry(task_id, user_id, now, lane, expected[exercise_id]))
+            if pending:
+                self._cond.notify_all()
+
+    ### Attende il prossimo task prelevabile: (voce, motivo) o None se lo scheduler è fermo ###
+    def _next_entry(self) -> Optional[Tuple[QueueEntry, str]]:
+        with self._cond:
+            while self._running:
+                popped = self._queue.pop(self._at_limit)
+                if popped is not None:
+                    user_id = popped[0].user_id
+                    self._active[user_id] = self._active.get(user_id, 0) + 1
+                    return popped
+                # Coda vuota o solo task di utenti al limite: attende una notifica
+                self._idle += 1
+                notified = self._cond.wait(timeout=self.refill_interval or None)
+                self._idle -= 1
+                if not notified and self._running and not self._queue:
+                    # Nessuna notifica: ricarica i task rimasti solo sul database
+                    self._cond.release()
+                    try:
+                        self._load_pending()
+                    finally:
+                        self._cond.acquire()
+            return None
+
+    # Durata stimata del task (solo per la politica 'sjf': le altre non la usano)
+    def _expected(self, exercise_id: Optional[int]) -> float:
+        return self._estimate(exercise_id) if self.policy == 'sjf' else 0.0
+
+    # True se l'utente ha già il massimo di task in corso in questo pool (con self._cond acquisito)
+    def _at_limit(self, user_id: Optional[int]) -> bool:
+        return self.per_user_limit > 0 and user_id is not None and self._active.get(user_id, 0) >= self.per_user_limit
+
+    # Un task dell'utente è terminato: libera il suo posto e sveglia un worker (con self._cond acquisito)
+    def _release(self, user_id: Optional[int]) -> None:
+        remaining = self._active.get(user_id, 0) - 1
+        if remaining > 0:
+            self._active[user_id] = remaining
+        else:
+            self._active.pop(user_id, None)
+        self._cond.notify()
+
+    ### Loop di un worker: preleva, prenota ed esegue i task ###
+    def _worker_loop(self) -> None:
+        while True:
+            popped = self._next_entry()
+            if popped is None:
+                return
+            entry, reason = popped
+            user_id = entry.user_id
+            task = None
+            try:
+                close_old_connections()
+                task = self._claim(entry.task_id)
+                if task is None:
+                    # Già prenotato da un altro worker o non più in attesa
+                    with self._cond:
+                        self._stats['claim_conflicts'] += 1
+                    continue
+                waited = time.monotonic() - entry.enqueued_at
+                with self._cond:
+                    self._stats['claimed'] += 1
+                    self._wait_times.append(waited)
+                    self._lane_waits[entry.lane].append(waited)
+                logger.info(
+                    'Scheduler %s: task %s utente %s corsia %s politica %s motivo %s attesa %.3fs stima %.1fs',
+                    self.name, entry.task_id, user_id, entry.lane, self.policy, reason, waited, entry.expected,
+                )
+                self._execute(task)
+                with self._cond:
+                    self._stats['completed'] += 1
+            except Exception:
+                with self._cond:
+                    self._stats['errors'] += 1
+                logger.exception('Scheduler %s: errore imprevisto durante il task %s', self.name, entry.task_id)
+                if task is not None:
+                    self._fail_task(entry.task_id)
+            finally:
+                with self._cond:
+                    self._release(user_id)
+                close_old_connections()
+
+    # Chiude come fallito un task prenotato rimasto in corso dopo un errore imprevisto
+    def _fail_task(self, task_id: int) -> None:
+        try:
+            close_old_connections()
+            task = Task.fail_if_running(task_id, 'Errore interno durante l\'esecuzione: task chiuso come fallito.')
+            if task is not None:
+                get_broadcaster().send(f'task_{task_id}', {'type': 'task_delta', 'data': status_delta(task)})
+        except Exception:
+            logger.exception('Scheduler %s: impossibile chiudere il task %s', self.name, task_id)
+
+
+# =============================================================================
+# PIPELINE COMPILAZIONE -> ESECUZIONE
+# =============================================================================
+
+# Due pool separati: MAX_CONCURRENT_COMPILES worker compilano (CPU, nessuna GPU),
+# MAX_CONCURRENT_RUNS worker eseguono. Una compilazione lunga non occupa uno
+# slot di esecuzione: il task compilato passa alla coda della fase successiva.
+class TaskPipeline:
+
+    def __init__(self, executor=None, compile_workers: Optional[int] = None,
+                 run_workers: Optional[int] = None, refill_interval: Optional[float] = None) -> None:
+        if executor is None:
+            from .executor import TaskExecutor
+            executor = TaskExecutor()
+        self.executor = executor
+        self.run_stage = TaskScheduler(
+            executor.run,
+            workers=run_workers or settings.MAX_CONCURRENT_RUNS,
+            refill_interval=refill_interval,
+            name='run-worker',
+            claim=executor.claim_run,
+            pending=Task.compiled_queue,
+        )
+        self.compile_stage = TaskScheduler(
+            self._compile,
+            workers=compile_workers or settings.MAX_CONCURRENT_COMPILES,
+            refill_interval=refill_interval,
+            name='compile-worker',
+        )
+        # Heartbeat dei task di questo processo e recupero di quelli abbandonati da altri
+        self.reaper = TaskReaper(
+            on_requeue=lambda task: self.submit(task.id, task.user_id, task.priority, task.exercise_id)
+        )
+
+    ### Avvia entrambe le fasi (dopo aver recuperato i task rimasti orfani) ###
+    def start(self) -> None:
+        try:
+            self.reaper.reap()
+        except Exception:
+            logger.warning('Recupero dei task orfani all\'avvio non riuscito', exc_info=True)
+        finally:
+            close_old_connections()
+        # Crea il pool delle cartelle di lavoro eliminando quelle lasciate dai processi terminati
+        get_workspace_pool()
+        self.reaper.start()
+        self.run_stage.start()
+        self.compile_stage.start()
+
+    ### Ferma entrambe le fasi ###
+    def stop(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        self.compile_stage.stop(wait, timeout)
+        self.run_stage.stop(wait, timeout)
+        self.reaper.stop(timeout)
+        if wait:
+            self.executor.release_prepared()
+            get_workspace_pool().close()
+
+    ### Accoda un nuovo task e restituisce la sua posizione nella fase di compilazione ###
+    def submit(self, task_id: int, user_id: Optional[int] = None, lane: str = 'interactive',
+               exercise_id: Optional[int] = None) -> int:
+        return self.compile_stage.submit(task_id, user_id, lane, exercise_id)
+
+    ### Fase e posizione di un task in coda: ('compile' | 'run', posizione) o None se non è in coda ###
+    def position(self, task_id: int) -> Optional[Tuple[str, int]]:
+        for stage, scheduler in (('compile', self.compile_stage), ('run', self.run_stage)):
+            position = scheduler.position(task_id)
+            if position is not None:
+                return stage, position
+        return None
+
+    ### Statistiche delle due fasi, del reaper e delle cartelle di lavoro ###
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'compile': self.compile_stage.stats(),
+            'run': self.run_stage.stats(),
+            'reaper': self.reaper.stats(),
+            'workspaces': get_workspace_pool().stats(),
+        }
+
+    # Fase 1: compila e, se va a buon fine, passa il task alla fase di esecuzione
+    def _compile(self, task: Task) -> None:
+        if self.executor.compile(task):
+            self.run_stage.submit(task.id, task.user_id, task.priority, task.exercise_id)
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_scheduler: Optional[TaskPipeline] = None
+_scheduler_lock = threading.Lock()
+
+
+# Restituisce la pipeline di processo, avviandola al primo utilizzo
+def get_scheduler() -> TaskPipeline:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TaskPipeline()
+            _scheduler.start()
+        return _scheduler
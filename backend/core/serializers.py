@@ -8,7 +8,8 @@ class ExerciseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Exercise
-        fields = ['id', 'name', 'return_type', 'params', 'comment', 'signature', 'file_extension', 'include_files']
+        fields = ['id', 'name', 'return_type', 'params', 'comment', 'signature', 'file_extension', 'include_files',
+                  'memory_limit_mb', 'cpu_time_limit', 'max_processes', 'max_file_size_mb']
 
     def get_signature(self, obj) -> str:
         return obj.build_signature()
@@ -28,17 +29,15 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'matr', 'first_name', 'last_name', 'course', 'course_name', 'is_superuser', 'credits', 'password']
+        # Saldo e permessi non sono impostabili in registrazione
+        read_only_fields = ['is_superuser', 'credits']
         extra_kwargs = {
             'password': {'write_only': True}
         }
 
-    # Crea un nuovo utente con password hashata
+    # Crea un nuovo utente con password hashata e il saldo iniziale nel registro crediti
     def create(self, validated_data) -> User:
-        password = validated_data.pop('password')
-        user = User(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        return User.objects.create_user(**validated_data)
 
 
 # Serializzatore per i task
@@ -51,11 +50,98 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'user', 'user_matr', 'user_name', 'exercise', 'exercise_name', 
-            'code', 'status', 'created_at', 'started_at', 'finished_at', 
+            'code', 'status', 'priority', 'created_at', 'started_at', 'finished_at', 
             'total_execution_time', 'stdout', 'stderr', 'credits_cost', 
-            'process_id', 'message'
+            'process_id', 'message', 'compile_status', 'compile_started_at', 'compile_finished_at',
+            'run_status', 'run_started_at', 'run_finished_at', 'archived_at',
+            'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason'
         ]
         read_only_fields = [
-            'id', 'user', 'created_at', 'started_at', 'finished_at', 
-            'total_execution_time', 'stdout', 'stderr', 'process_id'
+            'id', 'user', 'priority', 'created_at', 'started_at', 'finished_at', 
+            'total_execution_time', 'stdout', 'stderr', 'process_id',
+            'compile_status', 'compile_started_at', 'compile_finished_at',
+            'run_status', 'run_started_at', 'run_finished_at', 'archived_at',
+            'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason'
         ]
+
+
+# Serializzatore leggero per gli aggiornamenti di stato via WebSocket (senza codice, output e FK)
+class TaskStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'status', 'message', 'created_at', 'started_at', 'finished_at',
+            'total_execution_time', 'credits_cost', 'process_id',
+            'compile_status', 'compile_started_at', 'compile_finished_at',
+            'run_status', 'run_started_at', 'run_finished_at',
+            'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason'
+        ]
+
+
+# Serializzatore per la cronologia dei task: il client sceglie i campi con ?fields=
+# (mai codice e output, che restano nel dettaglio del task)
+class TaskHistorySerializer(serializers.ModelSerializer):
+    user_matr = serializers.CharField(source='user.matr', read_only=True)
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    exercise_name = serializers.CharField(source='exercise.name', read_only=True)
+
+    # Colonne da caricare per ogni campo (i percorsi con '__' richiedono una JOIN)
+    COLUMNS = {
+        'id': ('id',),
+        'exercise': ('exercise',),
+        'exercise_name': ('exercise__name',),
+        'user_matr': ('user__matr',),
+        'user_name': ('user__first_name', 'user__last_name'),
+        'status': ('status',),
+        'priority': ('priority',),
+        'message': ('message',),
+        'created_at': ('created_at',),
+        'started_at': ('started_at',),
+        'finished_at': ('finished_at',),
+        'total_execution_time': ('total_execution_time',),
+        'credits_cost': ('credits_cost',),
+        'compile_status': ('compile_status',),
+        'compile_started_at': ('compile_started_at',),
+        'compile_finished_at': ('compile_finished_at',),
+        'run_status': ('run_status',),
+        'run_started_at': ('run_started_at',),
+        'run_finished_at': ('run_finished_at',),
+        'archived_at': ('archived_at',),
+        'run_cpu_seconds': ('run_cpu_seconds',),
+        'run_max_rss_kb': ('run_max_rss_kb',),
+        'run_wall_seconds': ('run_wall_seconds',),
+        'failure_reason': ('failure_reason',),
+    }
+    DEFAULT_FIELDS = ['id', 'exercise', 'exercise_name', 'status', 'message', 'created_at',
+                      'finished_at', 'total_execution_time', 'credits_cost']
+
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'exercise', 'exercise_name', 'user_matr', 'user_name', 'status', 'priority', 'message',
+            'created_at', 'started_at', 'finished_at', 'total_execution_time', 'credits_cost',
+            'compile_status', 'compile_started_at', 'compile_finished_at',
+            'run_status', 'run_started_at', 'run_finished_at', 'archived_at',
+            'run_cpu_seconds', 'run_max_rss_kb', 'run_wall_seconds', 'failure_reason'
+        ]
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    # Argomenti per only() e select_related() che bastano a serializzare 'fields'
+    @classmethod
+    def projection(cls, fields) -> tuple:
+        columns = {'id', 'created_at'}  # Sempre presenti: servono al cursore di paginazione
+        related = set()
+        for name in fields:
+            for column in cls.COLUMNS[name]:
+                columns.add(column)
+                if '__' in column:
+                    relation = column.split('__', 1)[0]
+                    related.add(relation)
+                    columns.add(relation)
+        return sorted(columns), sorted(related)
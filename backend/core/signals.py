@@ -0,0 +1,43 @@
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from .catalogue import invalidate_catalogue
+from .models import Course, Exercise
+
+
+# =============================================================================
+# INVALIDAZIONE DEL CATALOGO ESERCIZI
+# =============================================================================
+
+# Gli aggiornamenti in blocco (QuerySet.update, bulk_create) non inviano segnali:
+# in quel caso il catalogo si aggiorna allo scadere di EXERCISE_CATALOGUE_CACHE_TTL.
+
+# Esercizio creato o modificato: catalogo dei suoi corsi
+@receiver(post_save, sender=Exercise)
+def exercise_saved(sender, instance, **kwargs) -> None:
+    invalidate_catalogue(instance.courses.values_list('id', flat=True))
+
+
+# Esercizio eliminato: i corsi vanno letti prima che la relazione venga rimossa
+@receiver(pre_delete, sender=Exercise)
+def exercise_deleted(sender, instance, **kwargs) -> None:
+    invalidate_catalogue(instance.courses.values_list('id', flat=True))
+
+
+# Corsi di un esercizio modificati (da entrambi i lati della relazione)
+@receiver(m2m_changed, sender=Exercise.courses.through)
+def exercise_courses_changed(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance è un Course: cambia solo il suo catalogo
+        invalidate_catalogue([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_catalogue(instance.courses.values_list('id', flat=True))
+    else:
+        invalidate_catalogue(pk_set or ())
+
+
+# Corso eliminato
+@receiver(pre_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs) -> None:
+    invalidate_catalogue([instance.pk])
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+from .models import Task
+from .serializers import TaskSerializer, TaskStatusSerializer
+
+
+# =============================================================================
+# PROTOCOLLO INCREMENTALE DEGLI AGGIORNAMENTI TASK (WebSocket)
+# =============================================================================
+#
+# Il motore di esecuzione pubblica sul gruppo 'task_<id>' solo messaggi
+# incrementali ('task_delta'); ogni consumer li inoltra così come sono
+# (protocollo 'delta') o li applica al proprio stato per inviare il payload
+# completo ai client legacy (protocollo 'full').
+#
+#   output:   {"type": "output", "stream": "stdout", "offset": 120, "data": "..."}
+#   status:   {"type": "status", "status": "running", "message": "...", ...}
+#   credits:  {"type": "credits", "credits_cost": 5}
+#   snapshot: {"type": "snapshot", "task": {...}, "stdout_offset": 0, "stderr_offset": 0}
+#
+# Gli offset sono posizioni (in caratteri) nel testo completo dello stream.
+
+TERMINAL_STATUSES = ('completed', 'failed', 'interrupted')
+OUTPUT_STREAMS = ('stdout', 'stderr')
+
+
+# Messaggio con un blocco di output aggiunto allo stream
+def output_delta(task_id: int, stream: str, offset: int, data: str) -> Dict[str, Any]:
+    return {'type': 'output', 'task_id': task_id, 'stream': stream, 'offset': offset, 'data': data}
+
+
+# Messaggio di cambio stato (negli stati finali include l'output definitivo)
+def status_delta(task: Task) -> Dict[str, Any]:
+    data = dict(TaskStatusSerializer(task).data)
+    data['task_id'] = data.pop('id')
+    data['type'] = 'status'
+    if task.status in TERMINAL_STATUSES:
+        data['stdout'] = task.stdout
+        data['stderr'] = task.stderr
+    return data
+
+
+# Messaggio di aggiornamento dei crediti consumati dal task
+def credits_delta(task: Task) -> Dict[str, Any]:
+    return {'type': 'credits', 'task_id': task.id, 'credits_cost': task.credits_cost}
+
+
+# Istantanea completa del task a partire dagli offset già ricevuti dal client
+def snapshot(task: Task, stdout_offset: int = 0, stderr_offset: int = 0) -> Dict[str, Any]:
+    data = dict(TaskSerializer(task).data)
+    data.pop('code', None)
+    stdout_offset = max(0, min(stdout_offset, len(task.stdout)))
+    stderr_offset = max(0, min(stderr_offset, len(task.stderr)))
+    data['stdout'] = task.stdout[stdout_offset:]
+    data['stderr'] = task.stderr[stderr_offset:]
+    return {
+        'type': 'snapshot',
+        'task_id': task.id,
+        'task': data,
+        'stdout_offset': stdout_offset,
+        'stderr_offset': stderr_offset,
+    }
+
+
+# Applica un messaggio incrementale allo stato completo di un task (client legacy).
+# Restituisce False se l'output ha un buco rispetto allo stato (serve una risincronizzazione).
+def apply_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> bool:
+    kind = delta.get('type')
+    if kind == 'output':
+        stream = delta['stream']
+        current: str = state.get(stream) or ''
+        offset: int = delta['offset']
+        if offset > len(current):
+            return False
+        # Blocchi già ricevuti (anche in parte) non vengono duplicati
+        if offset + len(delta['data']) > len(current):
+            state[stream] = current[:offset] + delta['data']
+        return True
+    if kind in ('status', 'credits'):
+        for key, value in delta.items():
+            if key not in ('type', 'task_id'):
+                state[key] = value
+        return True
+    return True
+
+
+# Legge un offset non negativo dai parametri della richiesta
+def parse_offset(value: Optional[str]) -> int:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
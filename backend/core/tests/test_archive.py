@@ -0,0 +1,68 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.archive import archive_batch
+from core.bench import create_bench_fixtures
+from core.models import Task, TaskArchive
+
+
+# Archiviazione: codice e output passano a TaskArchive e tornano identici con load_payload
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+        self.cutoff = timezone.now() - timedelta(days=30)
+
+    def create(self, days_ago, status='completed', **kwargs):
+        task = Task.objects.create(user=self.user, exercise=self.exercise, status=status, **kwargs)
+        Task.objects.filter(pk=task.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return task
+
+    def test_round_trip(self):
+        code, stdout, stderr = 'int main() { return 0; }\n' * 20, 'risultato è 42\n' * 50, 'avviso\n'
+        task = self.create(60, code=code, stdout=stdout, stderr=stderr)
+
+        after_pk, archived, moved = archive_batch(self.cutoff)
+
+        self.assertEqual((after_pk, archived), (task.pk, 1))
+        self.assertEqual(moved, len(code.encode()) + len(stdout.encode()) + len(stderr.encode()))
+        row = Task.objects.get(pk=task.pk)
+        self.assertEqual((row.code, row.stdout, row.stderr), ('', '', ''))
+        self.assertIsNotNone(row.archived_at)
+
+        row.load_payload()
+        self.assertEqual((row.code, row.stdout, row.stderr), (code, stdout, stderr))
+
+    def test_only_old_finished_tasks_are_archived(self):
+        old = [self.create(60, status=status, code=status) for status in Task.FINISHED_STATUSES]
+        running = self.create(60, status='running', code='in corso')
+        recent = self.create(1, code='recente')
+
+        self.assertEqual(archive_batch(self.cutoff, batch_size=2)[1], 2)
+        after_pk, archived, _ = archive_batch(self.cutoff, old[1].pk, batch_size=2)
+        self.assertEqual((after_pk, archived), (old[2].pk, 1))
+        self.assertEqual(archive_batch(self.cutoff, after_pk)[0], None)
+
+        self.assertEqual(set(TaskArchive.objects.values_list('task_id', flat=True)), {task.pk for task in old})
+        for task in (running, recent):
+            row = Task.objects.get(pk=task.pk)
+            self.assertIsNone(row.archived_at)
+            self.assertEqual(row.code, task.code)
+        # Un secondo passaggio non trova altro
+        self.assertEqual(archive_batch(self.cutoff), (None, 0, 0))
+
+    def test_detail_view_serves_archived_payload(self):
+        task = self.create(60, code='echo archiviato\n', stdout='archiviato\n')
+        output = StringIO()
+        call_command('archive_tasks', days=30, stdout=output)
+        self.assertIn('archiviati 1 task in 1 blocchi', output.getvalue())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/tasks/{task.pk}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['code'], response.data['stdout']), ('echo archiviato\n', 'archiviato\n'))
@@ -0,0 +1,23 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from core.benchmarks import BaseBenchmark, benchmark_names, load_benchmark
+
+
+# Comando unico 'bench': ogni modulo di core.benchmarks è un benchmark eseguibile
+class BenchCommandTests(SimpleTestCase):
+
+    def test_every_module_is_a_benchmark(self):
+        names = benchmark_names()
+        self.assertIn('scheduler', names)
+        for name in names:
+            with self.subTest(name=name):
+                benchmark = load_benchmark(name)
+                self.assertTrue(issubclass(benchmark, BaseBenchmark))
+                self.assertTrue(benchmark.help)
+
+    def test_runs_benchmark_with_its_options(self):
+        out = StringIO()
+        call_command('bench', 'output_buffer', sizes='4000', chunk=40, stdout=out)
+        self.assertIn('[bench_output_buffer] blocchi da 40 caratteri', out.getvalue())
+        self.assertIn('4000 |', out.getvalue())
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.bench import create_bench_fixtures
+from core.models import Course, Exercise
+
+
+# Catalogo esercizi in cache: ETag stabile, 304 su If-None-Match e invalidazione dai segnali
+class ExerciseCatalogueTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.course, self.exercise, (self.user,) = create_bench_fixtures()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/exercises/', **headers)
+
+    def test_etag_and_not_modified(self):
+        response = self.get()
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.data], ['sum'])
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(f'"altro", {etag}').status_code, 304)
+        self.assertEqual(self.get('"altro"').status_code, 200)
+
+    def test_cached_catalogue_skips_exercise_queries(self):
+        self.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get().status_code, 200)
+
+        self.assertFalse([q for q in queries.captured_queries if 'core_exercise' in q['sql']])
+
+    def test_exercise_change_invalidates_etag(self):
+        etag = self.get()['ETag']
+
+        self.exercise.comment = 'Somma di due vettori'
+        self.exercise.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['comment'], 'Somma di due vettori')
+
+    def test_course_membership_invalidates_only_that_course(self):
+        etag = self.get()['ETag']
+        other = Course.objects.create(name='Altro')
+        extra = Exercise.objects.create(name='scale', return_type='void')
+        extra.courses.add(other)
+
+        # Esercizio di un altro corso: il catalogo dell'utente non cambia
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        self.course.exercises.add(extra)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.data], ['sum', 'scale'])
+
+        extra.delete()
+        self.assertEqual(self.get(response['ETag']).status_code, 200)
+        self.assertEqual(self.get(etag)['ETag'], etag)
@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from core.bench import STUB_COMPILER, write_stub_compiler
+from core.compiler import CompileCache
+from core.manifest import ExerciseManifest
+
+
+# Cache di compilazione con il compilatore finto di core/bench.py (l'eseguibile è il sorgente)
+class CompileCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='gpu_test_cc_')
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.compiler = write_stub_compiler(self.work_dir)
+        self.exercise_dir = os.path.join(self.work_dir, 'sum')
+        os.makedirs(self.exercise_dir)
+        with open(os.path.join(self.exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\nint main() { return 0; }\n')
+        self.manifest = ExerciseManifest('sum', self.exercise_dir, 'main.cu')
+
+    def make_cache(self, **kwargs):
+        kwargs.setdefault('compiler', self.compiler)
+        kwargs.setdefault('flags', [])
+        return CompileCache(directory=os.path.join(self.work_dir, 'cache'), **kwargs)
+
+    # Sorgente che stampa 'name' (riempito fino a 'size' byte: eseguibili di dimensione nota)
+    def source(self, name, size=100):
+        path = os.path.join(self.work_dir, f'{name}.cu')
+        text = f'echo {name}\n'
+        with open(path, 'w') as f:
+            f.write(text + '#' * (size - len(text) - 1) + '\n')
+        return path
+
+    def test_hit_and_miss_counters(self):
+        cache = self.make_cache()
+        first = cache.compile(self.source('a'), self.manifest)
+        again = cache.compile(self.source('a'), self.manifest)
+        other = cache.compile(self.source('b'), self.manifest)
+
+        self.assertTrue(first.ok and again.ok and other.ok)
+        self.assertEqual((first.hit, again.hit, other.hit), (False, True, False))
+        self.assertEqual(first.binary, again.binary)
+        self.assertNotEqual(first.binary, other.binary)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+        output = subprocess.run([again.binary], capture_output=True, text=True).stdout
+        self.assertEqual(output, 'a\n')
+
+    def test_lru_eviction_by_size(self):
+        # Eseguibili da 112 byte: nel limite ne entrano due
+        cache = self.make_cache(max_size=250)
+        a = cache.compile(self.source('a'), self.manifest).binary
+        b = cache.compile(self.source('b'), self.manifest).binary
+        os.utime(a, ns=(1_000_000_000, 1_000_000_000))
+        os.utime(b, ns=(2_000_000_000, 2_000_000_000))
+        self.assertTrue(cache.compile(self.source('a'), self.manifest).hit)   # 'a' diventa il più recente
+
+        c = cache.compile(self.source('c'), self.manifest).binary
+
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertTrue(os.path.exists(c))
+        self.assertFalse(cache.compile(self.source('b'), self.manifest).hit)
+
+    def test_key_changes_with_flags(self):
+        source = self.source('a')
+        plain = self.make_cache().key(source, self.manifest)
+        optimized = self.make_cache(flags=['-O3']).key(source, self.manifest)
+        manifest_flags = ExerciseManifest('sum', self.exercise_dir, 'main.cu', flags=['-lineinfo'])
+
+        self.assertNotEqual(plain, optimized)
+        self.assertNotEqual(plain, self.make_cache().key(source, manifest_flags))
+        self.assertEqual(plain, self.make_cache().key(source, self.manifest))
+
+    def test_key_changes_with_compiler_version(self):
+        cache = self.make_cache()
+        source = self.source('a')
+        before = cache.key(source, self.manifest)
+        self.assertFalse(cache.compile(source, self.manifest).hit)
+
+        # Aggiornamento del compilatore: la versione viene riletta e gli eseguibili non vengono riusati
+        with open(self.compiler, 'w') as f:
+            f.write(STUB_COMPILER.replace('stub-nvcc 1.0', 'stub-nvcc 2.0'))
+
+        self.assertEqual(cache.compiler_version(), 'stub-nvcc 2.0')
+        self.assertNotEqual(cache.key(source, self.manifest), before)
+        self.assertFalse(cache.compile(source, self.manifest).hit)
+
+    @override_settings(CODE_COMPILATION_TIMEOUT=1)
+    def test_compile_timeout(self):
+        slow = os.path.join(self.work_dir, 'slow_nvcc')
+        with open(slow, 'w') as f:
+            f.write('#!/bin/bash\n[ "$1" = --version ] && { echo slow 1.0; exit 0; }\nsleep 30\n')
+        os.chmod(slow, 0o755)
+        cache = self.make_cache(compiler=slow)
+
+        started = time.monotonic()
+        result = cache.compile(self.source('a'), self.manifest)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(result.ok)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(os.listdir(cache.directory), [])   # Né eseguibile né file temporaneo
+        self.assertEqual(cache.stats()['misses'], 1)
@@ -0,0 +1,102 @@
+import hashlib
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from core import compression
+from core.bench import create_bench_fixtures
+from core.models import Task, TextBlob
+
+LONG_CODE = '__global__ void kernel(float *a, int n) {{ int i = blockIdx.x * blockDim.x + threadIdx.x; }} // {}\n'
+
+
+# Compressione dei campi di testo e deduplicazione del codice in TextBlob
+@override_settings(STORAGE_COMPRESSION_MIN_SIZE=64, STORAGE_DEDUP_MIN_SIZE=64)
+class CompressionTests(TestCase):
+
+    def setUp(self):
+        compression.reset_blob_cache()
+        compression.reset_dictionary_cache()
+        self.addCleanup(compression.reset_blob_cache)
+        self.addCleanup(compression.reset_dictionary_cache)
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+
+    def create_task(self, code, **kwargs):
+        return Task.objects.create(user=self.user, exercise=self.exercise, code=code, **kwargs)
+
+    def test_round_trip(self):
+        long_text = 'riga di output\n' * 200
+        for text in ('', 'corto', long_text, 'è UTF-8 ✓ ' * 50):
+            self.assertEqual(compression.decode(compression.encode(text)), text)
+        self.assertEqual(compression.encode(long_text)[0], compression.FORMAT_ZLIB)
+        self.assertEqual(compression.decode('riga scritta prima della compressione'),
+                         'riga scritta prima della compressione')
+
+    def test_round_trip_with_dictionary(self):
+        dict_id, created = compression.train_dictionary()
+        self.assertTrue(created)
+        self.assertEqual(compression.train_dictionary(), (dict_id, False))
+
+        encoded = compression.encode(LONG_CODE.format(1) * 3)
+        self.assertEqual(encoded[0], compression.FORMAT_ZLIB_DICT)
+        self.assertEqual(compression.decode(encoded), LONG_CODE.format(1) * 3)
+
+    def test_identical_code_stored_once(self):
+        first = self.create_task(LONG_CODE.format(1))
+        second = self.create_task(LONG_CODE.format(1))
+        self.create_task('int x;')
+
+        self.assertEqual(TextBlob.objects.count(), 1)
+        stored = Task.objects.filter(pk=first.pk).values_list('code', flat=True)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT code FROM core_task WHERE id = %s', [second.pk])
+            raw = bytes(cursor.fetchone()[0])
+        self.assertEqual(len(raw), 33)
+        self.assertEqual(raw[0], compression.FORMAT_BLOB)
+        self.assertEqual(stored.get(), LONG_CODE.format(1))
+
+    def test_missing_blob_raises_and_is_not_cached(self):
+        text = LONG_CODE.format('mancante')
+        digest = hashlib.sha256(text.encode()).hexdigest()
+
+        with self.assertRaises(compression.BlobNotFound):
+            compression.load_blob(digest)
+
+        # Il blob salvato in seguito (es. transazione non ancora confermata) viene letto
+        TextBlob.objects.create(digest=digest, content=text, size=len(text))
+        self.assertEqual(compression.load_blob(digest), text)
+
+    def test_task_list_resolves_blobs_in_bulk(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def list_queries():
+            compression.reset_blob_cache()   # Processo appena avviato
+            with CaptureQueriesContext(connection) as context:
+                response = client.get('/api/tasks/')
+            self.assertEqual(response.status_code, 200)
+            return response, len(context.captured_queries)
+
+        self.create_task(LONG_CODE.format(0))
+        _, few = list_queries()
+        for n in range(1, 10):
+            self.create_task(LONG_CODE.format(n))
+        response, many = list_queries()
+
+        self.assertEqual(few, many)
+        self.assertEqual(sorted(task['code'] for task in response.data),
+                         sorted(LONG_CODE.format(n) for n in range(10)))
+
+    def test_transitions_do_not_rewrite_code(self):
+        task = self.create_task(LONG_CODE.format(1), status='pending')
+        task = Task.objects.get(pk=task.pk)
+
+        with CaptureQueriesContext(connection) as context:
+            task.start()
+            task.complete(stdout='ok ' * 100, stderr='', message='fatto')
+
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('core_textblob' in sql or '"code"' in sql for sql in queries), queries)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.code, task.stdout), ('completed', LONG_CODE.format(1), 'ok ' * 100))
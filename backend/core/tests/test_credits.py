@@ -0,0 +1,147 @@
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib import admin
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from core.admin import UserAdmin
+from core.bench import create_bench_fixtures
+from core.credits import get_balance_cache, reset_credits_batch
+from core.models import CreditLedgerEntry, Task, User
+
+
+# Output di reconcile_credits (confronto tra saldi e registro crediti)
+def reconcile():
+    output = StringIO()
+    call_command('reconcile_credits', stdout=output)
+    return output.getvalue()
+
+
+# Addebito del costo di avvio alla sottomissione (POST /api/run/)
+@override_settings(EXECUTION_MODE='worker', TASK_START_COST=3)
+class TaskStartChargeTests(TestCase):
+
+    def setUp(self):
+        get_balance_cache().invalidate()
+        _, self.exercise, (self.user,) = create_bench_fixtures(credits=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self):
+        return self.client.post('/api/run/', {'code': 'int x;', 'exercise_id': self.exercise.id}, format='json')
+
+    def test_start_entry_points_to_task(self):
+        response = self.submit()
+
+        self.assertEqual(response.status_code, 200)
+        entry = CreditLedgerEntry.objects.get(user=self.user, reason='task_start')
+        self.assertEqual(entry.task_id, response.data['task_id'])
+        self.assertEqual(entry.delta, -3)
+        self.assertEqual(User.objects.get(pk=self.user.pk).credits, 7)
+
+    def test_insufficient_credits_creates_nothing(self):
+        User.objects.filter(pk=self.user.pk).update(credits=2)
+
+        response = self.submit()
+
+        self.assertEqual(response.status_code, 402)
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(CreditLedgerEntry.objects.filter(reason='task_start').exists())
+
+    def test_failed_charge_rolls_back_task(self):
+        # Saldo esaurito tra il controllo in cache e l'addebito
+        with mock.patch.object(User, 'reduce_credits', return_value=False):
+            response = self.submit()
+
+        self.assertEqual(response.status_code, 402)
+        self.assertFalse(Task.objects.exists())
+
+
+# Il saldo di ogni utente è sempre spiegato dal registro crediti (reconcile_credits senza differenze)
+class LedgerConsistencyTests(TestCase):
+
+    def setUp(self):
+        get_balance_cache().invalidate()
+
+    @override_settings(USER_INITIAL_CREDITS=25)
+    def test_registration_writes_initial_entry(self):
+        response = APIClient().post('/api/register/', {
+            'email': 'nuovo@example.com', 'matr': 'N000001', 'first_name': 'Nuovo', 'last_name': 'Utente',
+            'password': 'segreta-123', 'credits': 999, 'is_superuser': True,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email='nuovo@example.com')
+        self.assertEqual(user.credits, 25)
+        self.assertFalse(user.is_superuser)
+        self.assertTrue(user.check_password('segreta-123'))
+        self.assertEqual(list(user.credit_entries.values_list('reason', 'delta')), [('initial', 25)])
+        self.assertIn('0 utenti non allineati', reconcile())
+
+    def test_admin_credit_edit_records_adjustment(self):
+        _, _, (user,) = create_bench_fixtures(credits=10)
+        request = RequestFactory().post('/admin/core/user/')
+        form = SimpleNamespace(changed_data=['credits'], initial={'credits': 10})
+        # Task addebitato dopo l'apertura del modulo: la rettifica non lo sovrascrive
+        User.objects.get(pk=user.pk).reduce_credits(3, reason='task_start')
+
+        user.credits = 50
+        UserAdmin(User, admin.site).save_model(request, user, form, change=True)
+
+        self.assertEqual(User.objects.get(pk=user.pk).credits, 47)
+        self.assertEqual(user.credit_entries.latest('id').delta, 40)
+        self.assertIn('0 utenti non allineati', reconcile())
+
+
+# Reset giornaliero a blocchi per chiave primaria, con un movimento 'daily_reset' per utente
+class DailyResetTests(TestCase):
+
+    def setUp(self):
+        get_balance_cache().invalidate()
+        _, _, self.users = create_bench_fixtures(users=5, credits=0)
+        for user, credits in zip(self.users, [0, 3, 10, 20, 1]):
+            user.add_credits(credits)
+
+    def balances(self):
+        return list(User.objects.filter(pk__in=[user.pk for user in self.users]).order_by('pk')
+                    .values_list('credits', flat=True))
+
+    def run_command(self, *args, **options):
+        output = StringIO()
+        call_command('reset_daily_credits', *args, stdout=output, **options)
+        return output.getvalue()
+
+    def test_batches_walk_primary_keys(self):
+        after_pk, updated = reset_credits_batch(10, batch_size=2)
+        self.assertEqual((after_pk, updated), (self.users[1].pk, 2))
+
+        after_pk, updated = reset_credits_batch(10, after_pk, batch_size=2)
+        self.assertEqual((after_pk, updated), (self.users[4].pk, 1))
+        self.assertEqual(reset_credits_batch(10, after_pk, batch_size=2), (None, 0))
+
+        self.assertEqual(self.balances(), [10, 10, 10, 20, 10])
+        entries = CreditLedgerEntry.objects.filter(reason='daily_reset').order_by('user_id')
+        self.assertEqual(list(entries.values_list('user_id', 'delta')),
+                         [(self.users[0].pk, 10), (self.users[1].pk, 7), (self.users[4].pk, 9)])
+
+    def test_rollback_changes_nothing(self):
+        self.assertEqual(reset_credits_batch(10, batch_size=100, rollback=True), (self.users[4].pk, 3))
+
+        self.assertEqual(self.balances(), [0, 3, 10, 20, 1])
+        self.assertFalse(CreditLedgerEntry.objects.filter(reason='daily_reset').exists())
+
+    def test_command_resets_in_batches_and_reconciles(self):
+        output = self.run_command(credits=10, batch_size=2, throttle=0)
+
+        self.assertIn('aggiornati 3 utenti in 2 blocchi', output)
+        self.assertEqual(self.balances(), [10, 10, 10, 20, 10])
+        self.assertIn('0 utenti non allineati', reconcile())
+
+    def test_dry_run(self):
+        output = self.run_command(credits=10, batch_size=2, dry_run=True)
+
+        self.assertIn('utenti da aggiornare: 3', output)
+        self.assertIn('blocchi:              2 da 2', output)
+        self.assertEqual(self.balances(), [0, 3, 10, 20, 1])
@@ -0,0 +1,97 @@
+import subprocess
+import sys
+import threading
+import time
+from django.test import SimpleTestCase
+from core.io_engine import EVENT_EXIT, EVENT_OUTPUT, EVENT_TICK, EVENT_TIMEOUT, IOEngine
+from core.process_group import spawn, terminate_group
+
+
+# Motore I/O a eventi: un solo thread legge le pipe di tutti i processi osservati
+class IOEngineTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Motore dedicato ai test (non condiviso con i task reali)
+        cls.engine = IOEngine()
+        cls.engine.start()
+
+    def watch(self, script, **kwargs):
+        process = spawn([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return self.engine.watch(process, **kwargs)
+
+    # Eventi fino all'uscita del processo (senza leggere l'output nel frattempo)
+    def events_until_exit(self, watch, timeout=10.0):
+        events = []
+        deadline = time.monotonic() + timeout
+        while EVENT_EXIT not in events:
+            self.assertLess(time.monotonic(), deadline)
+            event = watch.next_event(timeout=0.5)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def test_output_is_read_before_exit(self):
+        watch = self.watch(
+            'import sys\n'
+            'for i in range(1000): print(f"riga {i}")\n'
+            'sys.stderr.write("errore\\n")\n'
+            'sys.exit(3)\n'
+        )
+
+        self.events_until_exit(watch)
+        stdout, stderr = watch.take_output()
+
+        self.assertEqual(stdout, ''.join(f'riga {i}\n' for i in range(1000)))
+        self.assertEqual(stderr, 'errore\n')
+        self.assertEqual(watch.returncode, 3)
+        self.assertIsNotNone(watch.usage)
+
+    def test_output_events_are_coalesced(self):
+        watch = self.watch(
+            'import sys, time\n'
+            'for i in range(20):\n'
+            '    print(i, flush=True)\n'
+            '    time.sleep(0.005)\n'
+        )
+
+        # Finché l'output non viene letto, altri blocchi non generano nuovi eventi
+        events = self.events_until_exit(watch)
+
+        self.assertEqual(events, [EVENT_OUTPUT, EVENT_EXIT])
+        self.assertEqual(watch.take_output()[0], ''.join(f'{i}\n' for i in range(20)))
+
+    def test_multibyte_character_split_across_reads(self):
+        watch = self.watch(
+            'import os, time\n'
+            'os.write(1, "caff".encode() + "è".encode()[:1])\n'
+            'time.sleep(0.1)\n'
+            'os.write(1, "è".encode()[1:] + b"\\n")\n'
+        )
+
+        self.events_until_exit(watch)
+
+        self.assertEqual(watch.take_output()[0], 'caffè\n')
+
+    def test_timeout_and_ticks(self):
+        watch = self.watch('import time; time.sleep(30)', timeout=0.3, tick_interval=0.1)
+
+        events = []
+        while EVENT_TIMEOUT not in events:
+            events.append(watch.next_event(timeout=5))
+        self.assertGreaterEqual(events.count(EVENT_TICK), 1)
+
+        terminate_group(watch.process.pid, watch.wait_exit, grace=2.0)
+        self.assertTrue(watch.wait_exit(0))
+        self.assertEqual(watch.returncode, -15)
+
+    def test_many_processes_share_one_thread(self):
+        threads = threading.active_count()
+        watches = [self.watch(f'print({i})') for i in range(20)]
+
+        for i, watch in enumerate(watches):
+            self.assertTrue(watch.wait_exit(10))
+            self.assertEqual(watch.take_output()[0], f'{i}\n')
+        # Nessun thread per processo: le pipe le legge il loop del motore
+        self.assertEqual(threading.active_count(), threads)
@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from core import manifest
+from core.checks import check_exercise_manifests
+from core.manifest import MANIFEST_NAME, ExerciseManifest, ManifestError, ManifestRegistry
+
+
+# Manifest degli esercizi: validazione di exercise.json, registro in memoria e controllo all'avvio
+class ManifestTests(SimpleTestCase):
+
+    def setUp(self):
+        self.gpu_dir = tempfile.mkdtemp(prefix='gpu_test_manifest_')
+        self.addCleanup(shutil.rmtree, self.gpu_dir, ignore_errors=True)
+
+    # Crea gpu/<name>/ con i file indicati e il manifest (dict serializzato o testo grezzo)
+    def exercise(self, name, data, files=('main.cu',)):
+        directory = os.path.join(self.gpu_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        for filename in files:
+            with open(os.path.join(directory, filename), 'w') as f:
+                f.write('// file\n')
+        with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+        return directory
+
+    def test_load_applies_defaults(self):
+        directory = self.exercise('sum', {'harness': 'main.cu'})
+
+        loaded = ExerciseManifest.load(directory)
+
+        self.assertEqual((loaded.name, loaded.directory), ('sum', directory))
+        self.assertEqual(loaded.harness_path, os.path.join(directory, 'main.cu'))
+        self.assertEqual(loaded.source_define, 'TEMP_FILE_PATH')
+        self.assertIsNone(loaded.compiler)
+        self.assertIsNone(loaded.declarations_path)
+        self.assertEqual((loaded.flags, loaded.inputs, loaded.args, loaded.limits), ([], [], [], {}))
+
+    def test_load_full_manifest(self):
+        directory = self.exercise('scale', {
+            'harness': 'main.cu', 'source_define': 'STUDENT_SRC', 'declarations': 'student.h',
+            'compiler': 'clang', 'flags': ['-rdc=true'], 'inputs': ['data/in.txt'], 'args': ['3'],
+            'limits': {'memory_mb': 512, 'cpu_seconds': None},
+        }, files=('main.cu', 'student.h'))
+        os.makedirs(os.path.join(directory, 'data'))
+        with open(os.path.join(directory, 'data', 'in.txt'), 'w') as f:
+            f.write('1 2 3\n')
+
+        loaded = ExerciseManifest.load(directory)
+
+        self.assertEqual(loaded.declarations_path, os.path.join(directory, 'student.h'))
+        self.assertEqual(loaded.input_paths(), [('data/in.txt', os.path.join(directory, 'data', 'in.txt'))])
+        self.assertEqual((loaded.compiler, loaded.flags, loaded.args), ('clang', ['-rdc=true'], ['3']))
+
+    def test_invalid_manifests(self):
+        cases = [
+            ('{non json', 'non leggibile'),
+            ('[]', 'deve essere un oggetto JSON'),
+            ({'harness': 'main.cu', 'script': 'run.sh'}, "chiavi sconosciute ['script']"),
+            ({}, '"harness" obbligatorio'),
+            ({'harness': 'main.cu', 'source_define': 'NON-VALIDA'}, '"source_define" deve essere il nome di una macro'),
+            ({'harness': 'main.cu', 'declarations': ''}, '"declarations" deve essere il percorso di un header'),
+            ({'harness': 'main.cu', 'compiler': 3}, '"compiler" deve essere una stringa'),
+            ({'harness': 'main.cu', 'flags': '-O2'}, '"flags" deve essere una lista di stringhe'),
+            ({'harness': 'main.cu', 'args': [1]}, '"args" deve essere una lista di stringhe'),
+            ({'harness': 'assente.cu'}, 'file "assente.cu" non trovato'),
+            ({'harness': '../main.cu'}, '"../main.cu" deve essere un percorso nella cartella'),
+            ({'harness': 'main.cu', 'inputs': ['/etc/passwd']}, '"/etc/passwd" deve essere un percorso nella cartella'),
+            ({'harness': 'main.cu', 'limits': {'gpu': 1}}, '"limits" accetta solo'),
+            ({'harness': 'main.cu', 'limits': {'memory_mb': -1}}, 'limite "memory_mb" non valido (-1)'),
+            ({'harness': 'main.cu', 'limits': {'processes': True}}, 'limite "processes" non valido (True)'),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data):
+                directory = self.exercise('bad', data)
+                with self.assertRaisesMessage(ManifestError, message):
+                    ExerciseManifest.load(directory)
+
+        with self.assertRaisesMessage(ManifestError, f'vuoto: {MANIFEST_NAME} mancante'):
+            ExerciseManifest.load(os.path.join(self.gpu_dir, 'vuoto'))
+
+    @override_settings(RUN_MEMORY_LIMIT_MB=2048, RUN_CPU_TIME_LIMIT=10, RUN_MAX_PROCESSES=0, RUN_MAX_FILE_SIZE_MB=10)
+    def test_resource_limits_precedence(self):
+        directory = self.exercise('sum', {'harness': 'main.cu', 'limits': {'memory_mb': 512, 'cpu_seconds': 5}})
+
+        limits = ExerciseManifest.load(directory).resource_limits({'cpu_seconds': 2, 'processes': None})
+
+        self.assertEqual((limits.memory_mb, limits.cpu_seconds, limits.processes, limits.file_size_mb), (512, 2, None, 10))
+
+    def test_registry_caches_until_file_changes(self):
+        directory = self.exercise('sum', {'harness': 'main.cu'})
+        registry = ManifestRegistry(self.gpu_dir)
+
+        first = registry.get('sum')
+        self.assertIs(registry.get('sum'), first)
+
+        self.exercise('sum', {'harness': 'main.cu', 'args': ['1']})
+        path = os.path.join(directory, MANIFEST_NAME)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        reloaded = registry.get('sum')
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(reloaded.args, ['1'])
+
+        for name in ('', '.hidden', f'..{os.sep}sum', 'assente'):
+            with self.subTest(name=name), self.assertRaises(ManifestError):
+                registry.get(name)
+
+    def test_registry_validate_and_names(self):
+        self.exercise('sum', {'harness': 'main.cu'})
+        self.exercise('broken', {'harness': 'assente.cu'})
+        self.exercise('_template', {})
+        os.makedirs(os.path.join(self.gpu_dir, 'senza_manifest'))
+        registry = ManifestRegistry(self.gpu_dir)
+
+        self.assertEqual(registry.names(), ['_template', 'broken', 'sum'])
+        self.assertEqual(registry.validate(), [
+            'broken: file "assente.cu" non trovato',
+            f'senza_manifest: {MANIFEST_NAME} mancante',
+        ])
+        self.assertEqual(ManifestRegistry(os.path.join(self.gpu_dir, 'assente')).validate(),
+                         [f'Cartella degli esercizi non trovata: {os.path.join(self.gpu_dir, "assente")}'])
+
+    def test_system_check_reports_invalid_manifests(self):
+        self.exercise('sum', {'harness': 'main.cu'})
+        with mock.patch.object(manifest, '_registry', ManifestRegistry(self.gpu_dir)):
+            self.assertEqual(check_exercise_manifests(None), [])
+
+            self.exercise('broken', {'harness': 'main.cu', 'flags': [1]})
+            errors = check_exercise_manifests(None)
+
+        self.assertEqual([(error.id, error.msg) for error in errors],
+                         [('core.E001', 'broken: "flags" deve essere una lista di stringhe')])
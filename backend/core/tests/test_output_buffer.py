@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+from core.output_buffer import TRUNCATION_MARKER, OutputBuffer
+
+
+# Buffer di output limitato: testa stabile, coda scorrevole e contatori dei caratteri
+class OutputBufferTests(SimpleTestCase):
+
+    def write_lines(self, buffer, count):
+        text = ''.join(f'riga {i:04d}\n' for i in range(count))   # 10 caratteri per riga
+        for i in range(0, len(text), 7):
+            buffer.write(text[i:i + 7])
+        return text
+
+    def test_within_limit_keeps_everything(self):
+        buffer = OutputBuffer(max_size=1000, tail_size=200)
+        text = self.write_lines(buffer, 100)
+
+        self.assertEqual(buffer.getvalue(), text)
+        self.assertFalse(buffer.overflowed)
+        self.assertEqual((len(buffer), buffer.total, buffer.dropped), (1000, 1000, 0))
+
+    def test_truncation_without_tail(self):
+        buffer = OutputBuffer(max_size=100)
+        text = self.write_lines(buffer, 50)
+
+        self.assertTrue(buffer.overflowed)
+        self.assertEqual(buffer.getvalue(), text[:100] + TRUNCATION_MARKER)
+        self.assertEqual((buffer.head_size, buffer.total, buffer.dropped), (100, 500, 400))
+
+    def test_truncation_keeps_head_and_tail(self):
+        buffer = OutputBuffer(max_size=100, tail_size=30)
+        text = self.write_lines(buffer, 50)
+
+        self.assertEqual(buffer.getvalue(), text[:70] + '\n... [Output troncato: omessi 400 caratteri] ...\n' + text[-30:])
+        self.assertEqual((buffer.head_size, len(buffer), buffer.dropped), (70, 100, 400))
+
+    def test_large_write_splits_between_head_and_tail(self):
+        buffer = OutputBuffer(max_size=10, tail_size=4)
+        buffer.write('0123456789abcdef')
+
+        self.assertEqual(buffer.read_since(0), '012345')
+        self.assertTrue(buffer.getvalue().endswith('\ncdef'))
+        self.assertEqual(buffer.dropped, 6)
+
+    def test_read_since_returns_only_new_head(self):
+        buffer = OutputBuffer(max_size=100, tail_size=30)
+        text = self.write_lines(buffer, 50)
+
+        self.assertEqual(buffer.read_since(0), text[:70])
+        self.assertEqual(buffer.read_since(33), text[33:70])
+        self.assertEqual(buffer.read_since(70), '')
+        self.assertEqual(buffer.read_since(-5), text[:70])
+
+    def test_empty_writes_are_ignored(self):
+        buffer = OutputBuffer(max_size=10)
+        buffer.write('')
+
+        self.assertEqual((buffer.getvalue(), buffer.total, buffer.read_since(0)), ('', 0, ''))
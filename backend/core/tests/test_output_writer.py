@@ -0,0 +1,84 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core.bench import create_bench_fixtures
+from core.models import Task
+from core.output_buffer import OutputBuffer
+from core.output_writer import LiveOutputWriter
+
+
+# Orologio manuale al posto di time.monotonic
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# Salvataggi accorpati dell'output live: poche UPDATE anche con molte scritture piccole
+class LiveOutputWriterTests(TestCase):
+
+    def setUp(self):
+        _, exercise, (user,) = create_bench_fixtures()
+        self.task = Task.objects.create(user=user, exercise=exercise, code='int x;', status='running')
+        self.stdout, self.stderr = OutputBuffer(max_size=1_000_000), OutputBuffer(max_size=1_000_000)
+        self.clock = FakeClock()
+        patcher = mock.patch('core.output_writer.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, writer, stdout='', stderr=''):
+        self.stdout.write(stdout)
+        self.stderr.write(stderr)
+        writer.mark(len(stdout) + len(stderr))
+        return writer.flush_if_due()
+
+    def task_updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "core_task"')]
+
+    def test_chatty_writer_flushes_by_size(self):
+        writer = LiveOutputWriter(self.task, self.stdout, self.stderr, interval=3600, flush_size=1000)
+        expected_bytes = 0
+        with CaptureQueriesContext(connection) as context:
+            for n in range(1000):
+                # 10 caratteri per scrittura: un salvataggio ogni 100 scritture
+                if self.write(writer, stdout=f'riga {n:04d}\n'):
+                    expected_bytes += len(self.stdout.getvalue()) + len(self.stderr.getvalue())
+
+        self.assertEqual(len(self.task_updates(context.captured_queries)), 10)
+        self.assertEqual(writer.stats(), {'writes': 10, 'bytes_written': expected_bytes})
+        self.assertEqual(expected_bytes, sum(1000 * n for n in range(1, 11)))
+        self.task.refresh_from_db()
+        self.assertEqual(len(self.task.stdout), 10_000)
+
+    def test_flush_by_interval(self):
+        writer = LiveOutputWriter(self.task, self.stdout, self.stderr, interval=0.5, flush_size=1_000_000)
+
+        self.assertIsNone(writer.time_until_due())
+        self.assertFalse(self.write(writer, stdout='a'))
+        self.clock.now += 0.2
+        self.assertFalse(self.write(writer, stderr='errore'))
+        self.assertAlmostEqual(writer.time_until_due(), 0.3)
+
+        self.clock.now += 0.3
+        self.assertTrue(writer.flush_if_due())
+        self.assertIsNone(writer.time_until_due())
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.stdout, self.task.stderr), ('a', 'errore'))
+        self.assertEqual(writer.stats(), {'writes': 1, 'bytes_written': 7})
+
+    def test_finish_counts_final_write_without_saving(self):
+        writer = LiveOutputWriter(self.task, self.stdout, self.stderr, interval=3600, flush_size=1_000_000)
+        for _ in range(50):
+            self.write(writer, stdout='x' * 20)
+
+        with CaptureQueriesContext(connection) as context:
+            self.task.complete(stdout=self.stdout.getvalue())
+            writer.finish()
+
+        # Il salvataggio finale è quello del cambio di stato: nessuna scrittura live in più
+        self.assertEqual(len(self.task_updates(context.captured_queries)), 1)
+        self.assertEqual(writer.stats(), {'writes': 1, 'bytes_written': 1000})
+        self.assertIsNone(writer.time_until_due())
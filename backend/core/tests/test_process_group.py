@@ -0,0 +1,117 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from django.test import SimpleTestCase
+from core.process_group import has_exited, reap, run, spawn, terminate_group
+
+# Albero di processi: ogni figlio crea un nipote (il primo figlio ignora SIGTERM) e tutti
+# comunicano il proprio pid al processo principale, che li scrive su stdout e poi esce
+# ('exit') o resta in attesa finché non viene terminato ('timeout')
+TREE_SCRIPT = r'''
+import os, signal, sys, time
+CHILDREN = 3
+r, w = os.pipe()
+for i in range(CHILDREN):
+    if os.fork() == 0:
+        if i == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        if os.fork() == 0:
+            os.write(w, b"%d\n" % os.getpid())
+            time.sleep(600)
+            os._exit(0)
+        os.write(w, b"%d\n" % os.getpid())
+        time.sleep(600)
+        os._exit(0)
+pids = b""
+while pids.count(b"\n") < CHILDREN * 2:
+    pids += os.read(r, 4096)
+os.write(1, pids)
+if sys.argv[1] == "exit":
+    sys.exit(3)
+time.sleep(600)
+'''
+DESCENDANTS = 6
+
+
+# True se il processo è ancora in esecuzione (uno zombie attende solo di essere raccolto da init)
+def running(pid: int) -> bool:
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+class ProcessTreeTests(SimpleTestCase):
+
+    def tearDown(self):
+        for pid in self.survivors(getattr(self, 'pids', []), timeout=0):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    # Attende che i processi terminino e restituisce quelli ancora in esecuzione
+    def survivors(self, pids, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        alive = [pid for pid in pids if running(pid)]
+        while alive and time.monotonic() < deadline:
+            time.sleep(0.02)
+            alive = [pid for pid in alive if running(pid)]
+        return alive
+
+    def wait_exit(self, process):
+        def wait(timeout):
+            deadline = time.monotonic() + timeout
+            while not has_exited(process):
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.01)
+            return True
+        return wait
+
+    def read_pids(self, process):
+        pids = []
+        while len(pids) < DESCENDANTS:
+            line = process.stdout.readline()
+            if not line:
+                break
+            pids.append(int(line))
+        self.pids = pids
+        return pids
+
+    def test_exit_kills_descendants(self):
+        process = spawn([sys.executable, '-c', TREE_SCRIPT, 'exit'], stdout=subprocess.PIPE)
+        pids = self.read_pids(process)
+
+        returncode, usage = reap(process)
+        process.stdout.close()
+
+        self.assertEqual(len(pids), DESCENDANTS)
+        self.assertEqual(returncode, 3)
+        self.assertIsNotNone(usage)
+        self.assertEqual(self.survivors(pids), [])
+
+    def test_timeout_terminates_tree(self):
+        process = spawn([sys.executable, '-c', TREE_SCRIPT, 'timeout'], stdout=subprocess.PIPE)
+        pids = self.read_pids(process)
+
+        # Il primo figlio ignora SIGTERM: viene ucciso dal SIGKILL al gruppo in reap()
+        terminate_group(process.pid, self.wait_exit(process), 0.3)
+        returncode, _ = reap(process)
+        process.stdout.close()
+
+        self.assertEqual(len(pids), DESCENDANTS)
+        self.assertEqual(returncode, -15)
+        self.assertEqual(self.survivors(pids), [])
+
+    def test_run_timeout_kills_background_processes(self):
+        with self.assertRaises(subprocess.TimeoutExpired) as raised:
+            run(['bash', '-c', 'sleep 600 & echo $!; sleep 600'], timeout=0.5)
+
+        pids = [int(pid) for pid in raised.exception.output.split()]
+        self.pids = pids
+        self.assertEqual(len(pids), 1)
+        self.assertEqual(self.survivors(pids), [])
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from core.bench import create_bench_fixtures
+from core.models import CreditLedgerEntry, Task, User
+from core.reaper import TaskReaper
+
+
+# Recupero dei task orfani: ogni task di un worker di un altro host viene giudicato dall'heartbeat
+@override_settings(TASK_START_COST=1)
+class TaskReaperTests(TestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures(credits=100)
+        self.requeued = []
+        self.reaper = TaskReaper(on_requeue=self.requeued.append, heartbeat_timeout=30, max_requeues=2)
+        patcher = mock.patch('core.reaper.get_broadcaster')
+        self.broadcaster = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def running_task(self, seconds_ago, credits_cost=5, recovery_count=0):
+        now = timezone.now()
+        return Task.objects.create(
+            user=self.user, exercise=self.exercise, code='int x;', status='running',
+            compile_status='completed', run_status='running', started_at=now - timedelta(minutes=5),
+            run_started_at=now - timedelta(minutes=5), worker_id='otherhost:1',
+            heartbeat_at=now - timedelta(seconds=seconds_ago), credits_cost=credits_cost,
+            recovery_count=recovery_count,
+        )
+
+    def balance(self):
+        return User.objects.get(pk=self.user.pk).credits
+
+    def test_stale_heartbeat_is_requeued(self):
+        task = self.running_task(seconds_ago=120)
+        balance = self.balance()
+
+        with self.assertLogs('core.reaper', 'WARNING') as logs:
+            stats = self.reaper.reap()
+
+        task.refresh_from_db()
+        self.assertIn('rimesso in coda (rimborso 4 crediti)', logs.output[0])
+        self.assertEqual((stats['orphans'], stats['requeued'], stats['failed']), (1, 1, 0))
+        self.assertEqual((task.status, task.compile_status, task.run_status), ('pending', 'pending', 'pending'))
+        self.assertEqual((task.worker_id, task.heartbeat_at, task.recovery_count), ('', None, 1))
+        # Resta addebitato solo il costo di avvio
+        self.assertEqual(task.credits_cost, 1)
+        self.assertEqual(self.balance(), balance + 4)
+        self.assertEqual(CreditLedgerEntry.objects.filter(task=task, reason='refund').get().delta, 4)
+        self.assertEqual([t.id for t in self.requeued], [task.id])
+        self.broadcaster.return_value.send.assert_called_once()
+
+    def test_requeue_cap_fails_and_refunds(self):
+        task = self.running_task(seconds_ago=120, recovery_count=2)
+        balance = self.balance()
+
+        with self.assertLogs('core.reaper', 'WARNING') as logs:
+            stats = self.reaper.reap()
+
+        task.refresh_from_db()
+        self.assertIn('chiuso come fallito (rimborso 5 crediti)', logs.output[0])
+        self.assertEqual((stats['requeued'], stats['failed'], stats['credits_refunded']), (0, 1, 5))
+        self.assertEqual((task.status, task.compile_status, task.run_status), ('failed', 'completed', 'failed'))
+        self.assertEqual(task.credits_cost, 0)
+        self.assertIsNotNone(task.finished_at)
+        self.assertEqual(self.balance(), balance + 5)
+        self.assertEqual(self.requeued, [])
+
+    def test_fresh_heartbeat_is_left_alone(self):
+        task = self.running_task(seconds_ago=5)
+
+        stats = self.reaper.reap()
+
+        task.refresh_from_db()
+        self.assertEqual((stats['orphans'], stats['requeued'], stats['failed']), (0, 0, 0))
+        self.assertEqual((task.status, task.worker_id, task.credits_cost), ('running', 'otherhost:1', 5))
+        self.broadcaster.return_value.send.assert_not_called()
+
+    def test_task_changed_after_scan_is_a_conflict(self):
+        task = self.running_task(seconds_ago=120)
+        balance = self.balance()
+        orphans = self.reaper.find_orphans()
+        self.assertEqual([t.id for t in orphans], [task.id])
+
+        # Il worker torna vivo tra la lettura e l'UPDATE condizionata
+        Task.objects.filter(pk=task.pk).update(heartbeat_at=timezone.now())
+        with mock.patch.object(self.reaper, 'find_orphans', return_value=orphans):
+            stats = self.reaper.reap()
+
+        task.refresh_from_db()
+        self.assertEqual((stats['conflicts'], stats['requeued'], stats['failed']), (1, 0, 0))
+        self.assertEqual((task.status, task.credits_cost), ('running', 5))
+        self.assertEqual(self.balance(), balance)
+        self.assertEqual(self.requeued, [])
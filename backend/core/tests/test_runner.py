@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from core import workspace
+from core.bench import write_stub_compiler
+from core.compiler import CompileCache
+from core.manifest import MANIFEST_NAME
+from core.runner import RunnerClient, RunnerDaemon, RunnerError, RunnerUnavailable
+from core.workspace import WorkspacePool
+
+# Compilatore che rifiuta ogni sorgente (risponde solo alla richiesta di versione)
+FAILING_COMPILER = '''#!/bin/bash
+if [ "$1" = "--version" ]; then echo "fail-nvcc 1.0"; exit 0; fi
+echo "main.cu(1): error: sorgente non valido" >&2
+exit 2
+'''
+
+
+# Protocollo del runner daemon sul socket Unix: ping, run, compile + exec ed errori
+class RunnerProtocolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='gpu_test_runner_')
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        exercise_dir = os.path.join(self.work_dir, 'gpu', 'sum')
+        os.makedirs(exercise_dir)
+        with open(os.path.join(exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'harness': 'main.cu'}, f)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\n')
+
+        pool = WorkspacePool(base_dir=self.work_dir)
+        self.addCleanup(pool.close)
+        patcher = mock.patch.object(workspace, '_pool', pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_daemon(self, compiler=None):
+        compiler = compiler or write_stub_compiler(self.work_dir)
+        socket_path = os.path.join(self.work_dir, 'runner.sock')
+        daemon = RunnerDaemon(socket_path, gpu_dir=os.path.join(self.work_dir, 'gpu'),
+                              cache=CompileCache(directory=os.path.join(self.work_dir, 'cache'),
+                                                 compiler=compiler, flags=[]))
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        self.addCleanup(daemon.server_close)
+        self.addCleanup(daemon.shutdown)
+        self.daemon = daemon
+        return RunnerClient(socket_path)
+
+    def source(self, code):
+        fd, path = tempfile.mkstemp(suffix='.cu', dir=self.work_dir)
+        with os.fdopen(fd, 'w') as f:
+            f.write(code)
+        return path
+
+    # Output completo e codice di uscita del processo avviato dal daemon
+    def collect(self, process):
+        stdout, stderr = process.stdout.read().decode(), process.stderr.read().decode()
+        process.stdout.close()
+        process.stderr.close()
+        return stdout, stderr, process.wait(10)
+
+    def test_ping_lists_exercises(self):
+        client = self.start_daemon()
+
+        self.assertEqual(client.ping(), {'ok': True, 'exercises': ['sum']})
+
+    def test_run_streams_pipes_and_exit_code(self):
+        client = self.start_daemon()
+        source = self.source('echo ciao\necho errore >&2\nexit 4\n')
+
+        launch = client.run('sum', source)
+
+        self.assertTrue(launch.compiled.ok)
+        self.assertFalse(launch.compiled.hit)
+        self.assertEqual(self.collect(launch.process), ('ciao\n', 'errore\n', 4))
+        self.assertIsNotNone(launch.process.usage)
+        # Stesso sorgente: l'eseguibile arriva dalla cache del daemon
+        self.assertTrue(client.run('sum', source).compiled.hit)
+
+    def test_compile_then_exec(self):
+        client = self.start_daemon()
+        workdir = tempfile.mkdtemp(dir=self.work_dir)
+
+        launch = client.compile('sum', self.source('pwd\n'))
+        self.assertTrue(launch.compiled.ok)
+        self.assertTrue(launch.compiled.binary.startswith(self.daemon.cache.directory))
+        self.assertIsNone(launch.process)
+
+        process = client.execute('sum', launch.compiled.binary, workdir=workdir)
+        self.assertEqual(self.collect(process), (f'{os.path.realpath(workdir)}\n', '', 0))
+
+    def test_exec_rejects_binaries_outside_cache(self):
+        client = self.start_daemon()
+        outside = self.source('echo no\n')
+
+        with self.assertRaisesMessage(RunnerError, 'non presente nella cache'):
+            client.execute('sum', outside)
+
+    def test_unknown_exercise(self):
+        client = self.start_daemon()
+
+        with self.assertRaisesMessage(RunnerError, 'Esercizio non trovato: nessuno'):
+            client.run('nessuno', self.source('echo\n'))
+
+    def test_compile_failure_is_reported(self):
+        compiler = os.path.join(self.work_dir, 'nvcc-fail')
+        with open(compiler, 'w') as f:
+            f.write(FAILING_COMPILER)
+        os.chmod(compiler, 0o755)
+        client = self.start_daemon(compiler)
+
+        launch = client.run('sum', self.source('echo\n'))
+
+        self.assertFalse(launch.compiled.ok)
+        self.assertEqual(launch.compiled.returncode, 2)
+        self.assertIn('sorgente non valido', launch.compiled.stderr)
+        self.assertIsNone(launch.process)
+
+    def test_unreachable_socket(self):
+        client = RunnerClient(os.path.join(self.work_dir, 'assente.sock'))
+
+        with self.assertRaises(RunnerUnavailable):
+            client.ping()
@@ -0,0 +1,316 @@
+import copy
+import random
+import threading
+import time
+from django.test import SimpleTestCase, TransactionTestCase
+from core.bench import create_bench_fixtures
+from core.models import Task
+from core.scheduler import QUEUE_POLICIES, PriorityLanes, QueueEntry, TaskScheduler
+
+
+def never_blocked(user_id):
+    return False
+
+
+# Posizione in coda delle politiche: deve coincidere con l'ordine reale di prelievo
+class QueuePositionTests(SimpleTestCase):
+
+    # Ordine in cui i task uscirebbero dalla coda (su una copia) se nessun utente è bloccato
+    def drain_order(self, queue):
+        queue = copy.deepcopy(queue)
+        order = []
+        while len(queue):
+            order.append(queue.pop(never_blocked).task_id)
+        return order
+
+    def assertPositionsMatchOrder(self, queue):
+        order = self.drain_order(queue)
+        self.assertEqual([queue.position(task_id) for task_id in order], list(range(len(order))))
+
+    def test_positions_match_pop_order(self):
+        rng = random.Random(11)
+        for policy, queue_class in QUEUE_POLICIES.items():
+            with self.subTest(policy=policy):
+                queue, next_id = queue_class(), 0
+                for _ in range(5):
+                    for _ in range(rng.randrange(5, 30)):
+                        queue.push(QueueEntry(next_id, rng.randrange(6), float(next_id),
+                                              expected=rng.choice((1.0, 5.0, 20.0))))
+                        next_id += 1
+                    self.assertPositionsMatchOrder(queue)
+                    for _ in range(rng.randrange(len(queue))):
+                        queue.pop(never_blocked)
+                    self.assertPositionsMatchOrder(queue)
+                self.assertIsNone(queue.position(next_id))
+
+
+# Errori imprevisti nei worker dello scheduler: registrati nel log e task chiuso come fallito
+class SchedulerErrorTests(TransactionTestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+
+    def wait_for(self, condition, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+
+    def test_crash_in_execute_fails_task(self):
+        task = Task.objects.create(user=self.user, exercise=self.exercise, code='int x;', status='pending')
+
+        def crash(task):
+            raise RuntimeError('esecutore rotto')
+
+        scheduler = TaskScheduler(crash, workers=1, refill_interval=0.05, pending=lambda: [])
+        with self.assertLogs('core.scheduler', 'ERROR') as logs:
+            scheduler.start()
+            try:
+                scheduler.submit(task.id, self.user.id)
+                self.wait_for(lambda: scheduler.stats()['errors'] == 1)
+            finally:
+                scheduler.stop()
+
+        self.assertIn(f'task {task.id}', logs.output[0])
+        self.assertIn('esecutore rotto', logs.output[0])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.compile_status, task.run_status), ('failed', 'failed', 'skipped'))
+        self.assertIsNotNone(task.finished_at)
+
+    def test_crash_after_completion_keeps_final_status(self):
+        task = Task.objects.create(user=self.user, exercise=self.exercise, code='int x;', status='pending')
+
+        def complete_then_crash(task):
+            task.complete(stdout='ok')
+            raise RuntimeError('errore dopo la chiusura')
+
+        scheduler = TaskScheduler(complete_then_crash, workers=1, refill_interval=0.05, pending=lambda: [])
+        with self.assertLogs('core.scheduler', 'ERROR'):
+            scheduler.start()
+            try:
+                scheduler.submit(task.id, self.user.id)
+                self.wait_for(lambda: scheduler.stats()['errors'] == 1)
+            finally:
+                scheduler.stop()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'completed')
+
+    def test_pending_reload_error_is_logged(self):
+        def broken_pending():
+            raise RuntimeError('database non raggiungibile')
+
+        scheduler = TaskScheduler(lambda task: None, workers=1, refill_interval=0.05, pending=broken_pending)
+        with self.assertLogs('core.scheduler', 'ERROR') as logs:
+            scheduler._load_pending()
+
+        self.assertIn('database non raggiungibile', '\n'.join(logs.output))
+        self.assertEqual(scheduler.queue_size(), 0)
+
+
+# Corsie di priorità, promozione per SLA e ordine della politica 'sjf' (orologio manuale)
+class PriorityLanesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+
+    def lanes(self, policy='fifo', sla=None):
+        return PriorityLanes(policy, sla=sla if sla is not None else {'interactive': 0, 'batch': 0},
+                             clock=lambda: self.now)
+
+    def push(self, lanes, task_id, lane, user_id=None, expected=0.0):
+        lanes.push(QueueEntry(task_id, user_id, self.now, lane, expected))
+
+    def drain(self, lanes):
+        popped = []
+        while len(lanes):
+            entry, reason = lanes.pop(never_blocked)
+            popped.append((entry.task_id, reason))
+        return popped
+
+    def test_staff_before_interactive_before_batch(self):
+        lanes = self.lanes()
+        for task_id, lane in enumerate(['batch', 'interactive', 'staff', 'batch', 'staff', 'interactive']):
+            self.push(lanes, task_id, lane)
+
+        self.assertEqual([lanes.position(task_id) for task_id in (2, 4, 1, 5, 0, 3)], [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self.drain(lanes), [(2, 'priority'), (4, 'priority'), (1, 'priority'),
+                                             (5, 'priority'), (0, 'priority'), (3, 'priority')])
+
+    def test_unknown_lane_is_interactive(self):
+        lanes = self.lanes()
+        self.push(lanes, 1, 'batch')
+        self.push(lanes, 2, 'urgentissimo')
+
+        self.assertEqual(len(lanes.lanes['interactive']), 1)
+        self.assertEqual(self.drain(lanes), [(2, 'priority'), (1, 'priority')])
+
+    def test_aged_batch_task_is_promoted(self):
+        lanes = self.lanes(sla={'interactive': 0, 'batch': 60})
+        self.push(lanes, 1, 'batch')
+        self.now += 30
+        self.push(lanes, 2, 'interactive')
+        self.push(lanes, 3, 'interactive')
+
+        # Entro lo SLA la corsia batch aspetta
+        self.assertEqual(lanes.pop(never_blocked)[0].task_id, 2)
+
+        # Oltre lo SLA il task batch passa davanti agli interattivi
+        self.now += 31
+        entry, reason = lanes.pop(never_blocked)
+        self.assertEqual((entry.task_id, reason), (1, 'sla'))
+        self.assertEqual(lanes.pop(never_blocked), (QueueEntry(3, None, 1030.0, 'interactive', 0.0), 'priority'))
+
+    def test_most_overdue_lane_goes_first(self):
+        lanes = self.lanes(sla={'interactive': 10, 'batch': 60})
+        self.push(lanes, 1, 'batch')
+        self.push(lanes, 2, 'interactive')
+        self.now += 100   # batch oltre lo SLA di 40s, interattiva di 90s
+
+        self.assertEqual(self.drain(lanes), [(2, 'sla'), (1, 'sla')])
+
+    def test_sjf_orders_by_estimate_then_arrival(self):
+        lanes = self.lanes(policy='sjf')
+        for task_id, expected in enumerate([30.0, 2.0, 10.0, 2.0, 0.5]):
+            self.push(lanes, task_id, 'interactive', user_id=task_id, expected=expected)
+        self.push(lanes, 10, 'staff', expected=100.0)
+
+        self.assertEqual([lanes.position(task_id) for task_id in (10, 4, 1, 3, 2, 0)], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([task_id for task_id, _ in self.drain(lanes)], [10, 4, 1, 3, 2, 0])
+
+    def test_sjf_skips_blocked_users(self):
+        queue = QUEUE_POLICIES['sjf']()
+        queue.push(QueueEntry(1, 7, 0.0, expected=1.0))
+        queue.push(QueueEntry(2, 8, 0.0, expected=5.0))
+
+        self.assertEqual(queue.pop(lambda user_id: user_id == 7).task_id, 2)
+        self.assertEqual(queue.position(1), 0)
+        self.assertEqual(queue.pop(never_blocked).task_id, 1)
+
+
+# Pool a dimensione fissa: al più `workers` task insieme e ogni task eseguito una sola volta
+class WorkerPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.claimed = set()
+        self.executed = []
+        self.running = 0
+        self.max_running = 0
+
+    # Prenotazione come sul database: un task già prenotato non viene restituito di nuovo
+    def claim(self, task_id):
+        with self.lock:
+            if task_id in self.claimed:
+                return None
+            self.claimed.add(task_id)
+        return task_id
+
+    def execute(self, task_id):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+            self.executed.append(task_id)
+
+    def run_scheduler(self, workers, submissions):
+        scheduler = TaskScheduler(self.execute, workers=workers, refill_interval=0.05, name='pool-test',
+                                  claim=self.claim, pending=lambda: [], policy='fifo')
+        with self.assertLogs('core.scheduler', 'INFO') as logs:
+            scheduler.start()
+            try:
+                threads = {thread.name for thread in threading.enumerate() if thread.name.startswith('pool-test-')}
+                for task_id in submissions:
+                    scheduler.submit(task_id)
+                deadline = time.monotonic() + 10
+                while scheduler.stats()['completed'] < len(set(submissions)) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                scheduler.stop()
+        # Ogni task prenotato compare nel log delle decisioni
+        self.assertEqual(len(logs.output), len(self.executed))
+        return scheduler.stats(), threads
+
+    def test_concurrency_is_bounded_by_workers(self):
+        stats, threads = self.run_scheduler(3, range(30))
+
+        self.assertEqual(len(threads), 3)
+        self.assertEqual(self.max_running, 3)
+        self.assertEqual(sorted(self.executed), list(range(30)))
+        self.assertEqual((stats['claimed'], stats['completed'], stats['errors']), (30, 30, 0))
+
+    def test_duplicate_submissions_run_once(self):
+        stats, _ = self.run_scheduler(4, [task_id for task_id in range(20) for _ in range(3)])
+
+        self.assertEqual(sorted(self.executed), list(range(20)))
+        self.assertEqual(stats['submitted'], 60)
+        # Le copie ancora in coda vengono scartate subito, le altre dalla prenotazione
+        self.assertEqual((stats['claimed'], stats['completed'], stats['queued']), (20, 20, 0))
+
+
+# Politica equa: un turno per utente e mai più di per_user_limit task in corso per utente
+class FairShareTests(SimpleTestCase):
+
+    def test_users_take_turns(self):
+        queue = QUEUE_POLICIES['fair']()
+        for task_id, user_id in enumerate([1, 1, 1, 1, 2, 3, 2]):
+            queue.push(QueueEntry(task_id, user_id, 0.0))
+
+        order = [queue.pop(never_blocked).task_id for _ in range(len(queue))]
+        self.assertEqual(order, [0, 4, 5, 1, 6, 2, 3])
+
+    def test_new_user_waits_at_most_one_round(self):
+        queue = QUEUE_POLICIES['fair']()
+        for task_id in range(100):
+            queue.push(QueueEntry(task_id, 1, 0.0))
+        queue.pop(never_blocked)
+        queue.push(QueueEntry(100, 2, 0.0))
+
+        # Davanti c'è solo il turno dell'utente 1, non i suoi 99 task
+        self.assertEqual(queue.position(100), 1)
+        self.assertEqual([queue.pop(never_blocked).task_id for _ in range(2)], [1, 100])
+
+    def test_blocked_user_keeps_turn(self):
+        queue = QUEUE_POLICIES['fair']()
+        queue.push(QueueEntry(1, 1, 0.0))
+        queue.push(QueueEntry(2, 2, 0.0))
+
+        self.assertEqual(queue.pop(lambda user_id: user_id == 1).task_id, 2)
+        self.assertIsNone(queue.pop(lambda user_id: user_id == 1))
+        self.assertEqual(queue.pop(never_blocked).task_id, 1)
+
+    def test_per_user_limit_in_pool(self):
+        lock = threading.Lock()
+        running, peaks, order = {}, {}, []
+
+        def execute(task_id):
+            user_id = task_id // 100
+            with lock:
+                running[user_id] = running.get(user_id, 0) + 1
+                peaks[user_id] = max(peaks.get(user_id, 0), running[user_id])
+                order.append(user_id)
+            time.sleep(0.01)
+            with lock:
+                running[user_id] -= 1
+
+        scheduler = TaskScheduler(execute, workers=4, refill_interval=0.05, name='fair-test', claim=lambda task_id: task_id,
+                                  pending=lambda: [], policy='fair', per_user_limit=1)
+        # L'utente 1 sottomette 8 task prima che arrivino gli altri due
+        submissions = [(100 + i, 1) for i in range(8)] + [(200, 2), (201, 2), (300, 3)]
+        with self.assertLogs('core.scheduler', 'INFO'):
+            for task_id, user_id in submissions:
+                scheduler.submit(task_id, user_id)
+            scheduler.start()
+            try:
+                deadline = time.monotonic() + 10
+                while scheduler.stats()['completed'] < len(submissions) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                scheduler.stop()
+
+        self.assertEqual(scheduler.stats()['completed'], len(submissions))
+        self.assertEqual(peaks, {1: 1, 2: 1, 3: 1})
+        # Gli altri utenti non aspettano la fine dei task dell'utente 1
+        self.assertEqual(set(order[:3]), {1, 2, 3})
@@ -0,0 +1,65 @@
+from unittest import mock
+from django.test import TestCase
+from core.bench import create_bench_fixtures
+from core.executor import PreparedTask, TaskExecutor
+from core.models import Task
+
+
+# Prenotazioni delle due fasi della pipeline: ogni fase prende un task una sola volta
+class StageClaimTests(TestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+
+    def create(self, **kwargs):
+        return Task.objects.create(user=self.user, exercise=self.exercise, code='int x;', **kwargs)
+
+    def test_compile_claim_is_exclusive(self):
+        task = self.create(status='pending')
+
+        claimed = Task.claim(task.id)
+
+        self.assertEqual((claimed.status, claimed.compile_status, claimed.run_status), ('running', 'running', 'pending'))
+        self.assertIsNotNone(claimed.compile_started_at)
+        self.assertTrue(claimed.worker_id)
+        self.assertIsNone(Task.claim(task.id))
+
+    def test_run_claim_requires_compiled_task(self):
+        task = self.create(status='pending')
+        Task.claim(task.id)
+
+        # Ancora in compilazione: la fase di esecuzione non può prenderlo
+        self.assertIsNone(Task.claim_run(task.id))
+        self.assertEqual(Task.compiled_queue(), [])
+
+        Task.objects.filter(id=task.id).update(compile_status='completed')
+        self.assertEqual(Task.compiled_queue(), [(task.id, self.user.id, 'interactive', self.exercise.id)])
+
+        claimed = Task.claim_run(task.id)
+        self.assertEqual((claimed.run_status, claimed.compile_status), ('running', 'completed'))
+        self.assertIsNotNone(claimed.run_started_at)
+        self.assertIsNone(Task.claim_run(task.id))
+        self.assertEqual(Task.compiled_queue(), [])
+
+    def test_queues_follow_stage(self):
+        pending = self.create(status='pending')
+        compiling = self.create(status='running', compile_status='running')
+        compiled = self.create(status='running', compile_status='skipped')
+        finished = self.create(status='completed', compile_status='completed', run_status='completed')
+
+        self.assertEqual([row[0] for row in Task.pending_queue()], [pending.id])
+        self.assertEqual([row[0] for row in Task.compiled_queue()], [compiled.id])
+        self.assertIsNone(Task.claim(compiling.id))
+        self.assertIsNone(Task.claim_run(finished.id))
+
+    def test_interrupted_task_releases_prepared_workspace(self):
+        task = self.create(status='running', compile_status='completed')
+        executor = TaskExecutor()
+        executor._prepared[task.id] = PreparedTask('/tmp/ws-test', '/tmp/ws-test/a.out', manifest=None)
+        task.interrupt(message='Task interrotto (disconnessione client).')
+
+        with mock.patch.object(executor, '_cleanup_workspace') as cleanup:
+            self.assertIsNone(executor.claim_run(task.id))
+
+        cleanup.assert_called_once_with('/tmp/ws-test')
+        self.assertNotIn(task.id, executor._prepared)
@@ -0,0 +1,163 @@
+import json
+from unittest import mock
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from core.bench import create_bench_fixtures
+from core.broadcast import ChannelBroadcaster
+from core.executor import TaskExecutor
+from core.models import Task
+from core.routing import websocket_urlpatterns
+from core.streaming import apply_delta, credits_delta, output_delta, parse_offset, snapshot, status_delta
+
+
+# Consegna dei messaggi incrementali dal thread del task ai consumer WebSocket,
+# attraverso il broadcaster e il channel layer in memoria
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    WS_RESUME_GRACE_PERIOD=0,
+)
+class ChannelBroadcastTests(TransactionTestCase):
+
+    def setUp(self):
+        _, exercise, (user,) = create_bench_fixtures()
+        self.task = Task.objects.create(user=user, exercise=exercise, code='int x;', status='running')
+        self.executor = TaskExecutor()
+        # Broadcaster dedicato al test: il consumer registra il proprio loop su questa istanza
+        self.broadcaster = ChannelBroadcaster(shards=2)
+        for target in ('core.executor.get_broadcaster', 'core.websocket.get_broadcaster'):
+            patcher = mock.patch(target, return_value=self.broadcaster)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    # Connessione al consumer tramite il protocollo ASGI (channels.testing richiede daphne)
+    async def connect(self, query=''):
+        communicator = ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            'type': 'websocket',
+            'path': f'/ws/tasks/{self.task.id}/',
+            'query_string': query.encode(),
+            'headers': [],
+            'subprotocols': [],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output(5))['type'], 'websocket.accept')
+        return communicator
+
+    async def receive(self, communicator):
+        message = await communicator.receive_output(5)
+        self.assertEqual(message['type'], 'websocket.send')
+        return json.loads(message['text'])
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(5)
+
+    async def test_delta_protocol_forwards_deltas(self):
+        communicator = await self.connect('protocol=delta')
+        snapshot = await self.receive(communicator)
+        self.assertEqual((snapshot['type'], snapshot['stdout_offset']), ('snapshot', 0))
+
+        self.executor._ws_output(self.task, 'stdout', 0, 'ciao ')
+        self.executor._ws_output(self.task, 'stdout', 5, 'mondo')
+        self.executor._ws_credits(self.task)
+
+        self.assertEqual(await self.receive(communicator),
+                         {'type': 'output', 'task_id': self.task.id, 'stream': 'stdout', 'offset': 0, 'data': 'ciao '})
+        self.assertEqual((await self.receive(communicator))['offset'], 5)
+        self.assertEqual(await self.receive(communicator),
+                         {'type': 'credits', 'task_id': self.task.id, 'credits_cost': self.task.credits_cost})
+        await self.disconnect(communicator)
+
+        stats = self.broadcaster.stats()
+        self.assertEqual((stats['queued'], stats['sent'], stats['dropped'], stats['errors']), (3, 3, 0, 0))
+
+    async def test_full_protocol_applies_deltas(self):
+        communicator = await self.connect()
+
+        self.executor._ws_output(self.task, 'stdout', 0, 'ciao')
+        state = await self.receive(communicator)
+        self.assertEqual((state['id'], state['stdout'], state['status']), (self.task.id, 'ciao', 'running'))
+
+        self.task.status = 'completed'
+        self.task.stdout = 'ciao'
+        self.executor._ws_status(self.task)
+        state = await self.receive(communicator)
+        self.assertEqual((state['status'], state['stdout']), ('completed', 'ciao'))
+        await self.disconnect(communicator)
+
+    async def test_full_protocol_resyncs_on_gap(self):
+        communicator = await self.connect()
+
+        # Il writer ha già salvato l'output, ma il client non ha ricevuto i primi blocchi:
+        # il consumer ricarica lo stato completo e vi applica il delta
+        self.task.stdout = 'ciao mondo'
+        await self.task.asave(update_fields=['stdout'])
+        self.executor._ws_output(self.task, 'stdout', 5, 'mondo!')
+
+        state = await self.receive(communicator)
+        self.assertEqual(state['stdout'], 'ciao mondo!')
+        await self.disconnect(communicator)
+
+
+# Protocollo incrementale: i delta applicati allo stato ricostruiscono il payload completo
+class DeltaProtocolTests(TestCase):
+
+    def setUp(self):
+        _, exercise, (user,) = create_bench_fixtures()
+        self.task = Task.objects.create(user=user, exercise=exercise, code='int x;', status='running')
+
+    def test_output_deltas_rebuild_stream(self):
+        state = {'stdout': ''}
+        chunks = ['ciao ', 'mondo', '\n']
+        offset = 0
+        for chunk in chunks:
+            self.assertTrue(apply_delta(state, output_delta(self.task.id, 'stdout', offset, chunk)))
+            offset += len(chunk)
+
+        self.assertEqual(state['stdout'], 'ciao mondo\n')
+
+    def test_repeated_delta_is_not_duplicated(self):
+        state = {'stdout': 'ciao mondo'}
+
+        self.assertTrue(apply_delta(state, output_delta(self.task.id, 'stdout', 5, 'mondo')))
+        self.assertTrue(apply_delta(state, output_delta(self.task.id, 'stdout', 5, 'mondo!')))
+
+        self.assertEqual(state['stdout'], 'ciao mondo!')
+
+    def test_gap_requires_resync(self):
+        state = {'stdout': 'ciao'}
+
+        self.assertFalse(apply_delta(state, output_delta(self.task.id, 'stdout', 10, 'x')))
+        self.assertEqual(state['stdout'], 'ciao')
+
+    def test_status_delta_carries_final_output(self):
+        running = status_delta(self.task)
+        self.assertEqual((running['type'], running['task_id'], running['status']), ('status', self.task.id, 'running'))
+        self.assertNotIn('stdout', running)
+
+        self.task.complete(stdout='fine\n', stderr='')
+        state = {'stdout': 'fi', 'status': 'running'}
+        self.assertTrue(apply_delta(state, status_delta(self.task)))
+        self.assertEqual((state['status'], state['stdout']), ('completed', 'fine\n'))
+        self.assertNotIn('type', state)
+
+    def test_credits_delta(self):
+        self.task.credits_cost = 7
+        state = {}
+        apply_delta(state, credits_delta(self.task))
+
+        self.assertEqual(state, {'credits_cost': 7})
+
+    def test_snapshot_resumes_from_offsets(self):
+        self.task.stdout, self.task.stderr = 'ciao mondo', 'errore'
+
+        data = snapshot(self.task, stdout_offset=5, stderr_offset=100)
+
+        self.assertEqual((data['type'], data['task_id']), ('snapshot', self.task.id))
+        self.assertEqual((data['stdout_offset'], data['stderr_offset']), (5, 6))
+        self.assertEqual((data['task']['stdout'], data['task']['stderr']), ('mondo', ''))
+        self.assertNotIn('code', data['task'])
+
+    def test_parse_offset(self):
+        self.assertEqual([parse_offset(value) for value in ('12', '-3', 'x', None)], [12, 0, 0, 0])
@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from core.bench import create_bench_fixtures
+from core.models import Task
+from core.serializers import TaskHistorySerializer
+from core.views import TaskHistoryView
+
+PAYLOAD_COLUMNS = ('code', 'stdout', 'stderr')
+
+
+# Numero di query costante per pagina e colonne di codice e output mai lette nelle liste
+class TaskListQueryTests(TestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_tasks(self, count):
+        Task.objects.bulk_create(
+            Task(user=self.user, exercise=self.exercise, code=f'int x = {n};', stdout='ok', stderr='',
+                 status='completed', message='Completato')
+            for n in range(count)
+        )
+
+    # Query eseguite da una richiesta GET (risposta, lista di SQL)
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def assertPayloadNotSelected(self, queries):
+        for sql in queries:
+            for column in PAYLOAD_COLUMNS:
+                self.assertNotIn(f'"core_task"."{column}"', sql)
+
+    def test_history_queries_constant_across_page_sizes(self):
+        self.create_tasks(60)
+        counts = {}
+        for page_size in (1, 5, 20, 50):
+            response, queries = self.get('/api/tasks/history/', {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertPayloadNotSelected(queries)
+            counts[page_size] = len(queries)
+
+            # La pagina successiva (cursore) costa quanto la prima
+            _, queries = self.get(response.data['next'])
+            self.assertEqual(len(queries), counts[page_size])
+
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_history_related_fields_use_join(self):
+        self.create_tasks(30)
+        fields = 'id,status,exercise_name,user_matr,user_name'
+        _, small = self.get('/api/tasks/history/', {'fields': fields, 'page_size': 2})
+        response, large = self.get('/api/tasks/history/', {'fields': fields, 'page_size': 30})
+
+        self.assertEqual(len(small), len(large))
+        self.assertPayloadNotSelected(large)
+        self.assertEqual(set(response.data['results'][0]), set(fields.split(',')))
+
+    def test_history_defers_payload_for_every_field_selection(self):
+        self.create_tasks(1)
+        view = TaskHistoryView()
+        view.request = APIRequestFactory().get('/api/tasks/history/')
+        view.request.user = self.user
+        for fields in (TaskHistorySerializer.DEFAULT_FIELDS, list(TaskHistorySerializer.COLUMNS), ['id']):
+            view.requested_fields = fields
+            task = view.get_queryset().get()
+            self.assertTrue(set(PAYLOAD_COLUMNS) <= task.get_deferred_fields(), fields)
+
+    def test_list_queries_constant_across_task_counts(self):
+        self.create_tasks(2)
+        response, few = self.get('/api/tasks/')
+        self.assertEqual(len(response.data), 2)
+
+        self.create_tasks(20)
+        response, many = self.get('/api/tasks/')
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(few), len(many))
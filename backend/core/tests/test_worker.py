@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from core import compiler, manifest, workspace
+from core.bench import create_bench_fixtures, write_stub_compiler
+from core.compiler import CompileCache
+from core.manifest import MANIFEST_NAME, ManifestRegistry
+from core.models import Task
+from core.worker import MESSAGE_SUBMITTED, QUEUE_GROUP, TaskWorker
+from core.workspace import WorkspacePool
+
+
+# Sottomissione con EXECUTION_MODE='worker': il processo HTTP salva il task e notifica i worker
+@override_settings(EXECUTION_MODE='worker', MAX_ACTIVE_TASKS_PER_USER=0)
+class WorkerSubmitTests(TestCase):
+
+    def setUp(self):
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submit_only_inserts_and_notifies(self):
+        with mock.patch('core.worker.get_broadcaster') as broadcaster, \
+                mock.patch('core.worker.get_scheduler') as scheduler, \
+                CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/run/', {'code': 'echo ok', 'exercise_id': self.exercise.id},
+                                        format='json')
+
+        self.assertEqual(response.status_code, 200)
+        task = Task.objects.get(pk=response.data['task_id'])
+        self.assertEqual((task.status, task.compile_status, task.run_status), ('pending', 'pending', 'pending'))
+        self.assertIsNone(task.started_at)
+
+        # Nessuna pipeline locale: solo la notifica ai worker
+        scheduler.assert_not_called()
+        broadcaster.return_value.send.assert_called_once_with(QUEUE_GROUP, {
+            'type': MESSAGE_SUBMITTED,
+            'task_id': task.id,
+            'user_id': self.user.id,
+            'priority': 'interactive',
+            'exercise_id': self.exercise.id,
+        })
+
+        # Sul task un solo INSERT, mai aggiornato dal processo HTTP
+        task_writes = [query['sql'] for query in context.captured_queries
+                       if query['sql'].startswith(('INSERT INTO "core_task"', 'UPDATE "core_task"'))]
+        self.assertEqual(len(task_writes), 1)
+        self.assertTrue(task_writes[0].startswith('INSERT'))
+
+
+# Worker nello stesso processo con esercizio e compilatore finti: il task accodato viene completato
+@override_settings(EXECUTION_MODE='worker', RUNNER_SOCKET='', COMPILE_CACHE_ENABLED=True)
+class TaskWorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        work_dir = tempfile.mkdtemp(prefix='gpu_test_worker_')
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        exercise_dir = os.path.join(work_dir, 'gpu', 'sum')
+        os.makedirs(exercise_dir)
+        with open(os.path.join(exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'harness': 'main.cu'}, f)
+        with open(os.path.join(exercise_dir, 'main.cu'), 'w') as f:
+            f.write('#include TEMP_FILE_PATH\n')
+
+        # Istanze globali puntate sulla cartella temporanea (il pool usa il registro degli esercizi)
+        self.patch(manifest, '_registry', ManifestRegistry(os.path.join(work_dir, 'gpu')))
+        self.patch(compiler, '_cache', CompileCache(directory=os.path.join(work_dir, 'cache'),
+                                                    compiler=write_stub_compiler(work_dir), flags=[]))
+        pool = WorkspacePool(base_dir=work_dir)
+        self.addCleanup(pool.close)
+        self.patch(workspace, '_pool', pool)
+
+        _, self.exercise, (self.user,) = create_bench_fixtures()
+
+    def patch(self, module, name, value):
+        patcher = mock.patch.object(module, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_worker_completes_pending_task(self):
+        task = Task.objects.create(user=self.user, exercise=self.exercise, code='echo "dal worker"\n',
+                                   priority='interactive', status='pending')
+        worker = TaskWorker(poll_interval=0.1, listen=False)
+        worker.start()
+        try:
+            deadline = time.monotonic() + 30
+            while Task.objects.filter(pk=task.pk, status__in=['pending', 'running']).exists():
+                self.assertLess(time.monotonic(), deadline, 'Task non concluso dal worker')
+                time.sleep(0.05)
+        finally:
+            worker.shutdown(timeout=10)
+
+        task.refresh_from_db()
+        task.load_payload()
+        self.assertEqual(task.status, 'completed', task.stderr or task.message)
+        self.assertEqual((task.compile_status, task.run_status), ('completed', 'completed'))
+        self.assertIn('dal worker', task.stdout)
+        self.assertEqual(worker.stats()['notifications'], 0)   # Trovato dalla lettura periodica
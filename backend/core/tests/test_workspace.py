@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from core import manifest
+from core.manifest import MANIFEST_NAME, ManifestRegistry
+from core.workspace import WORKSPACE_ROOT_NAME, WorkspacePool
+
+
+# Pool delle cartelle di lavoro: modelli con hard link, ripristino al rilascio e pulizia dei processi terminati
+class WorkspacePoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='gpu_test_workspace_')
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.exercise_dir = os.path.join(self.work_dir, 'gpu', 'sum')
+        os.makedirs(os.path.join(self.exercise_dir, 'data'))
+        with open(os.path.join(self.exercise_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'harness': 'main.cu', 'inputs': ['data/in.txt']}, f)
+        self.write('main.cu', '#include TEMP_FILE_PATH\n')
+        self.write('data/in.txt', '1 2 3\n')
+
+        # Registro dedicato: la pulizia iniziale guarda solo la cartella gpu/ del test
+        registry = ManifestRegistry(os.path.join(self.work_dir, 'gpu'))
+        patcher = mock.patch.object(manifest, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manifest = registry.get('sum')
+
+    def write(self, relative, text):
+        with open(os.path.join(self.exercise_dir, relative), 'w') as f:
+            f.write(text)
+
+    def pool(self, **kwargs):
+        pool = WorkspacePool(base_dir=self.work_dir, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_acquire_links_template_files(self):
+        pool = self.pool(pool_size=2)
+
+        workspace = pool.acquire(self.manifest)
+
+        with open(os.path.join(workspace, 'data', 'in.txt')) as f:
+            self.assertEqual(f.read(), '1 2 3\n')
+        # Stesso inode del modello: nessuna copia dei dati per task
+        template = pool._templates['sum']
+        self.assertEqual(os.stat(os.path.join(workspace, 'main.cu')).st_ino, template.files['main.cu'][0])
+        self.assertEqual(os.stat(os.path.join(workspace, 'main.cu')).st_mode & 0o777, 0o444)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_release_resets_and_reuses(self):
+        pool = self.pool(pool_size=2)
+        workspace = pool.acquire(self.manifest)
+        # Un task scrive file e cartelle, elimina un input e lascia un link simbolico
+        with open(os.path.join(workspace, 'a.out'), 'w') as f:
+            f.write('binario')
+        os.makedirs(os.path.join(workspace, 'out', 'nested'))
+        with open(os.path.join(workspace, 'out', 'nested', 'result.txt'), 'w') as f:
+            f.write('42')
+        os.unlink(os.path.join(workspace, 'data', 'in.txt'))
+        os.symlink(self.work_dir, os.path.join(workspace, 'link'))
+
+        pool.release(workspace)
+
+        self.assertEqual(sorted(os.listdir(workspace)), ['data', 'main.cu'])
+        self.assertEqual(os.listdir(os.path.join(workspace, 'data')), ['in.txt'])
+        self.assertTrue(os.path.isdir(self.work_dir))
+        self.assertEqual(pool.acquire(self.manifest), workspace)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['recycled'], stats['reused'], stats['in_use']), (1, 1, 1, 1))
+
+    def test_full_pool_discards_workspace(self):
+        pool = self.pool(pool_size=1)
+        first, second = pool.acquire(self.manifest), pool.acquire(self.manifest)
+
+        pool.release(first)
+        pool.release(second)
+
+        self.assertTrue(os.path.isdir(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual((pool.stats()['idle'], pool.stats()['discarded']), (1, 1))
+
+    def test_changed_exercise_rebuilds_template(self):
+        pool = self.pool(pool_size=2)
+        workspace = pool.acquire(self.manifest)
+        old_template = pool._templates['sum'].directory
+        pool.release(workspace)
+
+        self.write('data/in.txt', '4 5 6 7\n')
+        fresh = pool.acquire(self.manifest)
+
+        self.assertNotEqual(fresh, workspace)
+        self.assertFalse(os.path.exists(workspace))
+        self.assertFalse(os.path.exists(old_template))
+        with open(os.path.join(fresh, 'data', 'in.txt')) as f:
+            self.assertEqual(f.read(), '4 5 6 7\n')
+
+    def test_modified_template_is_dropped(self):
+        pool = self.pool(pool_size=2)
+        workspace = pool.acquire(self.manifest)
+        template = pool._templates['sum']
+        # Scrittura attraverso l'hard link: il modello condiviso non è più affidabile
+        with open(os.path.join(workspace, 'main.cu'), 'a') as f:
+            f.write('// modificato\n')
+
+        with self.assertLogs('core.workspace', 'WARNING'):
+            pool.release(workspace)
+
+        self.assertFalse(os.path.exists(workspace))
+        self.assertFalse(os.path.exists(template.directory))
+        fresh = pool.acquire(self.manifest)
+        with open(os.path.join(fresh, 'main.cu')) as f:
+            self.assertEqual(f.read(), '#include TEMP_FILE_PATH\n')
+
+    def test_collect_garbage_removes_dead_processes(self):
+        root = os.path.join(self.work_dir, WORKSPACE_ROOT_NAME)
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        dead = os.path.join(root, str(finished.pid), 'sum', 'ws_vecchia')
+        alive = os.path.join(root, str(os.getppid()))
+        os.makedirs(dead)
+        os.makedirs(alive)
+        self.write('tmp_abcdefgh.cu', '')
+        self.write('sum_12_34.out', '')
+
+        with self.assertLogs('core.workspace', 'INFO'):
+            pool = self.pool()
+
+        self.assertEqual(pool.stats()['collected'], 3)
+        self.assertFalse(os.path.exists(os.path.join(root, str(finished.pid))))
+        self.assertTrue(os.path.isdir(alive))
+        self.assertEqual(sorted(os.listdir(self.exercise_dir)), ['data', MANIFEST_NAME, 'main.cu'])
+
+    def test_close_removes_idle_workspaces(self):
+        pool = self.pool(pool_size=2)
+        idle, busy = pool.acquire(self.manifest), pool.acquire(self.manifest)
+        pool.release(idle)
+
+        pool.close()
+
+        self.assertFalse(os.path.exists(idle))
+        self.assertFalse(os.path.exists(os.path.join(pool.directory, 'templates')))
+        # La cartella in uso conserva i propri file fino al rilascio
+        self.assertTrue(os.path.isfile(os.path.join(busy, 'main.cu')))
+        pool.release(busy)
+        self.assertFalse(os.path.exists(busy))
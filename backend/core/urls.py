@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ExerciseListView, RunExerciseView, CourseListView, RegisterView, UserInfoView, TaskDetailView, TaskListView
+from .views import ExerciseListView, RunExerciseView, CourseListView, RegisterView, UserInfoView, TaskDetailView, TaskListView, TaskHistoryView, TaskQueuePositionView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -8,6 +8,8 @@ urlpatterns = [
     path('exercises/', ExerciseListView.as_view(), name='exercise-list'),
     path('run/', RunExerciseView.as_view(), name='run-exercise'),
     path('tasks/', TaskListView.as_view(), name='task-list'),
+    path('tasks/history/', TaskHistoryView.as_view(), name='task-history'),
     path('tasks/<int:task_id>/', TaskDetailView.as_view(), name='task-detail'),
+    path('tasks/<int:task_id>/queue/', TaskQueuePositionView.as_view(), name='task-queue-position'),
 ]
 
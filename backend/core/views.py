@@ -1,19 +1,17 @@
-import tempfile
-import shutil
-import subprocess
-import threading
-import time
-import os
-import select
-from typing import Dict, Any, Optional
+from typing import Optional
 from django.conf import settings
+from django.db import transaction
+from django.utils.http import parse_etags
 from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from .models import Exercise, Course, User, Task
-from .serializers import ExerciseSerializer, UserSerializer, CourseSerializer, TaskSerializer
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .fields import load_with_blobs
+from .serializers import UserSerializer, CourseSerializer, TaskSerializer, TaskHistorySerializer
+from .pagination import TaskHistoryPagination
+from .catalogue import get_catalogue
+from .scheduler import get_scheduler
+from .worker import submit_task
 
 # =============================================================================
 # AUTENTICAZIONE E GESTIONE UTENTI
@@ -51,21 +49,29 @@ class CourseListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-# Lista esercizi filtrati per corso
-class ExerciseListView(generics.ListAPIView):
-    serializer_class = ExerciseSerializer
+# Lista esercizi filtrati per corso (catalogo in cache con ETag: If-None-Match -> 304)
+class ExerciseListView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
-        
+    def get(self, request) -> Response:
+        user = request.user
+
         if user.is_superuser:
-            return Exercise.objects.all()
-        
-        if user.course:
-            return Exercise.objects.filter(courses=user.course)
-        return Exercise.objects.none()
-    
+            data, etag = get_catalogue(None)
+        elif user.course_id:
+            data, etag = get_catalogue(user.course_id)
+        else:
+            return Response([])
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'  # Il client riusa la sua copia solo dopo la verifica
+        return response
+
+
 
 # =============================================================================
 # CONSULTAZIONE E RECUPERO TASK
@@ -76,11 +82,46 @@ class TaskListView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request) -> Response:
-        tasks = Task.objects.filter(user=request.user).order_by('-created_at')[:10]
+        tasks = load_with_blobs(
+            Task.objects.filter(user=request.user).select_related('user', 'exercise').order_by('-created_at')[:10],
+            'code',
+        )
         serializer = TaskSerializer(tasks, many=True)
         return Response(serializer.data)
 
 
+# Cronologia paginata dei task dell'utente (?fields=id,status,exercise_name&page_size=50&cursor=...)
+class TaskHistoryView(generics.ListAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = TaskHistorySerializer
+    pagination_class = TaskHistoryPagination
+
+    def list(self, request, *args, **kwargs) -> Response:
+        self.requested_fields = self._parse_fields(request.query_params.get('fields'))
+        unknown = [name for name in self.requested_fields if name not in TaskHistorySerializer.COLUMNS]
+        if unknown:
+            return Response({
+                'error': f'Campi non disponibili: {", ".join(unknown)}',
+                'available_fields': list(TaskHistorySerializer.COLUMNS),
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+    # Solo le colonne richieste: codice e output non vengono mai letti dal database
+    def get_queryset(self):
+        columns, related = TaskHistorySerializer.projection(self.requested_fields)
+        return Task.objects.filter(user=self.request.user).select_related(*related).only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.requested_fields
+        return super().get_serializer(*args, **kwargs)
+
+    ### Campi richiesti dal client (senza duplicati) ###
+    def _parse_fields(self, raw: Optional[str]) -> list:
+        if not raw:
+            return list(TaskHistorySerializer.DEFAULT_FIELDS)
+        return list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+
+
 # Dettagli di un task specifico
 class TaskDetailView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -88,12 +129,44 @@ class TaskDetailView(views.APIView):
     def get(self, request, task_id: int) -> Response:
         try:
             task = Task.objects.get(id=task_id, user=request.user)
+            task.load_payload()  # Codice e output dall'archivio, se il task è archiviato
             serializer = TaskSerializer(task)
             return Response(serializer.data)
         except Task.DoesNotExist:
             return Response({'error': 'Task non trovato'}, status=status.HTTP_404_NOT_FOUND)
 
 
+# Posizione di un task nella coda (fase di compilazione o di esecuzione)
+class TaskQueuePositionView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, task_id: int) -> Response:
+        try:
+            task = Task.objects.only(
+                'id', 'status', 'created_at', 'compile_status', 'run_status',
+            ).get(id=task_id, user=request.user)
+        except Task.DoesNotExist:
+            return Response({'error': 'Task non trovato'}, status=status.HTTP_404_NOT_FOUND)
+
+        stage, position = None, None
+        if task.status in ('pending', 'running'):
+            # Con i worker separati la coda in memoria non è in questo processo
+            queued = get_scheduler().position(task.id) if settings.EXECUTION_MODE == 'local' else None
+            if queued is not None:
+                stage, position = queued
+            elif task.status == 'pending':
+                # Non nella coda in memoria: posizione calcolata sull'indice (status, created_at)
+                stage, position = 'compile', task.pending_position()
+            elif task.run_status == 'pending' and task.compile_status in ('completed', 'skipped'):
+                stage, position = 'run', task.compiled_position()
+
+        return Response({
+            'task_id': task.id,
+            'status': task.status,
+            'stage': stage,
+            'position': position,
+        })
+
 
 # =============================================================================
 # ESECUZIONE CODICE E GESTIONE TASK
@@ -115,6 +188,15 @@ class RunExerciseView(views.APIView):
         exercise_id = request.data['exercise_id']
         user = request.user
 
+        # Limite di task attivi per utente (in attesa + in esecuzione, non per i docenti)
+        max_active = settings.MAX_ACTIVE_TASKS_PER_USER
+        is_staff = user.is_superuser or user.is_staff
+        if max_active > 0 and not is_staff and Task.active_count(user) >= max_active:
+            return self._error_response(
+                f'Hai già {max_active} task in coda o in esecuzione: attendi che terminino.',
+                status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
         # Controllo crediti
         task_start_cost = settings.TASK_START_COST
         if not user.has_credits(task_start_cost):
@@ -124,19 +206,18 @@ class RunExerciseView(views.APIView):
         try:
             exercise = Exercise.objects.get(id=exercise_id)
             
-            # Deduce crediti per avviare il task
-            if not user.reduce_credits(task_start_cost):
+            # Crea il task e deduce i crediti di avvio nella stessa transazione,
+            # così il movimento 'task_start' del registro punta al task
+            task = self._create_charged_task(user, exercise, code, self._task_priority(request, is_staff))
+            if task is None:
                 return self._error_response('Crediti insufficienti.', status.HTTP_402_PAYMENT_REQUIRED)
             
-            # Crea il task
-            task = self._create_task(user, exercise, code)
-            
-            # Controlla se può essere avviato immediatamente o va in coda
-            if Task.can_start_new_task():
-                self._start_task_execution(task)
+            # Affida il task alla pipeline locale o ai worker di esecuzione (EXECUTION_MODE)
+            position = submit_task(task)
+            if position == 0:
                 message = 'Lavoro avviato con successo'
             else:
-                message = f'Lavoro aggiunto alla coda (posizione: {Task.objects.filter(status="pending").count()})'
+                message = f'Lavoro aggiunto alla coda (posizione: {position})'
             
             return Response({
                 'task_id': task.id,
@@ -158,6 +239,10 @@ class RunExerciseView(views.APIView):
         if not request.data.get('exercise_id'):
             return self._error_response('Errore nel recupero dell\'esercizio.', status.HTTP_404_NOT_FOUND)
         
+        # Priorità facoltativa: gli studenti possono solo scegliere la corsia batch
+        if request.data.get('priority') not in (None, '', *Task.PRIORITY_LANES):
+            return self._error_response('Priorità non valida.', status.HTTP_400_BAD_REQUEST)
+
         # Controllo lunghezza massima del codice sorgente
         code = request.data.get('code', '')
         if len(code) > settings.MAX_SOURCE_CODE_LENGTH:
@@ -172,324 +257,31 @@ class RunExerciseView(views.APIView):
     def _error_response(self, message: str, status_code: int) -> Response:
         return Response({'message': message}, status=status_code)
     
-    ### Crea un nuovo task ###
-    def _create_task(self, user: User, exercise: Exercise, code: str) -> Task:
-        task = Task.objects.create(
+    ### Corsia del task: batch se richiesta, docenti per staff e superuser, altrimenti interattiva ###
+    def _task_priority(self, request, is_staff: bool) -> str:
+        if request.data.get('priority') == 'batch':
+            return 'batch'
+        return 'staff' if is_staff else 'interactive'
+
+    ### Crea il task e addebita il costo di avvio; None (e nessun task) se i crediti non bastano ###
+    def _create_charged_task(self, user: User, exercise: Exercise, code: str, priority: str) -> Optional[Task]:
+        with transaction.atomic():
+            task = self._create_task(user, exercise, code, priority)
+            if user.reduce_credits(settings.TASK_START_COST, reason='task_start', task=task):
+                return task
+            # Saldo esaurito nel frattempo: annulla la creazione del task
+            transaction.set_rollback(True)
+        return None
+
+    ### Crea un nuovo task (già in attesa: un solo INSERT, nessun salvataggio successivo) ###
+    def _create_task(self, user: User, exercise: Exercise, code: str, priority: str) -> Task:
+        return Task.objects.create(
             user=user,
             exercise=exercise,
             code=code,
+            priority=priority,
             credits_cost=settings.TASK_START_COST,
+            status='pending',
+            message="Task in attesa di esecuzione...",
         )
-        task.pending()
-        return task
-    
-    ### Crea un thread per eseguire il task in background ###
-    def _start_task_execution(self, task: Task) -> None:
-        thread = threading.Thread(target=self._execute_task, args=(task,))
-        thread.daemon = True
-        thread.start()
-
-    ### Esecuzione del task in background con controllo crediti ###
-    def _execute_task(self, task: Task) -> None:
-        tmp_path = None
-        try:
-            # Avvia il task
-            task.start()
-            self._ws_broadcast(task)
-            tmp_path = self._create_temp_file(task.code, task.exercise)
-            process = self._start_process(tmp_path, task.exercise, task.user.matr)
-            task.process_id = process.pid
-            task.save()
-            self._ws_broadcast(task)
-
-            # Monitoraggio task
-            output_data = self._monitor_process(process, task, tmp_path)
-            
-            if not output_data['interrupted']:
-                self._finalize_task(task, process, output_data)
-            
-        except Exception as e:
-            task.fail(
-                stdout='',
-                stderr=f'Errore durante l\'esecuzione: {str(e)}',
-                message=f'Errore durante l\'esecuzione: {str(e)}'
-                )
-            self._ws_broadcast(task)
-            # Pulisce il file temporaneo anche in caso di errore
-            self._cleanup_temp_file(tmp_path)
-    
-    ### Crea un file temporaneo con il codice in ./gpu/<exercise.name> ###
-    def _create_temp_file(self, code: str, exercise: Exercise) -> str:
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'gpu', exercise.name))
-        os.makedirs(base_dir, exist_ok=True)
-
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix=exercise.file_extension,
-            prefix='tmp_',
-            delete=False, # Deve essere 'False' per evitare che il file non venga usato esternamente
-            dir=base_dir
-        ) as f:
-            f.write(code)
-            return f.name
-    
-    ### Avvia il processo di esecuzione ###
-    def _start_process(self, tmp_path: str, exercise: Exercise, user_matr: str) -> subprocess.Popen:
-        
-        script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'run_exercise.sh'))
-        
-        if shutil.which('stdbuf'):
-            # Con controllo buffering
-            cmd = ['stdbuf', '-oL', '-eL', 'bash', script_path, tmp_path, exercise.name, user_matr]
-        else:
-            cmd = ['bash', script_path, tmp_path, exercise.name, user_matr]
-
-        return subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-    
-    ### Monitora il processo e gestisce i crediti ###
-    def _monitor_process(self, process: subprocess.Popen, task: Task, tmp_path: str = None) -> Dict[str, Any]:
-        # Variabili per accumulare l'output del processo
-        stdout = ""
-        stderr = ""
-        last_broadcast_stdout_len = 0  # Lunghezza ultimo broadcast per evitare duplicati
-        last_broadcast_stderr_len = 0  # Lunghezza ultimo broadcast per evitare duplicati
-        start_time = time.time()     # Timestamp inizio esecuzione
-        task_interrupted = False     # Flag per interruzione task
-        last_credit_check = start_time  # Ultimo controllo crediti
-        
-        # Loop principale: continua finché il processo è attivo e non interrotto
-        while process.poll() is None and not task_interrupted:
-            # 1. LEGGE L'OUTPUT DEL PROCESSO (non bloccante)
-            stdout, stderr = self._read_process_output(
-                process, stdout, stderr
-            )
-            
-            # 2. CONTROLLA SE C'È NUOVO OUTPUT DA INVIARE AL CLIENT
-            if (len(stdout) > last_broadcast_stdout_len) or (len(stderr) > last_broadcast_stderr_len):
-                try:
-                    # 2a. CONTROLLO DIMENSIONE MASSIMA OUTPUT (protezione memoria)
-                    if len(stdout) > settings.MAX_OUTPUT_BUFFER_SIZE or len(stderr) > settings.MAX_OUTPUT_BUFFER_SIZE:
-                        # Tronca l'output se supera la dimensione massima
-                        if len(stdout) > settings.MAX_OUTPUT_BUFFER_SIZE:
-                            stdout = stdout[:settings.MAX_OUTPUT_BUFFER_SIZE] + "\n... [Output troncato per dimensione massima]"
-                        if len(stderr) > settings.MAX_OUTPUT_BUFFER_SIZE:
-                            stderr = stderr[:settings.MAX_OUTPUT_BUFFER_SIZE] + "\n... [Output troncato per dimensione massima]"
-                        
-                        # TERMINA IL PROCESSO se l'output è troppo grande
-                        self._terminate_process(process)
-                        task.fail(
-                            stdout=stdout.strip(), 
-                            stderr=f"{stderr.strip()}Task terminato per output troppo grande (max {settings.MAX_OUTPUT_BUFFER_SIZE} caratteri)",
-                            message=f"Task terminato per output troppo grande (max {settings.MAX_OUTPUT_BUFFER_SIZE} caratteri)"
-                            
-                        )
-                        self._ws_broadcast(task)
-                        task_interrupted = True
-                        
-                        # PULIZIA: rimuove file temporaneo e avvia prossimo task
-                        self._cleanup_temp_file(tmp_path)
-                        self._start_next_pending_task()
-                        break
-                    
-                    # 2b. AGGIORNA IL TASK CON L'OUTPUT E INVIALO AL CLIENT
-                    task.stdout = stdout
-                    task.stderr = stderr
-                    task.save(update_fields=["stdout", "stderr"])
-                    self._ws_broadcast(task)
-                except Exception:
-                    # Non interrompere il loop in caso di errori di I/O/WS
-                    pass
-                # Aggiorna le lunghezze per evitare duplicati
-                last_broadcast_stdout_len = len(stdout)
-                last_broadcast_stderr_len = len(stderr)
-            
-            # 3. CONTROLLI DI SICUREZZA E TIMEOUT
-            current_time = time.time()
-            elapsed_seconds = current_time - start_time
-            
-            # 3a. CONTROLLO TIMEOUT MASSIMO (evita processi infiniti)
-            if elapsed_seconds >= settings.MAX_TASK_EXECUTION_TIME:
-                # TERMINA IL PROCESSO per timeout
-                self._terminate_process(process)
-                stdout, stderr = self._get_remaining_output(
-                    process, stdout, stderr
-                )
-                task.fail(
-                    stdout=stdout.strip(), 
-                    stderr=f"{stderr.strip()}Task terminato per timeout massimo ({settings.MAX_TASK_EXECUTION_TIME}s)",
-                    message=f"Task terminato per timeout massimo ({settings.MAX_TASK_EXECUTION_TIME}s)"
-                )
-                self._ws_broadcast(task)
-                task_interrupted = True
-                
-                # PULIZIA: rimuove file temporaneo e avvia prossimo task
-                self._cleanup_temp_file(tmp_path)
-                self._start_next_pending_task()
-                break
-            
-            
-            # 4. CONTROLLO CREDITI OGNI SECONDO (sistema di pagamento)
-            if current_time - last_credit_check >= settings.REDUCE_CREDITS_TIME_AMOUNT:
-                # Aggiorna i dati utente dal database
-                task.user.refresh_from_db()
-                
-                # Controlla se l'utente ha ancora crediti e li riduce se necessario
-                task_interrupted = self._handle_credits_deduction(task, elapsed_seconds, process)
-                
-                if task_interrupted:  # Se l'utente non ha più crediti
-                    # Cattura l'output rimanente dal processo prima di terminarlo
-                    stdout, stderr = self._get_remaining_output(
-                        process, stdout, stderr
-                    )
-                    
-                    # Segna il task come interrotto per crediti esauriti
-                    task.interrupt(
-                        stdout=stdout.strip(), 
-                        stderr=stderr.strip(),
-                        message="Crediti esauriti."
-                    )
-                    self._ws_broadcast(task)
-                    self._cleanup_temp_file(tmp_path)
-                    self._start_next_pending_task()
-                
-                last_credit_check = current_time
-            time.sleep(0.01)  # 10ms di pausa
-        
-        # 6. RESTITUISCE I RISULTATI DEL MONITORAGGIO
-        return {
-            'stdout': stdout,      # Output completo del programma
-            'stderr': stderr,      # Errori completi del programma
-            'interrupted': task_interrupted,   # Se il task è stato interrotto
-            'start_time': start_time,          # Timestamp di inizio
-            'tmp_path': tmp_path               # Percorso del file temporaneo
-        }
-    
-    ### Legge l'output del processo in modo non bloccante ###
-    def _read_process_output(self, process: subprocess.Popen, stdout: str, stderr: str) -> tuple:
-        try:
-            # Drena tutte le linee disponibili su stdout
-            while True:
-                rlist, _, _ = select.select([process.stdout], [], [], 0)
-                if not rlist:
-                    break
-                line = process.stdout.readline()
-                if not line:
-                    break
-                stdout += line
-
-            # Drena tutte le linee disponibili su stderr
-            while True:
-                rlist, _, _ = select.select([process.stderr], [], [], 0)
-                if not rlist:
-                    break
-                line = process.stderr.readline()
-                if not line:
-                    break
-                stderr += line
-
-        except Exception:
-            pass
-        return stdout, stderr
-    
-    ### Gestisce la deduzione dei crediti e l'interruzione se necessario ###
-    def _handle_credits_deduction(self, task: Task, elapsed_seconds: float, process: subprocess.Popen) -> bool:
-        credits_needed = int(elapsed_seconds * settings.DEFAULT_CREDIT_COST_PER_TIME_AMOUNT)
-    
-        # Controlla se l'utente ha abbastanza crediti per continuare
-        if task.user.credits >= credits_needed - task.credits_cost:
-            credits_to_deduct = credits_needed - task.credits_cost
-            if credits_to_deduct > 0:
-                task.user.reduce_credits(credits_to_deduct)
-                task.credits_cost = credits_needed
-                task.save()
-                self._ws_broadcast(task)
-            return False
-        else:
-            self._terminate_process(process)
-            return True
-    
-    ### Termina il processo in modo sicuro ###
-    def _terminate_process(self, process: subprocess.Popen) -> None:
-        process.terminate()
-        try:
-            process.wait(timeout=min(0.5, settings.PROGRAM_EXECUTION_TIMEOUT))
-        except subprocess.TimeoutExpired:
-            process.kill()
-    
-    ### Ottiene l'output rimanente dal processo terminato ###
-    def _get_remaining_output(self, process: subprocess.Popen, stdout: str, stderr: str) -> tuple:
-        try:
-            remaining_stdout, remaining_stderr = process.communicate(timeout=min(0.5, settings.PROGRAM_EXECUTION_TIMEOUT))
-            stdout += remaining_stdout
-            stderr += remaining_stderr
-        except subprocess.TimeoutExpired:
-            pass
-        return stdout, stderr
-    
-    ### Finalizza il task con l'output completo ###
-    def _finalize_task(self, task: Task, process: subprocess.Popen, output_data: Dict[str, Any]) -> None:
-        
-        # Ottiene l'output rimanente dal processo terminato
-        remaining_stdout, remaining_stderr = process.communicate()
-        final_stdout = output_data['stdout'] + remaining_stdout
-        final_stderr = output_data['stderr'] + remaining_stderr
-        
-        # Calcolo tempo di esecuzione e crediti utilizzati
-        total_seconds = time.time() - output_data['start_time']
-        total_credits_used = int(total_seconds * settings.DEFAULT_CREDIT_COST_PER_TIME_AMOUNT)
-        
-        # Deduzione crediti se necessario
-        if total_credits_used > task.credits_cost:
-            remaining_credits = total_credits_used - task.credits_cost
-            task.user.reduce_credits(remaining_credits)
-            task.credits_cost = total_credits_used
-            task.save()
-        
-        if process.returncode == 0:
-            task.complete(stdout=final_stdout.strip(), stderr=final_stderr.strip())
-        else:
-            task.fail(stdout=final_stdout.strip(), stderr=final_stderr.strip())
-        self._ws_broadcast(task)
-        
-        # Pulisce il file temporaneo
-        self._cleanup_temp_file(output_data.get('tmp_path'), task.user.matr)
-        
-        # Avvia il prossimo task in coda se disponibile
-        self._start_next_pending_task()
-    
-    ### Pulisce il file temporaneo ###
-    def _cleanup_temp_file(self, tmp_path: Optional[str], user_matr: str) -> None:
-        if tmp_path:
-            try:
-                # Pulisce il file sorgente temporaneo
-                os.unlink(tmp_path)
-            except Exception:
-                pass
-    
-    ### Avvia il prossimo task in coda se disponibile ###
-    def _start_next_pending_task(self) -> None:
-        if Task.can_start_new_task():
-            next_task = Task.get_next_pending_task()
-            if next_task:
-                self._start_task_execution(next_task)
-
-    ### Invia aggiornamenti Task attraverso WebSocket ###
-    def _ws_broadcast(self, task: Task) -> None:
-        try:
-            channel_layer = get_channel_layer()
-            if not channel_layer:
-                return
-            data = TaskSerializer(task).data
-            async_to_sync(channel_layer.group_send)(
-                f'task_{task.id}',
-                { 'type': 'task_update', 'data': data }
-            )
-        except Exception:
-            # Ignora errori WebSocket
-            pass
+
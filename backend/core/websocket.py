@@ -1,36 +1,157 @@
+import asyncio
 import json
-import os
 import signal
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
+from .broadcast import get_broadcaster
 from .models import Task
+from .process_group import signal_group
 from .serializers import TaskSerializer
+from .streaming import apply_delta, parse_offset, snapshot, status_delta
+
+# Connessioni attive per task (per la ripresa dopo una riconnessione), nella cache di
+# Django: con Redis il client può riconnettersi a un worker diverso da quello iniziale
+CONNECTIONS_KEY_PREFIX = 'ws_connections'
+CONNECTIONS_TTL = 24 * 60 * 60   # Secondi: limita i contatori rimasti da un worker terminato
+
+
+def _connections_key(task_id) -> str:
+    return f'{CONNECTIONS_KEY_PREFIX}:{task_id}'
+
+
+# Registra una connessione al task
+async def _add_connection(task_id) -> None:
+    key = _connections_key(task_id)
+    await cache.aadd(key, 0, CONNECTIONS_TTL)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        # Chiave scaduta tra add e incr
+        await cache.aset(key, 1, CONNECTIONS_TTL)
+
+
+# Rimuove una connessione al task
+async def _remove_connection(task_id) -> None:
+    key = _connections_key(task_id)
+    try:
+        # Il contatore resta a zero fino alla scadenza: eliminarlo qui potrebbe perdere
+        # l'incremento di una riconnessione arrivata nel frattempo su un altro worker
+        await cache.adecr(key)
+    except ValueError:
+        pass
+
+
+# Connessioni attive al task in tutti i worker
+async def _connection_count(task_id) -> int:
+    return await cache.aget(_connections_key(task_id), 0)
 
 
 class TaskConsumer(AsyncWebsocketConsumer):
     # Connessione WebSocket
+    # Query string opzionale: ?protocol=delta&stdout_offset=N&stderr_offset=M
     async def connect(self):
         self.task_id = self.scope['url_route']['kwargs']['task_id']
         self.group_name = f'task_{self.task_id}'
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.protocol = params.get('protocol', ['full'])[0]
+        self.state = None
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        get_broadcaster().attach_consumer_loop(asyncio.get_running_loop())
         await self.accept()
+        await _add_connection(self.task_id)
+
+        if self.protocol == 'delta':
+            # Ripresa dagli offset già ricevuti dal client
+            data = await self._load_snapshot(
+                parse_offset(params.get('stdout_offset', [0])[0]),
+                parse_offset(params.get('stderr_offset', [0])[0]),
+            )
+            if data:
+                await self.send(text_data=json.dumps(data))
+        else:
+            # Stato completo da aggiornare con i messaggi incrementali
+            self.state = await self._load_state()
 
     # Disconnessione WebSocket
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
-        # Alla disconnessione del client, interrompe il task se è in corso
+        await _remove_connection(self.task_id)
+
+        # I client delta possono riconnettersi entro il periodo di grazia
+        if self.protocol == 'delta' and settings.WS_RESUME_GRACE_PERIOD > 0:
+            asyncio.ensure_future(self._interrupt_after_grace_period())
+            return
+        await self._interrupt_and_notify()
+
+    # Richieste del client (protocollo delta): {"action": "resync", "stdout_offset": N, "stderr_offset": M}
+    async def receive(self, text_data=None, bytes_data=None):
+        if self.protocol != 'delta' or not text_data:
+            return
+        try:
+            request = json.loads(text_data)
+        except ValueError:
+            return
+        if request.get('action') == 'resync':
+            data = await self._load_snapshot(
+                parse_offset(request.get('stdout_offset')),
+                parse_offset(request.get('stderr_offset')),
+            )
+            if data:
+                await self.send(text_data=json.dumps(data))
+
+    # Gestisce gli aggiornamenti incrementali del task
+    async def task_delta(self, event):
+        delta = event['data']
+        if self.protocol == 'delta':
+            await self.send(text_data=json.dumps(delta))
+            return
+
+        # Client legacy: applica il delta allo stato e invia il payload completo
+        if self.state is None or not apply_delta(self.state, delta):
+            self.state = await self._load_state()
+            if self.state is None:
+                return
+            apply_delta(self.state, delta)
+        await self.send(text_data=json.dumps(self.state))
+
+    # Interrompe il task solo se nessun client si è riconnesso nel frattempo
+    async def _interrupt_after_grace_period(self):
+        await asyncio.sleep(settings.WS_RESUME_GRACE_PERIOD)
+        if await _connection_count(self.task_id) <= 0:
+            await self._interrupt_and_notify()
+
+    # Alla disconnessione del client, interrompe il task se è in corso
+    async def _interrupt_and_notify(self):
         data = await self._interrupt_task_if_running()
         # Opzionale: broadcast finale (potrebbe non esserci nessun listener)
         if data:
             await self.channel_layer.group_send(self.group_name, {
-                'type': 'task_update',
+                'type': 'task_delta',
                 'data': data
             })
 
-    # Gestisce aggiornamenti del task
-    async def task_update(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+    # Stato completo del task (payload del protocollo legacy)
+    @database_sync_to_async
+    def _load_state(self):
+        try:
+            task = Task.objects.select_related('user', 'exercise').get(id=self.task_id)
+        except Task.DoesNotExist:
+            return None
+        task.load_payload()
+        return dict(TaskSerializer(task).data)
+
+    # Istantanea del task dagli offset indicati (protocollo delta)
+    @database_sync_to_async
+    def _load_snapshot(self, stdout_offset: int, stderr_offset: int):
+        try:
+            task = Task.objects.select_related('user', 'exercise').get(id=self.task_id)
+        except Task.DoesNotExist:
+            return None
+        task.load_payload()
+        return snapshot(task, stdout_offset, stderr_offset)
 
     # Interrompe il task se il client si disconnette
     @database_sync_to_async
@@ -38,22 +159,16 @@ class TaskConsumer(AsyncWebsocketConsumer):
         try:
             task = Task.objects.get(id=self.task_id)
             if task.status in ['running', 'pending']:
-                # Prova a terminare il processo se presente
+                # Prova a terminare il processo (con tutto il suo gruppo) se presente
                 if task.process_id:
-                    try:
-                        os.kill(task.process_id, signal.SIGTERM)
-                    except Exception:
-                        pass
-                # Marca come interrotto con messaggio dedicato
-                task.status = 'interrupted'
-                task.finished_at = timezone.now()
-                if task.started_at is not None:
-                    task.total_execution_time = task.finished_at - task.started_at
-                task.message = 'Task interrotto (disconnessione client).'
-                task.save()
-                return TaskSerializer(task).data
+                    signal_group(task.process_id, signal.SIGTERM)
+                # Marca come interrotto con messaggio dedicato (chiude anche le fasi in corso)
+                task.interrupt(
+                    stdout=task.stdout,
+                    stderr=task.stderr,
+                    message='Task interrotto (disconnessione client).'
+                )
+                return status_delta(task)
         except Task.DoesNotExist:
             return None
         return None
-
-
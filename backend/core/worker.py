@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from django.conf import settings
+from channels.layers import get_channel_layer
+from .broadcast import get_broadcaster
+from .models import Task
+from .scheduler import TaskPipeline, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# WORKER DI ESECUZIONE SEPARATO DAI PROCESSI HTTP
+# =============================================================================
+
+# Con EXECUTION_MODE='worker' i processi HTTP salvano il task in attesa e notificano i
+# worker (manage.py run_worker) sul gruppo QUEUE_GROUP del channel layer; ogni worker
+# lo mette nella propria coda e la prenotazione atomica sul database fa sì che parta
+# una volta sola. La coda resta il database: senza notifiche (channel layer in memoria,
+# Redis irraggiungibile, worker riavviato) i task vengono letti ogni WORKER_POLL_INTERVAL
+# secondi, quindi riavviare HTTP o worker non perde nessun task in attesa.
+QUEUE_GROUP = 'task_queue'
+MESSAGE_SUBMITTED = 'task.submitted'
+RECEIVE_TIMEOUT = 1.0           # Secondi di attesa di una notifica prima di ricontrollare l'arresto
+GROUP_REFRESH_INTERVAL = 3600   # Secondi tra due iscrizioni al gruppo (i gruppi Redis scadono)
+
+
+# Affida un nuovo task all'esecuzione e restituisce la sua posizione in coda (0 = in testa)
+def submit_task(task: Task) -> int:
+    if settings.EXECUTION_MODE == 'local':
+        return get_scheduler().submit(task.id, task.user_id, task.priority, task.exercise_id)
+    get_broadcaster().send(QUEUE_GROUP, {
+        'type': MESSAGE_SUBMITTED,
+        'task_id': task.id,
+        'user_id': task.user_id,
+        'priority': task.priority,
+        'exercise_id': task.exercise_id,
+    })
+    return task.pending_position()
+
+
+# Processo worker: pipeline compilazione -> esecuzione più l'ascolto delle notifiche
+class TaskWorker:
+
+    def __init__(self, pipeline: Optional[TaskPipeline] = None, poll_interval: Optional[float] = None,
+                 listen: Optional[bool] = None) -> None:
+        self.poll_interval = poll_interval if poll_interval is not None else settings.WORKER_POLL_INTERVAL
+        self.pipeline = pipeline or TaskPipeline(refill_interval=self.poll_interval)
+        # Il channel layer in memoria non attraversa i processi: solo lettura periodica
+        self.listen = listen if listen is not None else settings.CHANNEL_LAYER_BACKEND != 'memory'
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {'notifications': 0, 'listener_errors': 0}
+
+    ### Avvia la pipeline e l'ascolto delle notifiche ###
+    def start(self) -> None:
+        self.pipeline.start()
+        if self.listen:
+            self._listener = threading.Thread(target=self._listen, name='worker-listener', daemon=True)
+            self._listener.start()
+
+    ### Richiede l'arresto (anche da un gestore di segnale) ###
+    def request_stop(self) -> None:
+        self._stop.set()
+
+    ### Attende la richiesta di arresto (True) o lo scadere del timeout (False) ###
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._stop.wait(timeout)
+
+    ### Arresta il worker: nessun nuovo task, quelli in corso hanno fino a timeout secondi ###
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        timeout = timeout if timeout is not None else settings.WORKER_SHUTDOWN_TIMEOUT
+        deadline = time.monotonic() + timeout
+        self._stop.set()
+        self.pipeline.stop(wait=True, timeout=timeout)
+        if self._listener is not None:
+            self._listener.join(RECEIVE_TIMEOUT * 2)
+        # Ultimi aggiornamenti di stato verso i client
+        get_broadcaster().flush(max(1.0, deadline - time.monotonic()))
+
+    ### Statistiche del worker e delle due fasi della pipeline ###
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._stats)
+        data.update(self.pipeline.stats())
+        return data
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _listen(self) -> None:
+        asyncio.run(self._listen_loop())
+
+    # Riceve le notifiche dei processi HTTP e accoda i task nella fase di compilazione
+    async def _listen_loop(self) -> None:
+        layer = get_channel_layer()
+        channel, subscribed_at = None, 0.0
+        while not self._stop.is_set():
+            try:
+                if channel is None:
+                    channel = await layer.new_channel()
+                if time.monotonic() - subscribed_at > GROUP_REFRESH_INTERVAL:
+                    await layer.group_add(QUEUE_GROUP, channel)
+                    subscribed_at = time.monotonic()
+                message = await asyncio.wait_for(layer.receive(channel), RECEIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                continue
+            except Exception:
+                # Channel layer irraggiungibile: i task arrivano comunque dalla lettura periodica
+                self._count('listener_errors')
+                logger.warning('Notifiche dei task non disponibili, nuovo tentativo', exc_info=True)
+                channel, subscribed_at = None, 0.0
+                await asyncio.sleep(self.poll_interval or RECEIVE_TIMEOUT)
+                continue
+            if message.get('type') == MESSAGE_SUBMITTED:
+                self._count('notifications')
+                self.pipeline.submit(
+                    message['task_id'], message.get('user_id'),
+                    message.get('priority', 'interactive'), message.get('exercise_id'),
+                )
+        if channel is not None:
+            try:
+                await layer.group_discard(QUEUE_GROUP, channel)
+            except Exception:
+                pass
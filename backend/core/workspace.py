@@ -0,0 +1,286 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from .manifest import ExerciseManifest, get_manifest_registry
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CARTELLE DI LAVORO DEI TASK
+# =============================================================================
+
+# Ogni task compila ed esegue in una cartella di lavoro isolata su un filesystem veloce
+# (di default /dev/shm, in memoria). Per ogni esercizio il pool tiene un modello con harness
+# e file di input (copiati una volta, in sola lettura): le cartelle dei task li ricevono con
+# hard link, senza copiare dati. Alla fine del task la cartella viene riportata allo stato
+# del modello (via i file scritti dal programma) e rimessa nel pool per il task successivo.
+#
+#   <TASK_WORKSPACE_DIR>/gpu_workspaces/<pid>/templates/<esercizio>-<impronta>/
+#   <TASK_WORKSPACE_DIR>/gpu_workspaces/<pid>/<esercizio>/<cartella del task>/
+#
+# Le cartelle sono per processo: all'avvio quelle dei processi terminati (crash, kill)
+# vengono eliminate, insieme ai file temporanei lasciati nelle cartelle degli esercizi
+# dalla vecchia esecuzione tramite script.
+WORKSPACE_ROOT_NAME = 'gpu_workspaces'
+LEGACY_LEFTOVERS = re.compile(r'^(tmp_\w{8}\.\w+|\w+_\d+_\d+\.out)$')
+
+
+# Modello di un esercizio: file del manifest copiati sul filesystem delle cartelle di lavoro
+class WorkspaceTemplate:
+    def __init__(self, directory: str, fingerprint: str, files: Dict[str, Tuple[int, int, int]]) -> None:
+        self.directory = directory        # Cartella del modello
+        self.fingerprint = fingerprint    # Impronta dei file sorgente (cambia se l'esercizio viene modificato)
+        self.files = files                # Percorso relativo -> (inode, dimensione, mtime) del file nel modello
+
+    ### True se nessun file del modello è stato modificato (es. scrittura tramite hard link) ###
+    def intact(self) -> bool:
+        for relative, (inode, size, mtime) in self.files.items():
+            try:
+                st = os.stat(os.path.join(self.directory, relative))
+            except OSError:
+                return False
+            if (st.st_ino, st.st_size, st.st_mtime_ns) != (inode, size, mtime):
+                return False
+        return True
+
+
+# Pool di cartelle di lavoro riutilizzabili, divise per esercizio
+class WorkspacePool:
+
+    def __init__(self, base_dir: Optional[str] = None, pool_size: Optional[int] = None) -> None:
+        base_dir = base_dir or settings.TASK_WORKSPACE_DIR or default_base_dir()
+        self.root = os.path.join(base_dir, WORKSPACE_ROOT_NAME)
+        self.directory = os.path.join(self.root, str(os.getpid()))
+        self.pool_size = settings.TASK_WORKSPACE_POOL_SIZE if pool_size is None else pool_size
+        self._lock = threading.Lock()
+        self._template_lock = threading.Lock()   # Un solo thread alla volta ricrea i modelli
+        self._templates: Dict[str, WorkspaceTemplate] = {}
+        self._idle: Dict[str, List[Tuple[str, str]]] = {}       # Esercizio -> [(cartella, impronta)]
+        self._in_use: Dict[str, Tuple[str, str]] = {}           # Cartella -> (esercizio, impronta)
+        self._stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0, 'collected': 0}
+        self._stats['collected'] = self.collect_garbage()
+        os.makedirs(self.directory, exist_ok=True)
+
+    ### Cartella di lavoro per un task dell'esercizio, già popolata con harness e input ###
+    def acquire(self, manifest: ExerciseManifest) -> str:
+        template = self._template(manifest)
+        found, stale = None, []
+        with self._lock:
+            idle = self._idle.get(manifest.name, [])
+            while idle and found is None:
+                workspace, fingerprint = idle.pop()
+                if fingerprint == template.fingerprint:
+                    found = workspace
+                    self._in_use[workspace] = (manifest.name, fingerprint)
+                    self._stats['reused'] += 1
+                else:
+                    stale.append(workspace)
+            if found is None:
+                self._stats['created'] += 1
+        for workspace in stale:
+            shutil.rmtree(workspace, ignore_errors=True)
+        if found is not None:
+            return found
+
+        exercise_dir = os.path.join(self.directory, manifest.name)
+        os.makedirs(exercise_dir, exist_ok=True)
+        workspace = tempfile.mkdtemp(prefix='ws_', dir=exercise_dir)
+        try:
+            self._link_files(template, workspace)
+        except Exception:
+            shutil.rmtree(workspace, ignore_errors=True)
+            raise
+        with self._lock:
+            self._in_use[workspace] = (manifest.name, template.fingerprint)
+        return workspace
+
+    ### Restituisce la cartella al pool (ripulita) o la elimina se il pool è pieno o il modello è cambiato ###
+    def release(self, workspace: Optional[str]) -> None:
+        if not workspace:
+            return
+        with self._lock:
+            owner = self._in_use.pop(workspace, None)
+            template = self._templates.get(owner[0]) if owner else None
+            keep = (owner is not None and template is not None and template.fingerprint == owner[1]
+                    and len(self._idle.get(owner[0], [])) < self.pool_size)
+        if keep and template.intact():
+            try:
+                self._reset(template, workspace)
+            except OSError as e:
+                logger.debug('Cartella di lavoro %s non riutilizzabile: %s', workspace, e)
+            else:
+                with self._lock:
+                    self._idle.setdefault(owner[0], []).append((workspace, owner[1]))
+                    self._stats['recycled'] += 1
+                return
+        elif keep:
+            # Un programma ha modificato un file del modello: verrà ricreato al prossimo task
+            logger.warning('Modello della cartella di lavoro di %s modificato: verrà ricreato', owner[0])
+            self._drop_template(owner[0], template)
+        shutil.rmtree(workspace, ignore_errors=True)
+        with self._lock:
+            self._stats['discarded'] += 1
+
+    ### Elimina le cartelle dei processi terminati e i file temporanei rimasti negli esercizi ###
+    def collect_garbage(self) -> int:
+        from .reaper import process_exists
+        removed = 0
+        try:
+            entries = os.listdir(self.root)
+        except FileNotFoundError:
+            entries = []
+        for name in entries:
+            # La cartella con il proprio pid è di un processo precedente con lo stesso pid
+            if name.isdigit() and (int(name) == os.getpid() or not process_exists(int(name))):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                removed += 1
+
+        registry = get_manifest_registry()
+        for exercise in registry.names():
+            directory = os.path.join(registry.gpu_dir, exercise)
+            for name in os.listdir(directory):
+                if LEGACY_LEFTOVERS.match(name):
+                    try:
+                        os.unlink(os.path.join(directory, name))
+                        removed += 1
+                    except OSError:
+                        pass
+        if removed:
+            logger.info('Cartelle di lavoro: eliminati %d elementi rimasti da esecuzioni precedenti', removed)
+        return removed
+
+    ### Elimina modelli e cartelle inattive (arresto del worker); quelle in uso vengono eliminate al rilascio ###
+    def close(self) -> None:
+        with self._template_lock, self._lock:
+            self._templates.clear()
+            idle = [workspace for items in self._idle.values() for workspace, _ in items]
+            self._idle.clear()
+            in_use = bool(self._in_use)
+        for workspace in idle:
+            shutil.rmtree(workspace, ignore_errors=True)
+        # Le cartelle in uso conservano i propri hard link anche senza i modelli
+        shutil.rmtree(os.path.join(self.directory, 'templates'), ignore_errors=True)
+        if not in_use:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+                'in_use': len(self._in_use),
+            }
+
+    # Modello dell'esercizio, ricreato se harness o input sono cambiati
+    def _template(self, manifest: ExerciseManifest) -> WorkspaceTemplate:
+        sources = [(manifest.harness, manifest.harness_path), *manifest.input_paths()]
+        digest = hashlib.sha256()
+        for relative, path in sources:
+            st = os.stat(path)
+            digest.update(f'{relative}\0{st.st_size}\0{st.st_mtime_ns}\0'.encode())
+        fingerprint = digest.hexdigest()[:16]
+
+        with self._template_lock:
+            with self._lock:
+                template = self._templates.get(manifest.name)
+            if template is not None and template.fingerprint == fingerprint:
+                return template
+
+            directory = os.path.join(self.directory, 'templates', f'{manifest.name}-{fingerprint}')
+            shutil.rmtree(directory, ignore_errors=True)
+            files = {}
+            for relative, path in sources:
+                target = os.path.join(directory, relative)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(path, target)
+                os.chmod(target, 0o444)    # Condiviso tramite hard link da tutte le cartelle dei task
+                st = os.stat(target)
+                files[relative] = (st.st_ino, st.st_size, st.st_mtime_ns)
+            template = WorkspaceTemplate(directory, fingerprint, files)
+
+            with self._lock:
+                previous = self._templates.get(manifest.name)
+                self._templates[manifest.name] = template
+            if previous is not None and previous.directory != directory:
+                self._drop_template(manifest.name, previous)
+            return template
+
+    # Dimentica un modello non più valido e le cartelle inattive create da esso
+    def _drop_template(self, name: str, template: WorkspaceTemplate) -> None:
+        with self._lock:
+            if self._templates.get(name) is template:
+                del self._templates[name]
+            stale = [item for item in self._idle.get(name, []) if item[1] == template.fingerprint]
+            self._idle[name] = [item for item in self._idle.get(name, []) if item[1] != template.fingerprint]
+        for workspace, _ in stale:
+            shutil.rmtree(workspace, ignore_errors=True)
+        # Le cartelle in uso conservano i propri hard link anche dopo l'eliminazione del modello
+        shutil.rmtree(template.directory, ignore_errors=True)
+
+    # Collega i file del modello nella cartella (copia se l'hard link non è possibile)
+    @staticmethod
+    def _link_files(template: WorkspaceTemplate, workspace: str, only: Optional[List[str]] = None) -> None:
+        for relative in (template.files if only is None else only):
+            source = os.path.join(template.directory, relative)
+            target = os.path.join(workspace, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+
+    # Riporta la cartella allo stato del modello: elimina tutto ciò che il task ha scritto
+    def _reset(self, template: WorkspaceTemplate, workspace: str) -> None:
+        kept = set()
+        for current, dirs, names in os.walk(workspace, topdown=False, onerror=_raise):
+            for name in names:
+                path = os.path.join(current, name)
+                relative = os.path.relpath(path, workspace)
+                info = template.files.get(relative)
+                if info is not None and os.lstat(path).st_ino == info[0]:
+                    kept.add(relative)
+                else:
+                    os.unlink(path)
+            for name in dirs:
+                path = os.path.join(current, name)
+                if os.path.islink(path):
+                    os.unlink(path)
+                elif not os.listdir(path):
+                    os.rmdir(path)
+        missing = [relative for relative in template.files if relative not in kept]
+        if missing:
+            self._link_files(template, workspace, missing)
+
+
+def _raise(error: OSError) -> None:
+    raise error
+
+
+# Filesystem in memoria se disponibile, altrimenti la cartella temporanea di sistema
+def default_base_dir() -> str:
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK | os.X_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+# =============================================================================
+# ISTANZA GLOBALE
+# =============================================================================
+_pool: Optional[WorkspacePool] = None
+_pool_lock = threading.Lock()
+
+
+# Restituisce il pool di cartelle di lavoro del processo (creato, con la pulizia iniziale, al primo uso)
+def get_workspace_pool() -> WorkspacePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkspacePool()
+        return _pool
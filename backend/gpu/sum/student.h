@@ -0,0 +1,6 @@
+// Prototipi delle funzioni scritte dallo studente (harness precompilato, vedi exercise.json)
+#pragma once
+#include <stdio.h>
+#include <cuda_runtime.h>
+
+__global__ void sum(float *a, float *b, float *c, int n);
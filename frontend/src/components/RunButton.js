@@ -2,6 +2,10 @@ import { useState } from 'react';
 import PropTypes from 'prop-types';
 import api from '../services/api';
 
+// Tentativi di riconnessione WebSocket (entro il periodo di grazia del backend)
+const MAX_WS_RETRIES = 3;
+const WS_RETRY_DELAY_MS = 500;
+
 // Componente pulsante per esecuzione codice
 function RunButton({ code, onOutputChange, onTaskDetails, onCreditsUpdate, onResetResults, exerciseId }) {
   const [loading, setLoading] = useState(false);
@@ -64,72 +68,115 @@ function RunButton({ code, onOutputChange, onTaskDetails, onCreditsUpdate, onRes
     }
   };
 
-  // WebSocket per aggiornamenti realtime del task
+  // WebSocket per aggiornamenti realtime del task (protocollo incrementale 'delta')
   const startTaskWebSocket = (taskId) => {
     const base = process.env.REACT_APP_WS_BASE || 'ws://127.0.0.1:8000';
-    const socket = new WebSocket(`${base}/ws/tasks/${taskId}/`);
-
-    let closedOrErrored = false;
 
-    socket.onopen = () => {
-      // Nessuna azione necessaria all'apertura
+    // Output ricevuto finora e offset (in caratteri) per la ripresa dopo una riconnessione
+    const output = { stdout: '', stderr: '' };
+    const offsets = { stdout: 0, stderr: 0 };
+    let details = { id: taskId };
+    let finished = false;
+    let retries = 0;
+
+    // Aggiunge un blocco di output scartando la parte già ricevuta (false = buco, serve resync)
+    const appendOutput = (stream, offset, data) => {
+      if (offset > offsets[stream]) return false;
+      const chars = Array.from(data || '');
+      const skip = offsets[stream] - offset;
+      if (chars.length > skip) {
+        output[stream] += chars.slice(skip).join('');
+        offsets[stream] = offset + chars.length;
+      }
+      return true;
     };
 
-    socket.onmessage = async (event) => {
-      try {
-        const task = JSON.parse(event.data);
-
-        // Task completato
-        if ([ 'completed', 'failed', 'interrupted' ].includes(task.status)) {
-          onOutputChange?.({
-            stdout: task.stdout || '',
-            stderr: task.stderr || ''
-          });
-          onTaskDetails?.(task);
-
-          // Aggiorna crediti
-          if (onCreditsUpdate) {
-            try {
-              const userResponse = await api.get('/user/');
-              onCreditsUpdate(userResponse.data.credits);
-            } catch (error) {
-              console.error('Errore aggiornamento crediti:', error);
+    const connect = () => {
+      const query = `protocol=delta&stdout_offset=${offsets.stdout}&stderr_offset=${offsets.stderr}`;
+      const socket = new WebSocket(`${base}/ws/tasks/${taskId}/?${query}`);
+
+      socket.onopen = () => {
+        retries = 0;
+      };
+
+      socket.onmessage = async (event) => {
+        try {
+          const message = JSON.parse(event.data);
+
+          if (message.type === 'output') {
+            if (!appendOutput(message.stream, message.offset, message.data)) {
+              // Messaggi persi: chiede un'istantanea dagli offset correnti
+              socket.send(JSON.stringify({ action: 'resync', ...offsets }));
+              return;
             }
+            onOutputChange?.({ ...output });
+            return;
+          }
+
+          if (message.type === 'snapshot') {
+            const { stdout, stderr, ...fields } = message.task;
+            appendOutput('stdout', message.stdout_offset, stdout);
+            appendOutput('stderr', message.stderr_offset, stderr);
+            details = { ...details, ...fields };
+          } else if (message.type === 'status' || message.type === 'credits') {
+            const { type, task_id, stdout, stderr, ...fields } = message;
+            details = { ...details, ...fields };
+            // Negli stati finali il server invia l'output definitivo
+            if (stdout !== undefined) output.stdout = stdout;
+            if (stderr !== undefined) output.stderr = stderr;
+          }
+
+          // Task completato
+          if ([ 'completed', 'failed', 'interrupted' ].includes(details.status)) {
+            finished = true;
+            onOutputChange?.({ ...output });
+            onTaskDetails?.(details);
+
+            // Aggiorna crediti
+            if (onCreditsUpdate) {
+              try {
+                const userResponse = await api.get('/user/');
+                onCreditsUpdate(userResponse.data.credits);
+              } catch (error) {
+                console.error('Errore aggiornamento crediti:', error);
+              }
+            }
+            setIsTaskRunning(false);
+            socket.close();
+            return;
           }
-          setIsTaskRunning(false);
-          socket.close();
-          return;
-        }
 
-        // Task in esecuzione/pending - aggiorna dettagli e output incrementale
-        if (task.status === 'running' || task.status === 'pending') {
-          setIsTaskRunning(task.status === 'running');
-          onOutputChange?.({
-            stdout: task.stdout || '',
-            stderr: task.stderr || ''
-          });
-          onTaskDetails?.(task);
+          // Task in esecuzione/pending - aggiorna dettagli e output
+          if (details.status === 'running' || details.status === 'pending') {
+            setIsTaskRunning(details.status === 'running');
+            onOutputChange?.({ ...output });
+            onTaskDetails?.(details);
+          }
+        } catch (e) {
+          console.error('WebSocket parse error:', e);
         }
-      } catch (e) {
-        console.error('WebSocket parse error:', e);
-      }
-    };
+      };
 
-    socket.onerror = (err) => {
-      closedOrErrored = true;
-      setIsTaskRunning(false);
-      console.error('WebSocket error:', err);
-      if (socket && socket.readyState !== WebSocket.CLOSED) {
-        socket.close();
-      }
+      socket.onerror = (err) => {
+        console.error('WebSocket error:', err);
+        if (socket && socket.readyState !== WebSocket.CLOSED) {
+          socket.close();
+        }
+      };
+
+      socket.onclose = () => {
+        if (finished) return;
+        // Riconnessione con ripresa dagli offset ricevuti
+        if (retries < MAX_WS_RETRIES) {
+          retries += 1;
+          setTimeout(connect, WS_RETRY_DELAY_MS * retries);
+        } else {
+          setIsTaskRunning(false);
+        }
+      };
     };
 
-    socket.onclose = () => {
-      if (!closedOrErrored) {
-        closedOrErrored = true;
-        setIsTaskRunning(false);
-      }
-    };
+    connect();
   };
 
   return (
@@ -144,7 +144,7 @@ ENV_FILE="$BACKEND_DIR/.env"
 
 if [ -f "$ENV_FILE" ]; then
     # Carica tutte le variabili di configurazione
-    export $(grep -E "^(SECRET_KEY|DEBUG|ALLOWED_HOSTS|CORS_ALLOWED_ORIGINS|USER_INITIAL_CREDITS|DAILY_CREDITS_RESET_AMOUNT|TASK_START_COST|DEFAULT_CREDIT_COST_PER_SECOND|DEFAULT_FILE_EXTENSION|MAX_TASK_EXECUTION_TIME|MAX_SOURCE_CODE_LENGTH|MAX_OUTPUT_BUFFER_SIZE|CODE_COMPILATION_TIMEOUT|PROGRAM_EXECUTION_TIMEOUT|MAX_CONCURRENT_TASKS|JWT_ACCESS_TOKEN_LIFETIME|JWT_REFRESH_TOKEN_LIFETIME|CSRF_TRUSTED_ORIGINS|SCRIPT_DEBUG)=" "$ENV_FILE" | xargs)
+    export $(grep -E "^(SECRET_KEY|DEBUG|ALLOWED_HOSTS|CORS_ALLOWED_ORIGINS|USER_INITIAL_CREDITS|DAILY_CREDITS_RESET_AMOUNT|TASK_START_COST|DEFAULT_CREDIT_COST_PER_SECOND|DEFAULT_FILE_EXTENSION|MAX_TASK_EXECUTION_TIME|MAX_SOURCE_CODE_LENGTH|MAX_OUTPUT_BUFFER_SIZE|CODE_COMPILATION_TIMEOUT|PROGRAM_EXECUTION_TIMEOUT|MAX_CONCURRENT_TASKS|JWT_ACCESS_TOKEN_LIFETIME|JWT_REFRESH_TOKEN_LIFETIME|CSRF_TRUSTED_ORIGINS|REDIS_URL|CHANNEL_LAYER_BACKEND|BACKEND_WORKERS|EXECUTION_MODE)=" "$ENV_FILE" | xargs)
 else
     log_error "File $ENV_FILE non trovato"
 fi
@@ -170,13 +170,18 @@ log_info "MAX_OUTPUT_BUFFER_SIZE = ${MAX_OUTPUT_BUFFER_SIZE:-'non impostato'}"
 log_info "CODE_COMPILATION_TIMEOUT = ${CODE_COMPILATION_TIMEOUT:-'non impostato'}"
 log_info "PROGRAM_EXECUTION_TIMEOUT = ${PROGRAM_EXECUTION_TIMEOUT:-'non impostato'}"
 log_info "MAX_CONCURRENT_TASKS = ${MAX_CONCURRENT_TASKS:-'non impostato'}"
-log_info "SCRIPT_DEBUG = ${SCRIPT_DEBUG:-'non impostato'}"
 
 log_subsection "AUTENTICAZIONE E SICUREZZA"
 log_info "JWT_ACCESS_TOKEN_LIFETIME = ${JWT_ACCESS_TOKEN_LIFETIME:-'non impostato'}"
 log_info "JWT_REFRESH_TOKEN_LIFETIME = ${JWT_REFRESH_TOKEN_LIFETIME:-'non impostato'}"
 log_info "CSRF_TRUSTED_ORIGINS = ${CSRF_TRUSTED_ORIGINS:-'non impostato'}"
 
+log_subsection "WORKER E CHANNEL LAYER"
+log_info "BACKEND_WORKERS = ${BACKEND_WORKERS:-'non impostato'}"
+log_info "REDIS_URL = ${REDIS_URL:-'non impostato'}"
+log_info "CHANNEL_LAYER_BACKEND = ${CHANNEL_LAYER_BACKEND:-'non impostato'}"
+log_info "EXECUTION_MODE = ${EXECUTION_MODE:-'non impostato'}"
+
 # =============================================================================
 # CONFERMA UTENTE
 # =============================================================================
@@ -250,15 +255,47 @@ else
     log_error "Uvicorn non installato"
 fi
 
+# =============================================================================
+# AVVIO WORKER DI ESECUZIONE
+# =============================================================================
+# Con Redis i task girano in run_worker (stesso default di settings.py): il ricaricamento
+# o il riavvio di uvicorn non interrompe più i task in corso
+if [ -z "${EXECUTION_MODE:-}" ]; then
+    if [ -n "${REDIS_URL:-}" ]; then EXECUTION_MODE=worker; else EXECUTION_MODE=local; fi
+fi
+export EXECUTION_MODE
+if [ "${EXECUTION_MODE}" = "worker" ]; then
+    log_section "AVVIO WORKER"
+    log_info "Avvio worker di esecuzione (manage.py run_worker)"
+    pushd "$BACKEND_DIR" >/dev/null
+    python manage.py run_worker &
+    WORKER_PID=$!
+    popd >/dev/null
+fi
+
 # =============================================================================
 # AVVIO BACKEND
 # =============================================================================
 log_section "AVVIO BACKEND"
-log_info "Avvio backend su :8000 (uvicorn)"
+
+# Un solo worker con ricaricamento automatico; più worker solo con un channel layer condiviso (Redis).
+# Con EXECUTION_MODE=local i task girano nel processo uvicorn: niente ricaricamento automatico,
+# altrimenti ogni modifica al codice interromperebbe i task in corso
+UVICORN_ARGS=(--host 0.0.0.0 --port 8000)
+if [ "${EXECUTION_MODE}" = "worker" ]; then
+    UVICORN_ARGS+=(--reload)
+else
+    log_warn "EXECUTION_MODE=local: ricaricamento automatico di uvicorn disattivato (i task girano nel processo HTTP)"
+fi
+if [ "${BACKEND_WORKERS:-1}" -gt 1 ]; then
+    [ -n "${REDIS_URL:-}" ] || log_error "BACKEND_WORKERS=${BACKEND_WORKERS} richiede REDIS_URL (channel layer condiviso tra i worker)"
+    UVICORN_ARGS=(--host 0.0.0.0 --port 8000 --workers "${BACKEND_WORKERS}")
+fi
+log_info "Avvio backend su :8000 (uvicorn ${UVICORN_ARGS[*]})"
 
 # Avvia il backend
 pushd "$BACKEND_DIR" >/dev/null
-"${UVICORN_CMD[@]}" backend.asgi:application --host 0.0.0.0 --port 8000 --reload &
+"${UVICORN_CMD[@]}" backend.asgi:application "${UVICORN_ARGS[@]}" &
 BACK_PID=$!
 popd >/dev/null
 
@@ -325,6 +362,7 @@ cleanup() {
     CLEANED_UP=1
     [ -n "${BACK_PID:-}" ] && log_warn "Arresto backend (pid=$BACK_PID)" && kill "$BACK_PID" 2>/dev/null || true
     [ -n "${FRONT_PID:-}" ] && log_warn "Arresto frontend (pid=$FRONT_PID)" && kill "$FRONT_PID" 2>/dev/null || true
+    [ -n "${WORKER_PID:-}" ] && log_warn "Arresto worker (pid=$WORKER_PID)" && kill "$WORKER_PID" 2>/dev/null || true
 	# Rimuove la voce cron creata in precedenza (se presente)
 	if crontab -l >/dev/null 2>&1; then
 		_existing_cron=$(crontab -l 2>/dev/null || true)